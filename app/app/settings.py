@@ -16,6 +16,9 @@ import os
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Writable directory for on-disk indexes and other generated data.
+DATA_DIR = Path(os.environ.get('DATA_DIR', BASE_DIR / 'var'))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.2/howto/deployment/checklist/
@@ -48,7 +51,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ASGIURLConfMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,6 +84,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# URLs served over ASGI, routing hot reads to async views.
+ASGI_URLCONF = 'app.urls_asgi'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -88,9 +98,86 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Bounds readiness probes against hosts that drop packets.
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
+# DB_ENGINE=sqlite runs against a local file instead of PostgreSQL.
+if os.environ.get('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME', str(DATA_DIR / 'db.sqlite3')),
+    }
+
+# Read replicas: comma separated hosts for PostgreSQL, or file paths
+# (copies of the primary) as a stand-in with SQLite.
+DATABASE_REPLICAS = []
+for index, location in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{index}'
+    key = 'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3') \
+        else 'HOST'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        **{key: location.strip()},
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
+# Seconds a client reads from the primary after writing.
+DATABASE_PRIMARY_PIN_SECONDS = float(
+    os.environ.get('DB_PRIMARY_PIN_SECONDS', 5))
+# Cache holding the pins of token clients. It must be shared by every
+# worker, or a client's next request can miss the pin set by another.
+DATABASE_PRIMARY_PIN_CACHE = 'pins'
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# Rendered API responses live in their own cache. 'locmem' is private to
+# each process; 'file' shares entries between workers and can be pointed
+# at shared memory, e.g. RESPONSE_CACHE_LOCATION=/dev/shm/recipe-cache.
+# Invalidation only reaches the cache of the process that wrote, so
+# caching is on by default only with a shared backend.
+RESPONSE_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'locmem')
+RESPONSE_CACHE_SHARED = RESPONSE_CACHE_BACKEND != 'locmem'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': RESPONSE_CACHE_BACKENDS[RESPONSE_CACHE_BACKEND],
+        'LOCATION': os.environ.get(
+            'RESPONSE_CACHE_LOCATION',
+            str(DATA_DIR / 'response-cache')
+            if RESPONSE_CACHE_BACKEND == 'file' else 'responses',
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'pins': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'DB_PIN_CACHE_LOCATION', str(DATA_DIR / 'db-pins')),
+    },
+}
+
+RESPONSE_CACHE = {
+    'ENABLED': os.environ.get(
+        'RESPONSE_CACHE_ENABLED', '1' if RESPONSE_CACHE_SHARED else '0') == '1',
+    'ALIAS': 'responses',
+    'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300)),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -138,4 +225,145 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-}
\ No newline at end of file
+    # JSON through orjson when installed, see core.renderers. It is an
+    # optional speed-up: requirements.dev.txt pulls it in for development
+    # and benchmarks; production images add it with `pip install orjson`.
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Response compression: brotli when the `brotli` package is installed,
+# gzip otherwise, for bodies of at least MIN_SIZE bytes and the listed
+# content type prefixes.
+COMPRESSION = {
+    'ENABLED': os.environ.get('COMPRESSION_ENABLED', '1') == '1',
+    'MIN_SIZE': int(os.environ.get('COMPRESSION_MIN_SIZE', 1024)),
+    'GZIP_LEVEL': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+    'BROTLI_QUALITY': int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5)),
+    'CONTENT_TYPES': (
+        'application/json',
+        'application/vnd.oai.openapi',
+        'application/x-ndjson',
+        'application/javascript',
+        'application/xml',
+        'image/svg+xml',
+        'text/',
+    ),
+}
+
+# POST /api/batch/, see core.batch. Consecutive reads of a batch run on
+# up to WORKERS threads.
+BATCH = {
+    'MAX_REQUESTS': int(os.environ.get('BATCH_MAX_REQUESTS', 20)),
+    'WORKERS': int(os.environ.get('BATCH_WORKERS', 4)),
+    'PATHS': ('/api/recipe/', '/api/home/', '/api/user/me/'),
+}
+
+# Weekly meal plans, see home.meal_plan. After catalog changes the recipe
+# matrix is rebuilt at most every REBUILD_INTERVAL seconds, on a thread
+# of its own with REBUILD_ASYNC.
+MEAL_PLAN = {
+    'REBUILD_ASYNC': os.environ.get('MEAL_PLAN_REBUILD_ASYNC', '1') == '1',
+    'REBUILD_INTERVAL': float(os.environ.get(
+        'MEAL_PLAN_REBUILD_INTERVAL', 5)),
+}
+
+# In-process event bus for model changes, see core.events. Each
+# subscriber takes up to BATCH_SIZE events at a time from a queue of
+# QUEUE_SIZE on its own thread, or inline without ASYNC.
+EVENTS = {
+    'ASYNC': os.environ.get('EVENTS_ASYNC', '1') == '1',
+    'QUEUE_SIZE': int(os.environ.get('EVENTS_QUEUE_SIZE', 10000)),
+    'BATCH_SIZE': int(os.environ.get('EVENTS_BATCH_SIZE', 500)),
+}
+
+# Durable log of the events above, see core.eventlog. Segments roll over
+# at SEGMENT_BYTES; maintain_event_log deletes closed ones older than
+# RETENTION_HOURS or beyond RETENTION_BYTES in total.
+EVENT_LOG = {
+    'ENABLED': os.environ.get('EVENT_LOG_ENABLED', '0') == '1',
+    'PATH': os.environ.get('EVENT_LOG_PATH', DATA_DIR / 'events'),
+    'SEGMENT_BYTES': int(os.environ.get(
+        'EVENT_LOG_SEGMENT_BYTES', 64 * 1024 * 1024)),
+    'FSYNC': os.environ.get('EVENT_LOG_FSYNC', '0') == '1',
+    'RETENTION_HOURS': float(os.environ.get(
+        'EVENT_LOG_RETENTION_HOURS', 7 * 24)),
+    'RETENTION_BYTES': int(os.environ.get(
+        'EVENT_LOG_RETENTION_BYTES', 1024 * 1024 * 1024)),
+}
+
+# Kitchen sensor readings, see home.sensors. The latest reading of each
+# home and ingredient is written every WINDOW_MS, or sooner once
+# MAX_PENDING rows wait; with a WINDOW_MS of 0 readings are written as
+# they come in. Readings failing MAX_RETRIES more flushes are dropped, and
+# ones measured over MAX_SKEW_SECONDS in the future are refused, as they
+# would make every later reading of their row look stale.
+SENSORS = {
+    'WINDOW_MS': int(os.environ.get('SENSORS_WINDOW_MS', 500)),
+    'MAX_PENDING': int(os.environ.get('SENSORS_MAX_PENDING', 20000)),
+    'MAX_READINGS': int(os.environ.get('SENSORS_MAX_READINGS', 1000)),
+    'MAX_RETRIES': int(os.environ.get('SENSORS_MAX_RETRIES', 3)),
+    'MAX_SKEW_SECONDS': int(os.environ.get('SENSORS_MAX_SKEW_SECONDS', 60)),
+}
+
+# Prebuilt OpenAPI schema artifacts, see core.schema.
+SCHEMA_DIR = os.environ.get('SCHEMA_DIR', DATA_DIR / 'schema')
+
+# Memory-mapped ingredient co-occurrence index used for substitutes.
+# Committed recipe changes are merged into it every FLUSH_MS.
+COOCCURRENCE_PATH = os.environ.get(
+    'COOCCURRENCE_PATH', DATA_DIR / 'cooccurrence.bin')
+COOCCURRENCE_FLUSH_MS = int(os.environ.get('COOCCURRENCE_FLUSH_MS', 1000))
+
+# Near-duplicate recipes, see recipe.duplicates. Recipes whose estimated
+# Jaccard similarity reaches THRESHOLD are duplicates. CHECK_ON_CREATE
+# refuses new recipes with a duplicate title (409); it changes what
+# existing clients get back, so it is opt-in.
+DUPLICATES = {
+    'THRESHOLD': float(os.environ.get('DUPLICATES_THRESHOLD', 0.75)),
+    'CHECK_ON_CREATE': os.environ.get('DUPLICATES_CHECK', '0') == '1',
+}
+
+# Per-request query count and timings for views under PATH_PREFIX; slow
+# requests and queries are logged to 'core.timing'. HEADER also sends them
+# to clients in a Server-Timing header, so it is off outside profiling.
+REQUEST_TIMING = {
+    'ENABLED': os.environ.get('REQUEST_TIMING_ENABLED', '1') == '1',
+    'PATH_PREFIX': '/api/',
+    'HEADER': os.environ.get('REQUEST_TIMING_HEADER', '0') == '1',
+    'SLOW_REQUEST_MS': float(os.environ.get('SLOW_REQUEST_MS', 500)),
+    'SLOW_QUERY_MS': float(os.environ.get('SLOW_QUERY_MS', 100)),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'core.log.JSONFormatter'},
+    },
+    'handlers': {
+        'structured': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['structured'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core.views': {
+            'handlers': ['structured'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
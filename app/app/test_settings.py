@@ -0,0 +1,70 @@
+"""
+Django settings for running the test suite quickly.
+
+Inherits the project settings, swapping PostgreSQL for an in-memory
+SQLite database, password hashing for a fast hasher and the runner for
+one running test cases in parallel:
+
+    python manage.py test --settings=app.test_settings
+
+With TEST_DB=project the project database is kept, as CI does to test
+against PostgreSQL.
+
+Work the project defers to background threads runs inline, so tests see
+its effects once the request returns; tests of those threads switch
+them back on. Files the project writes under DATA_DIR go to a scratch
+directory removed when the run ends.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from app.settings import *  # noqa: F401,F403
+
+if os.environ.get('TEST_DB', 'sqlite') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': ':memory:',
+        },
+    }
+    DATABASE_REPLICAS = []
+
+DATA_DIR = Path(tempfile.mkdtemp(prefix='recipe-tests-'))
+_owner = os.getpid()
+
+
+@atexit.register
+def _remove_data_dir():
+    # Forked test workers share the directory with the main process.
+    if os.getpid() == _owner:
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+COOCCURRENCE_PATH = DATA_DIR / 'cooccurrence.bin'
+SCHEMA_DIR = DATA_DIR / 'schema'
+EVENT_LOG = dict(EVENT_LOG, PATH=DATA_DIR / 'events')  # noqa: F405
+CACHES = {
+    alias: dict(config, LOCATION=str(DATA_DIR / alias))
+    if config['BACKEND'].endswith('FileBasedCache') else config
+    for alias, config in CACHES.items()  # noqa: F405
+}
+
+# create_user hashes with PBKDF2 otherwise, most of the suite's time.
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+TEST_RUNNER = 'core.test_runner.ParallelTestRunner'
+
+# TestCase data is uncommitted, so other threads' connections miss it.
+BATCH = dict(BATCH, WORKERS=1)  # noqa: F405
+EVENTS = dict(EVENTS, ASYNC=False)  # noqa: F405
+SENSORS = dict(SENSORS, WINDOW_MS=0)  # noqa: F405
+
+# Tests of the response cache enable it.
+RESPONSE_CACHE = dict(RESPONSE_CACHE, ENABLED=False)  # noqa: F405
+
+# Plans and substitutes see catalog changes of the test straight away.
+MEAL_PLAN = {'REBUILD_ASYNC': False, 'REBUILD_INTERVAL': 0}
+COOCCURRENCE_FLUSH_MS = 0
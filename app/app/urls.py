@@ -13,16 +13,18 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
+from drf_spectacular.views import SpectacularSwaggerView
 from django.contrib import admin
 from django.urls import path, include
+from core import views as core_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
+    path(
+        'api/schema/',
+        core_views.PrebuiltSchemaView.as_view(),
+        name='api-schema'
+    ),
     path(
         'api/docs/',
         SpectacularSwaggerView.as_view(url_name='api-schema'),
@@ -31,4 +33,20 @@ urlpatterns = [
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
     path('api/home/', include('home.urls')),
+    path('api/batch/', core_views.BatchView.as_view(), name='batch'),
+    path(
+        'api/export/<str:dataset>/',
+        core_views.ExportView.as_view(),
+        name='export'
+    ),
+    path(
+        'api/cache/stats/',
+        core_views.CacheStatsView.as_view(),
+        name='cache-stats'
+    ),
+    path(
+        'api/health/ready/',
+        core_views.ReadinessView.as_view(),
+        name='health-ready'
+    ),
 ]
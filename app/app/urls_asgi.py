@@ -0,0 +1,25 @@
+"""
+URL configuration for requests served over ASGI.
+
+Routes the hot read endpoints to their async views and everything else
+to the regular URL configuration. Selected by
+`core.middleware.ASGIURLConfMiddleware`.
+"""
+from django.urls import include, path
+
+from home import async_views as home_views
+from recipe import async_views as recipe_views
+
+urlpatterns = [
+    path('api/recipe/recipes/', recipe_views.RecipeListView.as_view()),
+    path(
+        'api/recipe/recipes/<pk>/',
+        recipe_views.RecipeDetailView.as_view()
+    ),
+    path(
+        'api/home/inventory-fetch/',
+        home_views.InventoryFetchView.as_view()
+    ),
+    path('api/home/fav-recipes/', home_views.FavHomeRecipeListView.as_view()),
+    path('', include('app.urls')),
+]
@@ -0,0 +1,261 @@
+"""
+Benchmark WSGI against ASGI with many concurrent keep-alive clients.
+
+Seeds a SQLite stand-in database, then starts the app under gunicorn
+(WSGI, threaded workers) and under uvicorn (ASGI, async read views) and
+drives each with the same number of keep-alive connections issuing the
+hot read requests. Reports throughput, latency and the server's resident
+memory per open connection.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_asgi --clients 1000 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.utils import percentile, setup_django
+
+READ_PATHS = [
+    '/api/recipe/recipes/',
+    '/api/recipe/recipes/{recipe}/',
+    '/api/home/inventory-fetch/',
+    '/api/home/fav-recipes/',
+]
+
+
+def seed(recipes, homes, rng):
+    """Create the catalog and one token per home, returns client specs."""
+    from rest_framework.authtoken.models import Token
+
+    from core.models import (
+        FavHomeRecipe,
+        Home,
+        Ingredient,
+        Inventory,
+        Recipe,
+        User,
+    )
+
+    owner = User.objects.create_user('owner@example.com', 'bench-pass')
+    Ingredient.objects.bulk_create(
+        Ingredient(user=owner, name=f'ingredient-{i}') for i in range(200))
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    Recipe.objects.bulk_create(
+        Recipe(user=owner, title=f'recipe {i}', time_minutes=10 + i % 80)
+        for i in range(recipes))
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    specs = []
+    for h in range(homes):
+        home = Home.objects.create(name=f'home {h}')
+        user = User.objects.create_user(f'user{h}@example.com', 'bench')
+        user.home = home
+        user.save()
+        Inventory.objects.bulk_create(
+            Inventory(home=home, ingredient_id=ing, amount=500)
+            for ing in rng.sample(ingredient_ids, 20))
+        FavHomeRecipe.objects.bulk_create(
+            FavHomeRecipe(home=home, recipe_id=rid, rating=3)
+            for rid in rng.sample(recipe_ids, 10))
+        own = Recipe.objects.create(user=user, title=f'own {h}',
+                                    time_minutes=20)
+        specs.append((Token.objects.create(user=user).key, own.id))
+    return specs
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+SERVERS = {
+    'wsgi': lambda port, args: [
+        sys.executable, '-m', 'gunicorn', 'app.wsgi:application',
+        '--bind', f'127.0.0.1:{port}', '--workers', str(args.workers),
+        '--worker-class', 'gthread', '--threads', str(args.threads),
+        '--worker-connections', str(args.clients * 2),
+        '--keep-alive', '300', '--log-level', 'warning',
+    ],
+    'asgi': lambda port, args: [
+        sys.executable, '-m', 'uvicorn', 'app.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(args.workers), '--timeout-keep-alive', '300',
+        '--log-level', 'warning', '--no-access-log',
+    ],
+}
+
+
+def process_tree_rss(pid):
+    """Return the resident memory of `pid` and its children in bytes."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as stat:
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/statm') as statm:
+                total += int(statm.read().split()[1]) * os.sysconf(
+                    'SC_PAGE_SIZE')
+        except OSError:
+            pass
+    return total
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 client connection."""
+
+    def __init__(self, port, token, recipe):
+        self.port = port
+        self.headers = (f'Host: 127.0.0.1\r\nAuthorization: Token {token}'
+                        '\r\nConnection: keep-alive\r\n\r\n')
+        self.recipe = recipe
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            '127.0.0.1', self.port)
+
+    async def request(self, path):
+        self.writer.write(f'GET {path} HTTP/1.1\r\n{self.headers}'.encode())
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        status = int(head.split(b' ', 2)[1])
+        length = 0
+        for line in head.split(b'\r\n'):
+            if line.lower().startswith(b'content-length:'):
+                length = int(line.split(b':', 1)[1])
+        await self.reader.readexactly(length)
+        return status
+
+    def close(self):
+        self.writer.close()
+
+
+async def drive(name, port, pid, specs, args):
+    rng = random.Random(args.seed)
+    connections = [Connection(port, *rng.choice(specs))
+                   for _ in range(args.clients)]
+    rss_before = process_tree_rss(pid)
+    for start in range(0, len(connections), 100):
+        await asyncio.gather(*(conn.open()
+                               for conn in connections[start:start + 100]))
+    # Give the server a request per connection so each one is accepted
+    # and parsed before memory is sampled.
+    await asyncio.gather(*(
+        conn.request(f'/api/recipe/recipes/{conn.recipe}/')
+        for conn in connections))
+    rss_open = process_tree_rss(pid)
+
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def client(conn):
+        nonlocal errors
+        local = random.Random(id(conn))
+        while time.perf_counter() < deadline:
+            path = local.choice(READ_PATHS).format(recipe=conn.recipe)
+            start = time.perf_counter()
+            try:
+                status = await conn.request(path)
+            except (OSError, asyncio.IncompleteReadError):
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(conn) for conn in connections))
+    elapsed = time.perf_counter() - started
+    rss_load = process_tree_rss(pid)
+    for conn in connections:
+        conn.close()
+
+    ms = [sample * 1000 for sample in latencies]
+    print(f'{name:<6}{len(ms) / elapsed:>9.1f}{percentile(ms, 50):>9.1f}'
+          f'{percentile(ms, 99):>9.1f}{errors:>8}'
+          f'{rss_before / 2 ** 20:>10.1f}{rss_load / 2 ** 20:>10.1f}'
+          f'{(rss_open - rss_before) / args.clients / 1024:>12.1f}')
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.5).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=32,
+                        help='threads per gunicorn worker')
+    parser.add_argument('--recipes', type=int, default=100)
+    parser.add_argument('--homes', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--servers', default='wsgi,asgi')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-asgi-')
+    env = dict(
+        os.environ,
+        DB_ENGINE='sqlite',
+        DB_NAME=os.path.join(workdir, 'db.sqlite3'),
+        DATA_DIR=workdir,
+        DJANGO_SETTINGS_MODULE='app.settings',
+        # Measure the views rather than the response cache.
+        RESPONSE_CACHE_ENABLED='0',
+    )
+    os.environ.update(env)
+    try:
+        setup_django()
+        from django.core.management import call_command
+        from django.db import connections
+
+        call_command('migrate', verbosity=0)
+        specs = seed(args.recipes, args.homes, random.Random(args.seed))
+        connections.close_all()
+
+        print(f'{"server":<6}{"req/s":>9}{"p50":>9}{"p99":>9}{"errors":>8}'
+              f'{"idle MiB":>10}{"load MiB":>10}{"KiB/conn":>12}')
+        for name in args.servers.split(','):
+            port = free_port()
+            server = subprocess.Popen(
+                SERVERS[name](port, args), env=env, start_new_session=True)
+            try:
+                wait_for_port(port)
+                time.sleep(1)
+                asyncio.run(drive(name, port, server.pid, specs, args))
+            finally:
+                os.killpg(server.pid, signal.SIGTERM)
+                server.wait(timeout=30)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
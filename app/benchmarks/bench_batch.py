@@ -0,0 +1,96 @@
+"""
+Benchmark loading a screen with one batch instead of sequential calls.
+
+Seeds a scratch database and loads a home screen made of several reads
+under `api/recipe/` and `api/home/`, the way a mobile client does:
+one call after the other, each paying a simulated network round trip,
+against a single `POST /api/batch/` running them sequentially and on
+the thread pool. The round trip is simulated by sleeping `--rtt-ms`
+before each HTTP call, so the reported times are end to end.
+
+Usage (from the app directory):
+    DB_ENGINE=sqlite python -m benchmarks.bench_batch --rtt-ms 200
+"""
+import argparse
+import random
+import time
+
+from benchmarks import dataset as datasets
+from benchmarks.utils import Timer, scratch_database, setup_django, summarize
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+SCREEN = [
+    '/api/user/me/',
+    '/api/recipe/recipes/?ordering=popularity&fields=id,title,avg_rating',
+    '/api/recipe/recipes/?fields=id,title,time_minutes',
+    '/api/recipe/tags/',
+    '/api/home/homes/',
+    '/api/home/inventory-fetch/',
+    '/api/home/fav-recipes/',
+    '/api/home/meal-plan/?days=7',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rtt-ms', type=float, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--cache', action='store_true',
+                        help='serve reads from the response cache')
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    def call(method, *call_args, **kwargs):
+        time.sleep(rtt)
+        res = method(*call_args, **kwargs)
+        assert res.status_code == 200, res.content
+        return res
+
+    def sequential():
+        for path in SCREEN:
+            call(client.get, path)
+
+    def batched():
+        call(client.post, '/api/batch/', {
+            'requests': [{'method': 'GET', 'path': path} for path in SCREEN],
+        }, format='json')
+
+    response_cache = dict(settings.RESPONSE_CACHE, ENABLED=args.cache)
+    with scratch_database(), \
+            override_settings(RESPONSE_CACHE=response_cache):
+        data = datasets.seed(datasets.DEFAULT_VOLUMES,
+                             random.Random(args.seed))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {data.users[0].token}')
+        variants = [
+            (f'{len(SCREEN)} sequential calls', sequential, None),
+            ('batch, 1 worker', batched, 1),
+            ('batch, 4 workers', batched, 4),
+        ]
+        print(f'{len(SCREEN)} reads, {args.rtt_ms:.0f} ms RTT, response '
+              f'cache {"on" if args.cache else "off"}')
+        print(f'{"variant":<24}{"mean":>10}{"p50":>10}{"server p50":>12}')
+        for label, load, workers in variants:
+            config = dict(settings.BATCH, WORKERS=workers or 1)
+            with override_settings(BATCH=config):
+                load()
+                latencies = []
+                for _ in range(args.repeat):
+                    with Timer() as timer:
+                        load()
+                    latencies.append(timer.elapsed)
+            summary = summarize(latencies)
+            trips = len(SCREEN) if workers is None else 1
+            server = summary['p50_ms'] - trips * args.rtt_ms
+            print(f'{label:<24}{summary["mean_ms"]:>8.1f}ms'
+                  f'{summary["p50_ms"]:>8.1f}ms{server:>10.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark response compression per endpoint.
+
+Seeds a benchmark dataset on a scratch database and, for each read
+endpoint, reports the plain body size, the compressed size and the CPU
+time to compress it with every available encoding and level, and the
+latency of response cache hits that compress on every hit against hits
+served from the precompressed cache entry.
+
+Usage (from the app directory):
+    DB_ENGINE=sqlite python -m benchmarks.bench_compression
+"""
+import argparse
+import random
+
+from benchmarks import dataset as datasets
+from benchmarks.utils import Timer, scratch_database, setup_django, summarize
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import cache, compression  # noqa: E402
+
+ENDPOINTS = [
+    '/api/recipe/recipes/',
+    '/api/recipe/ingredients/',
+    '/api/recipe/recipeingredients/',
+    '/api/home/inventory-fetch/',
+    '/api/home/fav-recipes/',
+]
+LEVELS = {'gzip': [1, 6, 9], 'br': [1, 5, 11]}
+
+
+def time_compress(body, encoding, level, repeat):
+    key = 'GZIP_LEVEL' if encoding == 'gzip' else 'BROTLI_QUALITY'
+    config = dict(settings.COMPRESSION, **{key: level})
+    with override_settings(COMPRESSION=config):
+        latencies = []
+        for _ in range(repeat):
+            with Timer() as timer:
+                compressed = compression.compress(body, encoding)
+            latencies.append(timer.elapsed)
+    return len(compressed), summarize(latencies)['p50_ms']
+
+
+def hit_latency(client, path, repeat, accept):
+    latencies = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            client.get(path, HTTP_ACCEPT_ENCODING=accept)
+        latencies.append(timer.elapsed)
+    return summarize(latencies)['p50_ms']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--ingredients', type=int, default=1500)
+    args = parser.parse_args()
+
+    encodings = compression.available()
+    with scratch_database():
+        volumes = dict(datasets.DEFAULT_VOLUMES, recipes=args.recipes,
+                       ingredients=args.ingredients, inventory_per_home=200,
+                       favourites_per_home=150)
+        data = datasets.seed(volumes, random.Random(args.seed))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {data.users[0].token}')
+
+        print(f'{"endpoint":<32}{"coding":<8}{"bytes":>10}{"ratio":>8}'
+              f'{"cpu p50":>10}')
+        bodies = {}
+        for path in ENDPOINTS:
+            body = bodies[path] = client.get(path).content
+            print(f'{path:<32}{"plain":<8}{len(body):>10}')
+            for encoding in encodings:
+                for level in LEVELS[encoding]:
+                    size, ms = time_compress(body, encoding, level,
+                                             args.repeat)
+                    print(f'{"":<32}{f"{encoding}-{level}":<8}{size:>10}'
+                          f'{len(body) / size:>7.1f}x{ms:>8.2f}ms')
+
+        print()
+        print('response cache hits, p50 ms (gzip at the configured level)')
+        print(f'{"endpoint":<32}{"plain":>8}{"compress":>10}'
+              f'{"stored":>8}')
+        enabled = dict(settings.RESPONSE_CACHE, ENABLED=True)
+        with override_settings(RESPONSE_CACHE=enabled):
+            cache.get_cache().clear()
+            for path in ENDPOINTS:
+                client.get(path, HTTP_ACCEPT_ENCODING='gzip')
+                plain = hit_latency(client, path, args.repeat, '')
+                stored = hit_latency(client, path, args.repeat, 'gzip')
+                # A hit without the stored body would compress it again.
+                _, compress_ms = time_compress(
+                    bodies[path], 'gzip',
+                    settings.COMPRESSION['GZIP_LEVEL'], args.repeat)
+                print(f'{path:<32}{plain:>8.2f}{plain + compress_ms:>10.2f}'
+                      f'{stored:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
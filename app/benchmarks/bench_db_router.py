@@ -0,0 +1,199 @@
+"""
+Benchmark read throughput with read replicas.
+
+Uses the SQLite stand-in: a primary database file plus copies of it as
+replicas in a temporary directory. Worker threads replay a read-heavy
+mix of API requests (with a share of inventory updates) once with the
+replicas switched off and once with them on, and report throughput and
+how queries were spread over the aliases.
+
+The copies are not kept in sync, so reads on them may be stale; the
+primary pin after each write is what keeps clients reading their own
+writes.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_db_router --replicas 2 --threads 8
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+from collections import Counter
+
+from benchmarks.utils import Timer, setup_django, summarize
+
+READ_PATHS = [
+    '/api/recipe/recipes/',
+    '/api/recipe/recipes/?ordering=popularity',
+    '/api/recipe/ingredients/',
+    '/api/home/inventory-fetch/',
+    '/api/home/fav-recipes/',
+]
+
+
+def configure(workdir, replicas):
+    """Point the settings at SQLite files in `workdir` before setup."""
+    os.environ['DB_ENGINE'] = 'sqlite'
+    os.environ['DB_NAME'] = os.path.join(workdir, 'primary.sqlite3')
+    os.environ['DB_REPLICAS'] = ','.join(
+        os.path.join(workdir, f'replica{i}.sqlite3')
+        for i in range(1, replicas + 1))
+    os.environ['DATA_DIR'] = workdir
+    setup_django()
+
+
+def seed(recipes, ingredients, homes, rng):
+    from rest_framework.authtoken.models import Token
+
+    from core.models import (
+        Home,
+        Ingredient,
+        Inventory,
+        Recipe,
+        RecipeIngredient,
+        User,
+    )
+
+    owner = User.objects.create_user('owner@example.com', 'bench-pass')
+    Ingredient.objects.bulk_create(
+        Ingredient(user=owner, name=f'ingredient-{i}')
+        for i in range(ingredients))
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    Recipe.objects.bulk_create(
+        Recipe(user=owner, title=f'recipe {i}', time_minutes=10 + i % 80)
+        for i in range(recipes))
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe_id=rid, ingredient_id=ing, amount=100,
+                         amount_unit='g')
+        for rid in recipe_ids for ing in rng.sample(ingredient_ids, 4))
+    clients = []
+    for h in range(homes):
+        home = Home.objects.create(name=f'home {h}')
+        user = User.objects.create_user(f'user{h}@example.com', 'bench')
+        user.home = home
+        user.save()
+        Inventory.objects.bulk_create(
+            Inventory(home=home, ingredient_id=ing, amount=500)
+            for ing in rng.sample(ingredient_ids, 20))
+        item_ids = list(Inventory.objects.filter(
+            home=home).values_list('id', flat=True))
+        clients.append((Token.objects.create(user=user).key, item_ids))
+    return clients
+
+
+def copy_replicas(settings):
+    from django.db import connections
+
+    connections.close_all()
+    primary = settings.DATABASES['default']['NAME']
+    for alias in settings.DATABASE_REPLICAS:
+        shutil.copyfile(primary, settings.DATABASES[alias]['NAME'])
+
+
+def worker(clients, requests, write_ratio, seed, results):
+    from django.db import connections
+    from rest_framework.test import APIClient
+
+    rng = random.Random(seed)
+    latencies = []
+    queries = Counter()
+    wrappers = []
+    for alias in connections:
+        def count(execute, sql, params, many, context, alias=alias):
+            queries[alias] += 1
+            return execute(sql, params, many, context)
+        wrapper = connections[alias].execute_wrapper(count)
+        wrapper.__enter__()
+        wrappers.append(wrapper)
+    try:
+        sessions = {}
+        for _ in range(requests):
+            key, item_ids = rng.choice(clients)
+            client = sessions.get(key)
+            if client is None:
+                client = sessions[key] = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+            with Timer() as timer:
+                if rng.random() < write_ratio:
+                    client.patch(
+                        f'/api/home/inventory-detail/'
+                        f'{rng.choice(item_ids)}/',
+                        {'amount': rng.randint(1, 1000)})
+                else:
+                    client.get(rng.choice(READ_PATHS))
+            latencies.append(timer.elapsed)
+    finally:
+        for wrapper in reversed(wrappers):
+            wrapper.__exit__(None, None, None)
+        connections.close_all()
+    results.append((latencies, queries))
+
+
+def run(label, clients, args):
+    results = []
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(clients, args.requests // args.threads, args.write_ratio,
+                  args.seed + index, results))
+        for index in range(args.threads)
+    ]
+    with Timer() as timer:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    latencies = [sample for samples, _ in results for sample in samples]
+    queries = sum((counts for _, counts in results), Counter())
+    summary = summarize(latencies)
+    total = sum(queries.values()) or 1
+    spread = ', '.join(f'{alias} {count / total:.0%}'
+                       for alias, count in sorted(queries.items()))
+    print(f'{label:<10}{len(latencies) / timer.elapsed:>9.1f}'
+          f'{summary["p50_ms"]:>9.2f}{summary["p95_ms"]:>9.2f}  {spread}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--replicas', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=800)
+    parser.add_argument('--write-ratio', type=float, default=0.05)
+    parser.add_argument('--recipes', type=int, default=200)
+    parser.add_argument('--ingredients', type=int, default=200)
+    parser.add_argument('--homes', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-router-')
+    try:
+        configure(workdir, args.replicas)
+        from django.conf import settings
+        from django.core.management import call_command
+        from django.test.utils import (
+            override_settings,
+            setup_test_environment,
+        )
+
+        setup_test_environment()
+        call_command('migrate', verbosity=0)
+        clients = seed(args.recipes, args.ingredients, args.homes,
+                       random.Random(args.seed))
+        copy_replicas(settings)
+
+        print(f'{"mode":<10}{"req/s":>9}{"p50":>9}{"p95":>9}  queries')
+        # Cached responses would hide the database reads being compared.
+        no_cache = dict(settings.RESPONSE_CACHE, ENABLED=False)
+        with override_settings(RESPONSE_CACHE=no_cache):
+            with override_settings(DATABASE_REPLICAS=[]):
+                run('primary', clients, args)
+            run('replicas', clients, args)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
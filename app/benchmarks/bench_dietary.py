@@ -0,0 +1,128 @@
+"""
+Benchmark dietary filters on the recipe list.
+
+Seeds a scratch database with `core.seeding` (ingredient flags included),
+rebuilds every recipe's dietary flags and reports the rate. Each profile
+is then filtered two ways, newest recipes first:
+
+- bitmask: `dietary_flags & mask = 0` on the recipe table, what the view
+  runs;
+- join: recipes without a line whose ingredient has a flag in the mask,
+  a NOT EXISTS subquery through RecipeIngredient and Ingredient, which is
+  what the filter costs without the aggregated column.
+
+Both must return the same recipes. Finally the list endpoint is requested
+with the most selective profile.
+
+Usage (from the app directory):
+    DB_ENGINE=sqlite python -m benchmarks.bench_dietary --recipes 1000000
+"""
+import argparse
+
+from benchmarks.utils import (
+    QueryCounter,
+    Timer,
+    scratch_database,
+    setup_django,
+    summarize,
+)
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Exists, F, OuterRef  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import dietary, seeding  # noqa: E402
+from core.models import Recipe, RecipeIngredient  # noqa: E402
+
+# Label, ?diet=, ?avoid=; least selective first.
+PROFILES = [
+    ('no nuts', '', 'nuts'),
+    ('vegetarian', 'vegetarian', ''),
+    ('vegetarian, no nuts', 'vegetarian', 'nuts'),
+    ('vegan, gluten free', 'vegan,gluten_free', ''),
+]
+
+
+def profile_flags(diets, avoid):
+    return dietary.excluded(
+        dietary.mask(filter(None, diets.split(',')), dietary.DIET_BITS),
+        dietary.mask(filter(None, avoid.split(','))))
+
+
+def bitmask_query(flags):
+    recipes = dietary.exclude_flags(Recipe.objects.all(), flags)
+    return list(recipes.order_by('-id').values_list('id', flat=True))
+
+
+def join_query(flags):
+    flagged = (RecipeIngredient.objects.filter(recipe=OuterRef('pk'))
+               .alias(hits=F('ingredient__dietary_flags').bitand(flags))
+               .exclude(hits=0))
+    recipes = Recipe.objects.filter(~Exists(flagged))
+    return list(recipes.order_by('-id').values_list('id', flat=True))
+
+
+def timed(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            rows = call()
+        samples.append(timer.elapsed)
+    return rows, summarize(samples)['p50_ms']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    counts = {
+        'homes': 100, 'users': 1000, 'ingredients': 20000,
+        'recipes': args.recipes, 'inventory_per_home': 0,
+        'favourites_per_home': 0,
+    }
+    with scratch_database():
+        with Timer() as timer:
+            written = seeding.seed(counts, seed=args.seed)
+        print(f'seeded {sum(written.values())} rows in '
+              f'{timer.elapsed:.1f}s')
+        with Timer() as timer:
+            updated = dietary.rebuild_dietary_flags()
+        print(f'flagged {updated} recipes in {timer.elapsed:.1f}s '
+              f'({updated / timer.elapsed:.0f} recipes/s)')
+
+        print(f'{"profile":<22}{"rows":>9}{"bitmask ms":>12}'
+              f'{"join ms":>10}')
+        for label, diets, avoid in PROFILES:
+            flags = profile_flags(diets, avoid)
+            rows, bitmask = timed(lambda: bitmask_query(flags), args.repeat)
+            joined, join = timed(lambda: join_query(flags), 1)
+            assert rows == joined, label
+            print(f'{label:<22}{len(rows):>9}{bitmask:>12.1f}{join:>10.0f}')
+
+        user = seeding.User.objects.first()
+        client = APIClient()
+        client.force_authenticate(user)
+        _, diets, avoid = PROFILES[-1]
+        samples = []
+        with override_settings(
+                RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=False)):
+            for _ in range(args.repeat):
+                with QueryCounter(connection) as queries, Timer() as timer:
+                    res = client.get('/api/recipe/recipes/',
+                                     {'diet': diets, 'fields': 'id,title'})
+                samples.append(timer.elapsed)
+        assert res.status_code == 200, res.content
+        print(f'GET ?diet={diets}&fields=id,title: {len(res.data)} recipes, '
+              f'{queries.count} queries, '
+              f'p50 {summarize(samples)["p50_ms"]:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark near-duplicate lookups against a pairwise scan.
+
+Seeds a scratch database with `core.seeding`, plants near-duplicates of
+random recipes (a reworded title and one ingredient swapped), builds the
+MinHash/LSH index and reports its build rate. It then times
+`find_duplicates` and the title check done on create, with the queries
+each runs and how many planted duplicates are found. For contrast one
+recipe is compared with every stored signature, which is what a lookup
+without LSH costs.
+
+Usage (from the app directory):
+    DB_ENGINE=sqlite python -m benchmarks.bench_duplicates --recipes 200000
+"""
+import argparse
+import random
+
+from benchmarks.utils import (
+    QueryCounter,
+    Timer,
+    scratch_database,
+    setup_django,
+    summarize,
+)
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+
+from core import seeding  # noqa: E402
+from core.models import (  # noqa: E402
+    Recipe,
+    RecipeBand,
+    RecipeIngredient,
+    RecipeSignature,
+)
+from recipe import duplicates  # noqa: E402
+
+REWORDINGS = ['Best {}', 'The {}', '{}!', 'Easy {} recipe']
+
+
+def plant(count, rng):
+    """Copy `count` random recipes with small edits; return the pairs."""
+    ids = list(Recipe.objects.values_list('id', flat=True))
+    ingredient_ids = list(
+        RecipeIngredient.objects.values_list('ingredient_id', flat=True)
+        .distinct()[:5000])
+    pairs = []
+    for original in Recipe.objects.filter(id__in=rng.sample(ids, count)):
+        lines = list(RecipeIngredient.objects.filter(recipe=original))
+        copy = Recipe.objects.create(
+            user_id=original.user_id, time_minutes=original.time_minutes,
+            title=rng.choice(REWORDINGS).format(original.title))
+        used = {line.ingredient_id for line in lines}
+        swapped = rng.choice([i for i in ingredient_ids if i not in used])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=copy, amount=line.amount,
+                             amount_unit=line.amount_unit,
+                             ingredient_id=(swapped if n == 0
+                                            else line.ingredient_id))
+            for n, line in enumerate(lines)
+        ])
+        pairs.append((original.id, copy))
+    return pairs
+
+
+def timed(call, samples, counters):
+    with QueryCounter(connection) as counter, Timer() as timer:
+        result = call()
+    samples.append(timer.elapsed)
+    counters.append(counter.count)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=200000)
+    parser.add_argument('--planted', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    counts = {
+        'homes': 100, 'users': 1000, 'ingredients': 20000,
+        'recipes': args.recipes, 'inventory_per_home': 0,
+        'favourites_per_home': 0,
+    }
+    with scratch_database():
+        with Timer() as timer:
+            written = seeding.seed(counts, seed=args.seed)
+        print(f'seeded {sum(written.values())} rows in '
+              f'{timer.elapsed:.1f}s')
+        pairs = plant(args.planted, rng)
+
+        with Timer() as timer:
+            indexed = duplicates.build_index()
+        print(f'indexed {indexed} recipes in {timer.elapsed:.1f}s '
+              f'({indexed / timer.elapsed:.0f} recipes/s), '
+              f'{RecipeBand.objects.count()} band rows')
+
+        print(f'{"lookup":<22}{"p50 ms":>9}{"p95 ms":>9}{"queries":>9}'
+              f'{"found":>9}')
+        samples, counters, found = [], [], 0
+        for original_id, copy in pairs:
+            matches = timed(lambda: duplicates.find_duplicates(copy),
+                            samples, counters)
+            found += original_id in {match[0] for match in matches}
+        stats = summarize(samples)
+        print(f'{"find_duplicates":<22}{stats["p50_ms"]:>9.2f}'
+              f'{stats["p95_ms"]:>9.2f}{max(counters):>9}'
+              f'{found:>6}/{len(pairs)}')
+
+        samples, counters, found = [], [], 0
+        for original_id, copy in pairs:
+            matches = timed(
+                lambda: duplicates.find_title_duplicates(
+                    copy.title, exclude=copy.id),
+                samples, counters)
+            found += bool(matches)
+        stats = summarize(samples)
+        print(f'{"title check":<22}{stats["p50_ms"]:>9.2f}'
+              f'{stats["p95_ms"]:>9.2f}{max(counters):>9}'
+              f'{found:>6}/{len(pairs)}')
+
+        _, copy = pairs[0]
+        _, signature = duplicates.signatures(
+            copy.title, RecipeIngredient.objects.filter(recipe=copy)
+            .values_list('ingredient_id', flat=True))
+        with Timer() as timer:
+            scanned = 0
+            for data in RecipeSignature.objects.values_list(
+                    'minhash', flat=True).iterator(chunk_size=10000):
+                duplicates.similarity(signature, duplicates._unpack(data))
+                scanned += 1
+        print(f'{"pairwise scan":<22}{timer.elapsed * 1000:>9.0f}'
+              f'{"":>9}{"":>9}   ({scanned} signatures)')
+
+
+if __name__ == '__main__':
+    main()
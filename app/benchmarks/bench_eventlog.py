@@ -0,0 +1,106 @@
+"""
+Benchmark appending to and replaying the durable event log.
+
+Encodes `--events` inventory update events the way the `eventlog`
+subscriber does and appends them in batches of `--batch` records, as
+the subscriber receives them, with and without an fsync per batch.
+Replay reads the whole log back through a consumer in pages of
+`--batch`, from the memory-mapped segments, first raw and then decoding
+every event. Finally the log is compacted down to the latest event of
+each of `--rows` inventory rows.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_eventlog --events 1000000
+"""
+import argparse
+import random
+import tempfile
+
+from benchmarks.utils import Timer, setup_django
+
+setup_django()
+
+from core import eventlog, events  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def make_events(count, rows, seed):
+    rng = random.Random(seed)
+    batch = []
+    for _ in range(count):
+        pk = rng.randrange(rows)
+        batch.append(events.Event(
+            'inventory', 'updated', pk,
+            {'home_id': pk // 20, 'ingredient_id': rng.randrange(20000),
+             'amount': rng.randrange(5000)}, None))
+    return batch
+
+
+def append_all(log, records, batch):
+    for start in range(0, len(records), batch):
+        log.append(records[start:start + batch])
+
+
+def replay(log, batch, decode):
+    consumer = log.consumer('bench')
+    consumer.seek(0)
+    count = 0
+    while True:
+        records = consumer.poll(batch)
+        if not records:
+            return count
+        if decode:
+            for record in records:
+                eventlog.decode_event(record)
+        count += len(records)
+        consumer.commit(records[-1].offset + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--segment-mb', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with Timer() as timer:
+        records = [eventlog.encode_event(event) for event in
+                   make_events(args.events, args.rows, args.seed)]
+    size = sum(eventlog.RECORD.size + len(key) + len(value)
+               for key, value in records)
+    print(f'encoded {len(records)} events ({size / MB:.0f} MB, '
+          f'{size / len(records):.0f} bytes each) in {timer.elapsed:.1f}s')
+
+    for fsync in (False, True):
+        with tempfile.TemporaryDirectory() as path:
+            log = eventlog.EventLog(path, segment_bytes=args.segment_mb * MB,
+                                    fsync=fsync)
+            with Timer() as timer:
+                append_all(log, records, args.batch)
+            label = 'fsync per batch' if fsync else 'no fsync'
+            print(f'append {label:<16}{size / MB / timer.elapsed:>8.1f} MB/s '
+                  f'{len(records) / timer.elapsed:>10.0f} events/s')
+            if fsync:
+                continue
+
+            for decode in (False, True):
+                log = eventlog.EventLog(path, fsync=False)
+                with Timer() as timer:
+                    count = replay(log, args.batch, decode)
+                assert count == len(records)
+                label = 'replay decoded' if decode else 'replay raw'
+                print(f'{label:<23}{size / MB / timer.elapsed:>8.1f} MB/s '
+                      f'{count / timer.elapsed:>10.0f} events/s')
+
+            with Timer() as timer:
+                reclaimed = log.compact()
+            kept = replay(log, args.batch, decode=False)
+            print(f'compacted {reclaimed / MB:.0f} MB in '
+                  f'{timer.elapsed:.1f}s, {kept} events left')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark the model event bus.
+
+First the bus alone: `--events` events are published to a bus with one
+to `--subscribers` subscribers, each doing `--work-us` microseconds of
+work per event, run inline and on worker threads. Publish is the rate
+the publishing thread sustains, end to end the rate until every
+subscriber has handled every event.
+
+Then the API: recipe updates and favourite creates are timed with the
+subscribers (cache invalidation, popularity, duplicate signatures) run
+inline, as before the bus, and queued. The bus is drained after every
+request, outside the timing, so workers never write while a request
+does (the scratch SQLite database is in memory and has no busy
+timeout); the drain is reported as the time until side effects landed.
+
+Usage (from the app directory):
+    DB_ENGINE=sqlite python -m benchmarks.bench_events --events 200000
+"""
+import argparse
+import time
+
+from benchmarks.utils import Timer, scratch_database, setup_django, summarize
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import events, seeding  # noqa: E402
+from core.models import FavHomeRecipe, Recipe  # noqa: E402
+
+
+def busy(seconds):
+    if not seconds:
+        return
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def bench_bus(count, subscribers, work, asynchronous):
+    bus = events.EventBus(asynchronous=asynchronous, queue_size=count,
+                          batch_size=500)
+    for index in range(subscribers):
+        bus.subscribe(f's{index}', ['recipe/updated'],
+                      lambda batch: busy(work * len(batch)))
+    batch = [events.Event('recipe', 'updated', pk, {'user_id': 1}, None)
+             for pk in range(count)]
+    with Timer() as publish:
+        for event in batch:
+            bus.publish(event)
+    bus.drain()
+    end_to_end = time.perf_counter() - publish.start
+    return count / publish.elapsed, count / end_to_end
+
+
+def timed_request(send, requests, drains):
+    with Timer() as timer:
+        res = send()
+    requests.append(timer.elapsed)
+    assert res.status_code < 300, res.content
+    with Timer() as timer:
+        events.bus.drain()
+    drains.append(timer.elapsed)
+
+
+def bench_api(client, recipe_ids, home, repeat):
+    """Return p50 ms of requests and of the drains after them."""
+    requests, drains = [], []
+    for index in range(repeat):
+        recipe_id = recipe_ids[index % len(recipe_ids)]
+        timed_request(
+            lambda: client.patch(f'/api/recipe/recipes/{recipe_id}/',
+                                 {'title': f'Lentil soup {index}'}),
+            requests, drains)
+        timed_request(
+            lambda: client.post('/api/home/fav-recipe-create/',
+                                {'recipe': recipe_id, 'rating': 4}),
+            requests, drains)
+        FavHomeRecipe.objects.filter(home=home).delete()
+        events.bus.drain()
+    return summarize(requests)['p50_ms'], summarize(drains)['p50_ms']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--subscribers', type=int, default=4)
+    parser.add_argument('--work-us', type=float, default=5)
+    parser.add_argument('--recipes', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f'{"mode":<8}{"subscribers":>12}{"publish ev/s":>15}'
+          f'{"end to end ev/s":>18}')
+    for subscribers in sorted({1, args.subscribers}):
+        for asynchronous in (False, True):
+            publish, end_to_end = bench_bus(
+                args.events, subscribers, args.work_us / 1e6, asynchronous)
+            mode = 'async' if asynchronous else 'inline'
+            print(f'{mode:<8}{subscribers:>12}{publish:>15.0f}'
+                  f'{end_to_end:>18.0f}')
+
+    counts = {
+        'homes': 10, 'users': 100, 'ingredients': 2000,
+        'recipes': args.recipes, 'inventory_per_home': 0,
+        'favourites_per_home': 0,
+    }
+    with scratch_database():
+        seeding.seed(counts, seed=1)
+        user = seeding.User.objects.exclude(home=None).first()
+        recipe_ids = list(Recipe.objects.filter(user=user)
+                          .values_list('id', flat=True)[:args.repeat])
+        client = APIClient()
+        client.force_authenticate(user)
+        print('PATCH recipe, POST favourite')
+        for asynchronous in (False, True):
+            with override_settings(
+                    EVENTS=dict(settings.EVENTS, ASYNC=asynchronous)):
+                request, drain = bench_api(client, recipe_ids, user.home,
+                                           args.repeat)
+            mode = 'async' if asynchronous else 'inline'
+            print(f'{mode:<8}request p50 {request:.2f} ms, '
+                  f'side effects landed after {drain:.2f} ms more')
+        print(events.bus.stats())
+
+
+if __name__ == '__main__':
+    main()
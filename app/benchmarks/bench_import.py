@@ -0,0 +1,135 @@
+"""
+Benchmark bulk recipe imports against loading through the API.
+
+Writes a synthetic catalog as NDJSON, CSV and JSON-LD, imports each
+into a scratch database with `core.importing` using one and several
+parsing processes, and reports rows (recipes plus ingredient lines) per
+second. For contrast a sample of the catalog is loaded the way clients
+do today, one POST per recipe and per ingredient line through
+`RecipeViewSet` and `RecipeIngredientViewSet`.
+
+Usage (from the app directory):
+    DB_ENGINE=sqlite python -m benchmarks.bench_import --recipes 50000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+
+from benchmarks.utils import Timer, scratch_database, setup_django
+
+setup_django()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import importing  # noqa: E402
+
+UNITS = ['g', 'kg', 'ml', 'l', 'tsp', 'tbsp', 'cups', '']
+
+
+def catalog(recipes, lines, rng):
+    """Yield (title, minutes, [(name, amount, unit)]) synthetic recipes."""
+    for i in range(recipes):
+        names = rng.sample(range(5000), lines)
+        yield (f'Imported recipe {i}', rng.randint(5, 120),
+               [(f'ingredient {name}', rng.randint(1, 500), rng.choice(UNITS))
+                for name in names])
+
+
+def write_catalogs(directory, recipes, lines, seed):
+    paths = {}
+    paths['ndjson'] = os.path.join(directory, 'catalog.ndjson')
+    with open(paths['ndjson'], 'w') as file:
+        for title, minutes, items in catalog(recipes, lines,
+                                             random.Random(seed)):
+            file.write(json.dumps({
+                'title': title, 'time_minutes': minutes,
+                'ingredients': [{'name': name, 'amount': amount,
+                                 'amount_unit': unit}
+                                for name, amount, unit in items],
+            }) + '\n')
+    paths['csv'] = os.path.join(directory, 'catalog.csv')
+    with open(paths['csv'], 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['recipe', 'title', 'time_minutes', 'ingredient',
+                         'amount', 'amount_unit'])
+        for i, (title, minutes, items) in enumerate(
+                catalog(recipes, lines, random.Random(seed))):
+            for name, amount, unit in items:
+                writer.writerow([i, title, minutes, name, amount, unit])
+    paths['jsonld'] = os.path.join(directory, 'catalog.jsonld')
+    with open(paths['jsonld'], 'w') as file:
+        for title, minutes, items in catalog(recipes, lines,
+                                             random.Random(seed)):
+            file.write(json.dumps({
+                '@context': 'https://schema.org', '@type': 'Recipe',
+                'name': title, 'totalTime': f'PT{minutes}M',
+                'recipeIngredient': [f'{amount} {unit} {name}'
+                                     for name, amount, unit in items],
+            }) + '\n')
+    return paths
+
+
+def through_api(user, sample, lines, seed):
+    client = APIClient()
+    client.force_authenticate(user)
+    names = {}
+    rows = 0
+    with Timer() as timer:
+        for title, minutes, items in catalog(sample, lines,
+                                             random.Random(seed + 1)):
+            recipe = client.post('/api/recipe/recipes/', {
+                'title': title, 'time_minutes': minutes}, format='json')
+            rows += 1
+            for name, amount, unit in items:
+                if name not in names:
+                    names[name] = client.post(
+                        '/api/recipe/ingredients/', {'name': name},
+                        format='json').data['id']
+                client.post('/api/recipe/recipeingredients/', {
+                    'recipe': recipe.data['id'], 'ingredient': names[name],
+                    'amount': amount, 'amount_unit': unit or 'pcs',
+                }, format='json')
+                rows += 1
+    return rows, timer.elapsed
+
+
+def superuser():
+    return get_user_model().objects.create_superuser(
+        'importer@example.com', 'bench-pass-123')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=50000)
+    parser.add_argument('--lines', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--api-sample', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_catalogs(directory, args.recipes, args.lines,
+                               args.seed)
+        print(f'{"variant":<24}{"rows":>10}{"seconds":>10}{"rows/s":>10}')
+        for fmt, path in paths.items():
+            for workers in sorted({1, args.workers}):
+                with scratch_database():
+                    result = importing.import_file(path, superuser(), fmt=fmt,
+                                                   workers=workers)
+                label = f'{fmt}, {workers} worker(s)'
+                print(f'{label:<24}{result.rows:>10}'
+                      f'{result.seconds:>10.2f}'
+                      f'{result.rows_per_second:>10.0f}')
+        with scratch_database():
+            rows, seconds = through_api(superuser(), args.api_sample,
+                                        args.lines, args.seed)
+        print(f'{"API, one POST per row":<24}{rows:>10}{seconds:>10.2f}'
+              f'{rows / seconds:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Micro-benchmark JSON rendering and parsing of large API lists.
+
+Serializes in-memory recipes, inventory items and favourite recipes
+(with `last_cooked` dates) through the API serializers, then renders
+the lists with DRF's JSONRenderer and with FastJSONRenderer, and parses
+the rendered bodies with JSONParser and FastJSONParser. Outputs are
+compared byte for byte before timing.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_json --rows 10000
+"""
+import argparse
+import datetime
+import io
+import random
+
+from benchmarks.utils import Timer, setup_django, summarize
+
+setup_django()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from core.models import (  # noqa: E402
+    FavHomeRecipe,
+    Home,
+    Ingredient,
+    Inventory,
+    Recipe,
+    User,
+)
+from core.parsers import FastJSONParser  # noqa: E402
+from core.renderers import FastJSONRenderer, orjson  # noqa: E402
+from home.serializers import (  # noqa: E402
+    FavHomeRecipeSerializer,
+    InventorySerializer,
+)
+from recipe.serializers import RecipeSerializer  # noqa: E402
+
+
+def lists(rows, rng):
+    """Return serialized 10k-row style lists, keyed by endpoint."""
+    user = User(id=1, name='Benchmark cook', email='cook@example.com')
+    home = Home(id=1, name='Benchmark home')
+    recipes = [
+        Recipe(id=i, user=user, title=f'Recipe número {i}',
+               time_minutes=rng.choice([10, 20, 45]),
+               link=f'https://example.com/{i}' if i % 3 else '',
+               fav_count=rng.randint(0, 50), rating_sum=rng.randint(0, 400),
+               rating_count=rng.randint(0, 50))
+        for i in range(1, rows + 1)
+    ]
+    ingredients = [Ingredient(id=i, name=f'ingredient {i}')
+                   for i in range(1, rows + 1)]
+    inventory = [
+        Inventory(id=i, home=home, ingredient=ingredient,
+                  amount=rng.randint(1, 1000))
+        for i, ingredient in enumerate(ingredients, 1)
+    ]
+    start = datetime.date(2024, 1, 1)
+    favourites = [
+        FavHomeRecipe(id=recipe.id, home=home, recipe=recipe,
+                      last_cooked=start + datetime.timedelta(i % 365),
+                      rating=rng.randint(1, 10) if i % 4 else None)
+        for i, recipe in enumerate(recipes)
+    ]
+    return {
+        'recipes': RecipeSerializer(recipes, many=True).data,
+        'inventory': InventorySerializer(inventory, many=True).data,
+        'favourites': FavHomeRecipeSerializer(favourites, many=True).data,
+    }
+
+
+def measure(func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            func()
+        latencies.append(timer.elapsed)
+    return summarize(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if orjson is None:
+        print('orjson is not installed; FastJSON* use the stdlib.')
+    data = lists(args.rows, random.Random(args.seed))
+    context = {'encoding': 'utf-8'}
+    print(f'{"list":<12}{"step":<8}{"bytes":>10}{"stdlib p50":>12}'
+          f'{"fast p50":>10}{"speed-up":>10}')
+    for name, rows in data.items():
+        body = JSONRenderer().render(rows)
+        assert FastJSONRenderer().render(rows) == body, name
+        assert (FastJSONParser().parse(io.BytesIO(body), None, context)
+                == JSONParser().parse(io.BytesIO(body), None, context))
+        steps = {
+            'render': (lambda: JSONRenderer().render(rows),
+                       lambda: FastJSONRenderer().render(rows)),
+            'parse': (
+                lambda: JSONParser().parse(io.BytesIO(body), None, context),
+                lambda: FastJSONParser().parse(
+                    io.BytesIO(body), None, context)),
+        }
+        for step, (stdlib, fast) in steps.items():
+            base = measure(stdlib, args.repeat)['p50_ms']
+            quick = measure(fast, args.repeat)['p50_ms']
+            print(f'{name:<12}{step:<8}{len(body):>10}{base:>10.2f}ms'
+                  f'{quick:>8.2f}ms{base / quick:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark meal plan quality versus runtime.
+
+Builds a synthetic catalog with Zipf distributed ingredient popularity
+and compares a random plan, the greedy pass on its own and greedy plus
+local search for several time budgets.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_meal_plan --recipes 100000
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+django.setup()
+
+from home import meal_plan  # noqa: E402
+
+
+def synthetic_matrix(recipes, ingredients, rng):
+    """Return a matrix of `recipes` rows over `ingredients` columns."""
+    cum_weights = list(itertools.accumulate(
+        1.0 / (rank + 1) for rank in range(ingredients)))
+    ingredient_ids = list(range(1, ingredients + 1))
+    rows = []
+    lines = []
+    for recipe_id in range(1, recipes + 1):
+        rows.append((recipe_id, rng.choice([10, 15, 20, 30, 45, 60, 90])))
+        picked = set(rng.choices(ingredient_ids, cum_weights=cum_weights,
+                                 k=rng.randint(3, 12)))
+        for ingredient in sorted(picked):
+            lines.append((recipe_id, ingredient,
+                          rng.choice([50, 100, 200, 500]), 'g',
+                          rng.random() < 0.7))
+    return meal_plan.RecipeMatrix.from_rows(rows, lines)
+
+
+def synthetic_inventory(matrix, ingredients, size, rng):
+    code = matrix.kind_names.index('mass')
+    picked = rng.sample(range(1, ingredients + 1), size)
+    return {ing: (code, float(rng.choice([200, 500, 1000, 2000])))
+            for ing in picked}
+
+
+def describe(matrix, rows, inventory):
+    score = meal_plan._plan_score(matrix, rows, inventory)
+    missing = meal_plan.shopping_list(matrix, rows, inventory)
+    return score, len(missing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--inventory', type=int, default=40)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--max-minutes', type=int, default=45)
+    parser.add_argument('--homes', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    matrix = synthetic_matrix(args.recipes, args.ingredients, rng)
+    print(f'matrix: {len(matrix)} recipes, {matrix.nnz} lines, '
+          f'built in {time.perf_counter() - start:.2f}s')
+
+    limits = [args.max_minutes] * args.days
+    budgets = [0, 10, 50, 200, 1000]
+    totals = {name: [0.0, 0, 0.0] for name in ['random'] + budgets}
+    for _ in range(args.homes):
+        inventory = synthetic_inventory(
+            matrix, args.ingredients, args.inventory, rng)
+
+        start = time.perf_counter()
+        feasible = [row for row in range(len(matrix))
+                    if matrix.time_minutes[row] <= args.max_minutes]
+        rows = rng.sample(feasible, args.days)
+        elapsed = (time.perf_counter() - start) * 1000
+        score, missing = describe(matrix, rows, inventory)
+        totals['random'][0] += score
+        totals['random'][1] += missing
+        totals['random'][2] += elapsed
+
+        for budget in budgets:
+            result = meal_plan.plan_meals(
+                matrix, inventory, limits, budget_ms=budget)
+            score, missing = describe(matrix, result['rows'], inventory)
+            totals[budget][0] += score
+            totals[budget][1] += missing
+            totals[budget][2] += result['elapsed_ms']
+
+    print(f'{"optimizer":<22}{"score":>10}{"to buy":>10}{"ms":>10}')
+    for name, (score, missing, elapsed) in totals.items():
+        label = name if name == 'random' else (
+            'greedy' if name == 0 else f'greedy+search {name}ms')
+        print(f'{label:<22}{score / args.homes:>10.2f}'
+              f'{missing / args.homes:>10.1f}'
+              f'{elapsed / args.homes:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
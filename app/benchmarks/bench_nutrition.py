@@ -0,0 +1,164 @@
+"""
+Benchmark nutrition filters on the recipe list.
+
+Seeds a scratch database with `core.seeding` (ingredient nutrition
+included), rebuilds every recipe's nutrition summary and reports its
+rate. `?max_kcal=` and `?min_protein=` thresholds are then picked to
+match 0.1%, 1% and 10% of recipes, and each is timed three ways:
+
+- summary: the filter the view runs, on the indexed summary columns,
+  newest first, and the same filter unordered;
+- no index: the unordered filter after dropping recipe_kcal_idx and
+  recipe_protein_idx, a scan of the recipe table;
+- join: totals computed from RecipeIngredient and IngredientNutrition on
+  every read (grouped and filtered in SQL, ignoring unit conversion),
+  what the filter costs without a summary.
+
+Finally the list endpoint is requested with the most selective filter.
+SQLite's planner answers `ORDER BY id DESC` by walking the primary key
+whatever the filter's selectivity, so on SQLite the ordered column shows
+little of what the index saves; the unordered ones do.
+
+Usage (from the app directory):
+    DB_ENGINE=sqlite python -m benchmarks.bench_nutrition --recipes 1000000
+"""
+import argparse
+
+from benchmarks.utils import (
+    QueryCounter,
+    Timer,
+    scratch_database,
+    setup_django,
+    summarize,
+)
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import F, Sum  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import nutrition, seeding  # noqa: E402
+from core.models import Recipe, RecipeIngredient  # noqa: E402
+
+SELECTIVITY = [0.001, 0.01, 0.1]
+
+
+def threshold(field, fraction, total, descending=False):
+    """Return the value `fraction` of recipes are at or beyond."""
+    order = f'-{field}' if descending else field
+    offset = max(0, int(total * fraction) - 1)
+    return (Recipe.objects.filter(**{f'{field}__isnull': False})
+            .order_by(order).values_list(field, flat=True)[offset])
+
+
+def summary_query(lookup, value, ordered=True):
+    recipes = Recipe.objects.filter(**{lookup: value})
+    if ordered:
+        recipes = recipes.order_by('-id')
+    return list(recipes.values_list('id', flat=True))
+
+
+def join_query(field, lookup, value):
+    per = F(f'recipeingredient__ingredient__nutrition__{field}') * F(
+        'recipeingredient__amount') / F(
+        'recipeingredient__ingredient__nutrition__amount')
+    return list(Recipe.objects.annotate(total=Sum(per))
+                .filter(**{f'total__{lookup}': value})
+                .order_by('-id').values_list('id', flat=True))
+
+
+def timed(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        with Timer() as timer:
+            rows = call()
+        samples.append(timer.elapsed)
+    return len(rows), summarize(samples)['p50_ms']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    counts = {
+        'homes': 100, 'users': 1000, 'ingredients': 20000,
+        'recipes': args.recipes, 'inventory_per_home': 0,
+        'favourites_per_home': 0,
+    }
+    with scratch_database():
+        with Timer() as timer:
+            written = seeding.seed(counts, seed=args.seed)
+        print(f'seeded {sum(written.values())} rows in '
+              f'{timer.elapsed:.1f}s')
+        with Timer() as timer:
+            updated = nutrition.rebuild_nutrition()
+        print(f'summarized {updated} recipes in {timer.elapsed:.1f}s '
+              f'({updated / timer.elapsed:.0f} recipes/s)')
+
+        total = Recipe.objects.count()
+        filters = []
+        for fraction in SELECTIVITY:
+            filters.append((f'max_kcal {fraction:.1%}', 'max_kcal', 'kcal',
+                            'lte', threshold('kcal', fraction, total)))
+            filters.append((f'min_protein {fraction:.1%}', 'min_protein',
+                            'protein', 'gte',
+                            threshold('protein', fraction, total, True)))
+
+        results = {}
+        for label, _, field, lookup, value in filters:
+            results[label] = [
+                timed(lambda: summary_query(f'{field}__{lookup}', value),
+                      args.repeat),
+                timed(lambda: summary_query(f'{field}__{lookup}', value,
+                                            ordered=False), args.repeat),
+            ]
+        with connection.schema_editor() as editor:
+            for index in Recipe._meta.indexes:
+                if index.name in ('recipe_kcal_idx', 'recipe_protein_idx'):
+                    editor.remove_index(Recipe, index)
+        for label, _, field, lookup, value in filters:
+            results[label].append(timed(
+                lambda: summary_query(f'{field}__{lookup}', value,
+                                      ordered=False), args.repeat))
+            results[label].append(timed(
+                lambda: join_query(field, lookup, value), 1))
+
+        print(f'{"filter":<22}{"rows":>9}{"ordered ms":>12}'
+              f'{"unordered ms":>14}{"no index ms":>13}{"join ms":>11}')
+        for label, ((rows, ordered), (_, unordered), (_, scan),
+                    (_, join)) in results.items():
+            print(f'{label:<22}{rows:>9}{ordered:>12.1f}{unordered:>14.1f}'
+                  f'{scan:>13.1f}{join:>11.0f}')
+        with connection.schema_editor() as editor:
+            for index in Recipe._meta.indexes:
+                if index.name in ('recipe_kcal_idx', 'recipe_protein_idx'):
+                    editor.add_index(Recipe, index)
+
+        user = seeding.User.objects.first()
+        client = APIClient()
+        client.force_authenticate(user)
+        _, param, _, _, value = filters[0]
+        samples = []
+        with override_settings(
+                RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=False)):
+            for _ in range(args.repeat):
+                with QueryCounter(connection) as queries, Timer() as timer:
+                    res = client.get('/api/recipe/recipes/', {param: value})
+                samples.append(timer.elapsed)
+        assert res.status_code == 200, res.content
+        print(f'GET ?{param}={value:g}: {len(res.data)} recipes, '
+              f'{queries.count} queries, '
+              f'p50 {summarize(samples)["p50_ms"]:.1f} ms')
+        # Lines per recipe, for reading the join column.
+        print(f'({RecipeIngredient.objects.count() / total:.1f} lines '
+              f'per recipe)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark the response cache on the read endpoints.
+
+Seeds a scratch database, then replays the same mix of reads (with a
+share of writes that invalidate entries) with the cache disabled, with
+the local-memory backend and with the file backend, and reports latency,
+queries per request and hit rate.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_response_cache --requests 1000
+"""
+import argparse
+import random
+import tempfile
+
+from benchmarks.utils import (
+    QueryCounter,
+    Timer,
+    scratch_database,
+    setup_django,
+    summarize,
+)
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import cache  # noqa: E402
+from core.models import (  # noqa: E402
+    Home,
+    Ingredient,
+    Inventory,
+    Recipe,
+    RecipeIngredient,
+    User,
+)
+
+READ_PATHS = [
+    ('/api/recipe/recipes/', 6),
+    ('/api/recipe/recipes/?ordering=popularity', 2),
+    ('/api/recipe/ingredients/', 2),
+    ('/api/recipe/recipeingredients/', 1),
+    ('/api/home/inventory-fetch/', 4),
+    ('/api/home/fav-recipes/', 2),
+]
+
+
+def seed(recipes, ingredients, homes, rng):
+    owner = User.objects.create_user('owner@example.com', 'bench-pass')
+    Ingredient.objects.bulk_create(
+        Ingredient(user=owner, name=f'ingredient-{i}')
+        for i in range(ingredients))
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    Recipe.objects.bulk_create(
+        Recipe(user=owner, title=f'recipe {i}', time_minutes=10 + i % 80)
+        for i in range(recipes))
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe_id=rid, ingredient_id=ing, amount=100,
+                         amount_unit='g')
+        for rid in recipe_ids for ing in rng.sample(ingredient_ids, 4))
+    users = []
+    for h in range(homes):
+        home = Home.objects.create(name=f'home {h}')
+        user = User.objects.create_user(f'user{h}@example.com', 'bench')
+        user.home = home
+        user.save()
+        users.append(user)
+        Inventory.objects.bulk_create(
+            Inventory(home=home, ingredient_id=ing, amount=500)
+            for ing in rng.sample(ingredient_ids, 20))
+    return users, ingredient_ids
+
+
+def workload(users, requests, write_ratio, rng):
+    paths = [path for path, weight in READ_PATHS for _ in range(weight)]
+    for _ in range(requests):
+        user = rng.choice(users)
+        if rng.random() < write_ratio:
+            yield user, None
+        else:
+            yield user, rng.choice(paths)
+
+
+def run(label, users, ingredient_ids, args):
+    rng = random.Random(args.seed)
+    clients = {}
+    latencies = []
+    queries = 0
+    cache.stats.reset()
+    for user, path in workload(users, args.requests, args.write_ratio, rng):
+        client = clients.get(user.pk)
+        if client is None:
+            client = clients[user.pk] = APIClient()
+            client.force_authenticate(user)
+        if path is None:
+            item = Inventory.objects.filter(home_id=user.home_id).first()
+            item.amount = rng.randint(1, 1000)
+            item.save()
+            continue
+        with QueryCounter(connection) as counter, Timer() as timer:
+            client.get(path)
+        latencies.append(timer.elapsed)
+        queries += counter.count
+    summary = summarize(latencies)
+    counters = list(cache.stats.views.values())
+    hits = sum(c['hits'] for c in counters)
+    lookups = hits + sum(c['misses'] for c in counters)
+    print(f'{label:<10}{summary["mean_ms"]:>9.2f}{summary["p50_ms"]:>9.2f}'
+          f'{summary["p95_ms"]:>9.2f}{queries / len(latencies):>10.2f}'
+          f'{(hits / lookups if lookups else 0):>10.1%}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=500)
+    parser.add_argument('--ingredients', type=int, default=300)
+    parser.add_argument('--homes', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--write-ratio', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    with scratch_database():
+        users, ingredient_ids = seed(
+            args.recipes, args.ingredients, args.homes,
+            random.Random(args.seed))
+        print(f'{"backend":<10}{"mean":>9}{"p50":>9}{"p95":>9}'
+              f'{"queries":>10}{"hit rate":>10}')
+        disabled = dict(settings.RESPONSE_CACHE, ENABLED=False)
+        with override_settings(RESPONSE_CACHE=disabled):
+            run('off', users, ingredient_ids, args)
+        enabled = dict(settings.RESPONSE_CACHE, ENABLED=True)
+        backends = {
+            'locmem': {
+                'BACKEND': settings.RESPONSE_CACHE_BACKENDS['locmem'],
+                'LOCATION': 'bench',
+            },
+            'file': {
+                'BACKEND': settings.RESPONSE_CACHE_BACKENDS['file'],
+                'LOCATION': tempfile.mkdtemp(prefix='bench-cache-'),
+            },
+        }
+        for name, backend in backends.items():
+            caches_setting = dict(settings.CACHES, responses=backend)
+            with override_settings(CACHES=caches_setting,
+                                   RESPONSE_CACHE=enabled):
+                caches['responses'].clear()
+                run(name, users, ingredient_ids, args)
+
+
+if __name__ == '__main__':
+    main()
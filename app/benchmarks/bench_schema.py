@@ -0,0 +1,102 @@
+"""
+Benchmark the prebuilt OpenAPI schema against per-request generation.
+
+Times `SpectacularAPIView` generating the schema on every request, a
+process loading the prebuilt artifacts for the first time (fingerprint
+plus disk read), and warm requests for the plain body, the gzipped
+body and a revalidation answered with 304.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_schema --requests 200
+"""
+import argparse
+import contextlib
+import io
+import tempfile
+
+from benchmarks.utils import Timer, setup_django, summarize
+
+setup_django()
+
+from django.test.utils import (  # noqa: E402
+    override_settings,
+    setup_test_environment,
+)
+from drf_spectacular.views import SpectacularAPIView  # noqa: E402
+from rest_framework.test import APIClient, APIRequestFactory  # noqa: E402
+
+from core import schema  # noqa: E402
+
+URL = '/api/schema/'
+
+
+def measure(label, func, requests):
+    latencies = []
+    size = 0
+    for _ in range(requests):
+        with Timer() as timer:
+            response = func()
+        latencies.append(timer.elapsed)
+        size = len(response.content)
+    summary = summarize(latencies)
+    print(f'{label:<16}{summary["mean_ms"]:>10.3f}{summary["p50_ms"]:>10.3f}'
+          f'{summary["p95_ms"]:>10.3f}{response.status_code:>8}{size:>10}')
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--generated-requests', type=int, default=20,
+                        help='requests for the (slow) generating view')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    factory = APIRequestFactory()
+    generating_view = SpectacularAPIView.as_view()
+    client = APIClient()
+
+    def generated():
+        response = generating_view(factory.get(URL))
+        # Warnings about unresolvable type hints repeat on every build.
+        with contextlib.redirect_stderr(io.StringIO()):
+            return response.render()
+
+    def cold():
+        schema.reset()
+        return client.get(URL)
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            override_settings(SCHEMA_DIR=workdir):
+        schema.reset()
+        with contextlib.redirect_stderr(io.StringIO()), Timer() as build:
+            schema.build()
+        print(f'build: {build.elapsed * 1000:.1f} ms')
+        print(f'{"variant":<16}{"mean":>10}{"p50":>10}{"p95":>10}'
+              f'{"status":>8}{"bytes":>10}')
+        with contextlib.redirect_stderr(io.StringIO()):
+            base = measure('generated', generated, args.generated_requests)
+        results = {
+            'prebuilt cold': measure('prebuilt cold', cold, args.requests),
+            'prebuilt': measure(
+                'prebuilt', lambda: client.get(URL), args.requests),
+        }
+        etag = client.get(URL, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        results['prebuilt gzip'] = measure(
+            'prebuilt gzip',
+            lambda: client.get(URL, HTTP_ACCEPT_ENCODING='gzip'),
+            args.requests)
+        results['304'] = measure(
+            '304',
+            lambda: client.get(URL, HTTP_ACCEPT_ENCODING='gzip',
+                               HTTP_IF_NONE_MATCH=etag),
+            args.requests)
+        schema.reset()
+
+    for label, summary in results.items():
+        print(f'{label}: {base["p50_ms"] / summary["p50_ms"]:.0f}x faster '
+              f'p50 than generating')
+
+
+if __name__ == '__main__':
+    main()
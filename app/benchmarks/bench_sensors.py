@@ -0,0 +1,171 @@
+"""
+Load generator for kitchen sensor ingestion.
+
+Seeds `--homes` homes with stocked inventories, then replays
+`--readings` readings: every home has `--devices` scales, each weighing
+a few of the home's ingredients, and a hub per home posts them to
+`/api/home/sensor-readings/` in batches of `--batch`. Compared are:
+
+- buffered: what the endpoint does, readings coalesced per home and
+  ingredient and written in one batch every `--window-ms` of simulated
+  sensor time;
+- per reading: one UPDATE per reading, what writing through the ORM as
+  readings arrive costs, run on the same readings without requests.
+
+The scratch SQLite database is in memory and has no busy timeout, so the
+buffer is flushed on the request thread instead of its worker; the
+flushes are part of the measured time.
+
+With `--url` and `--token` the readings of the token's home are posted
+to a running server instead, from `--clients` threads, and the rate the
+server accepted them at is reported.
+
+Usage (from the app directory):
+    DB_ENGINE=sqlite python -m benchmarks.bench_sensors --readings 200000
+    python -m benchmarks.bench_sensors --url http://localhost:8000 \\
+        --token <token> --ingredients 12 15 19
+"""
+import argparse
+import json
+import random
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from benchmarks.utils import Timer, scratch_database, setup_django
+
+setup_django()
+
+from rest_framework.test import APIClient  # noqa: E402
+
+from core import seeding  # noqa: E402
+from core.models import Inventory  # noqa: E402
+from home import sensors  # noqa: E402
+
+URL = '/api/home/sensor-readings/'
+# Readings each device takes per second.
+RATE = 10
+
+
+def make_batches(stock, devices, count, batch, seed):
+    """Return `(home_id, readings, sensor time)` batches, in order."""
+    rng = random.Random(seed)
+    scales = {home_id: [(f'scale{index}',
+                         rng.sample(ingredients, min(3, len(ingredients))))
+                        for index in range(devices)]
+              for home_id, ingredients in stock.items()}
+    # A hub posts once its devices, at RATE each, took `batch` readings.
+    step = batch / RATE / devices
+    batches, clock = [], 0.0
+    while count > 0:
+        for home_id, home_scales in scales.items():
+            readings = []
+            for _ in range(min(batch, count)):
+                _, weighed = rng.choice(home_scales)
+                readings.append({'ingredient': rng.choice(weighed),
+                                 'amount': rng.randrange(5000)})
+            batches.append((home_id, readings, clock))
+            count -= len(readings)
+            if count <= 0:
+                break
+        clock += step
+    return batches
+
+
+def bench_buffered(clients, batches, window):
+    buffer = sensors.ReadingBuffer(window=window, max_pending=10 ** 9)
+    with mock.patch.object(sensors, '_buffer', buffer), \
+            mock.patch.object(buffer, '_run'), Timer() as timer:
+        flushed_at = 0.0
+        for home_id, readings, clock in batches:
+            res = clients[home_id].post(URL, {'readings': readings},
+                                        format='json')
+            assert res.status_code == 202, res.content
+            if clock - flushed_at >= window:
+                buffer.flush()
+                flushed_at = clock
+        buffer.flush()
+    return timer.elapsed, buffer.counters
+
+
+def bench_per_reading(batches):
+    with Timer() as timer:
+        for home_id, readings, _ in batches:
+            for reading in readings:
+                Inventory.objects.filter(
+                    home_id=home_id, ingredient_id=reading['ingredient'],
+                ).update(amount=reading['amount'])
+    return timer.elapsed
+
+
+def post_live(url, token, batches, clients):
+    def send(batch):
+        request = urllib.request.Request(
+            url.rstrip('/') + URL, method='POST',
+            data=json.dumps({'readings': batch[1]}).encode(),
+            headers={'Authorization': f'Token {token}',
+                     'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as res:
+            assert res.status == 202, res.read()
+
+    with ThreadPoolExecutor(clients) as pool, Timer() as timer:
+        list(pool.map(send, batches))
+    return timer.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--readings', type=int, default=200000)
+    parser.add_argument('--homes', type=int, default=500)
+    parser.add_argument('--devices', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=100)
+    parser.add_argument('--window-ms', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--url')
+    parser.add_argument('--token')
+    parser.add_argument('--ingredients', type=int, nargs='+')
+    parser.add_argument('--clients', type=int, default=8)
+    args = parser.parse_args()
+
+    if args.url:
+        batches = make_batches({0: args.ingredients}, args.devices,
+                               args.readings, args.batch, args.seed)
+        elapsed = post_live(args.url, args.token, batches, args.clients)
+        print(f'live: {args.readings / elapsed:.0f} readings/s accepted')
+        return
+
+    counts = {
+        'homes': args.homes, 'users': args.homes, 'ingredients': 2000,
+        'recipes': 0, 'inventory_per_home': 20, 'favourites_per_home': 0,
+    }
+    with scratch_database():
+        seeding.seed(counts, seed=args.seed)
+        clients = {}
+        for user in seeding.User.objects.exclude(home=None):
+            if user.home_id not in clients:
+                clients[user.home_id] = APIClient()
+                clients[user.home_id].force_authenticate(user)
+        stock = {}
+        for home_id, ingredient_id in Inventory.objects.filter(
+                home_id__in=clients).values_list('home_id', 'ingredient_id'):
+            stock.setdefault(home_id, []).append(ingredient_id)
+        batches = make_batches(stock, args.devices, args.readings,
+                               args.batch, args.seed)
+        count = sum(len(readings) for _, readings, _ in batches)
+        print(f'{count} readings from {len(clients)} homes in '
+              f'{len(batches)} requests, {batches[-1][2]:.0f}s of '
+              f'sensor time')
+
+        elapsed, counters = bench_buffered(clients, batches,
+                                           args.window_ms / 1000)
+        print(f'buffered:    {count / elapsed:>8.0f} readings/s, '
+              f'{counters["flushes"]} flushes wrote {counters["written"]} '
+              f'rows ({counters["stale"]} stale readings)')
+
+        elapsed = bench_per_reading(batches)
+        print(f'per reading: {count / elapsed:>8.0f} readings/s, '
+              f'{count} updates')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark sparse fieldsets on the list endpoints.
+
+Seeds a scratch database and requests every list endpoint three ways:
+all fields with the queryset left as the views built it before sparse
+fieldsets (one query per row for fields reading a relation), all fields
+with the narrowed queryset, and a minimal `?fields=` set. Reports the
+payload size, queries, DB time and total latency per request.
+
+Usage (from the app directory):
+    DB_ENGINE=sqlite python -m benchmarks.bench_sparse_fields
+"""
+import argparse
+import random
+from unittest import mock
+
+from benchmarks import dataset as datasets
+from benchmarks.utils import (
+    QueryCounter,
+    Timer,
+    scratch_database,
+    setup_django,
+    summarize,
+)
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+ENDPOINTS = [
+    ('/api/recipe/recipes/', 'id,title'),
+    ('/api/recipe/ingredients/', 'id'),
+    ('/api/recipe/recipeingredients/', 'id,amount'),
+    ('/api/home/inventory-fetch/', 'ingredient,amount'),
+    ('/api/home/fav-recipes/', 'recipe,rating'),
+]
+
+
+def unnarrowed(queryset, serializer_class, names=None):
+    return queryset
+
+
+def measure(client, url, repeat):
+    latencies, db = [], []
+    for _ in range(repeat):
+        with QueryCounter(connection) as queries, Timer() as timer:
+            res = client.get(url)
+        latencies.append(timer.elapsed)
+        db.append(queries.seconds)
+    assert res.status_code == 200, res.content
+    return (len(res.content), queries.count, summarize(db)['p50_ms'],
+            summarize(latencies)['p50_ms'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--recipes', type=int, default=1000)
+    args = parser.parse_args()
+
+    # Every request should reach the view, not the response cache.
+    uncached = dict(settings.RESPONSE_CACHE, ENABLED=False)
+    with scratch_database(), override_settings(RESPONSE_CACHE=uncached):
+        volumes = dict(datasets.DEFAULT_VOLUMES, recipes=args.recipes,
+                       ingredients=1000, inventory_per_home=200,
+                       favourites_per_home=150)
+        data = datasets.seed(volumes, random.Random(args.seed))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {data.users[0].token}')
+
+        print(f'{"endpoint":<32}{"variant":<26}{"bytes":>10}{"queries":>9}'
+              f'{"db p50":>10}{"p50":>10}')
+        for path, fields in ENDPOINTS:
+            with mock.patch('core.fieldsets.narrow', unnarrowed):
+                before = measure(client, path, args.repeat)
+            variants = [
+                ('all, unnarrowed', before),
+                ('all', measure(client, path, args.repeat)),
+                (f'fields={fields}',
+                 measure(client, f'{path}?fields={fields}', args.repeat)),
+            ]
+            for label, (size, queries, db_ms, total_ms) in variants:
+                print(f'{path:<32}{label:<26}{size:>10}{queries:>9}'
+                      f'{db_ms:>8.2f}ms{total_ms:>8.2f}ms')
+                path = ''
+
+
+if __name__ == '__main__':
+    main()
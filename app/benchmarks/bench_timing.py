@@ -0,0 +1,78 @@
+"""
+Benchmark the overhead of the request timing middleware.
+
+Seeds a scratch database and replays the same API reads with the timing
+middleware switched off and on, alternating rounds to even out noise,
+and reports the mean latency of each and the relative overhead.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_timing --requests 2000
+"""
+import argparse
+import random
+
+from benchmarks.utils import Timer, scratch_database, setup_django, summarize
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from benchmarks.bench_response_cache import READ_PATHS, seed  # noqa: E402
+
+
+def replay(users, paths, args, rng):
+    clients = {}
+    latencies = []
+    for _ in range(args.requests // args.rounds):
+        user = rng.choice(users)
+        client = clients.get(user.pk)
+        if client is None:
+            client = clients[user.pk] = APIClient()
+            client.force_authenticate(user)
+        path = rng.choice(paths)
+        with Timer() as timer:
+            client.get(path)
+        latencies.append(timer.elapsed)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=300)
+    parser.add_argument('--ingredients', type=int, default=200)
+    parser.add_argument('--homes', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=4)
+    parser.add_argument('--cache', action='store_true',
+                        help='keep the response cache on')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    paths = [path for path, weight in READ_PATHS for _ in range(weight)]
+    response_cache = dict(settings.RESPONSE_CACHE, ENABLED=args.cache)
+    with scratch_database(), override_settings(RESPONSE_CACHE=response_cache):
+        users, _ = seed(args.recipes, args.ingredients, args.homes,
+                        random.Random(args.seed))
+        # Warm up connections, caches and code paths before measuring.
+        replay(users, paths, args, random.Random(args.seed))
+        samples = {False: [], True: []}
+        for round_ in range(args.rounds):
+            for enabled in (False, True):
+                config = dict(settings.REQUEST_TIMING, ENABLED=enabled)
+                with override_settings(REQUEST_TIMING=config):
+                    samples[enabled] += replay(
+                        users, paths, args, random.Random(args.seed + round_))
+        off = summarize(samples[False])
+        on = summarize(samples[True])
+        for label, summary in (('off', off), ('on', on)):
+            print(f'{label:<5}mean {summary["mean_ms"]:.3f} ms  '
+                  f'p50 {summary["p50_ms"]:.3f} ms  '
+                  f'p95 {summary["p95_ms"]:.3f} ms')
+        print(f'overhead mean {on["mean_ms"] / off["mean_ms"] - 1:+.2%}  '
+              f'p50 {on["p50_ms"] / off["p50_ms"] - 1:+.2%}')
+
+
+if __name__ == '__main__':
+    main()
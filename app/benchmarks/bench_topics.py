@@ -0,0 +1,121 @@
+"""
+Benchmark wildcard topic matching with many subscriptions.
+
+Builds `--subscriptions` patterns over `--homes` homes, the mix a
+kitchen device fleet would subscribe with: mostly exact device topics
+(`home/7/kitchen/scale3`), then per home room wildcards
+(`home/7/kitchen/+`), whole homes (`home/7/#`) and a few fleet-wide
+patterns (`home/+/+/light`). Random device topics are then matched:
+
+- trie: `core.topics.TopicTrie`, what the event bus uses;
+- linear: every pattern tested level by level, what a flat list of
+  subscriptions costs.
+
+Both must agree. Finally the same events are published through an
+inline `EventBus` with one subscriber per pattern.
+
+Usage (from the app directory):
+    python -m benchmarks.bench_topics --subscriptions 100000
+"""
+import argparse
+import random
+
+from benchmarks.utils import Timer, setup_django
+
+setup_django()
+
+from core import events  # noqa: E402
+from core.topics import TopicTrie  # noqa: E402
+
+ROOMS = ('kitchen', 'pantry', 'hall', 'garage')
+DEVICES = ('scale', 'light', 'fridge', 'door')
+
+
+def device_topic(rng, homes):
+    return (f'home/{rng.randrange(homes)}/{rng.choice(ROOMS)}/'
+            f'{rng.choice(DEVICES)}{rng.randrange(10)}')
+
+
+def make_patterns(count, homes, rng):
+    patterns = [f'home/+/+/{device}' for device in DEVICES]
+    patterns += ['home/+/kitchen/#', '#']
+    while len(patterns) < count:
+        roll = rng.random()
+        home = rng.randrange(homes)
+        if roll < 0.8:
+            patterns.append(device_topic(rng, homes))
+        elif roll < 0.95:
+            patterns.append(f'home/{home}/{rng.choice(ROOMS)}/+')
+        else:
+            patterns.append(f'home/{home}/#')
+    return patterns
+
+
+def pattern_matches(pattern_levels, levels):
+    for index, level in enumerate(pattern_levels):
+        if level == '#':
+            return True
+        if index >= len(levels) or level not in ('+', levels[index]):
+            return False
+    return len(pattern_levels) == len(levels)
+
+
+def linear_match(patterns, topic):
+    levels = topic.split('/')
+    return [pattern for pattern, pattern_levels in patterns
+            if pattern_matches(pattern_levels, levels)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--subscriptions', type=int, default=100000)
+    parser.add_argument('--homes', type=int, default=10000)
+    parser.add_argument('--topics', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    patterns = make_patterns(args.subscriptions, args.homes, rng)
+    topics = [device_topic(rng, args.homes) for _ in range(args.topics)]
+
+    trie = TopicTrie()
+    with Timer() as timer:
+        for pattern in patterns:
+            trie.add(pattern, pattern)
+    print(f'{len(trie)} subscriptions added in {timer.elapsed:.2f}s '
+          f'({len(trie) / timer.elapsed:.0f}/s)')
+
+    with Timer() as timer:
+        matched = sum(len(trie.match(topic)) for topic in topics)
+    trie_rate = len(topics) / timer.elapsed
+    print(f'trie:   {trie_rate:>10.0f} topics/s, '
+          f'{matched / len(topics):.1f} matches per topic')
+
+    split = [(pattern, pattern.split('/')) for pattern in patterns]
+    sample = topics[:200]
+    with Timer() as timer:
+        linear = [sorted(linear_match(split, topic)) for topic in sample]
+    linear_rate = len(sample) / timer.elapsed
+    print(f'linear: {linear_rate:>10.0f} topics/s '
+          f'({trie_rate / linear_rate:.0f}x slower)')
+    assert linear == [sorted(trie.match(topic)) for topic in sample]
+
+    bus = events.EventBus(asynchronous=False)
+    handled = []
+    for index, pattern in enumerate(patterns):
+        bus.subscribe(f's{index}', [pattern], handled.extend)
+    batch = []
+    for topic in topics:
+        # Room and device stand in for model and action.
+        _, home_id, room, device = topic.split('/')
+        batch.append(events.Event(room, device, 1, {'home_id': home_id},
+                                  None))
+    with Timer() as timer:
+        for event in batch:
+            bus.publish(event)
+    print(f'bus:    {len(batch) / timer.elapsed:>10.0f} events/s inline, '
+          f'{len(handled)} deliveries')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+Seed benchmark datasets of configurable size.
+
+Rows are created with `bulk_create` and every user shares one password
+hash, so seeding costs little next to the benchmark itself. Names and
+emails carry a prefix, which lets a later run against the same database
+(e.g. behind a running server) load the dataset instead of seeding it
+again.
+"""
+import datetime
+import random
+
+DEFAULT_VOLUMES = {
+    'users': 60,
+    'homes': 25,
+    'recipes': 200,
+    'ingredients': 300,
+    'tags': 30,
+    'lines_per_recipe': 6,
+    'inventory_per_home': 15,
+    'favourites_per_home': 5,
+}
+PASSWORD = 'bench-pass-123'
+UNITS = ['g', 'kg', 'ml', 'l', 'pcs', 'tbsp']
+
+
+class HomeState:
+    """Rows of a home, shared by its members."""
+
+    def __init__(self, home_id):
+        self.id = home_id
+        self.inventory = []
+        self.stocked = set()
+        self.favourites = []
+        self.favourited = set()
+
+
+class VirtualUser:
+    """A seeded user the benchmark sends requests as."""
+
+    def __init__(self, user_id, email, token, home=None):
+        self.user_id = user_id
+        self.email = email
+        self.token = token
+        self.home = home
+        self.recipes = []
+        self.tags = []
+        self.ingredients = []
+        self.created_recipes = []
+
+
+class Dataset:
+    """Ids and users of a seeded dataset."""
+
+    def __init__(self, prefix, users, spare, recipe_ids, ingredient_ids):
+        self.prefix = prefix
+        self.users = users
+        # Users without a home, to be added to homes and removed again.
+        self.spare = spare
+        self.recipe_ids = recipe_ids
+        self.ingredient_ids = ingredient_ids
+
+
+def _batches(rows, size=5000):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _bulk(model, rows):
+    for batch in _batches(rows):
+        model.objects.bulk_create(batch)
+
+
+def seed(volumes, rng, prefix='bench'):
+    """Create a dataset with `volumes` rows, see `DEFAULT_VOLUMES`."""
+    from django.contrib.auth.hashers import make_password
+    from rest_framework.authtoken.models import Token
+
+    from core import popularity
+    from recipe import cooccurrence, duplicates
+    from core.models import (
+        FavHomeRecipe,
+        Home,
+        Ingredient,
+        Inventory,
+        Recipe,
+        RecipeIngredient,
+        Tag,
+        User,
+    )
+
+    volumes = dict(DEFAULT_VOLUMES, **volumes)
+    password = make_password(PASSWORD)
+
+    _bulk(Home, [Home(name=f'{prefix} home {i}', parameters=str(i % 10 ** 6))
+                 for i in range(volumes['homes'])])
+    home_ids = list(Home.objects.filter(
+        name__startswith=f'{prefix} home ').values_list('id', flat=True))
+    # About one in ten users starts without a home.
+    _bulk(User, [
+        User(
+            email=f'{prefix}-{i}@example.com',
+            name=f'{prefix} user {i}',
+            password=password,
+            home_id=home_ids[i % len(home_ids)] if i % 10 else None,
+        )
+        for i in range(volumes['users'])
+    ])
+    users = list(User.objects.filter(email__startswith=f'{prefix}-'))
+    _bulk(Token, [Token(key=Token.generate_key(), user=user)
+                  for user in users])
+
+    owners = [user for user in users if user.home_id]
+    _bulk(Tag, [Tag(user=rng.choice(owners), name=f'{prefix} tag {i}')
+                for i in range(volumes['tags'])])
+    _bulk(Ingredient, [
+        Ingredient(user=rng.choice(owners), name=f'{prefix} ingredient {i}')
+        for i in range(volumes['ingredients'])
+    ])
+    ingredient_ids = list(Ingredient.objects.filter(
+        name__startswith=f'{prefix} ingredient ').values_list('id', flat=True))
+    _bulk(Recipe, [
+        Recipe(
+            user=rng.choice(owners),
+            title=f'{prefix} recipe {i}',
+            time_minutes=rng.choice([10, 15, 20, 30, 45, 60, 90]),
+            description='Seeded for benchmarks.',
+        )
+        for i in range(volumes['recipes'])
+    ])
+    recipe_ids = list(Recipe.objects.filter(
+        title__startswith=f'{prefix} recipe ').values_list('id', flat=True))
+
+    per_recipe = min(volumes['lines_per_recipe'], len(ingredient_ids))
+    _bulk(RecipeIngredient, [
+        RecipeIngredient(
+            recipe_id=recipe_id,
+            ingredient_id=ingredient_id,
+            amount=rng.choice([50, 100, 200, 500]),
+            amount_unit=rng.choice(UNITS),
+            mandatory=rng.random() < 0.7,
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in rng.sample(ingredient_ids, per_recipe)
+    ])
+    stock = min(volumes['inventory_per_home'], len(ingredient_ids))
+    _bulk(Inventory, [
+        Inventory(home_id=home_id, ingredient_id=ingredient_id,
+                  amount=rng.choice([100, 250, 500, 1000]))
+        for home_id in home_ids
+        for ingredient_id in rng.sample(ingredient_ids, stock)
+    ])
+    favourites = min(volumes['favourites_per_home'], len(recipe_ids))
+    cooked = datetime.date(2024, 1, 1)
+    _bulk(FavHomeRecipe, [
+        FavHomeRecipe(home_id=home_id, recipe_id=recipe_id,
+                      rating=rng.randint(1, 5), last_cooked=cooked)
+        for home_id in home_ids
+        for recipe_id in rng.sample(recipe_ids, favourites)
+    ])
+    # bulk_create sends no signals, so rebuild what they would maintain.
+    popularity.rebuild_popularity()
+    cooccurrence.build_index()
+    cooccurrence.reset_index()
+    duplicates.build_index()
+    return load(prefix)
+
+
+def load(prefix='bench'):
+    """Return the dataset seeded earlier with `prefix`, or None."""
+    from core.models import (
+        FavHomeRecipe,
+        Ingredient,
+        Inventory,
+        Recipe,
+        Tag,
+        User,
+    )
+
+    users = list(User.objects.filter(
+        email__startswith=f'{prefix}-', auth_token__isnull=False,
+    ).select_related('auth_token'))
+    if not users:
+        return None
+    by_id = {}
+    homes = {}
+    spare = []
+    for user in users:
+        home = None
+        if user.home_id:
+            home = homes.setdefault(user.home_id, HomeState(user.home_id))
+        vu = VirtualUser(user.id, user.email, user.auth_token.key, home)
+        by_id[user.id] = vu
+        if home is None:
+            spare.append(vu)
+    for recipe_id, user_id in Recipe.objects.filter(
+            user_id__in=by_id).values_list('id', 'user_id'):
+        by_id[user_id].recipes.append(recipe_id)
+    for tag_id, user_id in Tag.objects.filter(
+            user_id__in=by_id).values_list('id', 'user_id'):
+        by_id[user_id].tags.append(tag_id)
+    for ingredient_id, user_id in Ingredient.objects.filter(
+            user_id__in=by_id).values_list('id', 'user_id'):
+        by_id[user_id].ingredients.append(ingredient_id)
+    for item_id, home_id, ingredient_id in Inventory.objects.filter(
+            home_id__in=homes).values_list(
+                'id', 'home_id', 'ingredient_id'):
+        homes[home_id].inventory.append(item_id)
+        homes[home_id].stocked.add(ingredient_id)
+    for fav_id, home_id, recipe_id in FavHomeRecipe.objects.filter(
+            home_id__in=homes).values_list('id', 'home_id', 'recipe_id'):
+        homes[home_id].favourites.append(fav_id)
+        homes[home_id].favourited.add(recipe_id)
+
+    recipe_ids = list(Recipe.objects.filter(
+        title__startswith=f'{prefix} recipe ').values_list('id', flat=True))
+    ingredient_ids = list(Ingredient.objects.filter(
+        name__startswith=f'{prefix} ingredient ').values_list('id', flat=True))
+    homed = [vu for vu in by_id.values() if vu.home]
+    return Dataset(prefix, homed, spare, recipe_ids, ingredient_ids)
+
+
+def seed_or_load(volumes, random_seed=1, prefix='bench'):
+    """Load the dataset with `prefix`, seeding it first if missing."""
+    return load(prefix) or seed(volumes, random.Random(random_seed), prefix)
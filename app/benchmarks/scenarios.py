@@ -0,0 +1,400 @@
+"""
+Request mixes for the benchmark suite.
+
+Every route of the recipe, home and user APIs has an operation that
+builds a request for a virtual user, and each mix gives the operations
+a weight. Operations keep the dataset's bookkeeping up to date (e.g. the
+recipes a user owns or the ingredients a home has in stock) so writes
+stay valid and ownership checks pass for the whole run.
+"""
+import itertools
+import uuid
+
+OPERATIONS = {}
+
+
+def operation(name):
+    def register(func):
+        OPERATIONS[name] = func
+        return func
+    return register
+
+
+class Call:
+    """A request of a virtual user; `done` gets the JSON of a success."""
+
+    def __init__(self, user, method, path, data=None, done=None,
+                 failed=None):
+        self.user = user
+        self.method = method
+        self.path = path
+        self.data = data
+        self.done = done
+        # Undoes the bookkeeping of a request that did not succeed.
+        self.failed = failed
+
+
+class State:
+    """Bookkeeping shared by the operations during a run."""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.run = uuid.uuid4().hex[:8]
+        self.counter = itertools.count()
+        # Spare users that were added to a home or created one.
+        self.joined = []
+        self.lines = set()
+
+    def unique(self, kind):
+        return f'{self.dataset.prefix} {self.run} {kind} {next(self.counter)}'
+
+    def user(self, rng):
+        return rng.choice(self.dataset.users)
+
+
+# Recipe API.
+
+@operation('recipe-list')
+def recipe_list(state, rng):
+    return Call(state.user(rng), 'GET', '/api/recipe/recipes/')
+
+
+@operation('recipe-list-popular')
+def recipe_list_popular(state, rng):
+    return Call(state.user(rng), 'GET',
+                '/api/recipe/recipes/?ordering=popularity')
+
+
+@operation('recipe-detail')
+def recipe_detail(state, rng):
+    user = state.user(rng)
+    if not user.recipes:
+        return None
+    return Call(user, 'GET',
+                f'/api/recipe/recipes/{rng.choice(user.recipes)}/')
+
+
+@operation('recipe-create')
+def recipe_create(state, rng):
+    user = state.user(rng)
+
+    def done(data):
+        user.recipes.append(data['id'])
+        user.created_recipes.append(data['id'])
+    return Call(user, 'POST', '/api/recipe/recipes/', {
+        'title': state.unique('recipe'),
+        'time_minutes': rng.choice([10, 20, 30, 45]),
+        'description': 'Created by the benchmark.',
+    }, done)
+
+
+@operation('recipe-update')
+def recipe_update(state, rng):
+    user = state.user(rng)
+    if not user.recipes:
+        return None
+    return Call(user, 'PATCH',
+                f'/api/recipe/recipes/{rng.choice(user.recipes)}/',
+                {'time_minutes': rng.choice([10, 20, 30, 45])})
+
+
+@operation('recipe-delete')
+def recipe_delete(state, rng):
+    user = state.user(rng)
+    if not user.created_recipes:
+        return None
+    recipe_id = user.created_recipes.pop()
+    user.recipes.remove(recipe_id)
+    return Call(user, 'DELETE', f'/api/recipe/recipes/{recipe_id}/')
+
+
+@operation('tag-list')
+def tag_list(state, rng):
+    return Call(state.user(rng), 'GET', '/api/recipe/tags/')
+
+
+@operation('tag-create')
+def tag_create(state, rng):
+    user = state.user(rng)
+    return Call(user, 'POST', '/api/recipe/tags/',
+                {'name': state.unique('tag')},
+                lambda data: user.tags.append(data['id']))
+
+
+@operation('tag-detail')
+def tag_detail(state, rng):
+    user = state.user(rng)
+    if not user.tags:
+        return None
+    return Call(user, 'GET', f'/api/recipe/tags/{rng.choice(user.tags)}/')
+
+
+@operation('ingredient-list')
+def ingredient_list(state, rng):
+    return Call(state.user(rng), 'GET', '/api/recipe/ingredients/')
+
+
+@operation('ingredient-create')
+def ingredient_create(state, rng):
+    user = state.user(rng)
+
+    def done(data):
+        user.ingredients.append(data['id'])
+        state.dataset.ingredient_ids.append(data['id'])
+    return Call(user, 'POST', '/api/recipe/ingredients/',
+                {'name': state.unique('ingredient')}, done)
+
+
+@operation('ingredient-detail')
+def ingredient_detail(state, rng):
+    user = state.user(rng)
+    if not user.ingredients:
+        return None
+    return Call(user, 'GET',
+                f'/api/recipe/ingredients/{rng.choice(user.ingredients)}/')
+
+
+@operation('ingredient-substitutes')
+def ingredient_substitutes(state, rng):
+    ingredient = rng.choice(state.dataset.ingredient_ids)
+    return Call(state.user(rng), 'GET',
+                f'/api/recipe/ingredients/{ingredient}/substitutes/')
+
+
+@operation('recipeingredient-list')
+def recipeingredient_list(state, rng):
+    return Call(state.user(rng), 'GET', '/api/recipe/recipeingredients/')
+
+
+@operation('recipeingredient-create')
+def recipeingredient_create(state, rng):
+    user = state.user(rng)
+    # Lines of recipes created in this run are known not to exist yet.
+    if not user.created_recipes:
+        return None
+    recipe = rng.choice(user.created_recipes)
+    ingredient = rng.choice(state.dataset.ingredient_ids)
+    if (recipe, ingredient) in state.lines:
+        return None
+    state.lines.add((recipe, ingredient))
+    return Call(user, 'POST', '/api/recipe/recipeingredients/', {
+        'recipe': recipe,
+        'ingredient': ingredient,
+        'amount': rng.choice([50, 100, 200]),
+        'amount_unit': 'g',
+        'mandatory': rng.random() < 0.5,
+    })
+
+
+# Home API.
+
+@operation('home-list')
+def home_list(state, rng):
+    return Call(state.user(rng), 'GET', '/api/home/homes/')
+
+
+@operation('home-detail')
+def home_detail(state, rng):
+    user = state.user(rng)
+    return Call(user, 'GET', f'/api/home/homes/{user.home.id}/')
+
+
+@operation('home-update')
+def home_update(state, rng):
+    user = state.user(rng)
+    return Call(user, 'PATCH', f'/api/home/homes/{user.home.id}/',
+                {'name': state.unique('home')})
+
+
+@operation('home-create')
+def home_create(state, rng):
+    from benchmarks.dataset import HomeState
+
+    spare = state.dataset.spare
+    if not spare:
+        return None
+    user = spare.pop(rng.randrange(len(spare)))
+
+    def done(data):
+        user.home = HomeState(data['id'])
+        state.joined.append(user)
+
+    def failed():
+        spare.append(user)
+    return Call(user, 'POST', '/api/home/homes/',
+                {'name': state.unique('home'), 'parameters': '1'},
+                done, failed)
+
+
+@operation('home-adduser')
+def home_adduser(state, rng):
+    spare = state.dataset.spare
+    if not spare:
+        return None
+    user = state.user(rng)
+    guest = spare.pop(rng.randrange(len(spare)))
+
+    def done(data):
+        guest.home = user.home
+        state.joined.append(guest)
+
+    def failed():
+        spare.append(guest)
+    return Call(user, 'POST', '/api/home/adduser/',
+                {'user': guest.user_id}, done, failed)
+
+
+@operation('home-remove')
+def home_remove(state, rng):
+    joined = state.joined
+    if not joined:
+        return None
+    user = joined.pop(rng.randrange(len(joined)))
+
+    def done(data):
+        user.home = None
+        state.dataset.spare.append(user)
+
+    def failed():
+        joined.append(user)
+    return Call(user, 'POST', '/api/home/remove-home/', {}, done, failed)
+
+
+@operation('inventory-fetch')
+def inventory_fetch(state, rng):
+    return Call(state.user(rng), 'GET', '/api/home/inventory-fetch/')
+
+
+@operation('inventory-create')
+def inventory_create(state, rng):
+    user = state.user(rng)
+    home = user.home
+    ingredient = rng.choice(state.dataset.ingredient_ids)
+    if ingredient in home.stocked:
+        return None
+    home.stocked.add(ingredient)
+    return Call(user, 'POST', '/api/home/inventory-create/', {
+        'ingredient': ingredient,
+        'amount': rng.choice([100, 250, 500]),
+    }, lambda data: home.inventory.append(data['id']))
+
+
+@operation('inventory-detail')
+def inventory_detail(state, rng):
+    user = state.user(rng)
+    if not user.home.inventory:
+        return None
+    item = rng.choice(user.home.inventory)
+    return Call(user, 'GET', f'/api/home/inventory-detail/{item}/')
+
+
+@operation('inventory-update')
+def inventory_update(state, rng):
+    user = state.user(rng)
+    if not user.home.inventory:
+        return None
+    item = rng.choice(user.home.inventory)
+    return Call(user, 'PATCH', f'/api/home/inventory-detail/{item}/',
+                {'amount': rng.randint(1, 1000)})
+
+
+@operation('fav-recipes')
+def fav_recipes(state, rng):
+    return Call(state.user(rng), 'GET', '/api/home/fav-recipes/')
+
+
+@operation('fav-recipe-create')
+def fav_recipe_create(state, rng):
+    user = state.user(rng)
+    home = user.home
+    recipe = rng.choice(state.dataset.recipe_ids)
+    if recipe in home.favourited:
+        return None
+    home.favourited.add(recipe)
+    return Call(user, 'POST', '/api/home/fav-recipe-create/', {
+        'recipe': recipe,
+        'rating': rng.randint(1, 5),
+    }, lambda data: home.favourites.append(data['id']))
+
+
+@operation('fav-recipe-update')
+def fav_recipe_update(state, rng):
+    user = state.user(rng)
+    if not user.home.favourites:
+        return None
+    fav = rng.choice(user.home.favourites)
+    return Call(user, 'PATCH', f'/api/home/fav-recipe-update/{fav}/',
+                {'rating': rng.randint(1, 5)})
+
+
+@operation('meal-plan')
+def meal_plan(state, rng):
+    return Call(state.user(rng), 'GET',
+                '/api/home/meal-plan/?days=3&budget_ms=20')
+
+
+# User API.
+
+@operation('user-create')
+def user_create(state, rng):
+    return Call(None, 'POST', '/api/user/create/', {
+        'email': f'{state.dataset.prefix}.{state.run}.'
+                 f'{next(state.counter)}@example.com',
+        'password': 'bench-pass-123',
+        'name': 'Benchmark user',
+    })
+
+
+@operation('user-token')
+def user_token(state, rng):
+    from benchmarks.dataset import PASSWORD
+
+    user = state.user(rng)
+    return Call(None, 'POST', '/api/user/token/',
+                {'email': user.email, 'password': PASSWORD})
+
+
+@operation('user-me')
+def user_me(state, rng):
+    return Call(state.user(rng), 'GET', '/api/user/me/')
+
+
+@operation('user-me-update')
+def user_me_update(state, rng):
+    return Call(state.user(rng), 'PATCH', '/api/user/me/',
+                {'name': state.unique('name')})
+
+
+READS = {
+    'recipe-list': 6, 'recipe-list-popular': 3, 'recipe-detail': 10,
+    'tag-list': 3, 'tag-detail': 2, 'ingredient-list': 4,
+    'ingredient-detail': 3, 'ingredient-substitutes': 3,
+    'recipeingredient-list': 1, 'home-list': 2, 'home-detail': 2,
+    'inventory-fetch': 10, 'inventory-detail': 4, 'fav-recipes': 8,
+    'meal-plan': 2, 'user-me': 4,
+}
+WRITES = {
+    'recipe-create': 3, 'recipe-update': 3, 'recipe-delete': 2,
+    'tag-create': 1, 'ingredient-create': 1, 'recipeingredient-create': 2,
+    'home-update': 1, 'home-create': 1, 'home-adduser': 1, 'home-remove': 2,
+    'inventory-create': 3, 'inventory-update': 6, 'fav-recipe-create': 2,
+    'fav-recipe-update': 3, 'user-create': 1, 'user-token': 1,
+    'user-me-update': 1,
+}
+
+
+def _mix(read_share):
+    reads = sum(READS.values())
+    writes = sum(WRITES.values())
+    weights = {name: read_share * weight / reads
+               for name, weight in READS.items()}
+    weights.update((name, (1 - read_share) * weight / writes)
+                   for name, weight in WRITES.items())
+    return weights
+
+
+MIXES = {
+    'browse': _mix(0.95),
+    'mixed': _mix(0.8),
+    'write': _mix(0.4),
+}
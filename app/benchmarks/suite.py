@@ -0,0 +1,331 @@
+"""
+Load benchmark suite for the recipe, home and user APIs.
+
+Seeds a dataset (see `benchmarks.dataset`) and replays a weighted mix of
+requests covering every API route (see `benchmarks.scenarios`), either
+in-process through the test client on a scratch database or over HTTP
+against a running server. Reports throughput, p50/p95/p99 latency and
+queries per request for every operation, and compares them with a saved
+baseline to flag regressions. Latency baselines only mean something on
+the machine they were recorded on; query counts are portable.
+
+Queries are read from the Server-Timing header of the request timing
+middleware, so they are reported for remote servers too when these run
+with REQUEST_TIMING_HEADER=1.
+
+Usage (from the app directory):
+    # In-process on a scratch copy of the configured database.
+    DB_ENGINE=sqlite python -m benchmarks.suite --mix mixed \\
+        --baseline benchmarks/baselines/mixed.json
+    # Against a server using the same database settings; the dataset is
+    # seeded there on the first run and reused afterwards. Start it with
+    # REQUEST_TIMING_HEADER=1 to get query counts.
+    python -m benchmarks.suite --url http://127.0.0.1:8000 --concurrency 8
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from benchmarks import dataset as datasets
+from benchmarks.scenarios import MIXES, OPERATIONS, State
+from benchmarks.utils import percentile, scratch_database, setup_django
+
+# Relative latency growth tolerated before an operation is flagged, and
+# an absolute floor so sub-millisecond jitter is not flagged.
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_MS = 2.0
+# Operations with fewer samples are too noisy to flag on latency.
+MIN_SAMPLES = 20
+
+
+def queries_from(header):
+    """Return the query count of a Server-Timing header, if any."""
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if name == 'db':
+            for param in params.split(';'):
+                if param.startswith('desc='):
+                    return int(param[5:].strip('"').split()[0])
+    return None
+
+
+class InProcessDriver:
+    """Send requests through the Django test client."""
+
+    def __init__(self):
+        from rest_framework.test import APIClient
+        self.client_class = APIClient
+        self.clients = {}
+
+    def client(self, user):
+        key = user.token if user else None
+        client = self.clients.get(key)
+        if client is None:
+            client = self.clients[key] = self.client_class()
+            if user:
+                client.credentials(HTTP_AUTHORIZATION=f'Token {user.token}')
+        return client
+
+    def send(self, call):
+        client = self.client(call.user)
+        method = getattr(client, call.method.lower())
+        kwargs = {'format': 'json'} if call.data is not None else {}
+        response = method(call.path, call.data, **kwargs)
+        return (response.status_code, response.content,
+                response.get('Server-Timing'))
+
+
+class HTTPDriver:
+    """Send requests over keep-alive HTTP connections, one per thread."""
+
+    def __init__(self, url):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=60)
+        return connection
+
+    def send(self, call):
+        headers = {'Accept': 'application/json'}
+        if call.user:
+            headers['Authorization'] = f'Token {call.user.token}'
+        body = None
+        if call.data is not None:
+            body = json.dumps(call.data)
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            connection = self.connection()
+            try:
+                connection.request(call.method, call.path, body, headers)
+                response = connection.getresponse()
+                content = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+                continue
+            return (response.status, content,
+                    response.getheader('Server-Timing'))
+
+
+class Results:
+    """Latencies and query counts per operation."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ops = {}
+
+    def add(self, name, elapsed, status, queries):
+        with self.lock:
+            op = self.ops.setdefault(
+                name, {'latencies': [], 'queries': [], 'errors': 0})
+            op['latencies'].append(elapsed)
+            if queries is not None:
+                op['queries'].append(queries)
+            if status >= 400:
+                op['errors'] += 1
+
+    def summary(self, elapsed):
+        """Return per operation and overall statistics."""
+        report = {}
+        everything = {'latencies': [], 'queries': [], 'errors': 0}
+        for name, op in sorted(self.ops.items()):
+            report[name] = self._stats(op, elapsed)
+            everything['latencies'] += op['latencies']
+            everything['queries'] += op['queries']
+            everything['errors'] += op['errors']
+        report['ALL'] = self._stats(everything, elapsed)
+        return report
+
+    @staticmethod
+    def _stats(op, elapsed):
+        ms = [sample * 1000 for sample in op['latencies']]
+        queries = op['queries']
+        return {
+            'count': len(ms),
+            'rps': round(len(ms) / elapsed, 2),
+            'p50_ms': round(percentile(ms, 50), 3),
+            'p95_ms': round(percentile(ms, 95), 3),
+            'p99_ms': round(percentile(ms, 99), 3),
+            'queries': (round(sum(queries) / len(queries), 2)
+                        if queries else None),
+            'errors': op['errors'],
+        }
+
+
+def pick(state, weights, rng):
+    """Return the name and call of an applicable operation."""
+    names = list(weights)
+    cum_weights = []
+    total = 0.0
+    for name in names:
+        total += weights[name]
+        cum_weights.append(total)
+    while True:
+        name = rng.choices(names, cum_weights=cum_weights)[0]
+        call = OPERATIONS[name](state, rng)
+        if call is not None:
+            return name, call
+
+
+def worker(driver, state, weights, requests, rng, results, lock):
+    for _ in range(requests):
+        with lock:
+            name, call = pick(state, weights, rng)
+        start = time.perf_counter()
+        status, content, timing = driver.send(call)
+        elapsed = time.perf_counter() - start
+        results.add(name, elapsed, status, queries_from(timing))
+        with lock:
+            if status < 300 and call.done:
+                call.done(json.loads(content) if content else None)
+            elif status >= 300 and call.failed:
+                call.failed()
+
+
+def run(driver, data, args):
+    state = State(data)
+    weights = MIXES[args.mix]
+    lock = threading.Lock()
+    if args.warmup:
+        worker(driver, state, weights, args.warmup,
+               random.Random(args.seed - 1), Results(), lock)
+    results = Results()
+    per_thread = args.requests // args.concurrency
+    threads = [
+        threading.Thread(target=worker, args=(
+            driver, state, weights, per_thread,
+            random.Random(args.seed + index), results, lock))
+        for index in range(args.concurrency)
+    ]
+    start = time.perf_counter()
+    if len(threads) == 1:
+        # In-process runs stay on the thread owning the scratch database.
+        threads[0].run()
+    else:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return results.summary(time.perf_counter() - start)
+
+
+def print_report(report, regressions=()):
+    flagged = {name for name, _ in regressions}
+    print(f'{"operation":<26}{"count":>7}{"req/s":>9}{"p50":>9}{"p95":>9}'
+          f'{"p99":>9}{"queries":>9}{"errors":>7}')
+    for name, stats in report.items():
+        queries = ('-' if stats['queries'] is None
+                   else f'{stats["queries"]:.1f}')
+        mark = '  !' if name in flagged else ''
+        print(f'{name:<26}{stats["count"]:>7}{stats["rps"]:>9.1f}'
+              f'{stats["p50_ms"]:>9.2f}{stats["p95_ms"]:>9.2f}'
+              f'{stats["p99_ms"]:>9.2f}{queries:>9}{stats["errors"]:>7}'
+              f'{mark}')
+
+
+def compare(report, baseline, tolerance):
+    """Return (operation, reason) for every regression against baseline."""
+    regressions = []
+    for name, base in baseline['operations'].items():
+        stats = report.get(name)
+        if stats is None or not stats['count']:
+            continue
+        if (base['queries'] is not None and stats['queries'] is not None
+                and stats['queries'] > base['queries'] + 0.5):
+            regressions.append((name, f'queries {base["queries"]} -> '
+                                      f'{stats["queries"]}'))
+        if min(stats['count'], base['count']) < MIN_SAMPLES:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            limit = max(base[key] * (1 + tolerance),
+                        base[key] + MIN_REGRESSION_MS)
+            if stats[key] > limit:
+                regressions.append((name, f'{key} {base[key]} -> '
+                                          f'{stats[key]}'))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--mix', choices=sorted(MIXES), default='mixed')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='client threads (HTTP only)')
+    parser.add_argument('--url', help='server to benchmark over HTTP')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--prefix', default='bench',
+                        help='name prefix of the seeded rows')
+    for name, value in datasets.DEFAULT_VOLUMES.items():
+        parser.add_argument(f'--{name.replace("_", "-")}', type=int,
+                            default=value)
+    parser.add_argument('--baseline', help='JSON report to compare with')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--save', help='write the report to this file')
+    args = parser.parse_args()
+
+    setup_django()
+    volumes = {name: getattr(args, name) for name in datasets.DEFAULT_VOLUMES}
+    if args.url:
+        data = datasets.seed_or_load(volumes, args.seed, args.prefix)
+        report = run(HTTPDriver(args.url), data, args)
+    else:
+        args.concurrency = 1
+        from django.conf import settings
+        from django.test.utils import override_settings
+
+        from recipe import cooccurrence
+
+        timing = dict(settings.REQUEST_TIMING, ENABLED=True, HEADER=True)
+        # One process, so the per-process cache stays exact.
+        response_cache = dict(settings.RESPONSE_CACHE, ENABLED=True)
+        with tempfile.TemporaryDirectory() as workdir, \
+                scratch_database(), \
+                override_settings(
+                    REQUEST_TIMING=timing,
+                    RESPONSE_CACHE=response_cache,
+                    COOCCURRENCE_PATH=os.path.join(workdir, 'cooc.bin')):
+            cooccurrence.reset_index()
+            data = datasets.seed(volumes, random.Random(args.seed),
+                                 args.prefix)
+            report = run(InProcessDriver(), data, args)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+    print_report(report, regressions)
+    for name, reason in regressions:
+        print(f'REGRESSION {name}: {reason}')
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump({
+                'mix': args.mix,
+                'target': args.url or 'in-process',
+                'requests': args.requests,
+                'seed': args.seed,
+                'volumes': volumes,
+                'operations': report,
+            }, file, indent=2, sort_keys=True)
+            file.write('\n')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
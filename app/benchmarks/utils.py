@@ -0,0 +1,100 @@
+"""
+Shared helpers for benchmarks.
+"""
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    """Configure Django for a standalone benchmark script."""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """Run inside a throwaway copy of the configured databases.
+
+    Uses the same machinery as the test runner, so it works against the
+    PostgreSQL server from docker-compose or any SQLite settings module.
+    """
+    from django.db import connections
+    from django.test.utils import (
+        setup_test_environment,
+        teardown_test_environment,
+    )
+    setup_test_environment()
+    connection = connections['default']
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity)
+        teardown_test_environment()
+
+
+def percentile(samples, pct):
+    """Return the `pct` percentile of `samples` (nearest rank)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1,
+                      int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    """Return count, mean and p50/p95/p99 of latencies in seconds as ms."""
+    ms = [sample * 1000 for sample in samples]
+    return {
+        'count': len(ms),
+        'mean_ms': statistics.fmean(ms) if ms else 0.0,
+        'p50_ms': percentile(ms, 50),
+        'p95_ms': percentile(ms, 95),
+        'p99_ms': percentile(ms, 99),
+    }
+
+
+class Timer:
+    """Context manager measuring elapsed wall time."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+class QueryCounter:
+    """Count queries and their time on a connection.
+
+    Unlike `CaptureQueriesContext` this keeps no per-query log, so it
+    works for requests running thousands of queries.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._wrapper.__exit__(*exc)
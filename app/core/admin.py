@@ -49,3 +49,4 @@ admin.site.register(models.Inventory)
 admin.site.register(models.Home)
 admin.site.register(models.Ingredient)
 admin.site.register(models.Tag)
+admin.site.register(models.IngredientNutrition)
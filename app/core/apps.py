@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import cache, eventlog, events, popularity
+        events.connect_signals()
+        cache.connect_signals()
+        events.subscribe('popularity', ['home/+/favhomerecipe/+'],
+                         popularity.apply_favourite_events, database=True)
+        eventlog.connect()
@@ -0,0 +1,67 @@
+"""
+Async entry points for read endpoints served over ASGI.
+
+Under ASGI Django runs every sync view on one shared thread per process,
+so a slow query holds up all requests of that worker. The views here are
+native coroutines: GET and HEAD requests run the wrapped DRF view in the
+thread pool with `thread_sensitive=False`, so reads of a process overlap
+and the event loop itself never touches the ORM. Authentication,
+permissions, the response cache and serialization are those of the DRF
+view, so responses are identical to the WSGI ones.
+
+Writes keep Django's default handling and run on the shared thread.
+"""
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.db import close_old_connections
+from django.views import View
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def database_sync_to_async(func):
+    """Wrap `func` to run in the thread pool with Django's connection
+    handling, the way request_started/request_finished would."""
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+class AsyncReadView(View):
+    """Serve reads of a DRF view from a coroutine.
+
+    Subclasses set `view_class` to the DRF view and, for viewsets,
+    `actions` to the method to action map it is routed with.
+    """
+
+    view_class = None
+    actions = None
+    sync_view = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        if cls.actions is not None:
+            sync_view = cls.view_class.as_view(cls.actions)
+        else:
+            sync_view = cls.view_class.as_view()
+        view = super().as_view(sync_view=sync_view, **initkwargs)
+        view.csrf_exempt = True
+        # Django 3.2 only awaits callbacks marked as coroutine functions.
+        return markcoroutinefunction(view)
+
+    def read(self, request, *args, **kwargs):
+        response = self.sync_view(request, *args, **kwargs)
+        # Rendered here, Django would otherwise hop to the shared thread.
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+        return response
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            handler = database_sync_to_async(self.read)
+        else:
+            handler = sync_to_async(self.sync_view)
+        return await handler(request, *args, **kwargs)
@@ -0,0 +1,184 @@
+"""
+Batched API requests.
+
+`POST /api/batch/` takes a list of sub-requests and answers them in one
+round trip. The batch request is authenticated once and every
+sub-request runs as that user, straight through the URL resolver
+without another trip through the middleware. Sub-requests share the
+user object, so its home is loaded once for the whole batch, and
+identical reads are run once.
+
+Sub-requests run in order, except that consecutive reads are
+independent of each other and run concurrently on a thread pool of
+`BATCH['WORKERS']` threads. A write waits for the reads before it and
+the requests after it wait for the write, so a batch can create an
+item and read it back.
+
+Each sub-response is embedded as it was rendered, with its status and
+a few headers, so cached responses are copied without parsing them.
+"""
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from rest_framework.permissions import SAFE_METHODS
+
+logger = logging.getLogger(__name__)
+
+# Sub-response headers worth passing on to the client.
+HEADERS = ('Content-Type', 'ETag', 'Location', 'X-Cache')
+# Environ keys not carried over from the batch request. Sub-responses
+# are embedded in the batch response, so they must not be compressed
+# or answered with 304 on their own.
+_REQUEST_KEYS = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_ACCEPT_ENCODING',
+                 'HTTP_CONTENT_LENGTH', 'HTTP_CONTENT_TYPE',
+                 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_NONE_MATCH', 'PATH_INFO',
+                 'QUERY_STRING', 'REQUEST_METHOD', 'wsgi.input')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _config(name):
+    return settings.BATCH[name]
+
+
+def get_executor():
+    """Return the thread pool running concurrent reads."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_config('WORKERS'),
+                thread_name_prefix='batch')
+        return _executor
+
+
+def is_allowed(path):
+    """Check whether `path` may be requested from a batch."""
+    return path.startswith(tuple(_config('PATHS')))
+
+
+def build_request(parent, item):
+    """Return the request for sub-request `item` of request `parent`."""
+    path, _, query = item['path'].partition('?')
+    body = b''
+    if item.get('body') is not None:
+        body = json.dumps(item['body']).encode()
+    environ = {key: value for key, value in parent.META.items()
+               if key not in _REQUEST_KEYS}
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    })
+    request = WSGIRequest(environ)
+    # DRF authenticates these as the batch's user, without a lookup.
+    request._force_auth_user = parent.user
+    request._force_auth_token = parent.auth
+    return request
+
+
+def _error(status, detail):
+    return {'status': status, 'headers': {},
+            'body': json.dumps({'detail': detail}).encode()}
+
+
+def run(parent, item):
+    """Run one sub-request and return {'status', 'headers', 'body'}."""
+    path = item['path'].partition('?')[0]
+    if not is_allowed(path):
+        return _error(404, 'Not found.')
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return _error(404, 'Not found.')
+    try:
+        response = match.func(build_request(parent, item),
+                              *match.args, **match.kwargs)
+        if hasattr(response, 'render') and not response.is_rendered:
+            response.render()
+        body = (b''.join(response.streaming_content) if response.streaming
+                else response.content)
+    except Exception:
+        logger.exception('batch sub-request failed', extra={
+            'fields': {'method': item['method'], 'path': path}})
+        return _error(500, 'Server error.')
+    return {
+        'status': response.status_code,
+        'headers': {name: response[name] for name in HEADERS
+                    if response.has_header(name)},
+        'body': body,
+    }
+
+
+def _run_in_thread(parent, item):
+    close_old_connections()
+    try:
+        return run(parent, item)
+    finally:
+        close_old_connections()
+
+
+def _run_reads(parent, items):
+    """Run independent reads, concurrently where worthwhile."""
+    unique = {}
+    for item in items:
+        unique.setdefault((item['method'], item['path']), item)
+    if len(unique) == 1 or _config('WORKERS') <= 1:
+        results = {key: run(parent, item) for key, item in unique.items()}
+    else:
+        futures = {key: get_executor().submit(_run_in_thread, parent, item)
+                   for key, item in unique.items()}
+        results = {key: future.result() for key, future in futures.items()}
+    return [results[item['method'], item['path']] for item in items]
+
+
+def execute(parent, items):
+    """Run the sub-requests `items` for `parent`, returning their results."""
+    # Loaded once here rather than by each sub-request, and before any
+    # thread could race to load it.
+    parent.user.home
+    results = []
+    reads = []
+    for item in items:
+        if item['method'] in SAFE_METHODS:
+            reads.append(item)
+            continue
+        results.extend(_run_reads(parent, reads))
+        reads = []
+        results.append(run(parent, item))
+    results.extend(_run_reads(parent, reads))
+    return results
+
+
+def _embed(result):
+    body = result['body']
+    content_type = result['headers'].get('Content-Type', 'application/json')
+    if not body:
+        body = b'null'
+    elif not content_type.startswith('application/json'):
+        body = json.dumps(body.decode('utf-8', 'replace')).encode()
+    head = json.dumps({'status': result['status'],
+                       'headers': result['headers']})
+    return b''.join([head[:-1].encode(), b', "body": ', body, b'}'])
+
+
+def render(results):
+    """Return the batch response for sub-request results."""
+    content = b''.join([
+        b'{"responses": [', b', '.join(_embed(result) for result in results),
+        b']}',
+    ])
+    return HttpResponse(content, content_type='application/json')
@@ -0,0 +1,65 @@
+"""
+Raw bulk writes shared by seeding, imports and the derived columns.
+
+These bypass the ORM, and with it model signals and events: callers
+bump the response cache and update dependent indexes themselves.
+"""
+import csv
+import io
+
+from django.core.management.color import no_style
+
+# Rows per executemany() call when COPY is not available.
+INSERT_BATCH = 1000
+
+
+def copy_rows(connection, table, columns, rows, not_null=()):
+    """Stream `rows` into `table` with PostgreSQL COPY."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    # Unquoted empty fields are NULL in CSV, except in FORCE_NOT_NULL.
+    options = 'FORMAT csv'
+    if not_null:
+        options += f', FORCE_NOT_NULL ({", ".join(not_null)})'
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL synchronous_commit TO OFF')
+        cursor.copy_expert(
+            f'COPY {table} ({", ".join(columns)}) FROM STDIN '
+            f'WITH ({options})',
+            buffer,
+        )
+
+
+def insert_rows(connection, table, columns, rows):
+    """Insert `rows` into `table` with batched executemany()."""
+    quote = connection.ops.quote_name
+    sql = (f'INSERT INTO {quote(table)} '
+           f'({", ".join(quote(column) for column in columns)}) '
+           f'VALUES ({", ".join(["%s"] * len(columns))})')
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), INSERT_BATCH):
+            cursor.executemany(sql, rows[start:start + INSERT_BATCH])
+
+
+def update_rows(connection, table, columns, rows, key='id'):
+    """Update `columns` of `table` from `rows` of values then `key`.
+
+    One parameterized UPDATE per row: Django's bulk_update builds a CASE
+    expression per column, which is far slower for large batches.
+    """
+    quote = connection.ops.quote_name
+    sql = (f'UPDATE {quote(table)} SET '
+           f'{", ".join(f"{quote(column)} = %s" for column in columns)} '
+           f'WHERE {quote(key)} = %s')
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), INSERT_BATCH):
+            cursor.executemany(sql, rows[start:start + INSERT_BATCH])
+
+
+def reset_sequences(connection, models):
+    """Move the id sequences of `models` past explicitly written ids."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
@@ -0,0 +1,358 @@
+"""
+Response cache for read endpoints.
+
+Rendered JSON responses are stored under keys made of the view, the
+user/home scope, the request path and sorted query parameters, and the
+current generation of every namespace the response depends on (for
+example `recipe`, `ingredient` or `inventory:<home id>`).
+
+Model signals, or for models publishing events the `cache` subscriber of
+the event bus (run inline once the write commits, before the response is
+sent), bump the generation of the namespaces a row belongs to, so
+entries built from old data are never looked up again and simply
+expire.
+Nothing has to enumerate or delete keys, which keeps invalidation exact
+per home and works the same with every cache backend.
+
+Entries also keep the body compressed with each encoding clients asked
+for, so hits are sent compressed without compressing again.
+"""
+import hashlib
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.checks import Tags, Warning, register
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from rest_framework.response import Response
+
+from core import compression, events
+from core.models import (
+    FavHomeRecipe,
+    Home,
+    Ingredient,
+    Inventory,
+    Recipe,
+    RecipeIngredient,
+    Tag,
+)
+
+GENERATION_PREFIX = 'gen:'
+RESPONSE_PREFIX = 'resp:'
+# Local counters are added to the shared ones every this many lookups.
+STATS_FLUSH_EVERY = 100
+
+
+def _config(name):
+    return settings.RESPONSE_CACHE[name]
+
+
+def is_enabled():
+    """Check whether response caching is switched on."""
+    return _config('ENABLED')
+
+
+def get_cache():
+    """Return the cache backend responses are stored in."""
+    return caches[_config('ALIAS')]
+
+
+@register(Tags.caches)
+def check_shared_backend(app_configs, **kwargs):
+    """Warn when responses are cached in memory of each process, where
+    writes in one process leave the others serving old responses."""
+    backend = settings.CACHES[_config('ALIAS')]['BACKEND']
+    if is_enabled() and backend.endswith('.LocMemCache'):
+        return [Warning(
+            'The response cache is enabled with a per-process backend.',
+            hint='Set RESPONSE_CACHE_BACKEND=file, or run one process.',
+            id='core.W001',
+        )]
+    return []
+
+
+def _new_generation():
+    # Random start values keep a namespace from reusing the generation
+    # of entries written before its counter was evicted.
+    return random.getrandbits(48)
+
+
+def bump(*namespaces):
+    """Invalidate every cached response depending on `namespaces`."""
+    if not is_enabled():
+        return
+    cache = get_cache()
+    for namespace in namespaces:
+        key = GENERATION_PREFIX + namespace
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_generation(), None)
+
+
+def generations(namespaces):
+    """Return the current generation of each namespace."""
+    cache = get_cache()
+    keys = [GENERATION_PREFIX + namespace for namespace in namespaces]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _new_generation(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+class CacheStats:
+    """Hit and miss counters for cached views.
+
+    Counts are kept per view in each process and added to shared
+    counters in the cache backend every `STATS_FLUSH_EVERY` lookups.
+    """
+
+    FIELDS = ('hits', 'misses', 'stores')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.views = {}
+            self._unflushed = dict.fromkeys(self.FIELDS, 0)
+            self._events = 0
+
+    def record(self, view, field):
+        with self._lock:
+            counters = self.views.setdefault(
+                view, dict.fromkeys(self.FIELDS, 0))
+            counters[field] += 1
+            self._unflushed[field] += 1
+            self._events += 1
+            if self._events < STATS_FLUSH_EVERY:
+                return
+            unflushed = self._unflushed
+            self._unflushed = dict.fromkeys(self.FIELDS, 0)
+            self._events = 0
+        self._publish(unflushed)
+
+    def _publish(self, counts):
+        cache = get_cache()
+        for field, count in counts.items():
+            if not count:
+                continue
+            key = f'stats:{field}'
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                if not cache.add(key, count, None):
+                    cache.incr(key, count)
+
+    def flush(self):
+        """Publish counters not yet added to the shared ones."""
+        with self._lock:
+            unflushed = self._unflushed
+            self._unflushed = dict.fromkeys(self.FIELDS, 0)
+            self._events = 0
+        self._publish(unflushed)
+
+    @staticmethod
+    def _rate(counters):
+        lookups = counters['hits'] + counters['misses']
+        return round(counters['hits'] / lookups, 4) if lookups else None
+
+    def snapshot(self):
+        """Return local per view counters and the shared totals."""
+        with self._lock:
+            views = {
+                view: dict(counters, hit_rate=self._rate(counters))
+                for view, counters in self.views.items()
+            }
+        shared = get_cache().get_many(
+            [f'stats:{field}' for field in self.FIELDS])
+        totals = {field: shared.get(f'stats:{field}', 0)
+                  for field in self.FIELDS}
+        totals['hit_rate'] = self._rate(totals)
+        return {'process': views, 'shared': totals}
+
+
+stats = CacheStats()
+
+
+class CachedResponseMixin:
+    """Serve `list` and `retrieve` of a DRF view from the response cache.
+
+    Views set `cache_namespaces` to the data their responses are built
+    from; `{home}` is replaced with the requesting user's home id. With
+    `cache_scope = 'home'` or `'user'` entries are kept per home or user,
+    otherwise they are shared by every user. Only JSON responses are
+    cached and only after authentication and permissions passed.
+
+    Detail objects are looked up, and their object permissions checked,
+    before the cache is: shared entries are keyed by path, not by user.
+    Handlers set `cacheable` to False for responses not to be stored.
+    """
+
+    cache_namespaces = ()
+    cache_scope = 'global'
+    cacheable = True
+
+    def get_cache_namespaces(self):
+        home = getattr(self.request.user, 'home_id', None)
+        return [namespace.format(home=home)
+                for namespace in self.cache_namespaces]
+
+    def get_cache_scope(self):
+        if self.cache_scope == 'home':
+            return f'home:{self.request.user.home_id}'
+        if self.cache_scope == 'user':
+            return f'user:{self.request.user.pk}'
+        return 'global'
+
+    def get_cache_key(self):
+        request = self.request
+        namespaces = self.get_cache_namespaces()
+        query = sorted(request.query_params.lists())
+        raw = '|'.join([
+            type(self).__name__,
+            self.get_cache_scope(),
+            request.accepted_renderer.format,
+            request.path,
+            repr(query),
+            repr(list(zip(namespaces, generations(namespaces)))),
+        ])
+        return RESPONSE_PREFIX + hashlib.sha1(raw.encode()).hexdigest()
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        """Return the cached response for the request or call `handler`."""
+        if not is_enabled() or request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        view = type(self).__name__
+        cache = get_cache()
+        key = self.get_cache_key()
+        entry = cache.get(key)
+        if entry is not None:
+            stats.record(view, 'hits')
+            response = HttpResponse(
+                entry['content'],
+                status=entry['status'],
+                content_type=entry['content_type'],
+            )
+            response['X-Cache'] = 'HIT'
+            if self._compress(request, response, entry):
+                cache.set(key, entry, _config('TIMEOUT'))
+            return response
+        stats.record(view, 'misses')
+        response = handler(request, *args, **kwargs)
+        self._cache_key_to_store = key
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        key = getattr(self, '_cache_key_to_store', None)
+        if key and response.status_code == 200 and self.cacheable:
+            response.render()
+            entry = {
+                'content': response.content,
+                'status': response.status_code,
+                'content_type': response['Content-Type'],
+                'encoded': {},
+            }
+            self._compress(request, response, entry)
+            get_cache().set(key, entry, _config('TIMEOUT'))
+            stats.record(type(self).__name__, 'stores')
+            response['X-Cache'] = 'MISS'
+        return response
+
+    @staticmethod
+    def _compress(request, response, entry):
+        """Compress `response` for the client from or into `entry`.
+
+        Returns True when a new encoding was added to the entry.
+        """
+        encoding = compression.response_encoding(request, response)
+        if not encoding:
+            return False
+        encoded = entry.setdefault('encoded', {})
+        body = encoded.get(encoding)
+        added = body is None
+        if added:
+            body = encoded[encoding] = compression.compress(
+                entry['content'], encoding)
+        compression.apply(response, encoding, body)
+        return added
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+
+        def handler(request, *args, **kwargs):
+            return Response(self.get_serializer(instance).data)
+        return self.cached_response(handler, request, *args, **kwargs)
+
+
+# Namespaces each model's rows belong to.
+MODEL_NAMESPACES = {
+    Tag: lambda obj: ['tag'],
+    Ingredient: lambda obj: ['ingredient'],
+    RecipeIngredient: lambda obj: ['recipeingredient'],
+    Home: lambda obj: [f'home:{obj.pk}'],
+}
+# Namespaces of the rows of models publishing events, from event data.
+EVENT_NAMESPACES = {
+    Recipe: lambda data: ['recipe'],
+    Inventory: lambda data: [f"inventory:{data['home_id']}"],
+    # Favourites feed the popularity columns shown with recipes.
+    FavHomeRecipe: lambda data: [f"favourite:{data['home_id']}", 'recipe'],
+}
+
+
+def invalidate_instance(sender, instance, **kwargs):
+    """Signal receiver bumping the namespaces of a saved/deleted row.
+
+    The bump waits for the commit; bumping earlier would let a concurrent
+    read cache the old rows under the new generation.
+    """
+    if not is_enabled():
+        return
+    namespaces = MODEL_NAMESPACES[sender](instance)
+    transaction.on_commit(lambda: bump(*namespaces))
+
+
+def invalidate_events(batch):
+    """Event subscriber bumping the namespaces of changed rows, once per
+    batch."""
+    if not is_enabled():
+        return
+    namespaces = set()
+    for event in batch:
+        namespaces.update(_event_namespaces[event.model](event.data))
+    bump(*namespaces)
+
+
+_event_namespaces = {model._meta.model_name: namespaces
+                     for model, namespaces in EVENT_NAMESPACES.items()}
+# Topics of the events of every model in EVENT_NAMESPACES.
+EVENT_TOPICS = ['recipe/+', 'home/+/inventory/+', 'home/+/favhomerecipe/+']
+
+
+def connect_signals():
+    # Bumped before the response, so writers read their own writes.
+    events.subscribe('cache', EVENT_TOPICS, invalidate_events, inline=True)
+    for model in MODEL_NAMESPACES:
+        post_save.connect(
+            invalidate_instance,
+            sender=model,
+            dispatch_uid=f'response_cache_save_{model.__name__}',
+        )
+        post_delete.connect(
+            invalidate_instance,
+            sender=model,
+            dispatch_uid=f'response_cache_delete_{model.__name__}',
+        )
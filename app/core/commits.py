@@ -0,0 +1,33 @@
+"""
+Work deferred until the current transaction commits.
+"""
+import threading
+
+from django.db import transaction
+
+
+class CommitBuffer:
+    """Collect keys added during a transaction and pass them to
+    `callback` as one set once it commits.
+
+    Keys are kept per thread, as transactions are. Outside a transaction
+    the callback runs at once.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self._local = threading.local()
+
+    def add(self, key):
+        if not hasattr(self._local, 'keys'):
+            self._local.keys = set()
+        self._local.keys.add(key)
+        transaction.on_commit(self.flush)
+
+    def flush(self):
+        """Pass the keys added by this thread to the callback."""
+        keys = getattr(self._local, 'keys', None)
+        if not keys:
+            return
+        self._local.keys = set()
+        self.callback(keys)
@@ -0,0 +1,146 @@
+"""
+Response compression.
+
+`CompressionMiddleware` compresses responses with the best encoding the
+client accepts: brotli when the `brotli` package is installed, gzip
+otherwise. Bodies below `MIN_SIZE`, types that do not compress (images,
+archives) and responses that already carry a Content-Encoding are left
+alone. Streaming responses are compressed chunk by chunk, flushing after
+every chunk so clients still receive data as it is produced.
+
+The response cache stores the compressed bodies next to the plain one
+(see `CachedResponseMixin`), so repeat hits are served without
+compressing again.
+"""
+import gzip
+import re
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference when the client accepts several equally.
+PREFERENCE = ('br', 'gzip')
+_strong_etag = re.compile(r'^"')
+
+
+def _config(name):
+    return settings.COMPRESSION[name]
+
+
+def is_enabled():
+    """Check whether responses are compressed."""
+    return _config('ENABLED')
+
+
+def available():
+    """Return the encodings this process can produce, preferred first."""
+    return [encoding for encoding in PREFERENCE
+            if encoding != 'br' or brotli is not None]
+
+
+def accepted(header):
+    """Return {coding: q} parsed from an Accept-Encoding header."""
+    codings = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def negotiate(header):
+    """Return the encoding to use for an Accept-Encoding header, if any."""
+    codings = accepted(header)
+    best, best_q = None, 0.0
+    for encoding in available():
+        q = codings.get(encoding, codings.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding):
+    """Return `data` compressed with `encoding`."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=_config('BROTLI_QUALITY'))
+    # mtime=0 keeps equal bodies byte for byte equal, e.g. for caches.
+    return gzip.compress(data, compresslevel=_config('GZIP_LEVEL'), mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks, yielding after each chunk."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=_config('BROTLI_QUALITY'))
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(_config('GZIP_LEVEL'), zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _compressible_type(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip()
+    return content_type.startswith(_config('CONTENT_TYPES'))
+
+
+def response_encoding(request, response):
+    """Return the encoding `response` should be sent with, or None.
+
+    Adds Accept-Encoding to Vary whenever the answer depends on it.
+    """
+    if (not is_enabled() or response.has_header('Content-Encoding')
+            or 'no-transform' in response.get('Cache-Control', '')
+            or not _compressible_type(response)):
+        return None
+    if not response.streaming and len(response.content) < _config(
+            'MIN_SIZE'):
+        return None
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+
+
+def apply(response, encoding, body=None):
+    """Send `response` with `encoding`; `body` is its compressed content.
+
+    Returns False, leaving the response as is, when compressing does not
+    make the body smaller.
+    """
+    if response.streaming:
+        response.streaming_content = compress_stream(
+            response.streaming_content, encoding)
+        del response['Content-Length']
+    else:
+        if body is None:
+            body = compress(response.content, encoding)
+        if len(body) >= len(response.content):
+            return False
+        response.content = body
+        response['Content-Length'] = str(len(body))
+    # The compressed bytes differ, so a strong ETag must become weak.
+    if response.has_header('ETag'):
+        response['ETag'] = _strong_etag.sub('W/"', response['ETag'])
+    response['Content-Encoding'] = encoding
+    return True
@@ -0,0 +1,173 @@
+"""
+Read/write splitting across the primary database and read replicas.
+
+`ReplicaRoutingMiddleware` marks safe-method requests as allowed to read
+from a replica. `PrimaryReplicaRouter` then spreads their reads over the
+aliases in `settings.DATABASE_REPLICAS` and sends everything else (writes,
+reads outside a request, reads inside a transaction) to `default`.
+
+A client that just wrote is pinned to the primary for
+`DATABASE_PRIMARY_PIN_SECONDS` so it reads its own writes while the
+replicas catch up. The pin travels in a cookie and, for token clients
+that drop cookies, in the `DATABASE_PRIMARY_PIN_CACHE` cache keyed by
+their credentials. That cache is file based by default so every worker
+on the host sees the pin; point it at a network cache when workers run
+on several hosts.
+"""
+import asyncio
+import contextvars
+import hashlib
+import random
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+PRIMARY = 'default'
+PIN_COOKIE = 'db_primary_pin'
+PIN_KEY_PREFIX = 'db-pin:'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    """Routing decision for the current request."""
+
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('db_routing_state', default=None)
+
+
+def current_state():
+    """Return the routing state of the current request, if any."""
+    return _state.get()
+
+
+class use_replicas:
+    """Allow replica reads for the enclosed block, e.g. in a batch job."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+
+    def __enter__(self):
+        self._token = _state.set(RoutingState(self.enabled))
+        return self
+
+    def __exit__(self, *exc):
+        _state.reset(self._token)
+
+
+class PrimaryReplicaRouter:
+    """Route reads to replicas when the current request allows it."""
+
+    def __init__(self, replicas=None):
+        self._replicas = replicas
+
+    @property
+    def replicas(self):
+        if self._replicas is not None:
+            return self._replicas
+        return getattr(settings, 'DATABASE_REPLICAS', [])
+
+    def db_for_read(self, model, **hints):
+        replicas = self.replicas
+        if not replicas:
+            return None
+        state = _state.get()
+        if state is None or not state.use_replicas or state.wrote:
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in self.replicas
+
+
+def _client_key(request):
+    """Identify the client for pins stored in the cache."""
+    credentials = request.META.get('HTTP_AUTHORIZATION')
+    if not credentials:
+        return None
+    digest = hashlib.sha1(credentials.encode()).hexdigest()
+    return PIN_KEY_PREFIX + digest
+
+
+def _pin_cache():
+    """Return the cache shared by workers for client pins."""
+    return caches[settings.DATABASE_PRIMARY_PIN_CACHE]
+
+
+class ReplicaRoutingMiddleware:
+    """Decide per request whether its reads may go to a replica."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def is_pinned(self, request):
+        if request.COOKIES.get(PIN_COOKIE):
+            return True
+        key = _client_key(request)
+        return key is not None and _pin_cache().get(key) is not None
+
+    def pin(self, request, response):
+        seconds = settings.DATABASE_PRIMARY_PIN_SECONDS
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=seconds, httponly=True, samesite='Lax')
+        key = _client_key(request)
+        if key is not None:
+            _pin_cache().set(key, 1, seconds)
+
+    def start(self, request):
+        allowed = (
+            request.method in SAFE_METHODS and
+            bool(settings.DATABASE_REPLICAS) and
+            not self.is_pinned(request)
+        )
+        return _state.set(RoutingState(allowed))
+
+    def finish(self, request, response):
+        state = _state.get()
+        if settings.DATABASE_REPLICAS and (
+                state.wrote or request.method not in SAFE_METHODS):
+            self.pin(request, response)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+            self.finish(request, response)
+            return response
+        finally:
+            _state.reset(token)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+            self.finish(request, response)
+            return response
+        finally:
+            _state.reset(token)
@@ -0,0 +1,160 @@
+"""
+Allergen and diet flags of ingredients and recipes.
+
+`Ingredient.dietary_flags` is a bitmask of what an ingredient contains:
+the allergens below plus meat, other animal products and alcohol. It
+starts out as UNCLASSIFIED and stays so until someone sets it.
+`Recipe.dietary_flags` ORs the flags of a recipe's lines, so it carries
+UNCLASSIFIED while any of them does.
+
+A diet or a list of allergens to avoid becomes one mask, and matching
+recipes are those with `dietary_flags & mask = 0`: a single predicate on
+the recipe table instead of a join through every line. The mask always
+includes UNCLASSIFIED, so a recipe is never offered as safe on the
+strength of an ingredient nobody has checked.
+
+The recipe signals recompute a recipe's flags once a change to one of
+its lines commits, and every recipe using an ingredient when its flags
+change. `rebuild_dietary_flags` recomputes them all.
+"""
+from django.db import connections, transaction
+from django.db.models import F
+
+from core import cache
+from core.models import Recipe, RecipeIngredient
+from core.bulk import update_rows
+from core.commits import CommitBuffer
+
+# The fourteen allergens EU labelling rules require.
+ALLERGENS = (
+    'gluten', 'crustaceans', 'eggs', 'fish', 'peanuts', 'soy', 'milk',
+    'nuts', 'celery', 'mustard', 'sesame', 'sulphites', 'lupin', 'molluscs',
+)
+# `meat` includes what is made from it, such as gelatin or lard;
+# `animal_products` other foods of animal origin, such as honey.
+CONTENTS = ALLERGENS + ('meat', 'animal_products', 'alcohol')
+# Bit of every content flag; bit i is CONTENTS[i].
+CONTENT_FLAGS = {name: 1 << bit for bit, name in enumerate(CONTENTS)}
+UNCLASSIFIED = 1 << 30
+FLAGS = {**CONTENT_FLAGS, 'unclassified': UNCLASSIFIED}
+
+# What each diet rules out.
+DIETS = {
+    'vegetarian': ('meat', 'fish', 'crustaceans', 'molluscs'),
+    'vegan': ('meat', 'fish', 'crustaceans', 'molluscs', 'eggs', 'milk',
+              'animal_products'),
+    'pescatarian': ('meat',),
+    'gluten_free': ('gluten',),
+    'dairy_free': ('milk',),
+    'alcohol_free': ('alcohol',),
+}
+# Bit of every diet in a diet bitmask, such as `Home.diets`.
+DIET_BITS = {name: 1 << bit for bit, name in enumerate(DIETS)}
+
+
+def mask(names, bits=FLAGS):
+    """Return the bitmask of `names`, raising ValueError on unknown ones."""
+    value = 0
+    for name in names:
+        try:
+            value |= bits[name]
+        except KeyError:
+            raise ValueError(f'Unknown flag {name!r}.')
+    return value
+
+
+def names(value, bits=FLAGS):
+    """Return the names of the bits set in `value`."""
+    return [name for name, bit in bits.items() if value & bit]
+
+
+def excluded(diets=0, avoid=0):
+    """Return the flags a recipe must not have.
+
+    `diets` is a diet bitmask and `avoid` a flag bitmask, as stored on
+    `Home`. Empty when neither asks for anything.
+    """
+    value = avoid
+    for diet in names(diets, DIET_BITS):
+        value |= mask(DIETS[diet])
+    if value:
+        value |= UNCLASSIFIED
+    return value
+
+
+def home_excluded(home):
+    """Return the flags the dietary profile of `home` rules out."""
+    return excluded(home.diets, home.avoid)
+
+
+def suitable_diets(flags):
+    """Return the diets a recipe with `flags` fits."""
+    if flags & UNCLASSIFIED:
+        return []
+    return [diet for diet, ruled_out in DIETS.items()
+            if not flags & mask(ruled_out)]
+
+
+def exclude_flags(queryset, flags):
+    """Filter recipes down to those having none of `flags`."""
+    if not flags:
+        return queryset
+    return (queryset.alias(dietary_hits=F('dietary_flags').bitand(flags))
+            .filter(dietary_hits=0))
+
+
+def recompute(recipe_ids, using='default'):
+    """Recompute the flags of the given recipes."""
+    flags = dict.fromkeys(recipe_ids, 0)
+    rows = (RecipeIngredient.objects.using(using)
+            .filter(recipe_id__in=list(flags))
+            .values_list('recipe_id', 'ingredient__dietary_flags'))
+    for recipe_id, ingredient_flags in rows:
+        flags[recipe_id] |= ingredient_flags
+    update_rows(connections[using], Recipe._meta.db_table,
+                ['dietary_flags'],
+                [(value, recipe_id) for recipe_id, value in flags.items()])
+
+
+def rebuild_dietary_flags(batch_size=2000, ingredient_id=None):
+    """Recompute the flags of every recipe, or of those using an
+    ingredient, `batch_size` recipes per transaction.
+
+    Returns the number of recipes updated.
+    """
+    recipes = Recipe.objects.order_by('id')
+    if ingredient_id is not None:
+        recipes = recipes.filter(recipeingredient__ingredient_id=ingredient_id)
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(recipes.filter(id__gt=last_id)
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            recompute(ids)
+        updated += len(ids)
+        last_id = ids[-1]
+
+    cache.bump('recipe')
+    return updated
+
+
+def _recompute_changed(recipe_ids):
+    recompute(recipe_ids)
+    # Recipe lists show the flags; bumped here since `recompute` bypasses
+    # the model events the cache listens to.
+    cache.bump('recipe')
+
+
+# Recipes whose lines changed in the current transaction.
+_changed = CommitBuffer(_recompute_changed)
+
+
+def track(recipe_id):
+    """Recompute a recipe's flags once the current transaction commits.
+
+    Outside a transaction this recomputes them at once.
+    """
+    _changed.add(recipe_id)
@@ -0,0 +1,446 @@
+"""
+Durable append-only log of model events.
+
+Events published on the bus are only kept until the subscribers that
+were listening have run. The log keeps them on disk, so a consumer that
+was down, or that starts later, can read everything it missed:
+
+    <path>/00000000000000000000.log   segment, named by its first offset
+    <path>/00000000000000052113.log   active segment, appended to
+    <path>/offsets/<consumer>         next offset of each consumer
+    <path>/.lock                      serializes writers across processes
+
+Each record is a little-endian header followed by its key and value:
+
+    crc32   uint32    of everything after it
+    offset  uint64    position of the record in the log
+    length  uint32    of the value
+    keylen  uint16    of the key
+
+Offsets increase by one per record and are never reused. Writers append
+to the active segment and start a new one past `SEGMENT_BYTES`; a crash
+mid-write leaves a record whose checksum fails, which readers treat as
+the end and the next writer truncates. Readers memory-map segments and
+keep the position of their next record, so reading on is a slice of the
+mapped file.
+
+A `Consumer` reads from its committed offset and commits only after its
+handler succeeded, so every record is handled at least once: a crash
+between the two hands the same records to the handler again, which must
+cope with that. `retain` deletes closed segments past an age or total
+size, skipping consumers forward; `compact` drops the records of closed
+segments superseded by a later one with the same key, which for events
+is the changed row.
+"""
+import bisect
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from django.conf import settings
+
+from core import events
+from core.renderers import orjson
+
+logger = logging.getLogger(__name__)
+
+RECORD = struct.Struct('<IQIH')
+OFFSET = struct.Struct('<Q')
+SUFFIX = '.log'
+
+Record = namedtuple('Record', 'offset key value')
+
+
+def _config(name):
+    return settings.EVENT_LOG[name]
+
+
+def _segment_path(path, base):
+    return os.path.join(path, f'{base:020d}{SUFFIX}')
+
+
+def _encode(offset, key, value):
+    body = RECORD.pack(0, offset, len(value), len(key))[4:] + key + value
+    return struct.pack('<I', zlib.crc32(body)) + body
+
+
+def _scan(buffer, position, end):
+    """Yield `(position, next position, record)` of the valid records from
+    `position`, stopping at `end` or the first incomplete or corrupt one."""
+    unpack = RECORD.unpack_from
+    crc32 = zlib.crc32
+    while position + RECORD.size <= end:
+        crc, offset, length, keylen = unpack(buffer, position)
+        start = position + RECORD.size
+        stop = start + keylen + length
+        if stop > end or crc32(buffer[position + 4:stop]) != crc:
+            return
+        yield position, stop, Record(offset, buffer[start:start + keylen],
+                                     buffer[start + keylen:stop])
+        position = stop
+
+
+class _Mapped:
+    """A read-only mapping of one segment file as it was when mapped."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as fh:
+            stat = os.fstat(fh.fileno())
+            self.inode = stat.st_ino
+            self.size = stat.st_size
+            self.buffer = (mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                           if self.size else b'')
+
+
+class EventLog:
+    """A segmented append-only log in the directory `path`."""
+
+    def __init__(self, path, segment_bytes=None, fsync=None):
+        self.path = str(path)
+        self.segment_bytes = segment_bytes or _config('SEGMENT_BYTES')
+        self.fsync = _config('FSYNC') if fsync is None else fsync
+        os.makedirs(os.path.join(self.path, 'offsets'), exist_ok=True)
+        self._lock = threading.Lock()
+        self._maps = {}
+        # Active segment of this writer: base, end position, next offset.
+        self._tail = None
+
+    # Segments.
+
+    def segments(self):
+        """Return the base offsets of the segments, oldest first."""
+        return sorted(int(name[:-len(SUFFIX)])
+                      for name in os.listdir(self.path)
+                      if name.endswith(SUFFIX))
+
+    def _map(self, base):
+        """Return a current mapping of a segment, or None if deleted."""
+        path = _segment_path(self.path, base)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._maps.pop(base, None)
+            return None
+        mapped = self._maps.get(base)
+        if (mapped is None or mapped.inode != stat.st_ino
+                or mapped.size != stat.st_size):
+            mapped = self._maps[base] = _Mapped(path)
+        return mapped
+
+    # Writing.
+
+    def _writer(self):
+        """Lock out writers of other processes; see `_Writer`."""
+        return _Writer(os.path.join(self.path, '.lock'))
+
+    def _recover_tail(self):
+        """Find the end of the active segment, truncating a torn write."""
+        bases = self.segments()
+        if not bases:
+            return 0, 0, 0
+        base = bases[-1]
+        position, next_offset = 0, base
+        if self._tail is not None and self._tail[0] == base:
+            position, next_offset = self._tail[1], self._tail[2]
+        path = _segment_path(self.path, base)
+        size = os.path.getsize(path)
+        if size < position:
+            # Replaced under us; scan it from the start.
+            position, next_offset = 0, base
+        if size != position:
+            # Only what other writers added since is read.
+            with open(path, 'rb') as fh:
+                fh.seek(position)
+                data = fh.read()
+            scanned = 0
+            for _, scanned, record in _scan(data, 0, len(data)):
+                next_offset = record.offset + 1
+            position += scanned
+            if position < size:
+                logger.warning('Truncating %d torn bytes of %s',
+                               size - position, path)
+                os.truncate(path, position)
+        return base, position, next_offset
+
+    def append(self, records):
+        """Append `(key, value)` byte pairs; return their offsets."""
+        if not records:
+            return []
+        offsets = []
+        with self._lock, self._writer():
+            base, position, next_offset = self._recover_tail()
+            chunk = bytearray()
+
+            def write():
+                if not chunk:
+                    return
+                fd = os.open(_segment_path(self.path, base),
+                             os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                try:
+                    os.write(fd, chunk)
+                    if self.fsync:
+                        os.fsync(fd)
+                finally:
+                    os.close(fd)
+                chunk.clear()
+
+            for key, value in records:
+                data = _encode(next_offset, key, value)
+                if position and position + len(data) > self.segment_bytes:
+                    write()
+                    base, position = next_offset, 0
+                chunk += data
+                position += len(data)
+                offsets.append(next_offset)
+                next_offset += 1
+            write()
+            self._tail = (base, position, next_offset)
+        return offsets
+
+    def end_offset(self):
+        """Return the offset the next record will get."""
+        with self._lock, self._writer():
+            self._tail = self._recover_tail()
+            return self._tail[2]
+
+    # Reading.
+
+    def read(self, offset, limit=1000, position=None):
+        """Return up to `limit` records from `offset` on, and the position
+        to pass to read on from the last of them.
+
+        Records before the oldest segment are gone, so reading starts
+        there instead. `position` is what an earlier call returned.
+        """
+        bases = self.segments()
+        if not bases:
+            return [], None
+        index = max(0, bisect.bisect_right(bases, offset) - 1)
+        records = []
+        while index < len(bases) and len(records) < limit:
+            base = bases[index]
+            mapped = self._map(base)
+            if mapped is None:
+                index += 1
+                continue
+            start = 0
+            if (position is not None and position[0] == base
+                    and position[1] == mapped.inode
+                    and position[2] == offset):
+                start = position[3]
+            found = len(records)
+            for _, end, record in _scan(mapped.buffer, start, mapped.size):
+                if record.offset >= offset:
+                    records.append(record)
+                    if len(records) == limit:
+                        break
+            if len(records) > found:
+                offset = records[-1].offset + 1
+                position = (base, mapped.inode, offset, end)
+            index += 1
+        return records, position
+
+    # Maintenance.
+
+    def retain(self, max_age=None, max_bytes=None):
+        """Delete closed segments last written over `max_age` seconds ago
+        or beyond `max_bytes` in total, oldest first.
+
+        Returns the number of segments deleted.
+        """
+        with self._lock, self._writer():
+            bases = self.segments()
+            sizes = {}
+            for base in bases:
+                stat = os.stat(_segment_path(self.path, base))
+                sizes[base] = (stat.st_size, stat.st_mtime)
+            total = sum(size for size, _ in sizes.values())
+            cutoff = None if max_age is None else time.time() - max_age
+            deleted = 0
+            for base in bases[:-1]:
+                size, mtime = sizes[base]
+                expired = cutoff is not None and mtime < cutoff
+                oversized = max_bytes is not None and total > max_bytes
+                if not (expired or oversized):
+                    break
+                os.unlink(_segment_path(self.path, base))
+                self._maps.pop(base, None)
+                total -= size
+                deleted += 1
+            return deleted
+
+    def compact(self):
+        """Drop records of closed segments that a later record with the
+        same key supersedes. Records without a key are kept.
+
+        Returns the number of bytes reclaimed.
+        """
+        with self._lock, self._writer():
+            bases = self.segments()
+            latest = {}
+            for base in bases:
+                for _, _, record in self._records(base):
+                    if record.key:
+                        latest[record.key] = record.offset
+            reclaimed = 0
+            for base in bases[:-1]:
+                path = _segment_path(self.path, base)
+                kept = bytearray()
+                size = os.path.getsize(path)
+                for _, _, record in self._records(base):
+                    if record.key and latest[record.key] != record.offset:
+                        continue
+                    kept += _encode(record.offset, record.key, record.value)
+                if len(kept) == size:
+                    continue
+                # Readers keep the file they mapped until they remap.
+                fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as fh:
+                        fh.write(kept)
+                        # mkstemp creates files only the owner can read.
+                        os.fchmod(fh.fileno(), 0o644)
+                        if self.fsync:
+                            fh.flush()
+                            os.fsync(fh.fileno())
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+                reclaimed += size - len(kept)
+            return reclaimed
+
+    def _records(self, base):
+        mapped = self._map(base)
+        if mapped is None:
+            return iter(())
+        return _scan(mapped.buffer, 0, mapped.size)
+
+    def consumer(self, name):
+        return Consumer(self, name)
+
+
+class _Writer:
+    """Serialize writers across processes with a lock file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._lock = open(self.path, 'w')
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._lock, fcntl.LOCK_UN)
+        self._lock.close()
+
+
+class Consumer:
+    """A named reader of a log committing the offset it reached."""
+
+    def __init__(self, log, name):
+        self.log = log
+        self.name = name
+        self._path = os.path.join(log.path, 'offsets', name)
+        self._position = None
+
+    @property
+    def committed(self):
+        """Return the offset of the next record to handle."""
+        try:
+            with open(self._path, 'rb') as fh:
+                return OFFSET.unpack(fh.read(OFFSET.size))[0]
+        except FileNotFoundError:
+            return 0
+
+    def commit(self, offset):
+        """Record that every record before `offset` was handled."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self._path),
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(OFFSET.pack(offset))
+                os.fchmod(fh.fileno(), 0o644)
+                if self.log.fsync:
+                    fh.flush()
+                    os.fsync(fh.fileno())
+            os.replace(tmp_path, self._path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def seek(self, offset):
+        """Replay the log from `offset` on."""
+        self.commit(offset)
+        self._position = None
+
+    def poll(self, limit=1000):
+        """Return up to `limit` records from the committed offset on."""
+        records, self._position = self.log.read(
+            self.committed, limit, self._position)
+        return records
+
+    def consume(self, handler, limit=1000):
+        """Hand the next records to `handler` and commit them once it
+        returns. Returns the number of records handled."""
+        records = self.poll(limit)
+        if records:
+            handler(records)
+            self.commit(records[-1].offset + 1)
+        return len(records)
+
+
+def _dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':')).encode()
+
+
+def _loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_event(event):
+    """Return the `(key, value)` record of an event; the key is its row."""
+    return (f'{event.model}:{event.pk}'.encode(),
+            _dumps(event._asdict()))
+
+
+def decode_event(record):
+    """Return the event stored in `record`."""
+    return events.Event(**_loads(record.value))
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_log():
+    """Return the log at the configured path."""
+    global _log
+    with _log_lock:
+        if _log is None or _log.path != str(_config('PATH')):
+            _log = EventLog(_config('PATH'))
+        return _log
+
+
+def append_events(batch):
+    """Event subscriber appending events to the log."""
+    get_log().append([encode_event(event) for event in batch])
+
+
+def connect():
+    """Subscribe the log to every event, if enabled."""
+    if _config('ENABLED'):
+        events.subscribe('eventlog', ['#'], append_events)
@@ -0,0 +1,330 @@
+"""
+In-process event bus for model changes.
+
+Saves and deletes of the models in MODEL_FIELDS publish an `Event` once
+their transaction commits, on the topic `<model>/<action>` such as
+`recipe/created`, or `home/<home id>/<model>/<action>` for rows of a
+home, such as `home/42/inventory/deleted`. Subscribers name MQTT-style
+patterns (`home/+/inventory/+`, `home/42/#`), matched through a
+`core.topics.TopicTrie`. Events carry the values of a few fields at the
+time of the change, and updates of the models in SNAPSHOT_MODELS also
+the values they replaced, so subscribers never have to read the row
+back.
+
+Subscribers do the side-effect work of a change: bumping response cache
+generations, adjusting aggregates, reindexing. Each one has a bounded
+queue drained by its own worker thread, which hands the subscriber up
+to `EVENTS['BATCH_SIZE']` events at a time, so a request only pays for
+putting events on queues. A subscriber whose queue is full is run by the
+publishing thread instead, which slows writers down rather than losing
+events. With `EVENTS['ASYNC']` off, as under test, subscribers run
+inline when the event is published.
+
+Some subscribers always run inline. `inline` ones must finish before the
+response goes out, like response cache invalidation, so a client never
+reads a stale response after its own write. `database` ones query the
+database, and on SQLite, which takes one writer at a time (and whose
+test databases lock whole tables), they run inline rather than compete
+with requests for the lock.
+
+Events still queued when the process exits are handled by an atexit
+hook; events of a process that is killed are lost, and the management
+commands rebuilding each aggregate repair what they would have done.
+"""
+import atexit
+import itertools
+import logging
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+
+from django.conf import settings
+from django.db import (
+    DEFAULT_DB_ALIAS,
+    close_old_connections,
+    connections,
+    transaction,
+)
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from core.models import FavHomeRecipe, Inventory, Recipe
+from core.topics import TopicTrie, split_pattern
+
+logger = logging.getLogger(__name__)
+
+# Fields whose values the events of each model carry.
+MODEL_FIELDS = {
+    Recipe: ('user_id',),
+    Inventory: ('home_id', 'ingredient_id'),
+    FavHomeRecipe: ('home_id', 'recipe_id', 'rating'),
+}
+# Models whose update events also carry the values before the update.
+SNAPSHOT_MODELS = (FavHomeRecipe,)
+
+
+class Event(namedtuple('Event', 'model action pk data previous')):
+    """A committed change of one row.
+
+    `model` is the model name, `action` one of `created`, `updated` or
+    `deleted`, and `data` maps the model's MODEL_FIELDS to their values.
+    `previous` holds the values replaced by an update, if snapshotted.
+    """
+    __slots__ = ()
+
+    @property
+    def topic(self):
+        home_id = self.data.get('home_id')
+        if home_id is None:
+            return f'{self.model}/{self.action}'
+        return f'home/{home_id}/{self.model}/{self.action}'
+
+
+def _config(name):
+    return settings.EVENTS[name]
+
+
+# Subscriber ids; never reused, unlike a count of live subscribers.
+_ids = itertools.count(1)
+
+
+class Subscriber:
+    """A handler of batches of events with its own queue and worker."""
+
+    def __init__(self, name, patterns, handler, queue_size, batch_size,
+                 inline=False):
+        self.id = next(_ids)
+        self.name = name
+        self.patterns = tuple(patterns)
+        self.handler = handler
+        self.inline = inline
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.counters = defaultdict(int)
+        # A deque under one lock, like queue.Queue, except that the
+        # worker takes a whole batch per acquisition.
+        self._queue = deque()
+        self._unfinished = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._all_done = threading.Condition(self._lock)
+        self._worker = None
+
+    def put(self, event):
+        """Queue `event`, or handle it at once if the queue is full."""
+        with self._lock:
+            queued = len(self._queue) < self.queue_size
+            if queued:
+                self._queue.append(event)
+                self._unfinished += 1
+                self._not_empty.notify()
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name=f'events-{self.name}',
+                    daemon=True)
+                self._worker.start()
+        if not queued:
+            self.counters['overflowed'] += 1
+            self.handle([event])
+
+    def handle(self, events):
+        """Run the handler, logging rather than raising its errors."""
+        try:
+            self.handler(events)
+        except Exception:
+            self.counters['failed'] += len(events)
+            logger.exception('Subscriber %s failed on %d events',
+                             self.name, len(events))
+        else:
+            self.counters['handled'] += len(events)
+
+    def queued(self):
+        return len(self._queue)
+
+    def join(self, timeout=None):
+        """Wait until every queued event is handled.
+
+        Returns False if `timeout` seconds pass first.
+        """
+        with self._lock:
+            return self._all_done.wait_for(
+                lambda: not self._unfinished, timeout)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._queue)
+                pending = self._queue
+                events = [pending.popleft() for _ in
+                          range(min(len(pending), self.batch_size))]
+            # Drop connections the database closed while the worker idled.
+            close_old_connections()
+            self.handle(events)
+            with self._lock:
+                self._unfinished -= len(events)
+                if not self._unfinished:
+                    self._all_done.notify_all()
+
+
+class EventBus:
+    """Routes published events to the subscribers matching their topic."""
+
+    def __init__(self, asynchronous=None, queue_size=None, batch_size=None):
+        self._asynchronous = asynchronous
+        self._queue_size = queue_size
+        self._batch_size = batch_size
+        self._subscribers = {}
+        self._topics = TopicTrie()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @property
+    def asynchronous(self):
+        if self._asynchronous is None:
+            return _config('ASYNC')
+        return self._asynchronous
+
+    def subscribe(self, name, patterns, handler, inline=False,
+                  database=False):
+        """Call `handler` with lists of the events published on topics
+        matching `patterns`, replacing any subscriber of the same name.
+
+        `inline` handlers always run on the publishing thread, as do
+        `database` handlers when the database is SQLite. Raises ValueError
+        on an invalid pattern.
+        """
+        if database and connections[DEFAULT_DB_ALIAS].vendor == 'sqlite':
+            inline = True
+        subscriber = Subscriber(
+            name, patterns, handler,
+            self._queue_size or _config('QUEUE_SIZE'),
+            self._batch_size or _config('BATCH_SIZE'), inline)
+        for pattern in subscriber.patterns:
+            split_pattern(pattern)
+        with self._lock:
+            self._remove(name)
+            for pattern in subscriber.patterns:
+                self._topics.add(pattern, subscriber)
+            self._subscribers[name] = subscriber
+        return subscriber
+
+    def unsubscribe(self, name):
+        with self._lock:
+            self._remove(name)
+
+    def _remove(self, name):
+        subscriber = self._subscribers.pop(name, None)
+        if subscriber is not None:
+            for pattern in subscriber.patterns:
+                self._topics.remove(pattern, subscriber)
+
+    def subscribers(self, topic):
+        """Return the subscribers matching `topic`, each once."""
+        matched = self._topics.match(topic)
+        if len(matched) < 2:
+            return matched
+        return list({subscriber.id: subscriber
+                     for subscriber in matched}.values())
+
+    def publish(self, event):
+        """Hand `event` to the subscribers matching its topic."""
+        self.published += 1
+        asynchronous = self.asynchronous
+        for subscriber in self.subscribers(event.topic):
+            if asynchronous and not subscriber.inline:
+                subscriber.put(event)
+            else:
+                subscriber.handle([event])
+
+    def drain(self, timeout=None):
+        """Wait until every queued event is handled.
+
+        Returns False if `timeout` seconds pass first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for subscriber in subscribers:
+            remaining = (None if deadline is None
+                         else max(0, deadline - time.monotonic()))
+            if not subscriber.join(remaining):
+                return False
+        return True
+
+    def stats(self):
+        """Return counters and queue depth of every subscriber."""
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        return {
+            'published': self.published,
+            'subscribers': {
+                subscriber.name: dict(subscriber.counters,
+                                      queued=subscriber.queued())
+                for subscriber in subscribers
+            },
+        }
+
+
+bus = EventBus()
+
+
+def subscribe(name, patterns, handler, inline=False, database=False):
+    """Subscribe `handler` to `patterns` on the default bus."""
+    return bus.subscribe(name, patterns, handler, inline, database)
+
+
+def publish(event):
+    """Publish `event` on the default bus."""
+    bus.publish(event)
+
+
+def _values(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+def snapshot_instance(sender, instance, **kwargs):
+    """Signal receiver noting the values an update replaces."""
+    instance._event_previous = None
+    if instance.pk:
+        fields = MODEL_FIELDS[sender]
+        instance._event_previous = (sender._default_manager
+                                    .filter(pk=instance.pk)
+                                    .values(*fields).first())
+
+
+def publish_instance(sender, instance, created=None, using=None, **kwargs):
+    """Signal receiver publishing a saved or deleted row once committed."""
+    if created is None:
+        action, previous = 'deleted', None
+    else:
+        action = 'created' if created else 'updated'
+        previous = None if created else getattr(
+            instance, '_event_previous', None)
+    event = Event(sender._meta.model_name, action, instance.pk,
+                  _values(instance, MODEL_FIELDS[sender]), previous)
+    transaction.on_commit(lambda: publish(event), using=using)
+
+
+def connect_signals():
+    for model in MODEL_FIELDS:
+        post_save.connect(
+            publish_instance,
+            sender=model,
+            dispatch_uid=f'events_save_{model.__name__}',
+        )
+        post_delete.connect(
+            publish_instance,
+            sender=model,
+            dispatch_uid=f'events_delete_{model.__name__}',
+        )
+    for model in SNAPSHOT_MODELS:
+        pre_save.connect(
+            snapshot_instance,
+            sender=model,
+            dispatch_uid=f'events_snapshot_{model.__name__}',
+        )
+
+
+@atexit.register
+def _drain_at_exit():
+    if bus.asynchronous:
+        bus.drain(timeout=10)
@@ -0,0 +1,171 @@
+"""
+Streaming bulk export.
+
+Recipes, their ingredient lines, inventory and favourites are exported
+as NDJSON or CSV without holding them in memory: rows are read with
+`iterator(chunk_size=CHUNK_ROWS)`, which uses a server-side cursor on
+PostgreSQL, encoded as they arrive and handed out in chunks of about
+`CHUNK_BYTES`. Exports can be gzipped on the fly into a `.gz` file.
+
+`ExportView` streams one dataset of the requesting user (recipes and
+their lines) or of the user's home (inventory and favourites); the
+`export_data` command writes any of them, for one user, one home or
+the whole database, to a file.
+"""
+import csv
+from collections import namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core import compression
+from core.models import FavHomeRecipe, Inventory, Recipe, RecipeIngredient
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Rows fetched per round trip from the cursor.
+CHUNK_ROWS = 2000
+# Encoded bytes collected before a chunk is handed out.
+CHUNK_BYTES = 64 * 1024
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+Dataset = namedtuple('Dataset', 'model scope columns')
+
+# scope is the lookup from a row to the user or home it belongs to.
+DATASETS = {
+    'recipes': Dataset(
+        model=Recipe,
+        scope={'user': 'user'},
+        columns=[
+            ('id', 'id'),
+            ('title', 'title'),
+            ('description', 'description'),
+            ('time_minutes', 'time_minutes'),
+            ('link', 'link'),
+            ('fav_count', 'fav_count'),
+            ('rating_sum', 'rating_sum'),
+            ('rating_count', 'rating_count'),
+        ],
+    ),
+    'recipe-ingredients': Dataset(
+        model=RecipeIngredient,
+        scope={'user': 'recipe__user'},
+        columns=[
+            ('id', 'id'),
+            ('recipe', 'recipe_id'),
+            ('recipe_title', 'recipe__title'),
+            ('ingredient', 'ingredient_id'),
+            ('ingredient_name', 'ingredient__name'),
+            ('amount', 'amount'),
+            ('amount_unit', 'amount_unit'),
+            ('mandatory', 'mandatory'),
+        ],
+    ),
+    'inventory': Dataset(
+        model=Inventory,
+        scope={'home': 'home'},
+        columns=[
+            ('id', 'id'),
+            ('ingredient', 'ingredient_id'),
+            ('ingredient_name', 'ingredient__name'),
+            ('amount', 'amount'),
+            ('amount_unit', 'amount_unit'),
+        ],
+    ),
+    'favourites': Dataset(
+        model=FavHomeRecipe,
+        scope={'home': 'home'},
+        columns=[
+            ('id', 'id'),
+            ('recipe', 'recipe_id'),
+            ('recipe_title', 'recipe__title'),
+            ('last_cooked', 'last_cooked'),
+            ('rating', 'rating'),
+        ],
+    ),
+}
+
+
+def rows(name, user=None, home=None, using=None):
+    """Yield the value tuples of dataset `name`, optionally scoped.
+
+    Rows of a dataset scoped to users are filtered by `user`, rows of
+    one scoped to homes by `home`; None exports every row.
+    """
+    dataset = DATASETS[name]
+    queryset = dataset.model.objects.all()
+    if using is not None:
+        queryset = queryset.using(using)
+    owners = {'user': user, 'home': home}
+    for scope, lookup in dataset.scope.items():
+        if owners[scope] is not None:
+            queryset = queryset.filter(**{lookup: owners[scope]})
+    paths = [path for _, path in dataset.columns]
+    return (queryset.order_by('id').values_list(*paths)
+            .iterator(chunk_size=CHUNK_ROWS))
+
+
+def _buffered(pieces):
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def encode_ndjson(headers, values):
+    """Yield one JSON object per line for each row of `values`."""
+    if orjson is not None:
+        option = orjson.OPT_APPEND_NEWLINE
+        for row in values:
+            yield orjson.dumps(dict(zip(headers, row)), option=option)
+        return
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in values:
+        yield (encoder.encode(dict(zip(headers, row))) + '\n').encode()
+
+
+class _Line:
+    """File-like object handing back what csv.writer writes."""
+
+    def write(self, value):
+        return value
+
+
+def encode_csv(headers, values):
+    """Yield a header line, then one CSV line for each row of `values`."""
+    writer = csv.writer(_Line())
+    yield writer.writerow(headers).encode()
+    for row in values:
+        yield writer.writerow(row).encode()
+
+
+ENCODERS = {'ndjson': encode_ndjson, 'csv': encode_csv}
+
+
+def stream(name, output='ndjson', gzip=False, **scope):
+    """Yield dataset `name` encoded as `output`, in chunks of bytes."""
+    headers = [header for header, _ in DATASETS[name].columns]
+    chunks = _buffered(ENCODERS[output](headers, rows(name, **scope)))
+    if gzip:
+        chunks = compression.compress_stream(chunks, 'gzip')
+    return chunks
+
+
+def filename(name, output, gzip=False):
+    """Return the file name an export is offered as."""
+    return f'{name}.{output}' + ('.gz' if gzip else '')
+
+
+def content_type(output, gzip=False):
+    """Return the Content-Type of an export."""
+    return 'application/gzip' if gzip else FORMATS[output]
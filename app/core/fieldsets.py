@@ -0,0 +1,120 @@
+"""
+Sparse fieldsets.
+
+Read requests may pass `?fields=id,title` to receive only those fields,
+or `?omit=description` to drop some. Serializers using
+`SparseFieldsMixin` trim their output, and views using
+`SparseQuerysetMixin` narrow the queryset to match: only the columns
+the selected fields read are loaded, and related rows are joined only
+when a selected field reads through them (`created_by` reads
+`user.name`, so `user` is joined only when `created_by` is selected).
+
+Foreign key columns are always loaded, since permissions compare them
+and they cost next to nothing. Fields whose source is not a model
+field, like properties, declare what they read in
+`Meta.sparse_sources`; a field that reads something unknown disables
+narrowing for its serializer rather than risk a query per row.
+"""
+import functools
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return {name.strip() for name in (value or '').split(',')
+            if name.strip()}
+
+
+def requested_fields(request, available):
+    """Return the field names a request selects, or None for all of them.
+
+    Only read requests are trimmed; writes need every field to validate.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    fields = _split(request.query_params.get('fields'))
+    omit = _split(request.query_params.get('omit'))
+    if not fields and not omit:
+        return None
+    unknown = (fields | omit) - set(available)
+    if unknown:
+        raise ValidationError({
+            'fields': [f'Unknown field: {name}.' for name in sorted(unknown)],
+        })
+    return (fields or set(available)) - omit
+
+
+class SparseFieldsMixin:
+    """Serializer mixin keeping only the fields a request selects."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        names = requested_fields(self.context.get('request'), self.fields)
+        if names is not None:
+            for name in list(self.fields):
+                if name not in names:
+                    self.fields.pop(name)
+
+
+@functools.lru_cache(maxsize=None)
+def field_paths(serializer_class):
+    """Return {field name: ORM paths it reads, or None if unknown}."""
+    model = serializer_class.Meta.model
+    declared = getattr(serializer_class.Meta, 'sparse_sources', {})
+    paths = {}
+    for name, field in serializer_class().fields.items():
+        if name in declared:
+            paths[name] = list(declared[name])
+            continue
+        path = '__'.join(field.source_attrs)
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except (FieldDoesNotExist, IndexError):
+            path = None
+        else:
+            if not model_field.concrete or model_field.many_to_many:
+                path = None
+        paths[name] = None if path is None else [path]
+    return paths
+
+
+def narrow(queryset, serializer_class, names=None):
+    """Limit `queryset` to what `names` of `serializer_class` read.
+
+    Returns the queryset unchanged if a selected field reads anything
+    that is not a model field.
+    """
+    paths = field_paths(serializer_class)
+    meta = queryset.model._meta
+    columns = {meta.pk.name}
+    columns.update(field.name for field in meta.concrete_fields
+                   if field.is_relation)
+    related = set()
+    for name in paths if names is None else names:
+        if paths[name] is None:
+            return queryset
+        for path in paths[name]:
+            parts = path.split('__')
+            columns.update('__'.join(parts[:i])
+                           for i in range(1, len(parts) + 1))
+            if len(parts) > 1:
+                related.add('__'.join(parts[:-1]))
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+class SparseQuerysetMixin:
+    """View mixin narrowing read querysets to the selected fields."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if (self.request.method not in SAFE_METHODS
+                or not issubclass(serializer_class, SparseFieldsMixin)):
+            return queryset
+        names = requested_fields(
+            self.request, field_paths(serializer_class))
+        return narrow(queryset, serializer_class, names)
@@ -0,0 +1,538 @@
+"""
+Bulk import of recipe catalogs.
+
+Catalog files are read in chunks of `chunk_size` recipes:
+
+- NDJSON: one recipe per line, with the fields of `RecipeSerializer` and
+  an `ingredients` list of {name, amount, amount_unit, mandatory}.
+  Lines holding schema.org objects are read as JSON-LD.
+- JSON-LD: schema.org `Recipe` objects, alone, in a list, in an
+  `@graph` or one per line. `recipeIngredient` strings like
+  "200 g flour, sifted" are split into amount, unit and name.
+- CSV: one row per ingredient line with the columns `recipe` (a key
+  shared by the rows of one recipe), `title`, `description`,
+  `time_minutes`, `link`, `ingredient`, `amount`, `amount_unit` and
+  `mandatory`.
+
+Chunks are parsed in worker processes and loaded one after another,
+each in its own transaction. Ingredient names are resolved to ids for
+the whole chunk at once, creating the missing ones. On PostgreSQL the
+chunk is copied into temporary staging tables with COPY and merged with
+INSERT ... SELECT, recipe ids coming straight from the sequence; other
+databases get batched inserts.
+
+Every loaded chunk is recorded in `ImportedChunk` in the same
+transaction, keyed by the SHA-256 of the file, so importing a file
+again resumes after the last loaded chunk instead of duplicating it.
+
+Loaded rows bypass model signals, so `index_imported` has to be run once
+the files are in to update the co-occurrence and duplicate indexes.
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections, transaction
+from django.db.models import Max
+
+from core import cache, dietary, nutrition, units
+from core.models import ImportedChunk, Ingredient, Recipe, RecipeIngredient
+from core.bulk import copy_rows, insert_rows, reset_sequences
+from recipe import cooccurrence, duplicates
+
+# Recipes per chunk, one transaction each.
+CHUNK_RECIPES = 2000
+# Names per query when resolving ingredients without staging tables.
+LOOKUP_BATCH = 500
+FORMATS = ('ndjson', 'jsonld', 'csv')
+EXTENSIONS = {
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.json': 'jsonld',
+    '.jsonld': 'jsonld',
+    '.csv': 'csv',
+}
+TRUE = ('1', 'true', 'yes', 'y', 't')
+
+_duration = re.compile(
+    r'^P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?'
+    r'(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$', re.IGNORECASE)
+_amount = re.compile(
+    r'^(?P<amount>\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?)\s*(?P<rest>.*)$')
+_fractions = {'½': ' 1/2', '⅓': ' 1/3', '⅔': ' 2/3', '¼': ' 1/4',
+              '¾': ' 3/4'}
+
+
+class ImportResult:
+    """Counts of one import."""
+
+    def __init__(self, source, chunk_size):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.chunks = 0
+        self.skipped_chunks = 0
+        self.recipes = 0
+        self.lines = 0
+        self.errors = 0
+        self.error_samples = []
+        self.seconds = 0.0
+
+    @property
+    def rows(self):
+        return self.recipes + self.lines
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'source': self.source,
+            'chunk_size': self.chunk_size,
+            'chunks': self.chunks,
+            'skipped_chunks': self.skipped_chunks,
+            'recipes': self.recipes,
+            'lines': self.lines,
+            'errors': self.errors,
+            'error_samples': self.error_samples,
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def detect_format(path):
+    """Return the format of a catalog file from its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        return EXTENSIONS[extension]
+    except KeyError:
+        raise ValueError(f'Cannot tell the format of {path}; pass it.')
+
+
+def file_digest(path):
+    """Return the SHA-256 of a file, identifying it across runs."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _text(value, limit=None):
+    text = ' '.join(str(value or '').split())
+    return text[:limit] if limit else text
+
+
+def _number(text):
+    text = text.replace(',', '.')
+    whole, _, fraction = text.rpartition(' ')
+    if '/' in fraction:
+        numerator, denominator = fraction.split('/')
+        return float(whole or 0) + int(numerator) / int(denominator)
+    return float(text)
+
+
+def _amount_of(value):
+    """Return a stored amount; positive amounts never round to 0."""
+    amount = float(value or 0)
+    return max(1, round(amount)) if amount > 0 else 0
+
+
+def parse_duration(value):
+    """Return whole minutes of an ISO 8601 duration or a number."""
+    if value in (None, ''):
+        return 0
+    if isinstance(value, (int, float)):
+        return int(value)
+    if str(value).strip().isdigit():
+        return int(value)
+    match = _duration.match(str(value).strip())
+    if not match:
+        raise ValueError(f'Invalid duration {value!r}.')
+    parts = {key: float(part or 0) for key, part in match.groupdict().items()}
+    return round(parts['days'] * 1440 + parts['hours'] * 60
+                 + parts['minutes'] + parts['seconds'] / 60)
+
+
+def parse_ingredient_line(text):
+    """Split "200 g flour, sifted" into (name, amount, unit, mandatory)."""
+    for fraction, replacement in _fractions.items():
+        text = text.replace(fraction, replacement)
+    text = _text(text)
+    amount, unit, rest = None, '', text
+    match = _amount.match(text)
+    if match:
+        amount, rest = _number(match['amount']), match['rest']
+        word, _, tail = rest.partition(' ')
+        if tail and word.lower().rstrip('.') in units.UNITS:
+            unit, rest = word.lower().rstrip('.'), tail
+    if rest.lower().startswith('of '):
+        rest = rest[3:]
+    name = rest.split(',')[0].strip().lower()
+    if not name:
+        raise ValueError(f'No ingredient in {text!r}.')
+    return name[:255], _amount_of(amount), unit, amount is not None
+
+
+def _recipe(title, description, time_minutes, link, lines):
+    title = _text(title, 255)
+    if not title:
+        raise ValueError('Recipe without a title.')
+    return (title, str(description or ''), parse_duration(time_minutes),
+            _text(link, 255), lines)
+
+
+def _jsonld_recipes(node):
+    if isinstance(node, list):
+        for item in node:
+            yield from _jsonld_recipes(item)
+    elif isinstance(node, dict):
+        types = node.get('@type')
+        if 'Recipe' in (types if isinstance(types, list) else [types]):
+            yield node
+        elif '@graph' in node:
+            yield from _jsonld_recipes(node['@graph'])
+
+
+def parse_jsonld(node):
+    """Return the recipes of a JSON-LD document."""
+    recipes = []
+    for item in _jsonld_recipes(node):
+        time_minutes = item.get('totalTime')
+        if not time_minutes:
+            time_minutes = (parse_duration(item.get('prepTime'))
+                            + parse_duration(item.get('cookTime')))
+        link = item.get('url') or ''
+        ingredients = item.get('recipeIngredient') or []
+        if isinstance(ingredients, str):
+            ingredients = [ingredients]
+        recipes.append(_recipe(
+            item.get('name'), item.get('description'), time_minutes, link,
+            [parse_ingredient_line(line) for line in ingredients]))
+    return recipes
+
+
+def _line(value):
+    if isinstance(value, str):
+        return parse_ingredient_line(value)
+    name = _text(value.get('name'), 255)
+    if not name:
+        raise ValueError('Ingredient without a name.')
+    mandatory = value.get('mandatory', True)
+    if isinstance(mandatory, str):
+        mandatory = mandatory.lower() in TRUE
+    return (name, _amount_of(value.get('amount')),
+            _text(value.get('amount_unit', value.get('unit')), 100),
+            bool(mandatory))
+
+
+def parse_ndjson(line):
+    """Return the recipes of one NDJSON line."""
+    item = json.loads(line)
+    if '@type' in item or '@graph' in item:
+        return parse_jsonld(item)
+    return [_recipe(
+        item.get('title'), item.get('description'),
+        item.get('time_minutes'), item.get('link'),
+        [_line(value) for value in item.get('ingredients') or []])]
+
+
+def parse_csv(rows):
+    """Return the recipe of the CSV rows sharing one `recipe` key."""
+    first = rows[0]
+    lines = [_line({'name': row['ingredient'], 'amount': row.get('amount'),
+                    'amount_unit': row.get('amount_unit'),
+                    'mandatory': row.get('mandatory') or 'true'})
+             for row in rows if row.get('ingredient')]
+    return [_recipe(first.get('title'), first.get('description'),
+                    first.get('time_minutes'), first.get('link'), lines)]
+
+
+def parse_record(fmt, record):
+    """Return the recipes of one record read from a `fmt` file."""
+    if fmt == 'csv':
+        return parse_csv(record)
+    if isinstance(record, str):
+        return parse_ndjson(record)
+    return parse_jsonld(record)
+
+
+def parse_chunk(fmt, records):
+    """Return (recipes, errors) for records; bad records are skipped."""
+    recipes, errors = [], []
+    for record in records:
+        try:
+            recipes.extend(parse_record(fmt, record))
+        except (ValueError, TypeError, KeyError, AttributeError,
+                ZeroDivisionError) as error:
+            errors.append(str(error))
+    return recipes, errors
+
+
+def read_records(path, fmt):
+    """Yield the raw records of a catalog file."""
+    if fmt == 'csv':
+        with open(path, newline='', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            key_field = 'recipe' if 'recipe' in (
+                reader.fieldnames or []) else 'title'
+            group, key = [], None
+            for row in reader:
+                if group and row.get(key_field) != key:
+                    yield group
+                    group = []
+                key = row.get(key_field)
+                group.append(row)
+            if group:
+                yield group
+        return
+    with open(path, encoding='utf-8') as file:
+        if fmt == 'jsonld':
+            # A first line holding a whole document means one document
+            # per line, streamed like NDJSON; otherwise the file is one
+            # document and has to be read whole.
+            try:
+                json.loads(file.readline())
+            except json.JSONDecodeError:
+                file.seek(0)
+                yield from _jsonld_recipes(json.load(file))
+                return
+            file.seek(0)
+        for line in file:
+            if line.strip():
+                yield line
+
+
+def read_chunks(path, fmt, chunk_size):
+    """Yield (index, records) for chunks of `chunk_size` records."""
+    chunk = []
+    index = 0
+    for record in read_records(path, fmt):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield index, chunk
+            index += 1
+            chunk = []
+    if chunk:
+        yield index, chunk
+
+
+def _parse_task(args):
+    index, fmt, records = args
+    return (index, *parse_chunk(fmt, records))
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def parse_chunks(fmt, chunks, workers=1):
+    """Yield (index, recipes, errors) in order, parsing in processes.
+
+    At most two chunks per worker are read ahead, bounding memory.
+    """
+    tasks = ((index, fmt, records) for index, records in chunks)
+    if workers <= 1:
+        yield from map(_parse_task, tasks)
+        return
+    # Children must not share the parent's open connections.
+    connections.close_all()
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_parse_task, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _stage(cursor, table, columns):
+    cursor.execute(f'CREATE TEMPORARY TABLE {table} ({columns}) '
+                   f'ON COMMIT DROP')
+
+
+def _resolve_copy(connection, names, user_id):
+    ingredient = Ingredient._meta.db_table
+    with connection.cursor() as cursor:
+        _stage(cursor, 'import_names', 'name varchar(255) NOT NULL')
+    copy_rows(connection, 'import_names', ['name'],
+              [(name,) for name in names], ['name'])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {ingredient} (name, user_id, dietary_flags) '
+            f'SELECT DISTINCT name, %s, %s FROM import_names '
+            f'ON CONFLICT (name) DO NOTHING',
+            [user_id, dietary.UNCLASSIFIED])
+        cursor.execute(
+            f'SELECT i.id, i.name FROM {ingredient} i '
+            f'JOIN import_names n ON n.name = i.name')
+        return {name: pk for pk, name in cursor.fetchall()}
+
+
+def _resolve_orm(using, names, user_id):
+    names = list(names)
+    ids = {}
+
+    def lookup(batch):
+        ids.update((name, pk) for pk, name in Ingredient.objects.using(
+            using).filter(name__in=batch).values_list('id', 'name'))
+
+    for start in range(0, len(names), LOOKUP_BATCH):
+        lookup(names[start:start + LOOKUP_BATCH])
+    missing = [name for name in names if name not in ids]
+    Ingredient.objects.using(using).bulk_create(
+        [Ingredient(name=name, user_id=user_id) for name in missing],
+        batch_size=LOOKUP_BATCH, ignore_conflicts=True)
+    for start in range(0, len(missing), LOOKUP_BATCH):
+        lookup(missing[start:start + LOOKUP_BATCH])
+    return ids
+
+
+def _recipe_ids(connection, count, using):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)',
+                [Recipe._meta.db_table, 'id', count])
+            return [pk for pk, in cursor.fetchall()]
+    # Writers are serialized by the transaction on SQLite.
+    first = (Recipe.objects.using(using).aggregate(last=Max('id'))['last']
+             or 0) + 1
+    return list(range(first, first + count))
+
+
+def load_chunk(recipes, user_id, using='default'):
+    """Write parsed recipes and their lines; returns (recipes, lines).
+
+    Must run inside a transaction.
+    """
+    connection = connections[using]
+    postgresql = connection.vendor == 'postgresql'
+    names = {line[0] for recipe in recipes for line in recipe[4]}
+    if postgresql:
+        ingredient_ids = _resolve_copy(connection, names, user_id)
+    else:
+        ingredient_ids = _resolve_orm(using, names, user_id)
+    recipe_ids = _recipe_ids(connection, len(recipes), using)
+    recipe_rows = [
+        (pk, user_id, title, description, time_minutes, link, 0, 0, 0, 0,
+         0)
+        for pk, (title, description, time_minutes, link, _) in zip(
+            recipe_ids, recipes)
+    ]
+    line_rows = {}
+    for pk, recipe in zip(recipe_ids, recipes):
+        for name, amount, unit, mandatory in recipe[4]:
+            # A recipe lists an ingredient once; the first line wins.
+            line_rows.setdefault((pk, ingredient_ids[name]),
+                                 (pk, ingredient_ids[name], amount,
+                                  mandatory, unit))
+    recipe_columns = ['id', 'user_id', 'title', 'description',
+                      'time_minutes', 'link', 'fav_count', 'rating_sum',
+                      'rating_count', 'nutrition_missing', 'dietary_flags']
+    line_columns = ['recipe_id', 'ingredient_id', 'amount', 'mandatory',
+                    'amount_unit']
+    recipe_table = Recipe._meta.db_table
+    line_table = RecipeIngredient._meta.db_table
+    if not postgresql:
+        insert_rows(connection, recipe_table, recipe_columns, recipe_rows)
+        insert_rows(connection, line_table, line_columns,
+                    list(line_rows.values()))
+        nutrition.recompute(recipe_ids, using=using)
+        dietary.recompute(recipe_ids, using=using)
+        return len(recipe_rows), len(line_rows)
+    with connection.cursor() as cursor:
+        _stage(cursor, 'import_recipes',
+               'id bigint, user_id bigint, title varchar(255), '
+               'description text, time_minutes integer, link varchar(255), '
+               'fav_count integer, rating_sum integer, rating_count integer, '
+               'nutrition_missing integer, dietary_flags integer')
+        _stage(cursor, 'import_lines',
+               'recipe_id bigint, ingredient_id bigint, amount integer, '
+               'mandatory boolean, amount_unit varchar(100)')
+    copy_rows(connection, 'import_recipes', recipe_columns, recipe_rows,
+              ['title', 'description', 'link'])
+    copy_rows(connection, 'import_lines', line_columns,
+              list(line_rows.values()), ['amount_unit'])
+    columns = ', '.join(recipe_columns)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {recipe_table} ({columns}) '
+                       f'SELECT {columns} FROM import_recipes')
+        created = cursor.rowcount
+        columns = ', '.join(line_columns)
+        cursor.execute(f'INSERT INTO {line_table} ({columns}) '
+                       f'SELECT {columns} FROM import_lines '
+                       f'ON CONFLICT DO NOTHING')
+        lines = cursor.rowcount
+    nutrition.recompute(recipe_ids, using=using)
+    dietary.recompute(recipe_ids, using=using)
+    return created, lines
+
+
+def import_file(path, user, fmt=None, chunk_size=None, workers=1,
+                using='default', progress=None):
+    """Import the catalog at `path` for `user`; returns an ImportResult.
+
+    Chunks already loaded from the same file are skipped, with the chunk
+    size of the first run so chunk boundaries stay the same.
+    `progress(result)` is called after every loaded chunk.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown format {fmt}.')
+    source = file_digest(path)
+    done = dict(ImportedChunk.objects.using(using).filter(
+        source=source).values_list('chunk', 'chunk_size'))
+    if done:
+        chunk_size = next(iter(done.values()))
+    result = ImportResult(source, chunk_size or CHUNK_RECIPES)
+    start = time.monotonic()
+
+    def pending():
+        for index, records in read_chunks(path, fmt, result.chunk_size):
+            if index in done:
+                result.skipped_chunks += 1
+            else:
+                yield index, records
+
+    try:
+        for index, recipes, errors in parse_chunks(fmt, pending(), workers):
+            with transaction.atomic(using=using):
+                created, lines = load_chunk(recipes, user.id, using)
+                ImportedChunk.objects.using(using).create(
+                    source=source, chunk_size=result.chunk_size,
+                    chunk=index, recipes=created, lines=lines)
+            result.chunks += 1
+            result.recipes += created
+            result.lines += lines
+            result.errors += len(errors)
+            result.error_samples.extend(
+                errors[:5 - len(result.error_samples)])
+            result.seconds = time.monotonic() - start
+            if progress:
+                progress(result)
+    finally:
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            reset_sequences(connection, [Recipe])
+        # The rows bypassed model signals.
+        cache.bump('recipe', 'ingredient', 'recipeingredient')
+    result.seconds = time.monotonic() - start
+    return result
+
+
+def index_imported():
+    """Update the co-occurrence and duplicate indexes with imported
+    recipes."""
+    cooccurrence.build_index()
+    cooccurrence.reset_index()
+    duplicates.build_index(missing_only=True)
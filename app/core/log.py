@@ -0,0 +1,25 @@
+"""
+Logging helpers.
+"""
+import json
+import logging
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line.
+
+    Structured values passed as `extra={'fields': {...}}` are merged into
+    the object next to the timestamp, level, logger and message.
+    """
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
@@ -0,0 +1,31 @@
+"""
+Django command to build the ingredient co-occurrence index.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipe import cooccurrence
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the co-occurrence file from scratch."""
+
+    help = 'Build the memory-mapped ingredient co-occurrence index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            help='Output file, defaults to settings.COOCCURRENCE_PATH.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        path = options['path'] or cooccurrence.index_path()
+        self.stdout.write(f'Building co-occurrence index at {path}...')
+        start = time.monotonic()
+        size, nnz = cooccurrence.build_index(path)
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {size} ingredients, {nnz} pairs in {elapsed:.2f}s.'
+        ))
@@ -0,0 +1,32 @@
+"""
+Django command to build the near-duplicate recipe index.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipe import duplicates
+
+
+class Command(BaseCommand):
+    """Django command to compute the MinHash signatures of recipes."""
+
+    help = 'Build the MinHash/LSH index used to find duplicate recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing',
+            action='store_true',
+            help='Only index recipes without signatures, e.g. after a '
+                 'bulk load.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        self.stdout.write('Building duplicate recipe index...')
+        start = time.monotonic()
+        indexed = duplicates.build_index(missing_only=options['missing'])
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} recipes in {elapsed:.2f}s.'
+        ))
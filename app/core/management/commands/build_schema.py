@@ -0,0 +1,37 @@
+"""
+Django command to build the prebuilt OpenAPI schema.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Django command to write the schema artifacts of the current code."""
+
+    help = 'Generate the OpenAPI schema artifacts served at api/schema/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild even if artifacts of this version exist.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        version = schema.fingerprint()
+        if not options['force'] and schema.is_built():
+            self.stdout.write(self.style.SUCCESS(
+                f'Schema {version} is up to date.'))
+            return
+        self.stdout.write(f'Building schema {version}...')
+        start = time.monotonic()
+        paths = schema.build()
+        elapsed = time.monotonic() - start
+        for path in paths:
+            self.stdout.write(f'  {path} ({path.stat().st_size} bytes)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Built schema in {elapsed:.2f}s.'))
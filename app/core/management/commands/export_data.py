@@ -0,0 +1,94 @@
+"""
+Django command to export recipes, ingredient lines, inventory and
+favourites as NDJSON or CSV files.
+"""
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import export
+from core.models import Home
+
+
+class Command(BaseCommand):
+    """Django command to stream datasets to files with flat memory."""
+
+    help = (
+        'Export datasets of one user, one home or the whole database as '
+        'NDJSON or CSV, optionally gzipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset',
+            action='append',
+            choices=list(export.DATASETS),
+            help='Dataset to export; repeat for several (default: all).',
+        )
+        parser.add_argument(
+            '--format',
+            choices=list(export.FORMATS),
+            default='ndjson',
+            help='File format.',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Gzip the files while writing them.',
+        )
+        parser.add_argument(
+            '--user',
+            help='Email of the user whose recipes are exported.',
+        )
+        parser.add_argument(
+            '--home',
+            type=int,
+            help='Id of the home whose inventory and favourites are '
+                 'exported.',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default='.',
+            help='Directory the files are written to.',
+        )
+
+    def scope(self, options):
+        scope = {}
+        if options['user']:
+            try:
+                scope['user'] = get_user_model().objects.get(
+                    email=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user {options["user"]}.')
+        if options['home'] is not None:
+            try:
+                scope['home'] = Home.objects.get(id=options['home'])
+            except Home.DoesNotExist:
+                raise CommandError(f'No home {options["home"]}.')
+        return scope
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        scope = self.scope(options)
+        names = options['dataset'] or list(export.DATASETS)
+        if scope:
+            # Without an owner of its kind a dataset would export all rows.
+            names = [name for name in names
+                     if set(export.DATASETS[name].scope) & set(scope)]
+        os.makedirs(options['output_dir'], exist_ok=True)
+        for name in names:
+            path = os.path.join(options['output_dir'], export.filename(
+                name, options['format'], options['gzip']))
+            start = time.monotonic()
+            size = 0
+            with open(path, 'wb') as file:
+                for chunk in export.stream(name, options['format'],
+                                           options['gzip'], **scope):
+                    file.write(chunk)
+                    size += len(chunk)
+            elapsed = time.monotonic() - start
+            self.stdout.write(self.style.SUCCESS(
+                f'Wrote {path} ({size} bytes) in {elapsed:.2f}s.'
+            ))
@@ -0,0 +1,94 @@
+"""
+Django command to bulk import recipe catalogs.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import importing
+
+
+class Command(BaseCommand):
+    """Django command to load recipes and their ingredient lines."""
+
+    help = (
+        'Import recipe catalogs from JSON-LD, NDJSON or CSV files. '
+        'Importing a file again resumes after its last loaded chunk.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Catalog files.')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Email of the user owning the imported recipes.',
+        )
+        parser.add_argument(
+            '--format',
+            choices=importing.FORMATS,
+            help='Format of the files (default: from the extension).',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Processes parsing the files.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=importing.CHUNK_RECIPES,
+            help='Recipes loaded per transaction.',
+        )
+        parser.add_argument(
+            '--skip-index',
+            action='store_true',
+            help='Do not update the co-occurrence and duplicate indexes.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--workers and --chunk-size must be positive.')
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user {options["user"]}.')
+
+        def progress(result):
+            self.stdout.write(
+                f'  {result.recipes} recipes, {result.lines} lines '
+                f'({result.rows_per_second:.0f} rows/s)')
+
+        start = time.monotonic()
+        rows = 0
+        for path in options['paths']:
+            self.stdout.write(f'Importing {path}...')
+            try:
+                result = importing.import_file(
+                    path, user, fmt=options['format'],
+                    chunk_size=options['chunk_size'],
+                    workers=options['workers'], progress=progress)
+            except (OSError, ValueError) as error:
+                raise CommandError(str(error))
+            rows += result.rows
+            if result.skipped_chunks:
+                self.stdout.write(
+                    f'  skipped {result.skipped_chunks} chunks loaded by '
+                    f'an earlier run')
+            for error in result.error_samples:
+                self.stderr.write(f'  skipped record: {error}')
+            self.stdout.write(
+                f'  {result.recipes} recipes, {result.lines} lines, '
+                f'{result.errors} bad records in {result.seconds:.2f}s '
+                f'({result.rows_per_second:.0f} rows/s)')
+        if not options['skip_index']:
+            self.stdout.write(
+                'Updating co-occurrence and duplicate indexes...')
+            importing.index_imported()
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {rows} rows in {elapsed:.2f}s '
+            f'({rows / max(elapsed, 1e-9):.0f} rows/s).'
+        ))
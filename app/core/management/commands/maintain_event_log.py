@@ -0,0 +1,40 @@
+"""
+Django command to apply retention and compaction to the event log.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.eventlog import get_log
+
+
+class Command(BaseCommand):
+    """Django command to delete and compact old event log segments."""
+
+    help = ('Delete event log segments past the retention limits and '
+            'optionally compact the rest.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compact',
+            action='store_true',
+            help='Keep only the latest record of each row in closed '
+                 'segments.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        config = settings.EVENT_LOG
+        log = get_log()
+        start = time.monotonic()
+        deleted = log.retain(max_age=config['RETENTION_HOURS'] * 3600,
+                             max_bytes=config['RETENTION_BYTES'])
+        self.stdout.write(f'Deleted {deleted} segments.')
+        if options['compact']:
+            reclaimed = log.compact()
+            self.stdout.write(f'Compaction reclaimed {reclaimed} bytes.')
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Maintained {log.path} in {elapsed:.2f}s.'
+        ))
@@ -0,0 +1,33 @@
+"""
+Django command to rebuild the recipe dietary flags.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.dietary import rebuild_dietary_flags
+
+
+class Command(BaseCommand):
+    """Django command to recompute the allergen and diet flags of recipes."""
+
+    help = ('Recompute recipe dietary flags from the flags of their '
+            'ingredients.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of recipes updated per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        self.stdout.write('Rebuilding recipe dietary flags...')
+        start = time.monotonic()
+        updated = rebuild_dietary_flags(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {updated} recipes in {elapsed:.2f}s.'
+        ))
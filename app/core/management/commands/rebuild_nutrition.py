@@ -0,0 +1,33 @@
+"""
+Django command to rebuild the recipe nutrition summaries.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.nutrition import rebuild_nutrition
+
+
+class Command(BaseCommand):
+    """Django command to recompute kcal, protein, fat and carbs."""
+
+    help = ('Recompute recipe nutrition totals from RecipeIngredient and '
+            'IngredientNutrition.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of recipes updated per transaction.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        self.stdout.write('Rebuilding recipe nutrition...')
+        start = time.monotonic()
+        updated = rebuild_nutrition(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {updated} recipes in {elapsed:.2f}s.'
+        ))
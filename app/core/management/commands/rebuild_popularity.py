@@ -0,0 +1,32 @@
+"""
+Django command to rebuild the recipe popularity aggregates.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.popularity import rebuild_popularity
+
+
+class Command(BaseCommand):
+    """Django command to recompute fav_count, rating_sum, rating_count."""
+
+    help = 'Recompute recipe popularity aggregates from FavHomeRecipe.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Number of recipes updated per statement.',
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        self.stdout.write('Rebuilding recipe popularity...')
+        start = time.monotonic()
+        updated = rebuild_popularity(batch_size=options['batch_size'])
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {updated} recipes in {elapsed:.2f}s.'
+        ))
@@ -3,25 +3,68 @@ Django command to wait for the database to be available
 """
 import time
 
-from psycopg2 import OperationalError as Psycopg2OpError
+from django.core.management.base import BaseCommand, CommandError
 
-from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from core import readiness
 
 
 class Command(BaseCommand):
     """Django command to wait for database"""
 
+    help = 'Wait until every configured database accepts queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            dest='databases',
+            help='Alias to wait for; repeat for several. Defaults to all.',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=60.0,
+            help='Seconds to keep retrying before giving up.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0.05,
+            help='First retry delay in seconds, doubled on every retry.',
+        )
+        parser.add_argument(
+            '--max-interval',
+            type=float,
+            default=2.0,
+            help='Longest delay between retries in seconds.',
+        )
+
     def handle(self, *args, **options):
         """Entry point for command."""
         self.stdout.write('Waiting for Database...')
-        db_up = False
-        while db_up is False:
-            try:
-                self.check(databases=['default'])
-                db_up = True
-            except (Psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
-
-        self.stdout.write(self.style.SUCCESS('Database available!'))
+        start = time.monotonic()
+
+        def on_retry(failing, delay):
+            aliases = ', '.join(sorted(failing))
+            self.stdout.write(
+                f'Database unavailable ({aliases}), '
+                f'retrying in {delay:.2f}s...')
+
+        try:
+            results = readiness.wait_for(
+                options['databases'],
+                timeout=options['timeout'],
+                base=options['interval'],
+                cap=options['max_interval'],
+                on_retry=on_retry,
+            )
+        except readiness.NotReady as error:
+            raise CommandError(
+                f'{error} after {time.monotonic() - start:.2f}s.')
+
+        elapsed = time.monotonic() - start
+        for alias, result in sorted(results.items()):
+            self.stdout.write(
+                f'  {alias}: probe {result.latency * 1000:.1f}ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Database available! ({elapsed:.2f}s)'))
@@ -0,0 +1,148 @@
+"""
+Middleware for the core app.
+"""
+import asyncio
+import time
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import compression, timing
+
+
+class ASGIURLConfMiddleware:
+    """Resolve requests served over ASGI with `settings.ASGI_URLCONF`."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if settings.ASGI_URLCONF:
+            request.urlconf = settings.ASGI_URLCONF
+        return await self.get_response(request)
+
+
+class RequestTimingMiddleware:
+    """Measure queries, DB, serializer, view and render time of API
+    requests, report them in a Server-Timing header and log slow ones.
+
+    Configured by `settings.REQUEST_TIMING`; when disabled the middleware
+    removes itself at start-up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = settings.REQUEST_TIMING
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = config['PATH_PREFIX']
+        self.header = config['HEADER']
+        self.slow_request = config['SLOW_REQUEST_MS'] / 1000
+        self.slow_query_ms = config['SLOW_QUERY_MS']
+        timing.install()
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # Async hooks keep Django from running them on the sync thread.
+            self.process_view = self.aprocess_view
+            self.process_template_response = self.aprocess_template_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = timing.current()
+        if timings is not None:
+            timings.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timings = timing.current()
+        if timings is not None:
+            timings.view_end = time.perf_counter()
+            response.add_post_render_callback(
+                lambda response: setattr(
+                    timings, 'render_end', time.perf_counter()))
+        return response
+
+    async def aprocess_view(self, *args):
+        return RequestTimingMiddleware.process_view(self, *args)
+
+    async def aprocess_template_response(self, *args):
+        return RequestTimingMiddleware.process_template_response(self, *args)
+
+    def finish(self, request, response):
+        end = time.perf_counter()
+        timings = timing.current()
+        metrics = timings.metrics(end)
+        if self.header:
+            response['Server-Timing'] = timings.header(metrics)
+        if metrics['total'] >= self.slow_request:
+            timing.logger.warning('slow request', extra={
+                'fields': timings.log_entry(request, response, metrics)})
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not request.path.startswith(self.prefix):
+            return self.get_response(request)
+        token = timing.start(request.path, self.slow_query_ms)
+        try:
+            response = self.get_response(request)
+            self.finish(request, response)
+            return response
+        finally:
+            timing.stop(token)
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.prefix):
+            return await self.get_response(request)
+        token = timing.start(request.path, self.slow_query_ms)
+        try:
+            response = await self.get_response(request)
+            self.finish(request, response)
+            return response
+        finally:
+            timing.stop(token)
+
+
+class CompressionMiddleware:
+    """Compress responses with gzip or brotli, see `core.compression`.
+
+    Configured by `settings.COMPRESSION`; when disabled the middleware
+    removes itself at start-up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.COMPRESSION['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def process_response(self, request, response):
+        encoding = compression.response_encoding(request, response)
+        if encoding:
+            compression.apply(response, encoding)
+        return response
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-19 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_auto_20240916_1004'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='fav_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-fav_count', '-rating_sum', '-id'], name='recipe_popularity_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_popularity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=64)),
+                ('chunk_size', models.IntegerField()),
+                ('chunk', models.IntegerField()),
+                ('recipes', models.IntegerField()),
+                ('lines', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('source', 'chunk')},
+            },
+        ),
+    ]
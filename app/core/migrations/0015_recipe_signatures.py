@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_importedchunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSignature',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='core.recipe')),
+                ('title_minhash', models.BinaryField()),
+                ('minhash', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipeBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.recipe')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipeband',
+            index=models.Index(fields=['key', 'recipe'], name='recipe_band_key_idx'),
+        ),
+    ]
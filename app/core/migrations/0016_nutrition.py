@@ -0,0 +1,60 @@
+# Generated by Django 3.2.25 on 2026-10-19 06:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_signatures'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientNutrition',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nutrition', serialize=False, to='core.ingredient')),
+                ('amount', models.FloatField(default=100)),
+                ('unit', models.CharField(default='g', max_length=100)),
+                ('kcal', models.FloatField(default=0)),
+                ('protein', models.FloatField(default=0)),
+                ('fat', models.FloatField(default=0)),
+                ('carbs', models.FloatField(default=0)),
+                ('allergens', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carbs',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='kcal',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='nutrition_missing',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='protein',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['kcal'], name='recipe_kcal_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['protein'], name='recipe_protein_idx'),
+        ),
+    ]
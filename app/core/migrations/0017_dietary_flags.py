@@ -0,0 +1,62 @@
+# Generated by Django 3.2.25 on 2026-10-19 07:26
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+UNCLASSIFIED = 1 << 30
+
+
+def move_allergens(apps, schema_editor):
+    """Keep the allergens entered with nutrition data as ingredient flags.
+
+    Ingredients stay unclassified, as nobody has said whether they hold
+    meat or alcohol, and so do recipes with lines; `rebuild_dietary_flags`
+    fills in the allergen bits of recipes.
+    """
+    Ingredient = apps.get_model('core', 'Ingredient')
+    IngredientNutrition = apps.get_model('core', 'IngredientNutrition')
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeIngredient = apps.get_model('core', 'RecipeIngredient')
+    for ingredient_id, allergens in (IngredientNutrition.objects
+                                     .exclude(allergens=0)
+                                     .values_list('ingredient_id',
+                                                  'allergens')):
+        Ingredient.objects.filter(id=ingredient_id).update(
+            dietary_flags=UNCLASSIFIED | allergens)
+    Recipe.objects.filter(Exists(RecipeIngredient.objects.filter(
+        recipe=OuterRef('pk')))).update(dietary_flags=UNCLASSIFIED)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_nutrition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='home',
+            name='avoid',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='home',
+            name='diets',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='dietary_flags',
+            field=models.PositiveIntegerField(default=1073741824),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='dietary_flags',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(move_allergens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='ingredientnutrition',
+            name='allergens',
+        ),
+    ]
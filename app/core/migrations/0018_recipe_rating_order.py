@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 08:11
+
+import core.models
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_dietary_flags'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_popularity_idx',
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(django.db.models.expressions.OrderBy(django.db.models.expressions.F('fav_count'), descending=True), django.db.models.expressions.OrderBy(core.models.RatingAverage('rating_sum', 'rating_count'), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('id'), descending=True), name='recipe_popularity_idx'),
+        ),
+    ]
@@ -2,6 +2,7 @@
 Database models.
 """
 from django.db import models
+from django.db.models import F, FloatField, Func
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -38,6 +39,10 @@ class Home(models.Model):
     """Home object."""
     name = models.CharField(max_length=255, default='Home')
     parameters = models.CharField(max_length=10)
+    # Dietary profile, see core.dietary: a bitmask of DIETS followed and
+    # one of the flags (e.g. allergens) to avoid.
+    diets = models.PositiveIntegerField(default=0)
+    avoid = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -61,6 +66,27 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class RatingAverage(Func):
+    """Average of a sum and a count of ratings, 0.0 while unrated."""
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # Literals are inlined rather than passed as parameters, which
+        # SQLite cannot match against the expression of an index.
+        total, count = (compiler.compile(expression)[0]
+                        for expression in self.get_source_expressions())
+        return (f'COALESCE(CAST({total} AS real) / NULLIF({count}, 0), 0.0)',
+                [])
+
+
+# Order of ?ordering=popularity, see recipe_popularity_idx.
+POPULARITY_ORDER = [
+    F('fav_count').desc(),
+    RatingAverage('rating_sum', 'rating_count').desc(),
+    F('id').desc(),
+]
+
+
 class Recipe(models.Model):
     """Recipe object."""
     user = models.ForeignKey(
@@ -71,10 +97,35 @@ class Recipe(models.Model):
     description = models.TextField(blank=True)
     time_minutes = models.IntegerField()
     link = models.CharField(max_length=255, blank=True)
+    fav_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    # Nutrition totals of the lines, see core.nutrition; None until known.
+    kcal = models.FloatField(null=True, blank=True)
+    protein = models.FloatField(null=True, blank=True)
+    fat = models.FloatField(null=True, blank=True)
+    carbs = models.FloatField(null=True, blank=True)
+    nutrition_missing = models.IntegerField(default=0)
+    # Flags of the lines' ingredients ORed, see core.dietary.
+    dietary_flags = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(*POPULARITY_ORDER, name='recipe_popularity_idx'),
+            models.Index(fields=['kcal'], name='recipe_kcal_idx'),
+            models.Index(fields=['protein'], name='recipe_protein_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @property
+    def avg_rating(self):
+        """Average rating given by the homes that rated this recipe."""
+        if not self.rating_count:
+            return None
+        return round(self.rating_sum / self.rating_count, 2)
+
 
 class Tag(models.Model):
     """Tag for filtering recipes."""
@@ -95,11 +146,35 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    # What it contains, see core.dietary; 1 << 30 is UNCLASSIFIED.
+    dietary_flags = models.PositiveIntegerField(default=1 << 30)
 
     def __str__(self):
         return self.name
 
 
+class IngredientNutrition(models.Model):
+    """Energy and macronutrients of an ingredient.
+
+    Values are for `amount` of `unit`, e.g. per 100 g.
+    """
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='nutrition',
+    )
+    amount = models.FloatField(default=100)
+    unit = models.CharField(max_length=100, default='g')
+    kcal = models.FloatField(default=0)
+    protein = models.FloatField(default=0)
+    fat = models.FloatField(default=0)
+    carbs = models.FloatField(default=0)
+
+    def __str__(self):
+        return f'{self.ingredient} per {self.amount:g} {self.unit}'
+
+
 class Inventory(models.Model):
     """Inventory for home."""
     ingredient = models.ForeignKey(
@@ -159,3 +234,43 @@ class RecipeIngredient(models.Model):
 
     class Meta:
         unique_together = ('ingredient', 'recipe')
+
+
+class ImportedChunk(models.Model):
+    """Chunk of a recipe catalog file loaded by import_recipes."""
+    source = models.CharField(max_length=64)
+    chunk_size = models.IntegerField()
+    chunk = models.IntegerField()
+    recipes = models.IntegerField()
+    lines = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('source', 'chunk')
+
+
+class RecipeSignature(models.Model):
+    """MinHash signatures of a recipe for near-duplicate detection."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+    )
+    title_minhash = models.BinaryField()
+    minhash = models.BinaryField()
+
+
+class RecipeBand(models.Model):
+    """LSH bucket of one band of a recipe signature."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key', 'recipe'], name='recipe_band_key_idx'),
+        ]
@@ -0,0 +1,136 @@
+"""
+Helpers to maintain the per-recipe nutrition summary.
+
+`Recipe.kcal`, `protein`, `fat` and `carbs` total the `IngredientNutrition`
+of a recipe's lines, each scaled by how much of the ingredient the line
+uses, so recipes can be filtered on them without joining
+`RecipeIngredient`. Lines without nutrition data, or whose unit does not
+convert to the one the data is given for, are counted in
+`Recipe.nutrition_missing`; totals stay None while no line is known.
+
+The recipe signals recompute a recipe's summary once a change to one of
+its lines commits, and every recipe using an ingredient when its data
+changes. `rebuild_nutrition` recomputes them all, e.g. after a bulk load.
+"""
+from django.db import connections, transaction
+
+from core import cache, units
+from core.models import Recipe, RecipeIngredient
+from core.bulk import update_rows
+from core.commits import CommitBuffer
+
+NUTRIENTS = ('kcal', 'protein', 'fat', 'carbs')
+
+
+def line_factor(amount, unit, per_amount, per_unit):
+    """Return how many `per_amount` of `per_unit` a line amount holds.
+
+    None when the units are of different kinds, e.g. grams of an
+    ingredient whose nutrition is given per piece.
+    """
+    kind, value = units.normalize(amount, unit)
+    per_kind, per_value = units.normalize(per_amount, per_unit)
+    if kind != per_kind or not per_value:
+        return None
+    return value / per_value
+
+
+def summarize(lines):
+    """Return the summary fields of a recipe.
+
+    `lines` yields `(amount, unit, per_amount, per_unit, kcal, protein,
+    fat, carbs)`, with None nutrition fields for unknown ingredients.
+    """
+    totals = None
+    missing = 0
+    for amount, unit, per_amount, per_unit, *values in lines:
+        factor = None
+        if per_amount is not None:
+            factor = line_factor(amount, unit, per_amount, per_unit)
+        if factor is None:
+            missing += 1
+            continue
+        if totals is None:
+            totals = [0.0] * len(NUTRIENTS)
+        for i, value in enumerate(values):
+            totals[i] += value * factor
+    summary = dict.fromkeys(NUTRIENTS)
+    if totals is not None:
+        summary.update(zip(NUTRIENTS, totals))
+    summary['nutrition_missing'] = missing
+    return summary
+
+
+def _lines(recipe_ids, using):
+    """Return `{recipe id: [line]}` in the form `summarize` expects."""
+    lines = {recipe_id: [] for recipe_id in recipe_ids}
+    rows = (RecipeIngredient.objects.using(using)
+            .filter(recipe_id__in=recipe_ids)
+            .values_list('recipe_id', 'amount', 'amount_unit',
+                         'ingredient__nutrition__amount',
+                         'ingredient__nutrition__unit',
+                         *(f'ingredient__nutrition__{nutrient}'
+                           for nutrient in NUTRIENTS)))
+    for recipe_id, *line in rows:
+        lines[recipe_id].append(line)
+    return lines
+
+
+def recompute(recipe_ids, using='default'):
+    """Recompute the summary of the given recipes."""
+    lines = _lines(list(recipe_ids), using)
+    if len(lines) == 1:
+        ((recipe_id, recipe_lines),) = lines.items()
+        Recipe.objects.using(using).filter(id=recipe_id).update(
+            **summarize(recipe_lines))
+        return
+    columns = [*NUTRIENTS, 'nutrition_missing']
+    rows = []
+    for recipe_id, recipe_lines in lines.items():
+        summary = summarize(recipe_lines)
+        rows.append([*(summary[column] for column in columns), recipe_id])
+    update_rows(connections[using], Recipe._meta.db_table, columns, rows)
+
+
+def rebuild_nutrition(batch_size=2000, ingredient_id=None):
+    """Recompute the summary of every recipe, or of those using an
+    ingredient, `batch_size` recipes per transaction.
+
+    Returns the number of recipes updated.
+    """
+    recipes = Recipe.objects.order_by('id')
+    if ingredient_id is not None:
+        recipes = recipes.filter(recipeingredient__ingredient_id=ingredient_id)
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(recipes.filter(id__gt=last_id)
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        with transaction.atomic():
+            recompute(ids)
+        updated += len(ids)
+        last_id = ids[-1]
+
+    cache.bump('recipe')
+    return updated
+
+
+def _recompute_changed(recipe_ids):
+    recompute(recipe_ids)
+    # The totals are written with raw updates, which send no signals for
+    # the response cache to bump recipe lists on.
+    cache.bump('recipe')
+
+
+# Recipes whose lines changed in the current transaction.
+_changed = CommitBuffer(_recompute_changed)
+
+
+def track(recipe_id):
+    """Recompute a recipe's summary once the current transaction commits.
+
+    Outside a transaction this recomputes it at once.
+    """
+    _changed.add(recipe_id)
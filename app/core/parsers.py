@@ -0,0 +1,32 @@
+"""
+Parsers for the REST API.
+"""
+import io
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from core.renderers import FastJSONRenderer, orjson
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser decoding UTF-8 bodies with orjson when it is installed.
+
+    Bodies orjson rejects are parsed again with `json`, so errors (and
+    what non-strict mode accepts) are exactly JSONParser's. Integers
+    beyond 64 bits decode as floats; no field of the API accepts them
+    either way.
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('_', '-') != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(
+                io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,101 @@
+"""
+Helpers to maintain the recipe popularity aggregates.
+
+`Recipe.fav_count`, `Recipe.rating_sum` and `Recipe.rating_count` are
+denormalized from `FavHomeRecipe` so that "most favourited" and "highest
+average rating" never have to scan every favourite. The `popularity`
+subscriber of the event bus adjusts them with atomic `F()` updates as
+favourite changes commit; `rebuild_popularity` recomputes them from
+scratch for drift caused by writes that send no signals (queryset
+updates, raw SQL) or events lost with a killed process.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core import cache
+from core.models import FavHomeRecipe, Recipe
+
+
+def apply_favourite_delta(recipe_id, fav=0, rating_sum=0, rating_count=0):
+    """Shift the popularity aggregates of a recipe by the given amounts."""
+    if not (fav or rating_sum or rating_count):
+        return
+    Recipe.objects.filter(id=recipe_id).update(
+        fav_count=F('fav_count') + fav,
+        rating_sum=F('rating_sum') + rating_sum,
+        rating_count=F('rating_count') + rating_count,
+    )
+
+
+def apply_favourite_events(batch):
+    """Event subscriber adjusting the aggregates of the recipes whose
+    favourites changed, with one update per recipe and batch."""
+    deltas = defaultdict(lambda: [0, 0, 0])
+
+    def add(values, sign):
+        delta = deltas[values['recipe_id']]
+        delta[0] += sign
+        if values['rating'] is not None:
+            delta[1] += sign * values['rating']
+            delta[2] += sign
+
+    for event in batch:
+        if event.action == 'deleted':
+            add(event.data, -1)
+            continue
+        if event.previous is not None:
+            add(event.previous, -1)
+        add(event.data, 1)
+    with transaction.atomic():
+        for recipe_id, delta in sorted(deltas.items()):
+            apply_favourite_delta(recipe_id, *delta)
+    # The inline `cache` subscriber bumped `recipe` before these updates,
+    # and lists read in between were cached with the old aggregates.
+    if deltas:
+        cache.bump('recipe')
+
+
+def rebuild_popularity(batch_size=10000):
+    """Recompute the aggregates of every recipe with set-based updates.
+
+    Recipes are processed in primary key ranges of `batch_size` so that
+    each UPDATE only locks a bounded number of rows. Returns the number
+    of recipes updated.
+    """
+    favourites = FavHomeRecipe.objects.filter(
+        recipe=OuterRef('pk')).order_by().values('recipe')
+
+    def aggregate(expression):
+        return Coalesce(
+            Subquery(
+                favourites.annotate(value=expression).values('value'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    updated = 0
+    last_id = 0
+    while True:
+        ids = list(
+            Recipe.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        with transaction.atomic():
+            updated += Recipe.objects.filter(
+                id__gte=ids[0], id__lte=ids[-1]
+            ).update(
+                fav_count=aggregate(Count('id')),
+                rating_sum=aggregate(Sum('rating')),
+                rating_count=aggregate(Count('rating')),
+            )
+        last_id = ids[-1]
+
+    cache.bump('recipe')
+    return updated
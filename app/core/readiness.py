@@ -0,0 +1,130 @@
+"""
+Database readiness probing.
+
+A probe opens (or reuses) a connection and runs `SELECT 1`, which is all
+start-up needs to know; Django's system checks are far more expensive
+and say nothing about replicas. `wait_for` probes every alias that is
+not ready yet in parallel, retrying with jittered exponential backoff
+until a total deadline, and the health endpoint reports one round of the
+same probe.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2 import OperationalError as Psycopg2OpError
+
+from django.db import connections
+from django.db.utils import OperationalError
+
+
+class ProbeResult:
+    """Outcome of probing one database alias."""
+
+    __slots__ = ('alias', 'ok', 'latency', 'error')
+
+    def __init__(self, alias, ok, latency, error=None):
+        self.alias = alias
+        self.ok = ok
+        self.latency = latency
+        self.error = error
+
+    def as_dict(self):
+        data = {'ok': self.ok, 'ms': round(self.latency * 1000, 2)}
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+class NotReady(Exception):
+    """Databases were still unavailable at the deadline."""
+
+    def __init__(self, results):
+        self.results = results
+        failing = ', '.join(sorted(
+            alias for alias, result in results.items() if not result.ok))
+        super().__init__(f'Databases unavailable: {failing}')
+
+
+def probe(alias='default', close=False):
+    """Run a trivial query on `alias` and return a ProbeResult.
+
+    `close` drops the connection afterwards, for probes run on threads
+    that do not outlive them.
+    """
+    connection = connections[alias]
+    start = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except (Psycopg2OpError, OperationalError) as error:
+        # A broken connection would be reused by the next probe.
+        connection.close()
+        return ProbeResult(alias, False, time.perf_counter() - start,
+                           str(error).strip() or type(error).__name__)
+    if close:
+        connection.close()
+    return ProbeResult(alias, True, time.perf_counter() - start)
+
+
+def _probe_closing(alias):
+    return probe(alias, close=True)
+
+
+def probe_all(aliases=None, parallel=True):
+    """Probe `aliases` (default: every database); returns {alias: result}.
+
+    Parallel probes run on their own threads, and so on their own
+    connections, which are closed before returning.
+    """
+    aliases = list(aliases or connections)
+    if parallel and len(aliases) > 1:
+        with ThreadPoolExecutor(len(aliases)) as executor:
+            results = list(executor.map(_probe_closing, aliases))
+    else:
+        results = [probe(alias) for alias in aliases]
+    return {result.alias: result for result in results}
+
+
+def backoff(attempt, base, cap, rng=random):
+    """Return the delay before retry `attempt` (0 based).
+
+    Half of the exponential delay is fixed and half random, so waiting
+    containers spread out without ever retrying immediately.
+    """
+    delay = min(cap, base * 2 ** attempt)
+    return delay / 2 + rng.uniform(0, delay / 2)
+
+
+def wait_for(aliases=None, timeout=60.0, base=0.05, cap=2.0,
+             on_retry=None, sleep=None, clock=None, rng=random):
+    """Wait until every alias answers a probe; returns {alias: result}.
+
+    Aliases are only probed until they first succeed. `on_retry(results,
+    delay)` is called with the failing results before each sleep.
+    Raises NotReady when the deadline would pass before the next retry.
+    """
+    sleep = sleep or time.sleep
+    clock = clock or time.monotonic
+    deadline = clock() + timeout
+    pending = list(aliases or connections)
+    ready = {}
+    attempt = 0
+    while True:
+        results = probe_all(pending)
+        ready.update(
+            (alias, result) for alias, result in results.items()
+            if result.ok)
+        failing = {alias: result for alias, result in results.items()
+                   if not result.ok}
+        if not failing:
+            return ready
+        delay = backoff(attempt, base, cap, rng)
+        if clock() + delay > deadline:
+            raise NotReady(dict(ready, **failing))
+        if on_retry:
+            on_retry(failing, delay)
+        sleep(delay)
+        pending = list(failing)
+        attempt += 1
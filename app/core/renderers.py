@@ -0,0 +1,48 @@
+"""
+Renderers for the REST API.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Kept as JSON escapes by JSONRenderer so output is valid JavaScript.
+LINE_SEPARATORS = (
+    (b'\xe2\x80\xa8', b'\\u2028'),
+    (b'\xe2\x80\xa9', b'\\u2029'),
+)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer encoding with orjson when it is installed.
+
+    Output matches JSONRenderer for compact UTF-8 responses: dates and
+    times are ISO 8601 with UTC as `Z`, and everything orjson does not
+    know (Decimal, lazy strings, querysets, ...) goes through DRF's
+    encoder. Floats use the shortest round-trip form, as with `json`,
+    except that exponents are written without padding (`1e16`). Indented
+    or ASCII-only output, and a missing orjson, use JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact or self.get_indent(
+                    accepted_media_type, renderer_context or {}) is not None):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which `json` handles.
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        for raw, escaped in LINE_SEPARATORS:
+            if raw in ret:
+                ret = ret.replace(raw, escaped)
+        return ret
@@ -0,0 +1,173 @@
+"""
+Prebuilt OpenAPI schema.
+
+Generating the schema walks every view and serializer, so it is done
+once per code version instead of on every request. The version is a
+fingerprint of the project's Python sources, the schema related
+settings and the library versions; artifacts are stored as
+`openapi-<fingerprint>.<format>` (plus a gzipped copy) in SCHEMA_DIR by
+the `build_schema` command, or by the first request that finds none.
+Each process then keeps the artifacts in memory and serves them with
+strong ETags.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+# Directories of the project that never feed into the schema.
+IGNORED_DIRS = {'tests', 'benchmarks', '__pycache__', 'OldFiles'}
+PREFIX = 'openapi-'
+
+_lock = threading.Lock()
+_fingerprint = None
+_artifacts = {}
+
+
+def _renderers():
+    from drf_spectacular.renderers import (
+        OpenApiJsonRenderer,
+        OpenApiYamlRenderer,
+    )
+
+    return {'yaml': OpenApiYamlRenderer, 'json': OpenApiJsonRenderer}
+
+
+def _sources(root):
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(name for name in dirs if name not in IGNORED_DIRS)
+        for name in sorted(files):
+            if name.endswith('.py'):
+                yield Path(directory, name)
+
+
+def compute_fingerprint(root=None):
+    """Return a hash of everything the generated schema depends on."""
+    import django
+    import drf_spectacular
+    import rest_framework
+
+    root = Path(root or settings.BASE_DIR)
+    digest = hashlib.sha256()
+    for value in (django.__version__, rest_framework.VERSION,
+                  drf_spectacular.__version__,
+                  repr(getattr(settings, 'SPECTACULAR_SETTINGS', None)),
+                  repr(settings.REST_FRAMEWORK)):
+        digest.update(value.encode())
+    for path in _sources(root):
+        digest.update(str(path.relative_to(root)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def fingerprint():
+    """Return the fingerprint of the running code, computed once."""
+    global _fingerprint
+    if _fingerprint is None:
+        _fingerprint = compute_fingerprint()
+    return _fingerprint
+
+
+def schema_dir():
+    return Path(settings.SCHEMA_DIR)
+
+
+def artifact_path(fmt, version=None, directory=None):
+    directory = Path(directory or schema_dir())
+    return directory / f'{PREFIX}{version or fingerprint()}.{fmt}'
+
+
+def _gz(path):
+    return path.with_name(path.name + '.gz')
+
+
+def is_built(directory=None):
+    """Check whether the artifacts of the running code exist."""
+    return all(
+        path.exists()
+        for fmt in _renderers()
+        for path in (artifact_path(fmt, directory=directory),
+                     _gz(artifact_path(fmt, directory=directory)))
+    )
+
+
+def generate():
+    """Generate the schema the way SpectacularAPIView does."""
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS(
+        urlconf=spectacular_settings.SERVE_URLCONF)
+    return generator.get_schema(
+        request=None, public=spectacular_settings.SERVE_PUBLIC)
+
+
+def _write(path, data):
+    with tempfile.NamedTemporaryFile(
+            dir=path.parent, prefix='.tmp-', delete=False) as file:
+        file.write(data)
+    os.replace(file.name, path)
+
+
+def build(directory=None):
+    """Write the artifacts of the running code; returns their paths.
+
+    Artifacts of other versions in the directory are removed.
+    """
+    version = fingerprint()
+    directory = Path(directory or schema_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+    schema = generate()
+    paths = []
+    for fmt, renderer in _renderers().items():
+        path = artifact_path(fmt, version, directory)
+        body = renderer().render(schema, renderer_context={})
+        # mtime=0 keeps the gzipped bytes identical between builds.
+        _write(_gz(path),
+               gzip.compress(body, compresslevel=9, mtime=0))
+        _write(path, body)
+        paths.append(path)
+    current = {path.name for path in paths}
+    current |= {f'{name}.gz' for name in current}
+    for stale in directory.glob(f'{PREFIX}*'):
+        if stale.name not in current:
+            stale.unlink()
+    return paths
+
+
+class Artifact:
+    """A rendered schema with its gzipped copy and ETags."""
+
+    __slots__ = ('body', 'gzipped', 'etag', 'gzip_etag')
+
+    def __init__(self, fmt, version, body, gzipped):
+        self.body = body
+        self.gzipped = gzipped
+        self.etag = f'"{version}-{fmt}"'
+        self.gzip_etag = f'"{version}-{fmt}-gz"'
+
+
+def get_artifact(fmt):
+    """Return the Artifact of `fmt`, building the files if missing."""
+    artifact = _artifacts.get(fmt)
+    if artifact is not None:
+        return artifact
+    with _lock:
+        if fmt not in _artifacts:
+            if not is_built():
+                build()
+            path = artifact_path(fmt)
+            _artifacts[fmt] = Artifact(
+                fmt, fingerprint(), path.read_bytes(), _gz(path).read_bytes())
+        return _artifacts[fmt]
+
+
+def reset():
+    """Forget the loaded artifacts and fingerprint (for tests)."""
+    global _fingerprint
+    with _lock:
+        _fingerprint = None
+        _artifacts.clear()
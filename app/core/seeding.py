@@ -0,0 +1,365 @@
+"""
+Bulk synthetic data for load tests and query planning.
+
+Rows are generated in chunks, each from its own `random.Random` seeded
+with the run seed, the table and the chunk's position, so a seed always
+produces the same data no matter how many workers share the chunks.
+Homes, users, ingredients and recipes get explicit ids following the
+current maximum, which lets chunks of the tables referencing them be
+generated without reading anything back from the database.
+
+On PostgreSQL every chunk is streamed with COPY in its own transaction
+and chunks of the same table run in parallel worker processes. Other
+databases get batched inserts from a single process. All users
+share one precomputed password hash.
+"""
+import datetime
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections, transaction
+from django.db.models import Max
+
+from core.models import (
+    FavHomeRecipe,
+    Home,
+    Ingredient,
+    IngredientNutrition,
+    Inventory,
+    Recipe,
+    RecipeIngredient,
+    User,
+)
+from core import dietary
+from core.bulk import copy_rows, insert_rows, reset_sequences
+
+# Counts for --scale 1, about ten million rows in total.
+DEFAULT_COUNTS = {
+    'homes': 100000,
+    'users': 250000,
+    'ingredients': 20000,
+    'recipes': 750000,
+    'lines_per_recipe': 8,
+    'inventory_per_home': 20,
+    'favourites_per_home': 9,
+}
+# Rows generated and written per chunk.
+CHUNK_ROWS = 20000
+
+FIRST_NAMES = [
+    'Alex', 'Ana', 'Ben', 'Chloe', 'Dev', 'Elena', 'Femi', 'Grace', 'Hugo',
+    'Ines', 'Jon', 'Kira', 'Liam', 'Maya', 'Noah', 'Olga', 'Priya', 'Raj',
+    'Sara', 'Tom', 'Uma', 'Vic', 'Wen', 'Yara', 'Zoe',
+]
+LAST_NAMES = [
+    'Adams', 'Baker', 'Chen', 'Diaz', 'Evans', 'Fischer', 'Garcia', 'Hill',
+    'Ito', 'Jones', 'Khan', 'Lopez', 'Meyer', 'Novak', 'Okafor', 'Patel',
+    'Quinn', 'Rossi', 'Silva', 'Tanaka', 'Weber', 'Young',
+]
+INGREDIENTS = [
+    'salt', 'pepper', 'olive oil', 'butter', 'garlic', 'onion', 'flour',
+    'sugar', 'egg', 'milk', 'tomato', 'rice', 'pasta', 'chicken', 'beef',
+    'lemon', 'basil', 'parsley', 'cheese', 'potato', 'carrot', 'celery',
+    'cream', 'honey', 'ginger', 'chilli', 'cumin', 'paprika', 'spinach',
+    'mushroom', 'beans', 'lentils', 'tofu', 'salmon', 'yoghurt', 'thyme',
+]
+STYLES = [
+    'Easy', 'Quick', 'Spicy', 'Creamy', 'Roasted', 'Grilled', 'Smoky',
+    'Classic', 'Crispy', 'Slow-cooked', 'Herby', 'Zesty',
+]
+DISHES = [
+    'soup', 'stew', 'curry', 'salad', 'bake', 'risotto', 'stir-fry',
+    'pie', 'tacos', 'noodles', 'omelette', 'traybake', 'burger',
+]
+UNITS = ['g', 'kg', 'ml', 'l', 'pcs', 'tbsp', 'tsp']
+COOKED_FROM = datetime.date(2024, 1, 1)
+
+
+class Plan:
+    """Counts, first ids and password hash shared by every chunk."""
+
+    def __init__(self, counts, seed, password, first_ids):
+        self.counts = dict(DEFAULT_COUNTS, **counts)
+        self.seed = seed
+        self.password = password
+        self.first_ids = first_ids
+
+    def random_id(self, rng, name, skew=1):
+        """Return a random id of `name`, low ids favoured with `skew`."""
+        return self.first_ids[name] + int(
+            self.counts[name] * rng.random() ** skew)
+
+    def distinct_ids(self, rng, name, k, skew):
+        """Return up to `k` distinct ids of `name`."""
+        k = min(k, self.counts[name])
+        ids = set()
+        while len(ids) < k:
+            ids.add(self.random_id(rng, name, skew))
+        return sorted(ids)
+
+    def around(self, rng, name):
+        """Return a per parent row count scattered around its average."""
+        average = self.counts[name]
+        return rng.randint(max(0, average - average // 2),
+                           average + average // 2)
+
+
+def _homes(plan, rng, start, stop):
+    first = plan.first_ids['homes']
+    diets = list(dietary.DIET_BITS.values())
+    for index in range(start, stop):
+        # About one home in ten follows a diet and one avoids an allergen.
+        diet = rng.choice(diets) if rng.random() < 0.1 else 0
+        avoid = 0
+        if rng.random() < 0.1:
+            avoid = dietary.FLAGS[rng.choice(dietary.ALLERGENS)]
+        yield (first + index, f'{rng.choice(LAST_NAMES)} home',
+               str(rng.randint(1, 6)), diet, avoid)
+
+
+def _users(plan, rng, start, stop):
+    first = plan.first_ids['users']
+    for index in range(start, stop):
+        user_id = first + index
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        # About one user in ten has not joined a home yet.
+        home_id = (None if rng.random() < 0.1
+                   else plan.random_id(rng, 'homes'))
+        yield (user_id, plan.password, None, False,
+               f'{first_name}.{last_name}.{user_id}@example.com'.lower(),
+               f'{first_name} {last_name}', True, False, home_id)
+
+
+def _ingredients(plan, rng, start, stop):
+    first = plan.first_ids['ingredients']
+    for index in range(start, stop):
+        ingredient_id = first + index
+        yield (ingredient_id,
+               f'{INGREDIENTS[index % len(INGREDIENTS)]} {ingredient_id}',
+               plan.random_id(rng, 'users'), _dietary_flags(rng))
+
+
+def _dietary_flags(rng):
+    if rng.random() < 0.02:
+        return dietary.UNCLASSIFIED
+    flags = 0
+    # About one ingredient in five carries an allergen.
+    if rng.random() < 0.2:
+        flags |= dietary.FLAGS[rng.choice(dietary.ALLERGENS)]
+    kind = rng.random()
+    if kind < 0.15:
+        flags |= dietary.FLAGS['meat']
+    elif kind < 0.2:
+        flags |= dietary.FLAGS['animal_products']
+    elif kind < 0.22:
+        flags |= dietary.FLAGS['alcohol']
+    return flags
+
+
+def _nutrition(plan, rng, start, stop):
+    first = plan.first_ids['ingredients']
+    for index in range(start, stop):
+        yield (first + index, 100, rng.choice(['g', 'g', 'ml', 'pcs']),
+               round(rng.uniform(5, 900), 1), round(rng.uniform(0, 30), 1),
+               round(rng.uniform(0, 60), 1), round(rng.uniform(0, 80), 1))
+
+
+def _recipes(plan, rng, start, stop):
+    first = plan.first_ids['recipes']
+    for index in range(start, stop):
+        recipe_id = first + index
+        main = rng.choice(INGREDIENTS)
+        link = (f'https://example.com/recipes/{recipe_id}'
+                if rng.random() < 0.3 else '')
+        yield (recipe_id, plan.random_id(rng, 'users'),
+               f'{rng.choice(STYLES)} {main} {rng.choice(DISHES)}',
+               f'A {main} dish for the whole home.',
+               rng.choice([10, 15, 20, 30, 45, 60, 90, 120]), link, 0, 0, 0,
+               0, 0)
+
+
+def _recipe_lines(plan, rng, start, stop):
+    first = plan.first_ids['recipes']
+    for index in range(start, stop):
+        # Common ingredients such as salt turn up in most recipes.
+        for ingredient_id in plan.distinct_ids(
+                rng, 'ingredients', plan.around(rng, 'lines_per_recipe'), 3):
+            yield (first + index, ingredient_id,
+                   rng.choice([1, 2, 5, 50, 100, 200, 500]),
+                   rng.random() < 0.7, rng.choice(UNITS))
+
+
+def _inventory(plan, rng, start, stop):
+    first = plan.first_ids['homes']
+    for index in range(start, stop):
+        for ingredient_id in plan.distinct_ids(
+                rng, 'ingredients', plan.around(rng, 'inventory_per_home'), 2):
+            yield (ingredient_id, first + index,
+                   rng.choice([1, 6, 100, 250, 500, 1000]), rng.choice(UNITS))
+
+
+def _favourites(plan, rng, start, stop):
+    first = plan.first_ids['homes']
+    for index in range(start, stop):
+        for recipe_id in plan.distinct_ids(
+                rng, 'recipes', plan.around(rng, 'favourites_per_home'), 3):
+            rated = rng.random() < 0.8
+            cooked = rng.random() < 0.6
+            yield (first + index, recipe_id,
+                   (COOKED_FROM + datetime.timedelta(rng.randrange(365))
+                    if cooked else None),
+                   rng.randint(1, 10) if rated else None)
+
+
+class Step:
+    """One table: its columns, generator and the count it scales with.
+
+    Tables referenced by others list `id` among their columns; the rest
+    leave it to the database.
+    """
+
+    def __init__(self, name, model, columns, generate, units, per_unit=None):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.generate = generate
+        # Rows are generated per unit: a row, or a parent row.
+        self.units = units
+        self.per_unit = per_unit
+
+    def unit_count(self, plan):
+        return plan.counts[self.units]
+
+    def chunk_units(self, plan):
+        per_unit = plan.counts[self.per_unit] if self.per_unit else 1
+        return max(1, CHUNK_ROWS // max(1, per_unit))
+
+    def chunks(self, plan):
+        """Return the (start, stop) unit ranges of every chunk."""
+        total = self.unit_count(plan)
+        size = self.chunk_units(plan)
+        return [(start, min(start + size, total))
+                for start in range(0, total, size)]
+
+
+STEPS = [
+    Step('homes', Home, ['id', 'name', 'parameters', 'diets', 'avoid'],
+         _homes, 'homes'),
+    Step('users', User, [
+        'id', 'password', 'last_login', 'is_superuser', 'email', 'name',
+        'is_active', 'is_staff', 'home_id',
+    ], _users, 'users'),
+    Step('ingredients', Ingredient, ['id', 'name', 'user_id', 'dietary_flags'],
+         _ingredients, 'ingredients'),
+    Step('nutrition', IngredientNutrition, [
+        'ingredient_id', 'amount', 'unit', 'kcal', 'protein', 'fat', 'carbs',
+    ], _nutrition, 'ingredients'),
+    Step('recipes', Recipe, [
+        'id', 'user_id', 'title', 'description', 'time_minutes', 'link',
+        'fav_count', 'rating_sum', 'rating_count', 'nutrition_missing',
+        'dietary_flags',
+    ], _recipes, 'recipes'),
+    Step('recipe lines', RecipeIngredient, [
+        'recipe_id', 'ingredient_id', 'amount', 'mandatory', 'amount_unit',
+    ], _recipe_lines, 'recipes', 'lines_per_recipe'),
+    Step('inventory', Inventory, [
+        'ingredient_id', 'home_id', 'amount', 'amount_unit',
+    ], _inventory, 'homes', 'inventory_per_home'),
+    Step('favourites', FavHomeRecipe, [
+        'home_id', 'recipe_id', 'last_cooked', 'rating',
+    ], _favourites, 'homes', 'favourites_per_home'),
+]
+STEPS_BY_NAME = {step.name: step for step in STEPS}
+
+
+def estimate_rows(counts):
+    """Return the approximate number of rows `counts` will create."""
+    counts = dict(DEFAULT_COUNTS, **counts)
+    return (counts['homes'] + counts['users'] + 2 * counts['ingredients']
+            + counts['recipes']
+            + counts['recipes'] * counts['lines_per_recipe']
+            + counts['homes'] * (counts['inventory_per_home']
+                                 + counts['favourites_per_home']))
+
+
+def first_ids(using='default'):
+    """Return the first free id of every table given explicit ids."""
+    models = {'homes': Home, 'users': User, 'ingredients': Ingredient,
+              'recipes': Recipe}
+    return {
+        name: (model.objects.using(using).aggregate(last=Max('id'))['last']
+               or 0) + 1
+        for name, model in models.items()
+    }
+
+
+def seed_chunk(plan, step_name, start, stop, using='default'):
+    """Generate and write one chunk of a table; returns its row count."""
+    step = STEPS_BY_NAME[step_name]
+    rng = random.Random(f'{plan.seed}:{step_name}:{start}')
+    rows = list(step.generate(plan, rng, start, stop))
+    fields = {field.attname: field for field in step.model._meta.fields}
+    columns = [fields[name].column for name in step.columns]
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        if connection.vendor == 'postgresql':
+            not_null = [
+                fields[name].column for name in step.columns
+                if fields[name].get_internal_type() in (
+                    'CharField', 'TextField') and not fields[name].null
+            ]
+            copy_rows(connection, step.model._meta.db_table, columns,
+                      rows, not_null)
+        else:
+            insert_rows(connection, step.model._meta.db_table, columns, rows)
+    return len(rows)
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+
+
+def _seed_chunk_task(args):
+    return seed_chunk(*args)
+
+
+def seed(counts, seed=1, password='password123', workers=1,
+         using='default', progress=None):
+    """Create synthetic rows for `counts`, see `DEFAULT_COUNTS`.
+
+    Tables are written one after another so rows only ever reference
+    committed rows; the chunks of a table run in up to `workers`
+    processes on PostgreSQL. `progress(step, rows)` is called after every
+    table. Returns the number of rows per table.
+    """
+    from django.contrib.auth.hashers import make_password
+
+    plan = Plan(counts, seed, make_password(password), first_ids(using))
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        workers = 1
+    created = {}
+    executor = None
+    if workers > 1:
+        # Children must not share the parent's open connections.
+        connections.close_all()
+        executor = ProcessPoolExecutor(workers, initializer=_init_worker)
+    try:
+        for step in STEPS:
+            tasks = [(plan, step.name, start, stop, using)
+                     for start, stop in step.chunks(plan)]
+            if executor:
+                rows = sum(executor.map(_seed_chunk_task, tasks))
+            else:
+                rows = sum(_seed_chunk_task(task) for task in tasks)
+            created[step.name] = rows
+            if progress:
+                progress(step.name, rows)
+    finally:
+        if executor:
+            executor.shutdown()
+    reset_sequences(connection, [Home, User, Ingredient, Recipe])
+    return created
@@ -0,0 +1,54 @@
+"""
+Serializers for core API views.
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+from core import export
+
+
+class FlagsField(serializers.MultipleChoiceField):
+    """Names of the bits set in an integer bitmask.
+
+    `bits` maps each name to its bit, like the tables in core.dietary.
+    """
+
+    def __init__(self, bits, **kwargs):
+        self.bits = bits
+        super().__init__(choices=list(bits), **kwargs)
+
+    def to_representation(self, value):
+        return [name for name, bit in self.bits.items() if value & bit]
+
+    def to_internal_value(self, data):
+        value = 0
+        for name in super().to_internal_value(data):
+            value |= self.bits[name]
+        return value
+
+
+class BatchItemSerializer(serializers.Serializer):
+    """Serializer for one request of a batch."""
+    method = serializers.ChoiceField(
+        choices=['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.RegexField(r'^/', max_length=2000)
+    body = serializers.JSONField(required=False, allow_null=True)
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    """Serializer for a batch of API requests."""
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        limit = settings.BATCH['MAX_REQUESTS']
+        if len(value) > limit:
+            raise serializers.ValidationError(
+                f'Send at most {limit} requests per batch.')
+        return value
+
+
+class ExportRequestSerializer(serializers.Serializer):
+    """Serializer for export query parameters."""
+    output = serializers.ChoiceField(
+        choices=list(export.FORMATS), default='ndjson')
+    gzip = serializers.BooleanField(default=False)
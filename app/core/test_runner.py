@@ -0,0 +1,21 @@
+"""
+Test runner running test cases in parallel processes by default.
+"""
+import multiprocessing
+
+from django.test.runner import DiscoverRunner, default_test_processes
+
+
+class ParallelTestRunner(DiscoverRunner):
+    """DiscoverRunner defaulting --parallel to one process per CPU.
+
+    DJANGO_TEST_PROCESSES overrides the number of processes. Workers are
+    forked copies of the test database, so platforms that spawn worker
+    processes run serially.
+    """
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        if multiprocessing.get_start_method() == 'fork':
+            parser.set_defaults(parallel=default_test_processes())
@@ -11,20 +11,24 @@ from django.test import Client
 class AdminSiteTests(TestCase):
     """Tests for Django admin."""
 
-    def setUp(self):
-        """Create user and client."""
-        self.client = Client()
-        self.admin_user = get_user_model().objects.create_superuser(
+    @classmethod
+    def setUpTestData(cls):
+        """Create users."""
+        cls.admin_user = get_user_model().objects.create_superuser(
             email='admin@example.com',
             password='testpass123',
         )
-        self.client.force_login(self.admin_user)
-        self.user = get_user_model().objects.create_user(
+        cls.user = get_user_model().objects.create_user(
             email='user@example.com',
             password='testpass123',
             name='Test User'
         )
 
+    def setUp(self):
+        """Create client."""
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+
     def test_user_list(self):
         """Test that users are listed on page."""
         url = reverse('admin:core_user_changelist')
@@ -0,0 +1,85 @@
+"""
+Tests for the async read views served over ASGI.
+"""
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TransactionTestCase
+from django.urls import resolve
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.async_views import AsyncReadView
+from home.helper_method import (
+    add_to_inventory,
+    create_fav_recipe,
+    create_home,
+    create_ingredient,
+    create_recipe,
+    create_user,
+)
+
+READ_PATHS = [
+    '/api/recipe/recipes/',
+    '/api/home/inventory-fetch/',
+    '/api/home/fav-recipes/',
+]
+
+
+class AsyncViewTests(TransactionTestCase):
+    """Test reads over ASGI match the WSGI responses."""
+
+    def setUp(self):
+        self.home = create_home()
+        self.user = create_user(email='user@example.com', password='pass123')
+        self.user.home = self.home
+        self.user.save()
+        self.other = create_user(email='other@example.com', password='pass')
+        self.recipe = create_recipe(self.user, title='Soup')
+        self.other_recipe = create_recipe(self.other, title='Stew')
+        add_to_inventory(self.home, create_ingredient(self.user, name='Salt'))
+        create_fav_recipe(self.home, self.recipe, rating=4)
+
+        key = Token.objects.create(user=self.user).key
+        # The async test client takes header names rather than META keys.
+        self.auth = {'AUTHORIZATION': f'Token {key}'}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+        self.async_client = AsyncClient()
+
+    def test_hot_reads_use_async_views(self):
+        """Test the ASGI URLs resolve the hot reads to async views."""
+        for path in READ_PATHS:
+            match = resolve(path, urlconf='app.urls_asgi')
+            self.assertTrue(issubclass(match.func.view_class, AsyncReadView))
+
+    async def test_responses_match_wsgi(self):
+        """Test async reads return the same content as the sync views."""
+        paths = READ_PATHS + [f'/api/recipe/recipes/{self.recipe.id}/']
+        for path in paths:
+            res = await self.async_client.get(path, **self.auth)
+            expected = await sync_to_async(self.client.get)(path)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, expected.content)
+
+    async def test_permissions_apply(self):
+        """Test the DRF permission checks run on the async path."""
+        res = await self.async_client.get(
+            f'/api/recipe/recipes/{self.other_recipe.id}/', **self.auth)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_auth_required(self):
+        """Test authentication is required on the async path."""
+        for path in READ_PATHS:
+            res = await self.async_client.get(path)
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_writes_use_sync_view(self):
+        """Test other methods on the same URL reach the DRF view."""
+        res = await self.async_client.post(
+            '/api/recipe/recipes/',
+            {'title': 'Salad', 'time_minutes': 5},
+            content_type='application/json',
+            **self.auth,
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
@@ -0,0 +1,154 @@
+"""
+Tests for the batch API.
+"""
+import json
+from unittest.mock import patch
+
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import batch, cache
+from home.helper_method import (
+    add_to_inventory,
+    create_home,
+    create_ingredient,
+    create_recipe,
+    create_user,
+)
+
+BATCH_URL = reverse('batch')
+RECIPES_URL = reverse('recipe:recipe-list')
+INVENTORY_URL = reverse('home:inventory-fetch')
+
+
+def get(path):
+    return {'method': 'GET', 'path': path}
+
+
+class BatchMixin:
+    """Set up a user with a home, recipes and inventory."""
+
+    def create_data(self):
+        home = create_home()
+        self.user = create_user(email='user@example.com', password='pass123',
+                                name='Cook', home=home)
+        ingredient = create_ingredient(self.user, name='Salt')
+        add_to_inventory(home, ingredient, amount=40)
+        create_recipe(self.user, title='Dal')
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def batch(self, *items, **extra):
+        res = self.client.post(BATCH_URL, {'requests': list(items)},
+                               format='json', **extra)
+        return res, json.loads(res.content)
+
+
+class PublicBatchTests(TestCase):
+    """Test unauthenticated batch requests."""
+
+    def test_auth_required(self):
+        res = APIClient().post(BATCH_URL, {'requests': [get(RECIPES_URL)]},
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class BatchTests(BatchMixin, TestCase):
+    """Test running API requests in a batch."""
+
+    def setUp(self):
+        self.create_data()
+
+    def test_reads(self):
+        """Test sub-responses come back in order with their status."""
+        res, data = self.batch(get(RECIPES_URL), get(INVENTORY_URL),
+                               get(f'{RECIPES_URL}?fields=title'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in data['responses']],
+                         [200, 200, 200])
+        recipes, inventory, titles = (
+            item['body'] for item in data['responses'])
+        self.assertEqual(recipes[0]['created_by'], 'Cook')
+        self.assertEqual(inventory[0]['amount'], 40)
+        self.assertEqual(titles, [{'title': 'Dal'}])
+
+    def test_authenticates_once(self):
+        """Test the token is looked up for the batch, not per request."""
+        with patch.object(TokenAuthentication, 'authenticate_credentials',
+                          wraps=TokenAuthentication().authenticate_credentials
+                          ) as patched:
+            self.batch(get(RECIPES_URL), get(INVENTORY_URL))
+
+        self.assertEqual(patched.call_count, 1)
+
+    def test_write_then_read(self):
+        """Test later requests see what earlier writes did."""
+        res, data = self.batch(
+            {'method': 'POST', 'path': RECIPES_URL,
+             'body': {'title': 'Soup', 'time_minutes': 5}},
+            {'method': 'POST', 'path': RECIPES_URL, 'body': {'title': ''}},
+            get(RECIPES_URL),
+        )
+
+        created, invalid, listed = data['responses']
+        self.assertEqual(created['status'], 201)
+        self.assertEqual(invalid['status'], 400)
+        self.assertIn('time_minutes', invalid['body'])
+        self.assertEqual([recipe['title'] for recipe in listed['body']],
+                         ['Soup', 'Dal'])
+
+    def test_paths_outside_the_api(self):
+        """Test only allowed paths can be requested."""
+        res, data = self.batch(get('/admin/'), get(BATCH_URL),
+                               get('/api/recipe/missing/'))
+
+        self.assertEqual([item['status'] for item in data['responses']],
+                         [404, 404, 404])
+
+    @override_settings(BATCH=dict(settings.BATCH, MAX_REQUESTS=2))
+    def test_too_many_requests(self):
+        """Test batches are limited in size."""
+        res, data = self.batch(*[get(RECIPES_URL)] * 3)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(
+        RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=True))
+    def test_cached_sub_responses_not_compressed(self):
+        """Test sub-responses are embedded as JSON even on cache hits."""
+        cache.get_cache().clear()
+        self.batch(get(RECIPES_URL))
+        res, data = self.batch(get(RECIPES_URL), HTTP_ACCEPT_ENCODING='gzip')
+
+        item = data['responses'][0]
+        self.assertEqual(item['headers']['X-Cache'], 'HIT')
+        self.assertEqual(item['body'][0]['title'], 'Dal')
+
+
+@override_settings(BATCH=dict(settings.BATCH, WORKERS=4))
+class ConcurrentBatchTests(BatchMixin, TransactionTestCase):
+    """Test reads running on the thread pool."""
+
+    def setUp(self):
+        self.create_data()
+
+    def test_concurrent_reads(self):
+        """Test concurrent reads return what sequential reads do."""
+        items = [get(RECIPES_URL), get(INVENTORY_URL), get(RECIPES_URL),
+                 get(f'{RECIPES_URL}?fields=id')]
+        with override_settings(BATCH=dict(settings.BATCH, WORKERS=1)):
+            _, expected = self.batch(*items)
+        with patch('core.batch.run', wraps=batch.run) as patched:
+            _, data = self.batch(*items)
+
+        self.assertEqual(data, expected)
+        # The repeated read ran once.
+        self.assertEqual(patched.call_count, 3)
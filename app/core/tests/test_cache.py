@@ -0,0 +1,167 @@
+"""
+Tests for the response cache.
+"""
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import cache, popularity
+from core.events import Event
+from home.helper_method import (
+    create_user,
+    create_home,
+    create_ingredient,
+    add_to_inventory,
+    create_recipe,
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+HOMES_URL = reverse('home:home-list')
+INVENTORY_URL = reverse('home:inventory-fetch')
+CACHE_STATS_URL = reverse('cache-stats')
+
+
+@override_settings(RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=True))
+class ResponseCacheTests(TestCase):
+    """Test cached read endpoints."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        cache.stats.reset()
+        self.home = create_home()
+        self.user = create_user(email='user@example.com', password='Test123')
+        self.user.home = self.home
+        self.user.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_second_read_is_a_hit(self):
+        """Test repeating a request is served from the cache."""
+        create_recipe(self.user)
+
+        res1 = self.client.get(RECIPES_URL)
+        res2 = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res1['X-Cache'], 'MISS')
+        self.assertEqual(res2['X-Cache'], 'HIT')
+        self.assertEqual(res1.content, res2.content)
+
+    def test_query_params_are_part_of_key(self):
+        """Test different query parameters are cached separately."""
+        self.client.get(RECIPES_URL)
+        res = self.client.get(RECIPES_URL, {'ordering': 'popularity'})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_write_invalidates_after_commit(self):
+        """Test a committed write invalidates dependent responses."""
+        self.client.get(RECIPES_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(RECIPES_URL, {'title': 'Dal', 'time_minutes': 5})
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()[0]['title'], 'Dal')
+
+    def test_cached_detail_checks_object_permissions(self):
+        """Test a cached detail response is not served to other users."""
+        recipe = create_recipe(self.user)
+        url = reverse('recipe:recipe-detail', args=[recipe.id])
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        other = create_user(email='other@example.com', password='Test123')
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+
+        res = other_client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertNotIn('X-Cache', res)
+
+    def test_favourite_events_invalidate_recipe_list(self):
+        """Test a cached list shows a favourite applied after it was
+        cached, as when the popularity subscriber runs on its worker."""
+        recipe = create_recipe(self.user)
+        self.client.get(RECIPES_URL)
+        event = Event('favhomerecipe', 'created', 1, {
+            'home_id': self.home.id, 'recipe_id': recipe.id, 'rating': 4,
+        }, None)
+
+        popularity.apply_favourite_events([event])
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()[0]['fav_count'], 1)
+        self.assertEqual(res.json()[0]['avg_rating'], 4.0)
+
+    def test_inventory_invalidation_is_per_home(self):
+        """Test inventory changes only invalidate their own home."""
+        other_home = create_home(name='Other')
+        other = create_user(email='other@example.com', password='Test123')
+        other.home = other_home
+        other.save()
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        rice = create_ingredient(self.user, name='Rice')
+        self.client.get(INVENTORY_URL)
+        other_client.get(INVENTORY_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            add_to_inventory(other_home, rice)
+
+        self.assertEqual(self.client.get(INVENTORY_URL)['X-Cache'], 'HIT')
+        res = other_client.get(INVENTORY_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(res.json()), 1)
+
+    def test_home_invalidated_on_update(self):
+        """Test the home list is cached per home until the home changes."""
+        self.client.get(HOMES_URL)
+        self.assertEqual(self.client.get(HOMES_URL)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('home:home-detail', args=[self.home.id]),
+                {'name': 'Renamed'})
+        res = self.client.get(HOMES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.json()[0]['name'], 'Renamed')
+
+    def test_per_process_backend_warns(self):
+        """Test enabling the cache with LocMemCache is flagged."""
+        locmem = dict(settings.CACHES, responses={
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'})
+        filebased = dict(settings.CACHES, responses={
+            'BACKEND':
+                'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': '/tmp/responses'})
+
+        with self.settings(CACHES=locmem):
+            self.assertEqual(
+                [w.id for w in cache.check_shared_backend(None)],
+                ['core.W001'])
+        with self.settings(CACHES=filebased):
+            self.assertEqual(cache.check_shared_backend(None), [])
+
+    def test_cache_stats(self):
+        """Test hit rate is reported to admins."""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+        admin = create_user(email='admin@example.com', password='Test123',
+                            is_staff=True)
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.data['process']['RecipeViewSet']['hits'], 1)
+        self.assertEqual(res.data['shared']['hit_rate'], 0.5)
+
+    def test_cache_stats_admin_only(self):
+        """Test cache stats are not available to other users."""
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -1,35 +1,273 @@
 """
 Test custom Django management commands.
 """
-
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
-from psycopg2 import OperationalError as Psycopg2Error
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+
+from core import readiness, seeding
+from core.models import (
+    FavHomeRecipe,
+    Home,
+    Ingredient,
+    Inventory,
+    Recipe,
+    RecipeIngredient,
+    RecipeSignature,
+)
+
 
-from django.core.management import call_command
-from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+def probe_result(alias, ok):
+    return readiness.ProbeResult(
+        alias, ok, 0.001, None if ok else 'connection refused')
 
 
-@patch("core.management.commands.wait_for_db.Command.check")
+@patch('core.readiness.probe_all')
 class CommandTests(SimpleTestCase):
     """Test commands"""
 
-    def test_wait_for_db_ready(self, patched_check):
+    def test_wait_for_db_ready(self, patched_probe):
         """Test waiting for database if database is ready."""
-        patched_check.return_value = True
+        patched_probe.return_value = {'default': probe_result('default', True)}
+
+        call_command('wait_for_db', database=['default'], stdout=StringIO())
+
+        patched_probe.assert_called_once_with(['default'])
+
+    @patch('time.sleep')
+    def test_wait_for_db_delay(self, patched_sleep, patched_probe):
+        """Test waiting for database when probes fail."""
+        patched_probe.side_effect = [
+            {'default': probe_result('default', False)}] * 5 + [
+            {'default': probe_result('default', True)}]
+
+        out = StringIO()
+        call_command('wait_for_db', database=['default'], stdout=out)
+
+        self.assertEqual(patched_probe.call_count, 6)
+        self.assertEqual(patched_sleep.call_count, 5)
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertLess(delays[0], delays[-1])
+        self.assertIn('Database available!', out.getvalue())
 
-        call_command('wait_for_db')
+    @patch('time.sleep')
+    def test_wait_for_db_probes_pending_aliases(
+            self, patched_sleep, patched_probe):
+        """Test aliases are probed together until each one is ready."""
+        patched_probe.side_effect = [
+            {'default': probe_result('default', True),
+             'replica1': probe_result('replica1', False)},
+            {'replica1': probe_result('replica1', True)},
+        ]
+
+        call_command('wait_for_db', database=['default', 'replica1'],
+                     stdout=StringIO())
 
-        patched_check.assert_called_once_with(databases=['default'])
+        self.assertEqual(patched_probe.call_args_list[0].args[0],
+                         ['default', 'replica1'])
+        self.assertEqual(patched_probe.call_args_list[1].args[0],
+                         ['replica1'])
 
     @patch('time.sleep')
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
-        """Test waiting for database when getting OperationalError."""
-        patched_check.side_effect = [Psycopg2Error] * 2 + \
-            [OperationalError] * 3 + [True]
+    def test_wait_for_db_deadline(self, patched_sleep, patched_probe):
+        """Test giving up once the deadline has passed."""
+        patched_probe.return_value = {
+            'default': probe_result('default', False)}
+
+        with self.assertRaisesMessage(CommandError, 'default'):
+            call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+
+class RebuildPopularityTests(TestCase):
+    """Test rebuild_popularity command."""
+
+    def test_rebuild_popularity(self):
+        """Test aggregates are recomputed from fav recipes."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        recipe = Recipe.objects.create(
+            user=user, title='Dal', time_minutes=20, fav_count=7)
+        unrated = Recipe.objects.create(
+            user=user, title='Rice', time_minutes=15, rating_sum=3)
+        for name, rating in [('A', 4), ('B', None), ('C', 8)]:
+            home = Home.objects.create(name=name)
+            FavHomeRecipe.objects.create(
+                home=home, recipe=recipe, rating=rating)
+
+        call_command('rebuild_popularity', batch_size=1, stdout=StringIO())
+
+        recipe.refresh_from_db()
+        unrated.refresh_from_db()
+        self.assertEqual(recipe.fav_count, 3)
+        self.assertEqual(recipe.rating_sum, 12)
+        self.assertEqual(recipe.rating_count, 2)
+        self.assertEqual(recipe.avg_rating, 6)
+        self.assertEqual(unrated.fav_count, 0)
+        self.assertEqual(unrated.rating_sum, 0)
+        self.assertIsNone(unrated.avg_rating)
+
+
+class BuildDuplicatesTests(TestCase):
+    """Test build_duplicates command."""
+
+    def test_build_duplicates(self):
+        """Test every recipe, then only new ones, are indexed."""
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        Recipe.objects.create(user=user, title='Dal', time_minutes=20)
+        out = StringIO()
+
+        call_command('build_duplicates', stdout=out)
+        Recipe.objects.create(user=user, title='Rice', time_minutes=15)
+        call_command('build_duplicates', missing=True, stdout=out)
+
+        self.assertEqual(RecipeSignature.objects.count(), 2)
+        self.assertIn('Indexed 1 recipes', out.getvalue())
+
+
+class SeedDataTests(TestCase):
+    """Test seed_data command."""
+
+    options = {
+        'homes': 6, 'users': 15, 'ingredients': 40, 'recipes': 30,
+        'lines_per_recipe': 4, 'inventory_per_home': 5,
+        'favourites_per_home': 3,
+    }
+
+    def test_seed_data(self):
+        """Test rows are created with valid links and aggregates."""
+        call_command('seed_data', skip_index=True, password='seedpass123',
+                     stdout=StringIO(), **self.options)
+
+        users = get_user_model().objects.all()
+        self.assertEqual(users.count(), 15)
+        self.assertEqual(Home.objects.count(), 6)
+        self.assertEqual(Ingredient.objects.count(), 40)
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertTrue(users.first().check_password('seedpass123'))
+        self.assertTrue(RecipeIngredient.objects.exists())
+        self.assertTrue(Inventory.objects.exists())
+        favourites = FavHomeRecipe.objects.all()
+        self.assertTrue(favourites.exists())
+        self.assertEqual(
+            sum(Recipe.objects.values_list('fav_count', flat=True)),
+            favourites.count(),
+        )
+        new = Home.objects.create(name='New')
+        self.assertEqual(new.id, 7)
+
+    def test_seed_data_builds_indexes(self):
+        """Test seeded recipes are indexed for duplicates."""
+        call_command('seed_data', password='seedpass123',
+                     stdout=StringIO(), **self.options)
+
+        self.assertEqual(RecipeSignature.objects.count(), 30)
+
+    def test_seed_is_deterministic(self):
+        """Test the same seed produces the same rows."""
+        def snapshot():
+            return (
+                list(Recipe.objects.order_by('id').values_list(
+                    'id', 'user_id', 'title', 'time_minutes')),
+                list(RecipeIngredient.objects.order_by(
+                    'recipe_id', 'ingredient_id').values_list(
+                        'recipe_id', 'ingredient_id', 'amount')),
+                list(FavHomeRecipe.objects.order_by(
+                    'home_id', 'recipe_id').values_list(
+                        'home_id', 'recipe_id', 'rating', 'last_cooked')),
+            )
+
+        seeding.seed(self.options, seed=7)
+        first = snapshot()
+        get_user_model().objects.all().delete()
+        Home.objects.all().delete()
+        seeding.seed(self.options, seed=7)
+
+        self.assertEqual(snapshot(), first)
+
+
+class ExportDataTests(TestCase):
+    """Test export_data command."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seeding.seed(SeedDataTests.options, seed=3)
+
+    def export(self, **options):
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('export_data', output_dir=output_dir,
+                         stdout=StringIO(), **options)
+            files = {}
+            for name in os.listdir(output_dir):
+                with open(os.path.join(output_dir, name), 'rb') as file:
+                    files[name] = file.read()
+            return files
+
+    def test_export_everything(self):
+        """Test every dataset is written with every row."""
+        files = self.export(gzip=True)
+
+        self.assertEqual(set(files), {
+            'recipes.ndjson.gz', 'recipe-ingredients.ndjson.gz',
+            'inventory.ndjson.gz', 'favourites.ndjson.gz'})
+        lines = gzip.decompress(
+            files['recipe-ingredients.ndjson.gz']).splitlines()
+        self.assertEqual(len(lines), RecipeIngredient.objects.count())
+
+    def test_export_home(self):
+        """Test only the home's datasets and rows are written."""
+        home = Inventory.objects.first().home
+
+        files = self.export(home=home.id, format='csv')
+
+        self.assertEqual(set(files), {'inventory.csv', 'favourites.csv'})
+        lines = files['inventory.csv'].splitlines()
+        self.assertEqual(len(lines) - 1, home.inventory_set.count())
+
+    def test_export_user(self):
+        """Test a user's recipes are written."""
+        user = Recipe.objects.first().user
+
+        files = self.export(user=user.email, dataset=['recipes'])
+
+        ids = [json.loads(line)['id']
+               for line in files['recipes.ndjson'].splitlines()]
+        self.assertEqual(
+            ids, list(user.recipe_set.order_by('id').values_list(
+                'id', flat=True)))
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            self.export(user='nobody@example.com')
+
+
+class ImportRecipesTests(TestCase):
+    """Test import_recipes command."""
+
+    def test_import_recipes(self):
+        """Test catalogs are imported with a rows per second report."""
+        get_user_model().objects.create_user('admin@example.com', 'pass123')
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.csv')
+            with open(path, 'w') as file:
+                file.write('recipe,title,time_minutes,ingredient,amount\n'
+                           '1,Dal,30,lentils,200\n2,Rice,15,rice,100\n')
+            call_command('import_recipes', path, user='admin@example.com',
+                         workers=1, skip_index=True, stdout=out)
 
-        call_command('wait_for_db')
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertEqual(RecipeIngredient.objects.count(), 2)
+        self.assertIn('rows/s', out.getvalue())
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', 'catalog.csv',
+                         user='nobody@example.com', stdout=StringIO())
@@ -0,0 +1,31 @@
+"""
+Tests for work deferred to commits.
+"""
+from django.test import TestCase
+
+from core.commits import CommitBuffer
+
+
+class CommitBufferTests(TestCase):
+    """Test keys are handed over once the transaction commits."""
+
+    def setUp(self):
+        self.calls = []
+        self.buffer = CommitBuffer(self.calls.append)
+
+    def test_keys_passed_once_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.add(1)
+            self.buffer.add(2)
+            self.buffer.add(1)
+            self.assertEqual(self.calls, [])
+
+        self.assertEqual(self.calls, [{1, 2}])
+
+    def test_keys_of_next_transaction_kept_apart(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.add(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.add(2)
+
+        self.assertEqual(self.calls, [{1}, {2}])
@@ -0,0 +1,146 @@
+"""
+Tests for response compression.
+"""
+import gzip
+import json
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import cache, compression
+from core.middleware import CompressionMiddleware
+from home.helper_method import create_recipe, create_user
+
+RECIPES_URL = reverse('recipe:recipe-list')
+BODY = json.dumps([{'id': i, 'title': 'Dal'} for i in range(200)]).encode()
+
+
+def respond(response, accept='gzip'):
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+class NegotiationTests(SimpleTestCase):
+    """Test choosing an encoding from Accept-Encoding."""
+
+    def test_negotiate(self):
+        """Test q-values, wildcards and unknown codings."""
+        cases = [
+            ('gzip, deflate', 'gzip'),
+            ('deflate', None),
+            ('gzip;q=0', None),
+            ('*', compression.available()[0]),
+            ('identity, *;q=0', None),
+            ('', None),
+        ]
+        for header, expected in cases:
+            self.assertEqual(compression.negotiate(header), expected, header)
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli_preferred(self):
+        """Test brotli wins over gzip unless gzip has a higher q."""
+        self.assertEqual(compression.negotiate('gzip, br'), 'br')
+        self.assertEqual(compression.negotiate('gzip, br;q=0.5'), 'gzip')
+
+    @patch('core.compression.brotli', None)
+    def test_without_brotli(self):
+        """Test br is never chosen when brotli is missing."""
+        self.assertEqual(compression.negotiate('br, gzip;q=0.1'), 'gzip')
+        self.assertIsNone(compression.negotiate('br'))
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test compressing responses."""
+
+    def test_compresses_large_bodies(self):
+        """Test bodies over the threshold are gzipped."""
+        response = respond(HttpResponse(
+            BODY, content_type='application/json'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+        self.assertEqual(response['Content-Length'],
+                         str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_skips_small_bodies(self):
+        """Test bodies under the threshold are sent as they are."""
+        response = respond(HttpResponse(
+            b'{"id": 1}', content_type='application/json'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_skips_incompressible_types(self):
+        """Test only configured content types are compressed."""
+        response = respond(HttpResponse(BODY, content_type='image/png'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_client_without_encoding(self):
+        """Test clients not accepting gzip get the plain body."""
+        response = respond(HttpResponse(
+            BODY, content_type='application/json'), accept='')
+
+        self.assertEqual(response.content, BODY)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_etag_weakened(self):
+        """Test strong ETags become weak on compressed bodies."""
+        plain = HttpResponse(BODY, content_type='application/json')
+        plain['ETag'] = '"abc"'
+
+        self.assertEqual(respond(plain)['ETag'], 'W/"abc"')
+
+    def test_streaming(self):
+        """Test streaming responses are compressed chunk by chunk."""
+        chunks = [BODY[:500], BODY[500:], b'']
+        response = respond(StreamingHttpResponse(
+            iter(chunks), content_type='application/json'))
+
+        parts = list(response.streaming_content)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertGreater(len(parts), 2)
+        self.assertEqual(gzip.decompress(b''.join(parts)), BODY)
+
+
+@override_settings(RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=True))
+class CachedCompressionTests(TestCase):
+    """Test compressed bodies kept in the response cache."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        user = create_user(email='user@example.com', password='Test123')
+        for i in range(30):
+            create_recipe(user, title=f'Recipe {i}')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_hits_are_not_compressed_again(self):
+        """Test repeat hits reuse the stored compressed body."""
+        plain = self.client.get(RECIPES_URL).content
+        res1 = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+        with patch('core.compression.compress') as patched:
+            res2 = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        patched.assert_not_called()
+        self.assertEqual(res2['X-Cache'], 'HIT')
+        self.assertEqual(res2['Content-Encoding'], 'gzip')
+        self.assertEqual(res2.content, res1.content)
+        self.assertEqual(gzip.decompress(res2.content), plain)
+
+    def test_miss_stores_compressed_body(self):
+        """Test the first compressed response is stored for later hits."""
+        res1 = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+        with patch('core.compression.compress') as patched:
+            res2 = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        patched.assert_not_called()
+        self.assertEqual(res1['X-Cache'], 'MISS')
+        self.assertEqual(res1['Content-Encoding'], 'gzip')
+        self.assertEqual(res2.content, res1.content)
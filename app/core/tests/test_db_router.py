@@ -0,0 +1,111 @@
+"""
+Tests for the primary/replica database router.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.db_router import (
+    PIN_COOKIE,
+    PrimaryReplicaRouter,
+    ReplicaRoutingMiddleware,
+    _client_key,
+    current_state,
+    use_replicas,
+)
+from core.models import Recipe
+
+REPLICAS = ['replica1', 'replica2']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class RouterTests(SimpleTestCase):
+    """Test routing decisions."""
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test reads without a request context go to the primary."""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_safe_reads_use_replicas(self):
+        """Test reads allowed by the request go to a replica."""
+        with use_replicas():
+            self.assertIn(self.router.db_for_read(Recipe), REPLICAS)
+
+    def test_reads_after_write_use_primary(self):
+        """Test reads following a write in the same request stick to
+        the primary."""
+        with use_replicas():
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+            self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_no_replicas_configured(self):
+        """Test the router steps aside without replicas."""
+        with override_settings(DATABASE_REPLICAS=[]), use_replicas():
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_replicas_are_not_migrated(self):
+        """Test migrations only run on the primary."""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS,
+                   DATABASE_PRIMARY_PIN_SECONDS=5)
+class ReplicaRoutingMiddlewareTests(SimpleTestCase):
+    """Test the request level routing middleware."""
+
+    def setUp(self):
+        caches['pins'].clear()
+        self.factory = RequestFactory()
+        self.seen = []
+
+        def view(request):
+            self.seen.append(current_state().use_replicas)
+            return HttpResponse()
+
+        self.middleware = ReplicaRoutingMiddleware(view)
+
+    def test_get_may_use_replicas(self):
+        """Test a plain GET request is routed to replicas."""
+        self.middleware(self.factory.get('/api/recipe/recipes/'))
+        self.assertEqual(self.seen, [True])
+
+    def test_write_pins_client_to_primary(self):
+        """Test a write pins the client through cookie and token."""
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+        response = self.middleware(
+            self.factory.post('/api/recipe/recipes/', **auth))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        self.middleware(self.factory.get('/api/recipe/recipes/', **auth))
+        request = self.factory.get('/api/recipe/recipes/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        self.middleware(request)
+        self.middleware(self.factory.get(
+            '/api/recipe/recipes/', HTTP_AUTHORIZATION='Token other'))
+
+        self.assertEqual(self.seen, [False, False, False, True])
+
+    def test_token_pin_is_shared_between_workers(self):
+        """Test token pins go to the cache shared by all workers."""
+        request = self.factory.post(
+            '/api/recipe/recipes/', HTTP_AUTHORIZATION='Token abc')
+        self.middleware(request)
+
+        self.assertIsInstance(caches['pins'], FileBasedCache)
+        self.assertIsNotNone(caches['pins'].get(_client_key(request)))
+        self.assertIsNone(caches['default'].get(_client_key(request)))
+
+        other_worker = ReplicaRoutingMiddleware(self.middleware.get_response)
+        other_worker(self.factory.get(
+            '/api/recipe/recipes/', HTTP_AUTHORIZATION='Token abc'))
+        self.assertEqual(self.seen, [False, False])
+
+    def test_state_is_reset_after_request(self):
+        """Test routing state does not leak out of the request."""
+        self.middleware(self.factory.get('/api/recipe/recipes/'))
+        self.assertIsNone(current_state())
@@ -0,0 +1,118 @@
+"""
+Tests for allergen and diet flags.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from core import dietary
+from core.models import Recipe
+from recipe.helper_method import (
+    create_user,
+    create_recipe,
+    create_ingredient,
+    create_recipe_ingredient,
+)
+
+MEAT = dietary.FLAGS['meat']
+MILK = dietary.FLAGS['milk']
+NUTS = dietary.FLAGS['nuts']
+
+
+class FlagTests(SimpleTestCase):
+    """Test flag masks and diets."""
+
+    def test_mask_and_names(self):
+        mask = dietary.mask(['milk', 'gluten'])
+
+        self.assertEqual(dietary.names(mask), ['gluten', 'milk'])
+        with self.assertRaises(ValueError):
+            dietary.mask(['plutonium'])
+
+    def test_excluded(self):
+        """Test diets expand to their flags, plus unclassified."""
+        vegetarian = dietary.DIET_BITS['vegetarian']
+
+        flags = dietary.excluded(vegetarian, NUTS)
+
+        self.assertEqual(set(dietary.names(flags)), {
+            'meat', 'fish', 'crustaceans', 'molluscs', 'nuts',
+            'unclassified'})
+        self.assertEqual(dietary.excluded(), 0)
+
+    def test_suitable_diets(self):
+        self.assertEqual(dietary.suitable_diets(MILK), [
+            'vegetarian', 'pescatarian', 'gluten_free', 'alcohol_free'])
+        self.assertEqual(dietary.suitable_diets(MILK | dietary.UNCLASSIFIED),
+                         [])
+
+
+class MaintenanceTests(TestCase):
+    """Test recipe flags follow line and ingredient changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='user@example.com', password='Test123')
+        cls.beef = create_ingredient(cls.user, name='Beef',
+                                     dietary_flags=MEAT)
+        cls.butter = create_ingredient(cls.user, name='Butter',
+                                       dietary_flags=MILK)
+        cls.pesto = create_ingredient(cls.user, name='Pesto')
+
+    def flags(self, recipe):
+        return Recipe.objects.values_list(
+            'dietary_flags', flat=True).get(id=recipe.id)
+
+    def test_new_ingredients_are_unclassified(self):
+        self.assertEqual(self.pesto.dietary_flags, dietary.UNCLASSIFIED)
+
+    def test_line_changes(self):
+        """Test adding, moving and deleting lines recompute flags."""
+        recipe = create_recipe(self.user, title='Stew')
+        other = create_recipe(self.user, title='Pasta')
+        with self.captureOnCommitCallbacks(execute=True):
+            line = create_recipe_ingredient(recipe, self.beef)
+            create_recipe_ingredient(recipe, self.butter)
+        self.assertEqual(self.flags(recipe), MEAT | MILK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line.recipe = other
+            line.save()
+        self.assertEqual(self.flags(recipe), MILK)
+        self.assertEqual(self.flags(other), MEAT)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line.delete()
+        self.assertEqual(self.flags(other), 0)
+
+    def test_ingredient_changes(self):
+        """Test recipes using an ingredient follow its flags."""
+        recipe = create_recipe(self.user, title='Pasta')
+        create_recipe_ingredient(recipe, self.butter)
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe_ingredient(recipe, self.pesto)
+        self.assertEqual(self.flags(recipe), MILK | dietary.UNCLASSIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pesto.dietary_flags = MILK | NUTS
+            self.pesto.save()
+        self.assertEqual(self.flags(recipe), MILK | NUTS)
+
+        # Other changes to the ingredient leave its recipes alone.
+        Recipe.objects.update(dietary_flags=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pesto.name = 'Basil pesto'
+            self.pesto.save()
+        self.assertEqual(self.flags(recipe), 0)
+
+    def test_rebuild_command(self):
+        recipe = create_recipe(self.user, title='Stew')
+        create_recipe_ingredient(recipe, self.beef)
+        create_recipe_ingredient(recipe, self.pesto)
+        Recipe.objects.update(dietary_flags=0)
+
+        call_command('rebuild_dietary_flags', batch_size=1,
+                     stdout=StringIO())
+
+        self.assertEqual(self.flags(recipe), MEAT | dietary.UNCLASSIFIED)
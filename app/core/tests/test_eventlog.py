@@ -0,0 +1,172 @@
+"""
+Tests for the durable event log.
+"""
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import eventlog, events
+from recipe.helper_method import create_user, create_recipe
+
+
+def records(count, start=0, key=b''):
+    return [(key, f'event {i}'.encode()) for i in range(start, start + count)]
+
+
+class EventLogTests(SimpleTestCase):
+    """Test appending, reading and maintaining the log."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+        # Records take 25 bytes, so a segment holds four.
+        self.log = eventlog.EventLog(self.path, segment_bytes=100,
+                                     fsync=False)
+
+    def test_append_and_read_across_segments(self):
+        self.assertEqual(self.log.append(records(10)), list(range(10)))
+        self.assertEqual(self.log.segments(), [0, 4, 8])
+
+        first, position = self.log.read(0, limit=6)
+        rest, _ = self.log.read(6, position=position)
+
+        self.assertEqual([r.offset for r in first + rest], list(range(10)))
+        self.assertEqual(rest[-1].value, b'event 9')
+        self.assertEqual(self.log.end_offset(), 10)
+
+    def test_writers_continue_each_other(self):
+        """Test offsets carry on across log instances, as across
+        processes."""
+        self.log.append(records(3))
+        other = eventlog.EventLog(self.path, segment_bytes=100, fsync=False)
+
+        self.assertEqual(other.append(records(2)), [3, 4])
+        self.assertEqual(self.log.append(records(1)), [5])
+
+    def test_torn_write_is_truncated(self):
+        self.log.append(records(2))
+        with open(os.path.join(self.path, f'{0:020d}.log'), 'ab') as fh:
+            fh.write(b'\x01\x02\x03')
+
+        self.assertEqual(len(self.log.read(0)[0]), 2)
+        with self.assertLogs('core.eventlog', 'WARNING'):
+            self.assertEqual(
+                eventlog.EventLog(self.path, fsync=False).append(records(1)),
+                [2])
+        self.assertEqual(
+            [r.value for r in self.log.read(2)[0]], [b'event 0'])
+
+    def test_tail_recovery_reads_only_new_bytes(self):
+        """Test a writer resumes from where it stopped, reading only what
+        other writers appended."""
+        self.log.append(records(2))
+        other = eventlog.EventLog(self.path, segment_bytes=100, fsync=False)
+        other.append(records(1))
+        reads = []
+        real_open = open
+
+        def tracking_open(path, mode='r', *args, **kwargs):
+            fh = real_open(path, mode, *args, **kwargs)
+            if str(path).endswith(eventlog.SUFFIX):
+                real_read = fh.read
+                fh.read = lambda *a: reads.append(fh.tell()) or real_read(*a)
+            return fh
+
+        with patch('builtins.open', tracking_open):
+            self.assertEqual(self.log.append(records(1)), [3])
+
+        self.assertEqual(reads, [50])
+
+    def test_consumer_is_at_least_once(self):
+        self.log.append(records(5))
+        consumer = self.log.consumer('feed')
+
+        def fail(batch):
+            raise RuntimeError('down')
+
+        with self.assertRaises(RuntimeError):
+            consumer.consume(fail, limit=3)
+        handled = []
+        self.assertEqual(consumer.consume(handled.extend, limit=3), 3)
+        self.assertEqual(consumer.consume(handled.extend), 2)
+        self.assertEqual([r.offset for r in handled], list(range(5)))
+        self.assertEqual(consumer.committed, 5)
+
+        consumer.seek(1)
+        self.assertEqual([r.offset for r in consumer.poll(limit=2)], [1, 2])
+        # A restarted consumer resumes from the committed offset.
+        self.assertEqual(self.log.consumer('feed').committed, 1)
+
+    def test_retention_skips_consumers_forward(self):
+        self.log.append(records(10))
+
+        self.assertEqual(self.log.retain(max_bytes=150), 1)
+
+        self.assertEqual(self.log.segments(), [4, 8])
+        self.assertEqual(self.log.consumer('feed').poll(limit=1)[0].offset,
+                         4)
+        # The active segment is always kept.
+        self.assertEqual(self.log.retain(max_age=-1), 1)
+        self.assertEqual(self.log.segments(), [8])
+
+    def test_compaction_keeps_latest_per_key(self):
+        self.log.append([(b'recipe:1', b'v1'), (b'recipe:2', b'v1'),
+                         (b'', b'note'), (b'recipe:1', b'v2'),
+                         (b'recipe:2', b'v2'), (b'recipe:3', b'v1')])
+        self.assertEqual(self.log.segments(), [0, 3])
+
+        self.assertGreater(self.log.compact(), 0)
+
+        kept, _ = self.log.read(0)
+        self.assertEqual([(r.offset, r.key, r.value) for r in kept], [
+            (2, b'', b'note'), (3, b'recipe:1', b'v2'),
+            (4, b'recipe:2', b'v2'), (5, b'recipe:3', b'v1')])
+        self.assertEqual(self.log.append(records(1)), [6])
+
+    def test_rewritten_files_are_world_readable(self):
+        """Test compacted segments and offsets keep the usual mode."""
+        self.log.append([(b'recipe:1', b'v1')] * 6)
+        self.log.compact()
+        self.log.consumer('feed').commit(3)
+
+        for name in ['00000000000000000000.log', 'offsets/feed']:
+            mode = os.stat(os.path.join(self.path, name)).st_mode
+            self.assertEqual(mode & 0o777, 0o644)
+
+
+class EventLogSubscriberTests(TestCase):
+    """Test committed model events are appended to the log."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        config = dict(settings.EVENT_LOG, ENABLED=True, PATH=directory.name)
+        override = override_settings(EVENT_LOG=config)
+        override.enable()
+        self.addCleanup(override.disable)
+        eventlog.connect()
+        self.addCleanup(events.bus.unsubscribe, 'eventlog')
+
+    def test_model_events_are_logged(self):
+        user = create_user(email='user@example.com', password='Test123')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(user, title='Dal')
+
+        (record,), _ = eventlog.get_log().read(0)
+        event = eventlog.decode_event(record)
+        self.assertEqual(record.key, f'recipe:{recipe.id}'.encode())
+        self.assertEqual(event.topic, 'recipe/created')
+        self.assertEqual(event.data, {'user_id': user.id})
+
+    def test_maintain_command(self):
+        out = StringIO()
+
+        call_command('maintain_event_log', compact=True, stdout=out)
+
+        self.assertIn('Deleted 0 segments.', out.getvalue())
@@ -0,0 +1,245 @@
+"""
+Tests for the model event bus.
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.test import (
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import cache, events
+from core.models import FavHomeRecipe
+from home.helper_method import create_home
+from recipe.helper_method import create_user, create_recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+FAV_RECIPE_CREATE_URL = reverse('home:fav-recipe-create')
+
+
+def recipe_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def make_event(pk, action='created'):
+    return events.Event('recipe', action, pk, {'user_id': 1}, None)
+
+
+class EventBusTests(SimpleTestCase):
+    """Test routing and asynchronous delivery."""
+
+    def test_sync_bus_routes_by_topic(self):
+        bus = events.EventBus(asynchronous=False)
+        received = []
+        bus.subscribe('test', ['recipe/created'], received.extend)
+
+        bus.publish(make_event(1))
+        bus.publish(make_event(2, action='deleted'))
+
+        self.assertEqual([event.pk for event in received], [1])
+
+    def test_overlapping_patterns_deliver_once(self):
+        bus = events.EventBus(asynchronous=False)
+        received = []
+        bus.subscribe('test', ['recipe/+', 'recipe/#'], received.extend)
+
+        bus.publish(make_event(1))
+
+        self.assertEqual(len(received), 1)
+
+    def test_resubscribe_replaces_patterns(self):
+        bus = events.EventBus(asynchronous=False)
+        received = []
+        first = bus.subscribe('test', ['recipe/+'], received.extend)
+        second = bus.subscribe('test', ['recipe/deleted'], received.extend)
+
+        bus.publish(make_event(1))
+        bus.publish(make_event(2, action='deleted'))
+
+        self.assertEqual([event.pk for event in received], [2])
+        self.assertGreater(second.id, first.id)
+        with self.assertRaises(ValueError):
+            bus.subscribe('test', ['recipe/#/deleted'], received.extend)
+        self.assertEqual(bus.subscribers('recipe/deleted'), [second])
+
+    def test_async_bus_batches_on_worker(self):
+        """Test events queued while the worker is busy arrive together."""
+        bus = events.EventBus(asynchronous=True, batch_size=100)
+        release = threading.Event()
+        batches = []
+
+        def handler(batch):
+            release.wait(5)
+            batches.append((threading.current_thread().name,
+                            [event.pk for event in batch]))
+
+        bus.subscribe('test', ['recipe/created'], handler)
+        for pk in range(5):
+            bus.publish(make_event(pk))
+        release.set()
+
+        self.assertTrue(bus.drain(timeout=5))
+        self.assertEqual([pk for _, pks in batches for pk in pks],
+                         list(range(5)))
+        self.assertLess(len(batches), 5)
+        self.assertEqual({name for name, _ in batches}, {'events-test'})
+        self.assertEqual(bus.stats()['subscribers']['test'],
+                         {'handled': 5, 'queued': 0})
+
+    def test_full_queue_runs_handler_inline(self):
+        bus = events.EventBus(asynchronous=True, queue_size=1)
+        release = threading.Event()
+        threads = []
+
+        def handler(batch):
+            threads.append(threading.current_thread())
+            if threading.current_thread() is not threading.main_thread():
+                release.wait(5)
+
+        bus.subscribe('test', ['recipe/created'], handler)
+        for pk in range(3):
+            bus.publish(make_event(pk))
+        release.set()
+        bus.drain(timeout=5)
+
+        self.assertIn(threading.main_thread(), threads)
+        self.assertGreaterEqual(
+            bus.stats()['subscribers']['test']['overflowed'], 1)
+
+    def test_inline_and_database_subscribers(self):
+        """Test inline subscribers, and database ones on SQLite, run on
+        the publishing thread of an asynchronous bus."""
+        bus = events.EventBus(asynchronous=True)
+        threads = {}
+
+        def handler(name):
+            return lambda batch: threads.setdefault(
+                name, threading.current_thread())
+
+        bus.subscribe('inline', ['recipe/+'], handler('inline'),
+                      inline=True)
+        database = bus.subscribe('database', ['recipe/+'],
+                                 handler('database'), database=True)
+        bus.publish(make_event(1))
+        self.assertTrue(bus.drain(timeout=5))
+
+        sqlite = connection.vendor == 'sqlite'
+        self.assertEqual(database.inline, sqlite)
+        self.assertIs(threads['inline'], threading.current_thread())
+        self.assertEqual(
+            threads['database'] is threading.current_thread(), sqlite)
+
+    def test_failing_handler_is_counted(self):
+        bus = events.EventBus(asynchronous=True)
+
+        def handler(batch):
+            raise RuntimeError('boom')
+
+        bus.subscribe('test', ['recipe/created'], handler)
+        with self.assertLogs('core.events', 'ERROR'):
+            bus.publish(make_event(1))
+            self.assertTrue(bus.drain(timeout=5))
+
+        self.assertEqual(bus.stats()['subscribers']['test']['failed'], 1)
+
+
+class ModelEventTests(TestCase):
+    """Test model changes publish events once committed."""
+
+    def setUp(self):
+        self.received = []
+        events.subscribe('test', ['recipe/+', 'home/+/favhomerecipe/#'],
+                         self.received.extend)
+        self.addCleanup(events.bus.unsubscribe, 'test')
+        self.user = create_user(email='user@example.com', password='Test123')
+
+    def test_recipe_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.user, title='Dal')
+        recipe_id = recipe.id
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.title = 'Tadka dal'
+            recipe.save()
+            recipe.delete()
+
+        self.assertEqual(
+            [(event.topic, event.pk) for event in self.received],
+            [('recipe/created', recipe_id), ('recipe/updated', recipe_id),
+             ('recipe/deleted', recipe_id)])
+        self.assertEqual(self.received[0].data, {'user_id': self.user.id})
+
+    def test_uncommitted_changes_are_not_published(self):
+        create_recipe(self.user, title='Dal')
+
+        self.assertEqual(self.received, [])
+
+    def test_update_carries_previous_values(self):
+        recipe = create_recipe(self.user, title='Dal')
+        home = create_home(name='Home')
+        fav = FavHomeRecipe.objects.create(home=home, recipe=recipe,
+                                           rating=3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            fav.rating = 5
+            fav.save()
+
+        (event,) = self.received
+        self.assertEqual(event.topic, f'home/{home.id}/favhomerecipe/updated')
+        self.assertEqual(event.data, {
+            'home_id': home.id, 'recipe_id': recipe.id, 'rating': 5})
+        self.assertEqual(event.previous, {
+            'home_id': home.id, 'recipe_id': recipe.id, 'rating': 3})
+
+
+@override_settings(
+    EVENTS=dict(settings.EVENTS, ASYNC=True),
+    RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=True))
+class AsyncEventApiTests(TransactionTestCase):
+    """Test API writes with subscribers on their worker threads.
+
+    Writes are committed, so the workers' own connections see them.
+    """
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.home = create_home()
+        self.user = create_user(email='user@example.com', password='Test123')
+        self.user.home = self.home
+        self.user.save()
+        self.recipe = create_recipe(self.user, title='Dal')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.addCleanup(events.bus.drain, 5)
+
+    def test_favourite_updates_popularity(self):
+        """Test a favourite reaches the recipe aggregates."""
+        res = self.client.post(FAV_RECIPE_CREATE_URL,
+                               {'recipe': self.recipe.id, 'rating': 4})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(events.bus.drain(timeout=5))
+
+        res = self.client.get(recipe_url(self.recipe.id))
+
+        self.assertEqual(res.data['fav_count'], 1)
+        self.assertEqual(res.data['avg_rating'], 4.0)
+
+    def test_cached_read_after_write(self):
+        """Test a client reads its own write without waiting for the
+        bus."""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.patch(recipe_url(self.recipe.id),
+                                {'title': 'Tadka dal'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual([recipe['title'] for recipe in res.data],
+                         ['Tadka dal'])
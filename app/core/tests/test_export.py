@@ -0,0 +1,117 @@
+"""
+Tests for the streaming export.
+"""
+import csv
+import gzip
+import io
+import json
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from home.helper_method import (
+    add_recipe_ingredient,
+    add_to_inventory,
+    create_fav_recipe,
+    create_home,
+    create_ingredient,
+    create_recipe,
+    create_user,
+)
+
+
+def export_url(dataset):
+    return reverse('export', args=[dataset])
+
+
+def content(response):
+    return b''.join(response.streaming_content)
+
+
+class ExportTests(TestCase):
+    """Test exporting a user's and a home's data."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.home = create_home()
+        cls.user = create_user(email='user@example.com', password='pass123',
+                               home=cls.home)
+        other = create_user(email='other@example.com', password='pass123',
+                            home=create_home(name='Elms'))
+        salt = create_ingredient(cls.user, name='Salt')
+        cls.recipes = [create_recipe(cls.user, title=f'Recipe, {i}')
+                       for i in range(3)]
+        create_recipe(other, title='Not mine')
+        add_recipe_ingredient(cls.recipes[0], salt, amount=5)
+        add_to_inventory(cls.home, salt, amount=40)
+        add_to_inventory(other.home, salt, amount=1)
+        create_fav_recipe(cls.home, cls.recipes[1], rating=7)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_ndjson(self):
+        """Test recipes stream as one JSON object per line."""
+        res = self.client.get(export_url('recipes'))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertIn('filename="recipes.ndjson"',
+                      res['Content-Disposition'])
+        rows = [json.loads(line) for line in content(res).splitlines()]
+        self.assertEqual([row['title'] for row in rows],
+                         ['Recipe, 0', 'Recipe, 1', 'Recipe, 2'])
+        self.assertEqual(rows[0]['id'], self.recipes[0].id)
+
+    def test_csv(self):
+        """Test home datasets stream as CSV with a header line."""
+        res = self.client.get(export_url('inventory'), {'output': 'csv'})
+
+        rows = list(csv.reader(io.StringIO(content(res).decode())))
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertEqual(rows, [
+            ['id', 'ingredient', 'ingredient_name', 'amount', 'amount_unit'],
+            [rows[1][0], rows[1][1], 'Salt', '40', 'g'],
+        ])
+
+    def test_gzip(self):
+        """Test exports can be gzipped on the fly."""
+        res = self.client.get(export_url('favourites'), {'gzip': 'true'})
+
+        self.assertEqual(res['Content-Type'], 'application/gzip')
+        self.assertIn('favourites.ndjson.gz', res['Content-Disposition'])
+        self.assertFalse(res.has_header('Content-Encoding'))
+        row = json.loads(gzip.decompress(content(res)))
+        self.assertEqual(row['recipe_title'], 'Recipe, 1')
+        self.assertEqual(row['rating'], 7)
+
+    @patch('core.export.CHUNK_BYTES', 64)
+    @patch('core.export.CHUNK_ROWS', 1)
+    def test_chunked(self):
+        """Test rows are fetched and sent in chunks."""
+        res = self.client.get(export_url('recipes'))
+
+        self.assertEqual(len(list(res.streaming_content)), 3)
+
+    def test_errors(self):
+        """Test unknown datasets, formats and users without a home."""
+        res = self.client.get(export_url('users'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.get(export_url('recipes'), {'output': 'xml'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        homeless = create_user(email='homeless@example.com', password='x')
+        self.client.force_authenticate(homeless)
+        res = self.client.get(export_url('inventory'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_auth_required(self):
+        res = APIClient().get(export_url('recipes'))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,141 @@
+"""
+Tests for sparse fieldsets.
+"""
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+
+from core import fieldsets
+from core.models import Recipe
+from home.helper_method import (
+    add_recipe_ingredient,
+    add_to_inventory,
+    create_home,
+    create_ingredient,
+    create_recipe,
+    create_user,
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+RECIPE_INGREDIENTS_URL = reverse('recipe:recipeingredient-list')
+INVENTORY_URL = reverse('home:inventory-fetch')
+
+
+def recipe_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class SparseFieldsetTests(TestCase):
+    """Test ?fields= and ?omit= on API reads."""
+
+    @classmethod
+    def setUpTestData(cls):
+        home = create_home()
+        cls.user = create_user(email='user@example.com', password='pass123',
+                               name='Cook', home=home)
+        ingredient = create_ingredient(cls.user, name='Salt')
+        add_to_inventory(home, ingredient, amount=40)
+        cls.recipes = [create_recipe(cls.user, title=f'Recipe {i}')
+                       for i in range(3)]
+        for recipe in cls.recipes:
+            add_recipe_ingredient(recipe, ingredient)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        return res, [query['sql'] for query in queries]
+
+    def test_fields_trim_output_and_columns(self):
+        """Test only the selected fields are sent and selected from SQL."""
+        res, queries = self.get(RECIPES_URL, fields='id,title')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0], {'id': self.recipes[-1].id,
+                                       'title': 'Recipe 2'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0])
+        self.assertNotIn('"link"', queries[0])
+
+    def test_related_field_joined_once(self):
+        """Test a field reading a relation joins it instead of N queries."""
+        res, queries = self.get(RECIPES_URL, fields='title,created_by')
+
+        self.assertEqual([row['created_by'] for row in res.data],
+                         ['Cook'] * 3)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('JOIN', queries[0])
+
+    def test_omit(self):
+        """Test omitted fields are dropped from the full set."""
+        res, queries = self.get(recipe_url(self.recipes[0].id),
+                                omit='description,created_by')
+
+        self.assertEqual(set(res.data), {'id', 'title', 'time_minutes',
+                                         'link', 'fav_count', 'avg_rating',
+                                         'nutrition', 'contains', 'diets'})
+        self.assertNotIn('"description"', queries[0])
+
+    def test_property_sources(self):
+        """Test fields backed by properties load what they read."""
+        res, queries = self.get(RECIPES_URL, fields='avg_rating')
+
+        self.assertEqual(res.data[0], {'avg_rating': None})
+        self.assertEqual(len(queries), 1)
+
+    def test_unknown_field(self):
+        """Test asking for a field that does not exist is an error."""
+        res = self.client.get(RECIPES_URL, {'fields': 'id,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['fields'], ['Unknown field: secret.'])
+
+    def test_writes_return_every_field(self):
+        """Test write requests ignore sparse fieldsets."""
+        res = self.client.post(f'{RECIPES_URL}?fields=id', {
+            'title': 'Soup', 'time_minutes': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn('created_by', res.data)
+
+    def test_nested_sources(self):
+        """Test lists reading other tables join only what is selected."""
+        res, queries = self.get(RECIPE_INGREDIENTS_URL,
+                                fields='id,ingredient_name')
+        self.assertEqual({row['ingredient_name'] for row in res.data},
+                         {'Salt'})
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"core_ingredient"', queries[0])
+        self.assertNotIn('"core_recipe"', queries[0])
+
+        res, queries = self.get(INVENTORY_URL, fields='amount')
+        self.assertEqual(res.data, [{'amount': 40}])
+        self.assertNotIn('JOIN', queries[-1])
+
+
+class NarrowTests(TestCase):
+    """Test narrowing querysets to serializer fields."""
+
+    def test_unknown_source_disables_narrowing(self):
+        """Test fields reading non-model attributes keep every column."""
+
+        class Serializer(fieldsets.SparseFieldsMixin,
+                         serializers.ModelSerializer):
+            label = serializers.ReadOnlyField(source='__str__')
+
+            class Meta:
+                model = Recipe
+                fields = ['id', 'label']
+
+        queryset = Recipe.objects.all()
+
+        self.assertIs(fieldsets.narrow(queryset, Serializer), queryset)
+        self.assertEqual(
+            fieldsets.narrow(queryset, Serializer, ['id']).query
+            .deferred_loading, ({'id', 'user'}, False))
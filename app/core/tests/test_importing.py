@@ -0,0 +1,169 @@
+"""
+Tests for bulk recipe imports.
+"""
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+
+from core import importing
+from core.models import ImportedChunk, Ingredient, Recipe, RecipeIngredient
+from home.helper_method import create_ingredient, create_user
+
+JSONLD = {
+    '@context': 'https://schema.org',
+    '@graph': [
+        {'@type': 'WebPage', 'name': 'Not a recipe'},
+        {
+            '@type': ['Recipe'],
+            'name': 'Pancakes',
+            'description': 'Fluffy.',
+            'prepTime': 'PT10M',
+            'cookTime': 'PT20M',
+            'url': 'https://example.com/pancakes',
+            'recipeIngredient': ['200 g Flour, sifted', '2 eggs',
+                                 '1½ cups of milk', 'salt to taste'],
+        },
+    ],
+}
+CSV = '''recipe,title,time_minutes,ingredient,amount,amount_unit,mandatory
+1,Dal,30,lentils,200,g,true
+1,Dal,30,salt,5,g,false
+2,Rice,15,rice,100,g,
+3,,10,water,1,l,
+'''
+
+
+def write(directory, name, content):
+    path = os.path.join(directory, name)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    return path
+
+
+class ParseTests(SimpleTestCase):
+    """Test parsing catalog records."""
+
+    def test_ingredient_lines(self):
+        cases = [
+            ('200 g Flour, sifted', ('flour', 200, 'g', True)),
+            ('1½ cups of milk', ('milk', 2, 'cups', True)),
+            ('1/2 tsp. salt', ('salt', 1, 'tsp', True)),
+            ('2 large eggs', ('large eggs', 2, '', True)),
+            ('Salt to taste', ('salt to taste', 0, '', False)),
+        ]
+        for text, expected in cases:
+            self.assertEqual(importing.parse_ingredient_line(text), expected)
+
+    def test_durations(self):
+        self.assertEqual(importing.parse_duration('PT1H30M'), 90)
+        self.assertEqual(importing.parse_duration('P1DT2H'), 1560)
+        self.assertEqual(importing.parse_duration('45'), 45)
+        with self.assertRaises(ValueError):
+            importing.parse_duration('an hour')
+
+    def test_jsonld(self):
+        """Test recipes are found in @graph and mapped to fields."""
+        (recipe,) = importing.parse_jsonld(JSONLD)
+
+        title, description, time_minutes, link, lines = recipe
+        self.assertEqual((title, time_minutes, link),
+                         ('Pancakes', 30, 'https://example.com/pancakes'))
+        self.assertEqual([line[0] for line in lines],
+                         ['flour', 'eggs', 'milk', 'salt to taste'])
+
+    def test_bad_records_skipped(self):
+        """Test records that do not parse are counted, not raised."""
+        recipes, errors = importing.parse_chunk('ndjson', [
+            '{"title": "Soup", "time_minutes": 5}',
+            '{"title": ""}',
+            'not json',
+        ])
+
+        self.assertEqual(len(recipes), 1)
+        self.assertEqual(len(errors), 2)
+
+
+class ImportFileTests(TestCase):
+    """Test importing catalog files."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='admin@example.com', password='pass123')
+        create_ingredient(cls.user, name='eggs')
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_import_formats(self):
+        """Test every format loads recipes and resolves ingredients."""
+        ndjson = '\n'.join(json.dumps(item) for item in [
+            {'title': 'Soup', 'time_minutes': 5, 'ingredients': [
+                {'name': 'eggs', 'amount': 2, 'amount_unit': 'pcs'},
+                {'name': 'eggs', 'amount': 3},
+                '1 l water',
+            ]},
+            {'@type': 'Recipe', 'name': 'Tea', 'totalTime': 'PT5M',
+             'recipeIngredient': ['1 l water']},
+        ])
+        files = {
+            'catalog.ndjson': ndjson,
+            'catalog.json': json.dumps(JSONLD),
+            'catalog.csv': CSV,
+        }
+        for name, content in files.items():
+            importing.import_file(
+                write(self.directory.name, name, content), self.user)
+
+        titles = sorted(Recipe.objects.values_list('title', flat=True))
+        self.assertEqual(titles, ['Dal', 'Pancakes', 'Rice', 'Soup', 'Tea'])
+        soup = Recipe.objects.get(title='Soup')
+        lines = RecipeIngredient.objects.filter(recipe=soup)
+        self.assertEqual(
+            sorted(lines.values_list('ingredient__name', 'amount')),
+            [('eggs', 2), ('water', 1)])
+        self.assertEqual(Ingredient.objects.filter(name='eggs').count(), 1)
+        self.assertEqual(Ingredient.objects.filter(name='water').count(), 1)
+        dal = RecipeIngredient.objects.filter(recipe__title='Dal')
+        self.assertEqual(sorted(dal.values_list('mandatory', flat=True)),
+                         [False, True])
+        self.assertEqual(Recipe.objects.create(
+            user=self.user, title='Next', time_minutes=1).id,
+            Recipe.objects.order_by('-id')[1].id + 1)
+
+    def test_resume(self):
+        """Test importing a file again only loads the missing chunks."""
+        ndjson = '\n'.join(json.dumps({'title': f'Recipe {i}'})
+                           for i in range(5))
+        path = write(self.directory.name, 'catalog.ndjson', ndjson)
+        load_chunk = importing.load_chunk
+        calls = []
+
+        def fail_third_chunk(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError('connection lost')
+            return load_chunk(*args, **kwargs)
+
+        with patch('core.importing.load_chunk', fail_third_chunk):
+            with self.assertRaises(RuntimeError):
+                importing.import_file(path, self.user, chunk_size=2)
+        self.assertEqual(Recipe.objects.count(), 4)
+
+        result = importing.import_file(path, self.user, chunk_size=3)
+
+        self.assertEqual(result.skipped_chunks, 2)
+        self.assertEqual((result.chunk_size, result.recipes), (2, 1))
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertEqual(ImportedChunk.objects.count(), 3)
+        result = importing.import_file(path, self.user)
+        self.assertEqual((result.skipped_chunks, result.recipes), (3, 0))
+
+    def test_unknown_extension(self):
+        path = write(self.directory.name, 'catalog.txt', '')
+
+        with self.assertRaises(ValueError):
+            importing.import_file(path, self.user)
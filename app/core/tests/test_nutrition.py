@@ -0,0 +1,103 @@
+"""
+Tests for the recipe nutrition summary.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from core import nutrition
+from core.models import IngredientNutrition, Recipe, RecipeIngredient
+from recipe.helper_method import (
+    create_user,
+    create_recipe,
+    create_ingredient,
+    create_recipe_ingredient,
+)
+
+
+class SummaryTests(SimpleTestCase):
+    """Test computing summaries from lines."""
+
+    def test_lines_scaled_by_amount(self):
+        """Test lines are converted to the unit nutrition is given for."""
+        summary = nutrition.summarize([
+            (200, 'g', 100, 'g', 350, 10, 1, 70),
+            (1, 'kg', 100, 'g', 10, 0, 0, 2),
+            (2, 'tbsp', 100, 'ml', 800, 0, 90, 0),
+            (2, 'pcs', 100, 'g', 150, 12, 10, 1),
+            (1, 'g', None, None, None, None, None, None),
+        ])
+
+        self.assertAlmostEqual(summary['kcal'], 700 + 100 + 240)
+        self.assertAlmostEqual(summary['protein'], 20)
+        self.assertAlmostEqual(summary['fat'], 2 + 27)
+        self.assertAlmostEqual(summary['carbs'], 140 + 20)
+        self.assertEqual(summary['nutrition_missing'], 2)
+
+    def test_unknown_totals_are_none(self):
+        summary = nutrition.summarize([(1, 'g', None, None) + (None,) * 4])
+
+        self.assertIsNone(summary['kcal'])
+        self.assertEqual(summary['nutrition_missing'], 1)
+
+
+class MaintenanceTests(TestCase):
+    """Test summaries follow line and nutrition changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='user@example.com', password='Test123')
+        cls.flour = create_ingredient(cls.user, name='Flour')
+        cls.butter = create_ingredient(cls.user, name='Butter')
+        IngredientNutrition.objects.create(
+            ingredient=cls.flour, kcal=350, protein=10, fat=1, carbs=70)
+
+    def summary(self, recipe):
+        return Recipe.objects.values_list(
+            'kcal', 'protein', 'nutrition_missing').get(id=recipe.id)
+
+    def test_line_changes(self):
+        """Test adding, moving and deleting lines recompute totals."""
+        recipe = create_recipe(self.user, title='Bread')
+        other = create_recipe(self.user, title='Cake')
+        with self.captureOnCommitCallbacks(execute=True):
+            line = create_recipe_ingredient(
+                recipe, self.flour, amount=500, amount_unit='g')
+            create_recipe_ingredient(
+                recipe, self.butter, amount=50, amount_unit='g')
+        self.assertEqual(self.summary(recipe), (1750, 50, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line.recipe = other
+            line.save()
+        self.assertEqual(self.summary(recipe), (None, None, 1))
+        self.assertEqual(self.summary(other), (1750, 50, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            line.delete()
+        self.assertEqual(self.summary(other), (None, None, 0))
+
+    def test_nutrition_changes(self):
+        """Test recipes using an ingredient follow its nutrition."""
+        recipe = create_recipe(self.user, title='Shortbread')
+        create_recipe_ingredient(recipe, self.butter, amount=100,
+                                 amount_unit='g')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientNutrition.objects.create(
+                ingredient=self.butter, kcal=720, protein=1)
+
+        self.assertEqual(self.summary(recipe), (720, 1, 0))
+
+    def test_rebuild_command(self):
+        recipe = create_recipe(self.user, title='Bread')
+        create_recipe_ingredient(recipe, self.flour, amount=1,
+                                 amount_unit='kg')
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=self.butter, amount=1,
+            amount_unit='pcs')
+
+        call_command('rebuild_nutrition', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(self.summary(recipe), (3500, 100, 1))
@@ -0,0 +1,96 @@
+"""
+Tests for database readiness probing.
+"""
+import random
+from unittest.mock import patch
+
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import readiness
+
+READY_URL = reverse('health-ready')
+
+
+class FakeClock:
+    """Clock advanced by the fake sleep."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+class ProbeTests(TestCase):
+    """Test probing real connections."""
+
+    def test_probe_ready(self):
+        """Test a reachable database probes ok."""
+        result = readiness.probe('default')
+
+        self.assertTrue(result.ok)
+        self.assertIsNone(result.error)
+
+    def test_probe_unavailable(self):
+        """Test connection errors are reported, not raised."""
+        with patch('django.db.backends.base.base.BaseDatabaseWrapper.cursor',
+                   side_effect=OperationalError('refused')):
+            result = readiness.probe('default')
+
+        self.assertFalse(result.ok)
+        self.assertEqual(result.error, 'refused')
+
+    def test_ready_endpoint(self):
+        """Test the endpoint reports readiness without auth."""
+        res = APIClient().get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'status': 'ready'})
+
+    def test_ready_endpoint_unavailable(self):
+        """Test the endpoint answers 503 and only logs the error."""
+        failing = readiness.ProbeResult('default', False, 0.01, 'refused')
+        with patch('core.readiness.probe', return_value=failing), \
+                self.assertLogs('core.views', 'WARNING') as logs:
+            res = APIClient().get(READY_URL)
+
+        self.assertEqual(res.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.data, {'status': 'unavailable'})
+        self.assertEqual(
+            logs.records[0].fields['databases']['default']['error'],
+            'refused')
+
+
+class WaitForTests(SimpleTestCase):
+    """Test retrying with backoff."""
+
+    def test_backoff_grows_to_cap(self):
+        """Test delays double up to the cap and keep half of it fixed."""
+        rng = random.Random(1)
+        delays = [readiness.backoff(attempt, 0.1, 1.0, rng)
+                  for attempt in range(8)]
+
+        self.assertTrue(0.05 <= delays[0] <= 0.1)
+        self.assertTrue(all(0.5 <= delay <= 1.0 for delay in delays[4:]))
+
+    def test_wait_for_deadline(self):
+        """Test giving up before sleeping past the deadline."""
+        clock = FakeClock()
+        down = {'default': readiness.ProbeResult('default', False, 0.0)}
+        with patch('core.readiness.probe_all', return_value=down):
+            with self.assertRaises(readiness.NotReady):
+                readiness.wait_for(['default'], timeout=5, base=0.5, cap=2,
+                                   sleep=clock.sleep, clock=clock)
+
+        self.assertLessEqual(sum(clock.sleeps), 5)
+        self.assertGreater(len(clock.sleeps), 2)
@@ -0,0 +1,108 @@
+"""
+Tests for the orjson backed renderer and parser.
+"""
+import datetime
+import decimal
+import io
+import uuid
+from unittest.mock import patch
+
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APISimpleTestCase
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer
+
+UTC = datetime.timezone.utc
+SAMPLE = ReturnList([
+    ReturnDict({
+        'id': 1,
+        'title': 'Café\u2028line\u2029',
+        'last_cooked': datetime.date(2024, 2, 29),
+        'rating': None,
+        'mandatory': True,
+        'avg_rating': 6.67,
+        'price': decimal.Decimal('3.50'),
+        'created': datetime.datetime(2024, 1, 2, 3, 4, 5, 123456, UTC),
+        'local': datetime.datetime(2024, 1, 2, 3, 4, 5),
+        'offset': datetime.datetime(
+            2024, 1, 2, 3, 4, tzinfo=datetime.timezone(
+                datetime.timedelta(hours=5, minutes=30))),
+        'at': datetime.time(7, 30, 0, 5),
+        'took': datetime.timedelta(seconds=90),
+        'key': uuid.UUID(int=7),
+        'label': gettext_lazy('Recipe'),
+        'tags': ('a', 'b'),
+        'by_id': {1: 'one'},
+        'huge': 2 ** 70,
+    }, serializer=None),
+], serializer=None)
+
+
+class FastJSONRendererTests(APISimpleTestCase):
+    """Test rendering matches JSONRenderer."""
+
+    def test_matches_json_renderer(self):
+        """Test output is byte for byte the same as the stdlib's."""
+        data = [dict(SAMPLE[0], huge=1)]
+
+        self.assertEqual(FastJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+
+    def test_matches_json_renderer_beyond_64_bits(self):
+        """Test data orjson cannot encode falls back to the stdlib."""
+        self.assertEqual(FastJSONRenderer().render(SAMPLE),
+                         JSONRenderer().render(SAMPLE))
+
+    def test_indent_uses_json_renderer(self):
+        """Test requested indentation is honoured."""
+        rendered = FastJSONRenderer().render(
+            {'a': 1}, 'application/json; indent=4')
+
+        self.assertEqual(rendered, b'{\n    "a": 1\n}')
+
+    def test_none(self):
+        """Test no data renders an empty body."""
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_without_orjson(self):
+        """Test the stdlib is used when orjson is not installed."""
+        data = [dict(SAMPLE[0], huge=1)]
+        with patch('core.renderers.orjson', None):
+            rendered = FastJSONRenderer().render(data)
+
+        self.assertEqual(rendered, JSONRenderer().render(data))
+
+
+class FastJSONParserTests(APISimpleTestCase):
+    """Test parsing matches JSONParser."""
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json', {})
+
+    def test_matches_json_parser(self):
+        """Test request bodies parse to the same data."""
+        body = ('{"name": "Café", "amount": 2.5, "ok": true, '
+                '"ids": [1, 2], "none": null}').encode()
+
+        self.assertEqual(self.parse(FastJSONParser(), body),
+                         self.parse(JSONParser(), body))
+
+    def test_invalid_json(self):
+        """Test malformed bodies raise the same ParseError."""
+        for body in [b'{"a": ', b'', b'{"a": NaN}']:
+            with self.assertRaises(ParseError) as fast:
+                self.parse(FastJSONParser(), body)
+            with self.assertRaises(ParseError) as stdlib:
+                self.parse(JSONParser(), body)
+            self.assertEqual(str(fast.exception), str(stdlib.exception))
+
+    def test_without_orjson(self):
+        """Test the stdlib is used when orjson is not installed."""
+        with patch('core.parsers.orjson', None):
+            self.assertEqual(self.parse(FastJSONParser(), b'{"a": [1]}'),
+                             {'a': [1]})
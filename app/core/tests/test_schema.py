@@ -0,0 +1,86 @@
+"""
+Tests for the prebuilt OpenAPI schema.
+"""
+import gzip
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import schema
+
+SCHEMA_URL = reverse('api-schema')
+
+
+class PrebuiltSchemaTests(SimpleTestCase):
+    """Test building and serving the schema artifacts."""
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.dir = Path(workdir.name)
+        settings = override_settings(SCHEMA_DIR=self.dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        schema.reset()
+        self.addCleanup(schema.reset)
+        self.client = APIClient()
+
+    def test_schema_built_on_first_request(self):
+        """Test the artifacts are written and served."""
+        res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('/api/recipe/recipes/', json.loads(res.content)['paths'])
+        self.assertTrue(schema.is_built())
+        self.assertEqual(res['ETag'], f'"{schema.fingerprint()}-json"')
+
+    def test_schema_not_modified(self):
+        """Test a matching If-None-Match is answered with a 304."""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_schema_gzip(self):
+        """Test clients accepting gzip get the precompressed copy."""
+        plain = self.client.get(SCHEMA_URL)
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertNotEqual(res['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_build_schema_command(self):
+        """Test the command builds once and prunes other versions."""
+        stale = self.dir / 'openapi-0000000000000000.yaml'
+        stale.write_text('old')
+
+        call_command('build_schema', stdout=StringIO())
+        out = StringIO()
+        call_command('build_schema', stdout=out)
+
+        self.assertTrue(schema.is_built())
+        self.assertFalse(stale.exists())
+        self.assertIn('up to date', out.getvalue())
+
+    def test_fingerprint_follows_sources(self):
+        """Test the fingerprint changes with the code only."""
+        with tempfile.TemporaryDirectory() as root:
+            module = Path(root, 'views.py')
+            module.write_text('A = 1\n')
+            Path(root, 'tests').mkdir()
+            before = schema.compute_fingerprint(root)
+            Path(root, 'tests', 'test_views.py').write_text('B = 2\n')
+            self.assertEqual(schema.compute_fingerprint(root), before)
+            module.write_text('A = 2\n')
+            self.assertNotEqual(schema.compute_fingerprint(root), before)
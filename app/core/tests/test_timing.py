@@ -0,0 +1,125 @@
+"""
+Tests for the request timing middleware.
+"""
+import json
+import logging
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import timing
+from core.log import JSONFormatter
+from core.models import Recipe
+from home.helper_method import create_recipe, create_user
+from recipe.serializers import RecipeSerializer
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def timing_settings(**params):
+    return override_settings(
+        REQUEST_TIMING=dict(settings.REQUEST_TIMING, **params))
+
+
+def parse_server_timing(value):
+    """Return {name: {param: value}} for a Server-Timing header."""
+    metrics = {}
+    for part in value.split(', '):
+        name, *params = part.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@timing_settings(HEADER=True)
+class RequestTimingTests(TestCase):
+    """Test timings reported for API requests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='user@example.com', password='pass123')
+        create_recipe(cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        """Test API responses carry query count and timings."""
+        # The creator's name is joined into the single list query.
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        metrics = parse_server_timing(res['Server-Timing'])
+        self.assertEqual(metrics['db']['desc'], '"1 queries"')
+        self.assertEqual(
+            set(metrics), {'db', 'serialize', 'view', 'render', 'total'})
+        self.assertGreater(float(metrics['total']['dur']), 0)
+
+    @timing_settings(HEADER=False)
+    def test_header_off(self):
+        """Test timings stay server side unless the header is enabled."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Server-Timing', res)
+
+    def test_serializer_lists_timed_once(self):
+        """Test many=True serializers add their time to the request."""
+        token = timing.start(RECIPES_URL, slow_query_ms=100)
+        try:
+            serializer = RecipeSerializer(Recipe.objects.all(), many=True)
+            self.assertIsInstance(serializer, timing.TimedListSerializer)
+            serializer.data
+            timings = timing.current()
+        finally:
+            timing.stop(token)
+
+        self.assertGreater(timings.serializer, 0)
+        self.assertFalse(timings.serializing)
+
+    def test_non_api_paths_untimed(self):
+        """Test only views under the API prefix are timed."""
+        res = self.client.get('/admin/login/')
+
+        self.assertNotIn('Server-Timing', res)
+
+    @timing_settings(ENABLED=False)
+    def test_disabled(self):
+        """Test the middleware steps aside when switched off."""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    @timing_settings(SLOW_REQUEST_MS=0, SLOW_QUERY_MS=0)
+    def test_slow_requests_and_queries_logged(self):
+        """Test slow requests and queries are logged with their fields."""
+        with self.assertLogs('core.timing', logging.WARNING) as logs:
+            self.client.get(RECIPES_URL)
+
+        messages = [record.getMessage() for record in logs.records]
+        self.assertEqual(messages.count('slow query'), 1)
+        request = logs.records[-1]
+        self.assertEqual(request.getMessage(), 'slow request')
+        self.assertEqual(request.fields['path'], RECIPES_URL)
+        self.assertEqual(request.fields['status'], 200)
+        self.assertEqual(request.fields['queries'], 1)
+
+    def test_json_formatter(self):
+        """Test structured fields end up in the JSON log line."""
+        record = logging.makeLogRecord({
+            'name': 'core.timing',
+            'levelname': 'WARNING',
+            'msg': 'slow request',
+            'fields': {'path': '/api/x/', 'total_ms': 12.5},
+        })
+
+        entry = json.loads(JSONFormatter().format(record))
+
+        self.assertEqual(entry['message'], 'slow request')
+        self.assertEqual(entry['path'], '/api/x/')
+        self.assertEqual(entry['total_ms'], 12.5)
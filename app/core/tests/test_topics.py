@@ -0,0 +1,44 @@
+"""
+Tests for the topic trie.
+"""
+from django.test import SimpleTestCase
+
+from core.topics import TopicTrie
+
+
+class TopicTrieTests(SimpleTestCase):
+    """Test MQTT-style pattern matching."""
+
+    def setUp(self):
+        self.trie = TopicTrie()
+        for pattern in ('hall/kitchen/light', 'hall/+/light', 'hall/#',
+                        '+/kitchen/+', '#', 'garage/+'):
+            self.trie.add(pattern, pattern)
+
+    def test_match(self):
+        self.assertCountEqual(self.trie.match('hall/kitchen/light'), [
+            'hall/kitchen/light', 'hall/+/light', 'hall/#', '+/kitchen/+',
+            '#'])
+        self.assertCountEqual(self.trie.match('hall/bedroom/light'),
+                              ['hall/+/light', 'hall/#', '#'])
+        self.assertCountEqual(self.trie.match('garage/door'),
+                              ['garage/+', '#'])
+        # `+` matches exactly one level, `#` also none.
+        self.assertCountEqual(self.trie.match('garage'), ['#'])
+        self.assertCountEqual(self.trie.match('hall'), ['hall/#', '#'])
+
+    def test_remove_prunes(self):
+        self.assertTrue(self.trie.remove('hall/+/light', 'hall/+/light'))
+        self.assertFalse(self.trie.remove('hall/+/light', 'hall/+/light'))
+        self.assertFalse(self.trie.remove('hall/kitchen', 'hall/+/light'))
+
+        self.assertNotIn('hall/+/light', self.trie.match('hall/attic/light'))
+        self.assertNotIn('+', self.trie._root.children['hall'].children)
+        self.assertEqual(len(self.trie), 5)
+
+    def test_invalid(self):
+        for pattern in ('hall/#/light', 'hall/kit+', 'hall/#light'):
+            with self.assertRaises(ValueError):
+                self.trie.add(pattern, pattern)
+        with self.assertRaises(ValueError):
+            self.trie.match('hall/+')
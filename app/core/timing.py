@@ -0,0 +1,162 @@
+"""
+Per-request SQL and timing instrumentation.
+
+`RequestTimingMiddleware` starts a `RequestTimings` for each API request
+and keeps it in a context variable. A database execute wrapper installed
+on every connection, and the `.data` of serializers using
+`TimedSerializerMixin`, add to it while the request runs, including work
+done in thread pool threads by the async views (they run with a copy of
+the request's context).
+
+Serializer time includes the queries serializers trigger lazily, so it
+overlaps with DB time. Outside of a timed request both hooks cost one
+context variable lookup, and the execute wrapper is not installed while
+timing is switched off.
+"""
+import contextvars
+import logging
+import time
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+logger = logging.getLogger('core.timing')
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+class RequestTimings:
+    """Counters for one request."""
+
+    __slots__ = (
+        'start', 'queries', 'db', 'serializer', 'serializing',
+        'view_start', 'view_end', 'render_end', 'slow_query', 'path',
+    )
+
+    def __init__(self, path, slow_query_ms):
+        self.start = time.perf_counter()
+        self.path = path
+        self.slow_query = slow_query_ms / 1000
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.serializing = False
+        self.view_start = self.view_end = self.render_end = None
+
+    def metrics(self, end):
+        """Return the durations in seconds measured up to `end`."""
+        view_end = self.view_end or end
+        metrics = {
+            'db': self.db,
+            'serialize': self.serializer,
+            'view': view_end - (self.view_start or self.start),
+            'total': end - self.start,
+        }
+        if self.view_end is not None and self.render_end is not None:
+            metrics['render'] = self.render_end - self.view_end
+        return metrics
+
+    def header(self, metrics):
+        """Format `metrics` as a Server-Timing header value."""
+        parts = [f'db;dur={_ms(metrics["db"])};desc="{self.queries} queries"']
+        parts += [f'{name};dur={_ms(value)}'
+                  for name, value in metrics.items() if name != 'db']
+        return ', '.join(parts)
+
+    def log_entry(self, request, response, metrics):
+        entry = {
+            'method': request.method,
+            'path': self.path,
+            'status': response.status_code,
+            'queries': self.queries,
+        }
+        entry.update((f'{name}_ms', _ms(value))
+                     for name, value in metrics.items())
+        return entry
+
+
+def current():
+    """Return the timings of the request being handled, if any."""
+    return _current.get()
+
+
+def start(path, slow_query_ms):
+    """Start timing a request; returns the token for `stop`."""
+    return _current.set(RequestTimings(path, slow_query_ms))
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper adding the query to the current request."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        timings.queries += 1
+        timings.db += elapsed
+        if elapsed >= timings.slow_query:
+            logger.warning('slow query', extra={'fields': {
+                'path': timings.path,
+                'alias': context['connection'].alias,
+                'duration_ms': _ms(elapsed),
+                'sql': sql[:2000],
+            }})
+
+
+def _add_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class TimedDataMixin:
+    """Add the time spent building `.data` to the request timings."""
+
+    @property
+    def data(self):
+        timings = _current.get()
+        if timings is None or timings.serializing:
+            return super().data
+        timings.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            timings.serializer += time.perf_counter() - started
+            timings.serializing = False
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    """List serializer timed as a whole rather than per item."""
+
+
+class TimedSerializerMixin(TimedDataMixin):
+    """Serializer mixin reporting its `.data` time, `many=True` included.
+
+    Nested serializers only run `to_representation`, so each response is
+    counted once.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+
+def install():
+    """Hook the query wrapper in, once per process."""
+    connection_created.connect(_add_wrapper, dispatch_uid='request_timing')
+    for connection in connections.all():
+        _add_wrapper(None, connection)
@@ -0,0 +1,134 @@
+"""
+Topic trie matching MQTT-style subscriptions.
+
+Topics are `/` separated levels such as `home/42/inventory/updated`.
+Subscription patterns may use `+` for exactly one level and, as their
+last level, `#` for any number of levels, none included: `home/+/#`
+matches every topic of every home, and `home/#` also `home` itself.
+
+Patterns are stored level by level in a trie, so matching a topic walks
+one path per wildcard that applies rather than testing every pattern:
+the cost grows with the depth of the topic and the wildcards along it,
+not with the number of subscriptions.
+
+Matching takes no lock. Writers serialize on one, and nodes only ever
+swap in new tuples of values, so a concurrent match sees each node
+either before or after a change.
+"""
+import threading
+
+SEPARATOR = '/'
+SINGLE = '+'
+MULTI = '#'
+
+
+def split_pattern(pattern):
+    """Return the levels of `pattern`, raising ValueError if invalid."""
+    levels = pattern.split(SEPARATOR)
+    for index, level in enumerate(levels):
+        if level == MULTI:
+            if index != len(levels) - 1:
+                raise ValueError(f"'#' must be the last level: {pattern!r}")
+        elif level != SINGLE and (SINGLE in level or MULTI in level):
+            raise ValueError(
+                f'Wildcards must fill a whole level: {pattern!r}')
+    return levels
+
+
+def split_topic(topic):
+    """Return the levels of `topic`, raising ValueError on wildcards."""
+    if SINGLE in topic or MULTI in topic:
+        raise ValueError(f'Topics cannot contain wildcards: {topic!r}')
+    return topic.split(SEPARATOR)
+
+
+class _Node:
+    __slots__ = ('children', 'values')
+
+    def __init__(self):
+        self.children = {}
+        self.values = ()
+
+
+class TopicTrie:
+    """Values stored under subscription patterns, matched by topic."""
+
+    def __init__(self):
+        self._root = _Node()
+        self._lock = threading.Lock()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, pattern, value):
+        """Store `value` under `pattern`."""
+        levels = split_pattern(pattern)
+        with self._lock:
+            node = self._root
+            for level in levels:
+                child = node.children.get(level)
+                if child is None:
+                    child = node.children[level] = _Node()
+                node = child
+            node.values += (value,)
+            self._size += 1
+
+    def remove(self, pattern, value):
+        """Remove `value` from `pattern`, pruning nodes left empty.
+
+        Returns whether it was stored there.
+        """
+        levels = split_pattern(pattern)
+        with self._lock:
+            path = [self._root]
+            for level in levels:
+                node = path[-1].children.get(level)
+                if node is None:
+                    return False
+                path.append(node)
+            node = path[-1]
+            if value not in node.values:
+                return False
+            values = list(node.values)
+            values.remove(value)
+            node.values = tuple(values)
+            self._size -= 1
+            for parent, level in zip(reversed(path[:-1]), reversed(levels)):
+                child = parent.children[level]
+                if child.values or child.children:
+                    break
+                del parent.children[level]
+            return True
+
+    def match(self, topic):
+        """Return the values of every pattern matching `topic`.
+
+        A value stored under several matching patterns is returned once
+        per pattern.
+        """
+        matched = []
+        nodes = [self._root]
+        for level in split_topic(topic):
+            found = []
+            for node in nodes:
+                children = node.children
+                child = children.get(MULTI)
+                if child is not None:
+                    matched.extend(child.values)
+                child = children.get(level)
+                if child is not None:
+                    found.append(child)
+                child = children.get(SINGLE)
+                if child is not None:
+                    found.append(child)
+            if not found:
+                return matched
+            nodes = found
+        for node in nodes:
+            matched.extend(node.values)
+            # `a/#` also matches `a`.
+            child = node.children.get(MULTI)
+            if child is not None:
+                matched.extend(child.values)
+        return matched
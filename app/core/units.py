@@ -0,0 +1,62 @@
+"""
+Unit normalization for ingredient amounts.
+
+Amounts are stored as integers with a free-text unit on `Inventory` and
+`RecipeIngredient`. These helpers map them onto a base unit per kind so
+amounts from both tables can be compared.
+"""
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# unit -> (kind, factor to base unit)
+UNITS = {
+    'mg': (MASS, 0.001),
+    'g': (MASS, 1.0),
+    'gm': (MASS, 1.0),
+    'gms': (MASS, 1.0),
+    'gram': (MASS, 1.0),
+    'grams': (MASS, 1.0),
+    'kg': (MASS, 1000.0),
+    'ml': (VOLUME, 1.0),
+    'cl': (VOLUME, 10.0),
+    'dl': (VOLUME, 100.0),
+    'l': (VOLUME, 1000.0),
+    'ltr': (VOLUME, 1000.0),
+    'litre': (VOLUME, 1000.0),
+    'liter': (VOLUME, 1000.0),
+    'tsp': (VOLUME, 5.0),
+    'tbsp': (VOLUME, 15.0),
+    'cup': (VOLUME, 240.0),
+    'cups': (VOLUME, 240.0),
+    '': (COUNT, 1.0),
+    'pc': (COUNT, 1.0),
+    'pcs': (COUNT, 1.0),
+    'piece': (COUNT, 1.0),
+    'pieces': (COUNT, 1.0),
+    'unit': (COUNT, 1.0),
+    'units': (COUNT, 1.0),
+}
+
+
+BASE_UNITS = {MASS: 'g', VOLUME: 'ml', COUNT: 'pcs'}
+
+
+def normalize(amount, unit):
+    """Return (kind, amount in the base unit of that kind).
+
+    Unknown units are their own kind so they still compare equal to the
+    same unit spelled the same way.
+    """
+    key = (unit or '').strip().lower()
+    try:
+        kind, factor = UNITS[key]
+    except KeyError:
+        return key, float(amount)
+    return kind, float(amount) * factor
+
+
+def base_unit(kind):
+    """Return the unit name amounts of `kind` are normalized to."""
+    return BASE_UNITS.get(kind, kind)
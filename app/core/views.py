@@ -0,0 +1,142 @@
+"""
+Views for core services.
+"""
+import logging
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework import generics, status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import (
+    AllowAny,
+    IsAdminUser,
+    IsAuthenticated,
+)
+from rest_framework.response import Response
+
+from core import batch, cache, export, readiness, schema
+from core.serializers import BatchRequestSerializer, ExportRequestSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStatsView(generics.GenericAPIView):
+    """View to report response cache hit rates."""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    def get(self, request, *args, **kwargs):
+        cache.stats.flush()
+        return Response(cache.stats.snapshot())
+
+
+class ReadinessView(generics.GenericAPIView):
+    """View to report whether every database accepts queries.
+
+    The endpoint is public, so failing aliases and their errors are only
+    logged.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT,
+                              503: OpenApiTypes.OBJECT})
+    def get(self, request, *args, **kwargs):
+        # Probes run on the request thread to reuse its connections.
+        results = readiness.probe_all(parallel=False)
+        failing = {alias: result.as_dict()
+                   for alias, result in results.items() if not result.ok}
+        if failing:
+            logger.warning('databases unavailable',
+                           extra={'fields': {'databases': failing}})
+        return Response(
+            {'status': 'unavailable' if failing else 'ready'},
+            status=(status.HTTP_503_SERVICE_UNAVAILABLE if failing
+                    else status.HTTP_200_OK),
+        )
+
+
+class BatchView(generics.GenericAPIView):
+    """View to run several API requests in one round trip."""
+    serializer_class = BatchRequestSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = batch.execute(
+            request, serializer.validated_data['requests'])
+        return batch.render(results)
+
+
+class ExportView(generics.GenericAPIView):
+    """View to stream a dataset of the user or the user's home."""
+    serializer_class = ExportRequestSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(parameters=[ExportRequestSerializer],
+                   responses={200: OpenApiTypes.BINARY})
+    def get(self, request, dataset, *args, **kwargs):
+        if dataset not in export.DATASETS:
+            return Response({'detail': 'Not found.'},
+                            status=status.HTTP_404_NOT_FOUND)
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        if 'home' in export.DATASETS[dataset].scope:
+            if not request.user.home:
+                return Response(
+                    {'detail': 'No home found for the user.'},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            scope = {'home': request.user.home}
+        else:
+            scope = {'user': request.user}
+        output = serializer.validated_data['output']
+        gzip = serializer.validated_data['gzip']
+        response = StreamingHttpResponse(
+            export.stream(dataset, output, gzip, **scope),
+            content_type=export.content_type(output, gzip),
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{export.filename(dataset, output, gzip)}"')
+        return response
+
+
+class PrebuiltSchemaView(SpectacularAPIView):
+    """View to serve the prebuilt OpenAPI schema of the running code.
+
+    Same formats, content negotiation and permissions as the generated
+    view; `?lang=` falls back to generating the schema.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if request.GET.get('lang'):
+            return super().get(request, *args, **kwargs)
+        artifact = schema.get_artifact(request.accepted_renderer.format)
+        compressed = bool(re_accepts_gzip.search(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        etag = artifact.gzip_etag if compressed else artifact.etag
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = HttpResponse(
+                artifact.gzipped if compressed else artifact.body,
+                content_type=request.accepted_media_type,
+            )
+            if compressed:
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        # Clients revalidate every time and get a 304 until a deploy.
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
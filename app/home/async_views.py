@@ -0,0 +1,15 @@
+"""
+Async views for Home, served over ASGI.
+"""
+from core.async_views import AsyncReadView
+from home import views
+
+
+class InventoryFetchView(AsyncReadView):
+    """Async view for the home's inventory list."""
+    view_class = views.InventoryFetchView
+
+
+class FavHomeRecipeListView(AsyncReadView):
+    """Async view for the home's favourite recipes."""
+    view_class = views.FavHomeRecipeListView
@@ -8,6 +8,7 @@ from core.models import (
     Inventory,
     FavHomeRecipe,
     Recipe,
+    RecipeIngredient,
 )
 from django.contrib.auth import get_user_model
 from datetime import datetime
@@ -31,12 +32,13 @@ def create_ingredient(user, **params):
     return ingredient
 
 
-def add_to_inventory(home, ingredient, amount=500):
+def add_to_inventory(home, ingredient, amount=500, **params):
     """Add ingredient item to inventory of home."""
     return Inventory.objects.create(
         home=home,
         ingredient=ingredient,
         amount=amount,
+        **params,
         )
 
 
@@ -74,3 +76,19 @@ def create_fav_recipe(home, recipe, **params):
         **params,
     )
     return fav_home_recipe
+
+
+def add_recipe_ingredient(recipe, ingredient, **params):
+    """Create and return a new recipe ingredient line."""
+    defaults = {
+        'amount': 300,
+        'mandatory': True,
+        'amount_unit': 'g',
+    }
+    defaults.update(params)
+
+    return RecipeIngredient.objects.create(
+        recipe=recipe,
+        ingredient=ingredient,
+        **defaults,
+    )
@@ -0,0 +1,559 @@
+"""
+Weekly meal plan generation.
+
+The recipe catalog is held in memory as a compressed sparse row matrix of
+recipe x ingredient requirements (`RecipeMatrix`). It is built once from
+`RecipeIngredient` and reused; when a recipe or recipe ingredient changes
+it is rebuilt, at most every `MEAL_PLAN['REBUILD_INTERVAL']` seconds and
+on a background thread, while requests keep planning with the old one.
+
+`plan_meals` scores recipes against the home's inventory with a sparse
+matrix-vector product over the inventory ingredients, fills the days
+greedily (pruning with those scores as upper bounds) and then improves
+the plan with random replacements until its time budget runs out.
+Recipes the home's dietary profile rules out are never considered; their
+flags are those of the last build, at most MATRIX_MAX_AGE old.
+"""
+import logging
+import random
+import threading
+import time
+from array import array
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+
+from core import dietary, units
+from core.models import (
+    FavHomeRecipe,
+    Ingredient,
+    Inventory,
+    Recipe,
+    RecipeIngredient,
+)
+from recipe import cooccurrence
+
+logger = logging.getLogger(__name__)
+
+MANDATORY_WEIGHT = 1.0
+OPTIONAL_WEIGHT = 0.5
+SHOPPING_PENALTY = 1.0
+
+# Rebuild the cached matrix at least this often so that workers which
+# did not see the change signal still pick up catalog updates.
+MATRIX_MAX_AGE = 300
+
+# Size of the pool of replacement candidates used by the local search,
+# as a multiple of the number of days.
+POOL_FACTOR = 8
+
+
+class RecipeMatrix:
+    """Sparse recipe x ingredient requirement matrix.
+
+    Row `r` holds the lines of recipe `recipe_ids[r]` in the half open
+    range `indptr[r]:indptr[r + 1]` of the line arrays. Amounts are
+    normalized with `core.units`; `kinds` indexes into `kind_names`.
+    `flags` holds the dietary flags of every row. `fallback_order` lists
+    the rows cheapest to shop for first and `fallback_rank` the position
+    of each row in it.
+    """
+
+    def __init__(self, recipe_ids, time_minutes, indptr, ingredients,
+                 amounts, kinds, kind_names, mandatory, flags=None):
+        self.recipe_ids = recipe_ids
+        self.time_minutes = time_minutes
+        if flags is None:
+            flags = array('q', [0]) * len(recipe_ids)
+        self.flags = flags
+        self.indptr = indptr
+        self.ingredients = ingredients
+        self.amounts = amounts
+        self.kinds = kinds
+        self.kind_names = kind_names
+        self.mandatory = mandatory
+        self.built_at = time.monotonic()
+        self._rows_without = {}
+
+        self.row_of = {rid: row for row, rid in enumerate(recipe_ids)}
+        self.line_row = array('l')
+        self.lines_by_ingredient = {}
+        # Score of each recipe with an empty inventory.
+        self.base_score = array('d')
+        for row in range(len(recipe_ids)):
+            base = 0.0
+            for k in range(indptr[row], indptr[row + 1]):
+                self.line_row.append(row)
+                self.lines_by_ingredient.setdefault(
+                    ingredients[k], array('l')).append(k)
+                if mandatory[k]:
+                    base -= SHOPPING_PENALTY
+            self.base_score.append(base)
+        self.fallback_order = array('l', sorted(
+            range(len(recipe_ids)),
+            key=lambda row: (-self.base_score[row], time_minutes[row], row),
+        ))
+        self.fallback_rank = array('l', [0]) * len(recipe_ids)
+        for rank, row in enumerate(self.fallback_order):
+            self.fallback_rank[row] = rank
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    @property
+    def nnz(self):
+        """Number of stored recipe ingredient lines."""
+        return len(self.ingredients)
+
+    def rows_without(self, flags):
+        """Return the rows having none of `flags`, cached per mask."""
+        rows = self._rows_without.get(flags)
+        if rows is None:
+            rows = array('l', (row for row, value in enumerate(self.flags)
+                               if not value & flags))
+            self._rows_without[flags] = rows
+        return rows
+
+    @classmethod
+    def from_rows(cls, recipes, lines):
+        """Build the matrix from `(id, time_minutes[, dietary_flags])`
+        recipe rows and `(recipe_id, ingredient_id, amount, unit,
+        mandatory)` lines, both ordered by recipe id."""
+        recipe_ids = array('q')
+        time_minutes = array('l')
+        flags = array('q')
+        indptr = array('l', [0])
+        ingredients = array('q')
+        amounts = array('d')
+        kinds = array('l')
+        mandatory = bytearray()
+        kind_names = []
+        kind_codes = {}
+        unit_cache = {}
+
+        lines = iter(lines)
+        pending = next(lines, None)
+        for recipe_id, minutes, *recipe_flags in recipes:
+            while pending is not None and pending[0] < recipe_id:
+                pending = next(lines, None)
+            while pending is not None and pending[0] == recipe_id:
+                _, ingredient_id, amount, unit, is_mandatory = pending
+                cached = unit_cache.get(unit)
+                if cached is None:
+                    kind, factor = units.normalize(1, unit)
+                    code = kind_codes.get(kind)
+                    if code is None:
+                        code = kind_codes[kind] = len(kind_names)
+                        kind_names.append(kind)
+                    cached = unit_cache[unit] = (code, factor)
+                ingredients.append(ingredient_id)
+                amounts.append(amount * cached[1])
+                kinds.append(cached[0])
+                mandatory.append(1 if is_mandatory else 0)
+                pending = next(lines, None)
+            recipe_ids.append(recipe_id)
+            time_minutes.append(minutes)
+            flags.append(recipe_flags[0] if recipe_flags else 0)
+            indptr.append(len(ingredients))
+
+        return cls(recipe_ids, time_minutes, indptr, ingredients,
+                   amounts, kinds, kind_names, mandatory, flags)
+
+
+def load_matrix(chunk_size=10000):
+    """Build the recipe matrix from the database."""
+    recipes = (Recipe.objects.order_by('id')
+               .values_list('id', 'time_minutes', 'dietary_flags')
+               .iterator(chunk_size=chunk_size))
+    lines = (RecipeIngredient.objects.order_by('recipe_id', 'id')
+             .values_list('recipe_id', 'ingredient_id', 'amount',
+                          'amount_unit', 'mandatory')
+             .iterator(chunk_size=chunk_size))
+    return RecipeMatrix.from_rows(recipes, lines)
+
+
+def _config(name):
+    return settings.MEAL_PLAN[name]
+
+
+_matrix = None
+_matrix_lock = threading.Lock()
+# Set by changes to the catalog since the matrix was built.
+_stale = False
+_rebuilding = False
+
+
+def get_matrix():
+    """Return the cached recipe matrix.
+
+    Only the first call builds it while waiting; a stale matrix is
+    returned as is and rebuilt for the calls after, see `_schedule`.
+    """
+    global _matrix
+    matrix = _matrix
+    if matrix is None:
+        with _matrix_lock:
+            if _matrix is None:
+                _matrix = load_matrix()
+            return _matrix
+    if _stale or time.monotonic() - matrix.built_at > MATRIX_MAX_AGE:
+        if _schedule(matrix):
+            matrix = _matrix
+    return matrix
+
+
+def _schedule(matrix):
+    """Start a rebuild unless one runs or the matrix is too recent.
+    Returns whether it was rebuilt before returning."""
+    global _rebuilding
+    with _matrix_lock:
+        if _rebuilding or (time.monotonic() - matrix.built_at
+                           < _config('REBUILD_INTERVAL')):
+            return False
+        _rebuilding = True
+    if _config('REBUILD_ASYNC'):
+        threading.Thread(target=_rebuild, args=(True,),
+                         name='meal-plan-matrix', daemon=True).start()
+        return False
+    _rebuild(False)
+    return True
+
+
+def _rebuild(in_thread):
+    global _matrix, _stale, _rebuilding
+    # Cleared first so that changes during the build mark it stale again.
+    _stale = False
+    try:
+        _matrix = load_matrix()
+    except Exception:
+        _stale = True
+        logger.exception('Rebuilding the recipe matrix failed')
+    finally:
+        _rebuilding = False
+        if in_thread:
+            connection.close()
+
+
+def matrix_is_current():
+    """Check that no catalog change is waiting for a matrix rebuild."""
+    return not (_stale or _rebuilding)
+
+
+def invalidate_matrix(**kwargs):
+    """Mark the cached matrix stale; usable directly as a signal
+    receiver."""
+    global _stale
+    _stale = True
+
+
+def _coverage(have, kind, need):
+    """Return the fraction of a line covered by an inventory entry."""
+    if have is None:
+        return 0.0
+    have_kind, have_amount = have
+    if have_amount <= 0:
+        return 0.0
+    if need <= 0 or have_kind != kind:
+        # Present but not comparable; count it without consuming.
+        return 1.0
+    return min(1.0, have_amount / need)
+
+
+def _row_score(matrix, row, stock):
+    """Score a recipe against the current stock."""
+    score = matrix.base_score[row]
+    for k in range(matrix.indptr[row], matrix.indptr[row + 1]):
+        have = stock.get(matrix.ingredients[k])
+        if have is None:
+            continue
+        cover = _coverage(have, matrix.kinds[k], matrix.amounts[k])
+        if matrix.mandatory[k]:
+            score += (MANDATORY_WEIGHT + SHOPPING_PENALTY) * cover
+        else:
+            score += OPTIONAL_WEIGHT * cover
+    return score
+
+
+def _consume(matrix, row, stock):
+    """Take the amounts a recipe needs out of the stock."""
+    for k in range(matrix.indptr[row], matrix.indptr[row + 1]):
+        ingredient = matrix.ingredients[k]
+        have = stock.get(ingredient)
+        if have is not None and have[0] == matrix.kinds[k]:
+            stock[ingredient] = (
+                have[0], max(0.0, have[1] - matrix.amounts[k]))
+
+
+def _plan_score(matrix, plan, inventory):
+    """Score a whole plan, consuming stock day by day."""
+    stock = dict(inventory)
+    total = 0.0
+    for row in plan:
+        if row is None:
+            continue
+        total += _row_score(matrix, row, stock)
+        _consume(matrix, row, stock)
+    return total
+
+
+def _upper_bounds(matrix, inventory, allowed):
+    """Score every recipe that uses the inventory against the full stock.
+
+    This is a sparse matrix-vector product: only the lines of inventory
+    ingredients are visited. Scores only go down as stock is consumed,
+    so these are upper bounds for the greedy pass.
+    """
+    gains = {}
+    for ingredient, have in inventory.items():
+        for k in matrix.lines_by_ingredient.get(ingredient, ()):
+            row = matrix.line_row[k]
+            if allowed is not None and row not in allowed:
+                continue
+            cover = _coverage(have, matrix.kinds[k], matrix.amounts[k])
+            if matrix.mandatory[k]:
+                gain = (MANDATORY_WEIGHT + SHOPPING_PENALTY) * cover
+            else:
+                gain = OPTIONAL_WEIGHT * cover
+            gains[row] = gains.get(row, 0.0) + gain
+    return {row: matrix.base_score[row] + gain
+            for row, gain in gains.items()}
+
+
+def _feasible(matrix, row, limit):
+    return limit is None or matrix.time_minutes[row] <= limit
+
+
+def plan_meals(matrix, inventory, day_limits, candidates=None,
+               budget_ms=200, seed=0):
+    """Pick one recipe per day maximizing inventory use.
+
+    `inventory` maps ingredient id to `(kind code, amount)` in matrix
+    units, `day_limits` holds the maximum `time_minutes` per day (or
+    None) and `candidates` optionally restricts the rows considered.
+    Returns a dict with the chosen rows, the plan score and run stats.
+    """
+    started = time.monotonic()
+    deadline = started + budget_ms / 1000.0
+    allowed = set(candidates) if candidates is not None else None
+
+    bounds = _upper_bounds(matrix, inventory, allowed)
+    ranked = sorted(bounds, key=lambda row: (-bounds[row], row))
+    # Recipes sharing nothing with the inventory only differ by how much
+    # shopping they need, so the cheapest ones come first: a few
+    # candidates are sorted by their place in the precomputed order, which
+    # is otherwise walked skipping the rows not allowed.
+    if allowed is not None and len(allowed) * 8 < len(matrix):
+        subset = sorted((row for row in allowed if row not in bounds),
+                        key=matrix.fallback_rank.__getitem__)
+
+        def fallback():
+            return iter(subset)
+    else:
+        def fallback():
+            return (row for row in matrix.fallback_order
+                    if row not in bounds
+                    and (allowed is None or row in allowed))
+
+    days = len(day_limits)
+    plan = [None] * days
+    used = set()
+    stock = dict(inventory)
+    evaluated = 0
+    # Fill the tightest days first; they have the fewest options.
+    order = sorted(range(days), key=lambda d: (
+        day_limits[d] is None, day_limits[d] or 0, d))
+    for day in order:
+        limit = day_limits[day]
+        best_row, best_score = None, None
+        for row in ranked:
+            if best_score is not None and bounds[row] <= best_score:
+                break
+            if row in used or not _feasible(matrix, row, limit):
+                continue
+            score = _row_score(matrix, row, stock)
+            evaluated += 1
+            if best_score is None or score > best_score:
+                best_row, best_score = row, score
+        for row in fallback():
+            if best_score is not None and \
+                    matrix.base_score[row] <= best_score:
+                break
+            if row in used or not _feasible(matrix, row, limit):
+                continue
+            best_row = row
+            break
+        if best_row is not None:
+            plan[day] = best_row
+            used.add(best_row)
+            _consume(matrix, best_row, stock)
+
+    score = _plan_score(matrix, plan, inventory)
+    greedy_score = score
+
+    pool = ranked[:POOL_FACTOR * days]
+    pool += islice(fallback(), max(0, POOL_FACTOR * days - len(pool)))
+    rng = random.Random(seed)
+    iterations = 0
+    stale = 0
+    max_stale = 4 * len(pool) * days
+    while pool and stale < max_stale and time.monotonic() < deadline:
+        iterations += 1
+        stale += 1
+        day = rng.randrange(days)
+        row = rng.choice(pool)
+        if row in used or not _feasible(matrix, row, day_limits[day]):
+            continue
+        trial = list(plan)
+        trial[day] = row
+        trial_score = _plan_score(matrix, trial, inventory)
+        evaluated += 1
+        if trial_score > score:
+            if plan[day] is not None:
+                used.discard(plan[day])
+            used.add(row)
+            plan, score = trial, trial_score
+            stale = 0
+
+    return {
+        'rows': plan,
+        'score': score,
+        'greedy_score': greedy_score,
+        'candidates': len(allowed) if allowed is not None else len(matrix),
+        'evaluated': evaluated,
+        'iterations': iterations,
+        'elapsed_ms': (time.monotonic() - started) * 1000.0,
+    }
+
+
+def shopping_list(matrix, plan, inventory):
+    """Return `{(ingredient, kind code): amount}` still to be bought."""
+    stock = dict(inventory)
+    missing = {}
+    for row in plan:
+        if row is None:
+            continue
+        for k in range(matrix.indptr[row], matrix.indptr[row + 1]):
+            if not matrix.mandatory[k]:
+                continue
+            ingredient = matrix.ingredients[k]
+            have = stock.get(ingredient)
+            need = matrix.amounts[k]
+            if have is None or have[1] <= 0:
+                short = need
+            elif have[0] != matrix.kinds[k]:
+                continue
+            else:
+                short = need - have[1]
+                if short <= 0:
+                    continue
+            key = (ingredient, matrix.kinds[k])
+            missing[key] = missing.get(key, 0.0) + short
+        _consume(matrix, row, stock)
+    return missing
+
+
+def inventory_vector(matrix, home):
+    """Return the home's inventory in matrix units."""
+    kind_codes = {name: code for code, name in enumerate(matrix.kind_names)}
+    inventory = {}
+    rows = (Inventory.objects.filter(home=home)
+            .values_list('ingredient_id', 'amount', 'amount_unit'))
+    for ingredient_id, amount, unit in rows:
+        kind, base_amount = units.normalize(amount, unit)
+        # Kinds no recipe uses get a code that never matches a line.
+        inventory[ingredient_id] = (kind_codes.get(kind, -1), base_amount)
+    return inventory
+
+
+def _substitutes_in_stock(index, ingredient, inventory, limit=3):
+    """Return substitutes for a missing ingredient the home has."""
+    if index is None:
+        return []
+    found = []
+    for sub, _ in index.substitutes(ingredient):
+        have = inventory.get(sub)
+        if have is not None and have[1] > 0:
+            found.append({'ingredient': sub, 'ingredient_name':
+                          index.name(sub)})
+            if len(found) == limit:
+                break
+    return found
+
+
+def plan_for_home(home, days=7, max_minutes=None, source='catalog',
+                  budget_ms=200):
+    """Build a meal plan for a home and return it ready for rendering."""
+    matrix = get_matrix()
+    inventory = inventory_vector(matrix, home)
+
+    if not max_minutes:
+        day_limits = [None] * days
+    elif len(max_minutes) == 1:
+        day_limits = list(max_minutes) * days
+    else:
+        day_limits = list(max_minutes)
+
+    candidates = None
+    if source == 'favourites':
+        fav_ids = (FavHomeRecipe.objects.filter(home=home)
+                   .values_list('recipe_id', flat=True))
+        candidates = [matrix.row_of[rid] for rid in fav_ids
+                      if rid in matrix.row_of]
+    excluded = dietary.home_excluded(home)
+    if excluded and candidates is None:
+        candidates = matrix.rows_without(excluded)
+    elif excluded:
+        candidates = [row for row in candidates
+                      if not matrix.flags[row] & excluded]
+
+    result = plan_meals(matrix, inventory, day_limits, candidates,
+                        budget_ms=budget_ms)
+    rows = result['rows']
+
+    recipe_ids = [matrix.recipe_ids[row] for row in rows if row is not None]
+    titles = dict(Recipe.objects.filter(id__in=recipe_ids)
+                  .values_list('id', 'title'))
+    missing = shopping_list(matrix, rows, inventory)
+    names = dict(Ingredient.objects
+                 .filter(id__in={ing for ing, _ in missing})
+                 .values_list('id', 'name'))
+
+    plan = []
+    for day, row in enumerate(rows):
+        recipe = None
+        if row is not None:
+            recipe_id = matrix.recipe_ids[row]
+            recipe = {
+                'id': recipe_id,
+                'title': titles.get(recipe_id),
+                'time_minutes': matrix.time_minutes[row],
+            }
+        plan.append({
+            'day': day + 1,
+            'max_minutes': day_limits[day],
+            'recipe': recipe,
+        })
+
+    index = cooccurrence.get_index()
+    return {
+        'plan': plan,
+        'shopping_list': [
+            {
+                'ingredient': ingredient,
+                'ingredient_name': names.get(ingredient),
+                'amount': round(amount, 2),
+                'amount_unit': units.base_unit(matrix.kind_names[kind]),
+                'substitutes': _substitutes_in_stock(
+                    index, ingredient, inventory),
+            }
+            for (ingredient, kind), amount in sorted(missing.items())
+        ],
+        'score': round(result['score'], 3),
+        'stats': {
+            'candidates': result['candidates'],
+            'evaluated': result['evaluated'],
+            'iterations': result['iterations'],
+            'elapsed_ms': round(result['elapsed_ms'], 2),
+        },
+    }
@@ -97,3 +97,12 @@ class FavHomeRecipePermissions(permissions.BasePermission):
         if obj.home.id != request.user.home.id:
             raise PermissionDenied('You are not authorized for this action.')
         return True
+
+
+class MealPlanPermissions(permissions.BasePermission):
+    """Custom permission to ensure user has a home to plan meals for."""
+
+    def has_permission(self, request, view):
+        if not request.user.home:
+            raise PermissionDenied('You do not have a home.')
+        return True
@@ -0,0 +1,298 @@
+"""
+Ingestion of ingredient weights reported by kitchen sensors.
+
+Smart scales and pantry sensors report the weight of an ingredient
+several times a second. Writing every reading would cost an UPDATE
+apiece for amounts replaced a moment later, so readings are coalesced
+in memory per home and ingredient, and only the latest is written
+every `SENSORS['WINDOW_MS']` by a background thread, or sooner once
+`SENSORS['MAX_PENDING']` rows wait: one query finds the inventory rows,
+one batched UPDATE sets their amounts and one bulk INSERT adds the
+ingredients a home did not stock yet. A reading measured before one
+already taken for the same row is dropped, so late deliveries never
+overwrite newer weights.
+
+Bulk writes send no signals, so every flush publishes an inventory
+event per written row on the event bus once it commits, which keeps the
+response cache and the event log in step.
+
+Readings wait in the memory of the process that received them. A crash
+loses at most one window, which sensors reporting several times a
+second replace straight away; with several processes, the last flush
+of a row wins.
+
+A flush that fails is retried home by home, after dropping readings of
+ingredients or homes deleted since they were validated, so one bad row
+does not hold back every other home. Readings still failing are kept
+for the next flush, up to `SENSORS['MAX_RETRIES']` times.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from core import events
+from core.models import Home, Ingredient, Inventory
+from core.bulk import update_rows
+
+logger = logging.getLogger(__name__)
+
+# Homes per inventory lookup, within SQLite's limit on query parameters.
+LOOKUP_BATCH = 500
+# Seconds a reading is remembered to drop older ones delivered late.
+REMEMBER_SECONDS = 300
+
+
+def _config(name):
+    return settings.SENSORS[name]
+
+
+def write_amounts(amounts):
+    """Set inventory amounts from `{(home_id, ingredient_id): amount}`,
+    adding the rows that do not exist. Returns the rows written.
+
+    A home stocking an ingredient more than once has the oldest row set.
+    """
+    rows = {}
+    by_home = defaultdict(set)
+    for home_id, ingredient_id in amounts:
+        by_home[home_id].add(ingredient_id)
+    homes = sorted(by_home)
+    with transaction.atomic():
+        for start in range(0, len(homes), LOOKUP_BATCH):
+            chunk = homes[start:start + LOOKUP_BATCH]
+            ingredients = set().union(*(by_home[home] for home in chunk))
+            found = (Inventory.objects
+                     .filter(home_id__in=chunk,
+                             ingredient_id__in=ingredients)
+                     .order_by('-id')
+                     .values_list('id', 'home_id', 'ingredient_id'))
+            for pk, home_id, ingredient_id in found:
+                rows[(home_id, ingredient_id)] = pk
+        update_rows(connection, Inventory._meta.db_table, ['amount'], [
+            (amounts[key], pk) for key, pk in rows.items() if key in amounts
+        ])
+        missing = {key for key in amounts if key not in rows}
+        Inventory.objects.bulk_create([
+            Inventory(home_id=home_id, ingredient_id=ingredient_id,
+                      amount=amounts[home_id, ingredient_id])
+            for home_id, ingredient_id in missing
+        ])
+        created = {}
+        if missing:
+            for pk, home_id, ingredient_id in (
+                    Inventory.objects
+                    .filter(home_id__in={key[0] for key in missing},
+                            ingredient_id__in={key[1] for key in missing})
+                    .exclude(id__in=rows.values())
+                    .values_list('id', 'home_id', 'ingredient_id')):
+                if (home_id, ingredient_id) in missing:
+                    created[(home_id, ingredient_id)] = pk
+        batch = [
+            events.Event('inventory', action, pk,
+                         {'home_id': home_id, 'ingredient_id': ingredient_id},
+                         None)
+            for action, written in (('updated', rows), ('created', created))
+            for (home_id, ingredient_id), pk in written.items()
+            if (home_id, ingredient_id) in amounts
+        ]
+
+        def publish():
+            for event in batch:
+                events.publish(event)
+
+        transaction.on_commit(publish)
+    return len(batch)
+
+
+def _existing(model, ids):
+    """Return which of `ids` are rows of `model`."""
+    ids = sorted(ids)
+    found = set()
+    for start in range(0, len(ids), LOOKUP_BATCH):
+        chunk = ids[start:start + LOOKUP_BATCH]
+        found.update(model.objects.filter(id__in=chunk)
+                     .values_list('id', flat=True))
+    return found
+
+
+class ReadingBuffer:
+    """The latest reading of each home and ingredient, until written."""
+
+    def __init__(self, window=None, max_pending=None):
+        self.window = (_config('WINDOW_MS') / 1000 if window is None
+                       else window)
+        self.max_pending = max_pending or _config('MAX_PENDING')
+        self.counters = defaultdict(int)
+        self._pending = {}
+        # Measurement time of the latest reading taken for each row.
+        self._latest = {}
+        self._forgot = 0
+        # Failed writes of each row, while it is being retried.
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+
+    def add(self, home_id, readings):
+        """Take `(ingredient_id, amount, measured_at)` readings of a home;
+        `measured_at` is a timestamp."""
+        with self._lock:
+            pending = self._pending
+            latest = self._latest
+            stale = 0
+            for ingredient_id, amount, measured_at in readings:
+                key = (home_id, ingredient_id)
+                if measured_at < latest.get(key, measured_at):
+                    stale += 1
+                    continue
+                latest[key] = measured_at
+                pending[key] = amount
+            self.counters['readings'] += len(readings)
+            self.counters['stale'] += stale
+            full = len(pending) >= self.max_pending
+            if self.window and self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name='sensors', daemon=True)
+                self._worker.start()
+        if not self.window:
+            self.flush()
+        elif full:
+            self._wake.set()
+
+    def flush(self):
+        """Write the pending readings; return the rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._forget(time.time() - REMEMBER_SECONDS)
+        if not pending:
+            return 0
+        try:
+            written = write_amounts(pending)
+        except Exception:
+            logger.exception('Writing sensor readings failed, '
+                             'retrying home by home')
+            written = self._write_apart(pending)
+        else:
+            self._succeeded(pending)
+        self.counters['flushes'] += 1
+        self.counters['written'] += written
+        return written
+
+    def _write_apart(self, pending):
+        """Write `pending` one home at a time after a failed flush."""
+        try:
+            pending = self._drop_deleted(pending)
+        except Exception:
+            self._requeue(pending)
+            raise
+        by_home = defaultdict(dict)
+        for key, amount in pending.items():
+            by_home[key[0]][key] = amount
+        written = 0
+        for home_id, amounts in by_home.items():
+            try:
+                written += write_amounts(amounts)
+            except Exception:
+                logger.exception('Writing sensor readings of home %s failed',
+                                 home_id)
+                self._requeue(amounts)
+            else:
+                self._succeeded(amounts)
+        return written
+
+    def _drop_deleted(self, pending):
+        """Return `pending` without readings of deleted homes and
+        ingredients."""
+        homes = _existing(Home, {home_id for home_id, _ in pending})
+        ingredients = _existing(
+            Ingredient, {ingredient_id for _, ingredient_id in pending})
+        kept = {key: amount for key, amount in pending.items()
+                if key[0] in homes and key[1] in ingredients}
+        self.counters['dropped'] += len(pending) - len(kept)
+        return kept
+
+    def _requeue(self, pending):
+        """Put readings back for the next flush unless newer ones came in
+        meanwhile, dropping those that failed MAX_RETRIES times."""
+        max_retries = _config('MAX_RETRIES')
+        dropped = 0
+        with self._lock:
+            for key, amount in pending.items():
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts > max_retries:
+                    self._attempts.pop(key, None)
+                    dropped += 1
+                    continue
+                self._attempts[key] = attempts
+                self._pending.setdefault(key, amount)
+            self.counters['dropped'] += dropped
+        if dropped:
+            logger.warning('Dropped %d sensor readings after %d attempts',
+                           dropped, max_retries + 1)
+
+    def _succeeded(self, written):
+        if self._attempts:
+            with self._lock:
+                for key in written:
+                    self._attempts.pop(key, None)
+
+    def _forget(self, before):
+        """Forget readings measured before `before`, at most once a
+        minute, so rows no sensor reports on stop taking memory."""
+        if before - self._forgot < 60:
+            return
+        self._forgot = before
+        self._latest = {key: measured_at
+                        for key, measured_at in self._latest.items()
+                        if measured_at >= before}
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.window)
+            self._wake.clear()
+            # Drop connections the database closed while the worker idled.
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Writing sensor readings failed')
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the reading buffer of this process."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ReadingBuffer()
+        return _buffer
+
+
+def record(home_id, readings):
+    """Take validated readings, dicts of `ingredient`, `amount` and
+    optionally `measured_at`, reported for a home."""
+    now = time.time()
+    get_buffer().add(home_id, [
+        (reading['ingredient'], round(reading['amount']),
+         reading['measured_at'].timestamp() if reading.get('measured_at')
+         else now)
+        for reading in readings
+    ])
+
+
+@atexit.register
+def _flush_at_exit():
+    if _buffer is None:
+        return
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception('Writing sensor readings at exit failed')
@@ -2,20 +2,32 @@
 Serializers for home object.
 """
 
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
-from core.models import Home, Inventory, FavHomeRecipe
+from core import dietary
+from core.fieldsets import SparseFieldsMixin
+from core.serializers import FlagsField
+from core.timing import TimedSerializerMixin
+from core.models import Home, Ingredient, Inventory, FavHomeRecipe
 
 
-class HomeSerializer(serializers.ModelSerializer):
+class HomeSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                     serializers.ModelSerializer):
     """Serializer for Home."""
+    diets = FlagsField(dietary.DIET_BITS, required=False)
+    avoid = FlagsField(dietary.CONTENT_FLAGS, required=False)
 
     class Meta:
         model = Home
-        fields = ['id', 'name', 'parameters']
+        fields = ['id', 'name', 'parameters', 'diets', 'avoid']
         read_only_fields = ['id']
 
 
-class InventorySerializer(serializers.ModelSerializer):
+class InventorySerializer(SparseFieldsMixin, TimedSerializerMixin,
+                          serializers.ModelSerializer):
     """Serializer object for Inventory."""
 
     ingredient_name = serializers.ReadOnlyField(source='ingredient.name')
@@ -36,7 +48,8 @@ class RemoveUserFromHomeSerializer(serializers.Serializer):
     pass
 
 
-class FavHomeRecipeSerializer(serializers.ModelSerializer):
+class FavHomeRecipeSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                              serializers.ModelSerializer):
     """Serializer for fav home recipes."""
 
     home_name = serializers.ReadOnlyField(source='home.name')
@@ -47,3 +60,67 @@ class FavHomeRecipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'home_name', 'recipe',
                   'recipe_title', 'last_cooked', 'rating']
         read_only_fields = ['id', 'home_name', 'recipe_title']
+
+
+class MealPlanRequestSerializer(serializers.Serializer):
+    """Serializer for meal plan query parameters."""
+    days = serializers.IntegerField(min_value=1, max_value=28, default=7)
+    max_minutes = serializers.CharField(required=False, allow_blank=True)
+    source = serializers.ChoiceField(
+        choices=['catalog', 'favourites'],
+        default='catalog',
+    )
+    budget_ms = serializers.IntegerField(
+        min_value=1, max_value=2000, default=200)
+
+    def validate_max_minutes(self, value):
+        """Parse a single limit or a comma separated limit per day."""
+        if not value:
+            return []
+        try:
+            limits = [int(part) for part in value.split(',')]
+        except ValueError:
+            raise serializers.ValidationError(
+                'Provide whole minutes separated by commas.')
+        if any(limit < 1 for limit in limits):
+            raise serializers.ValidationError('Limits must be positive.')
+        return limits
+
+    def validate(self, attrs):
+        limits = attrs.get('max_minutes')
+        if limits and len(limits) not in (1, attrs['days']):
+            raise serializers.ValidationError(
+                {'max_minutes': 'Provide one limit or one per day.'})
+        return attrs
+
+
+class SensorReadingSerializer(serializers.Serializer):
+    """Serializer for an ingredient weight measured by a kitchen sensor."""
+    ingredient = serializers.IntegerField(min_value=1)
+    amount = serializers.FloatField(min_value=0)
+    measured_at = serializers.DateTimeField(required=False)
+
+    def validate_measured_at(self, value):
+        skew = timedelta(seconds=settings.SENSORS['MAX_SKEW_SECONDS'])
+        if value > timezone.now() + skew:
+            raise serializers.ValidationError(
+                'Measurement time is in the future.')
+        return value
+
+
+class SensorReadingsSerializer(serializers.Serializer):
+    """Serializer for a batch of sensor readings of a home."""
+    readings = SensorReadingSerializer(many=True, allow_empty=False)
+
+    def validate_readings(self, value):
+        limit = settings.SENSORS['MAX_READINGS']
+        if len(value) > limit:
+            raise serializers.ValidationError(
+                f'Send at most {limit} readings at a time.')
+        ids = {reading['ingredient'] for reading in value}
+        unknown = ids - set(Ingredient.objects.filter(id__in=ids)
+                            .values_list('id', flat=True))
+        if unknown:
+            raise serializers.ValidationError(
+                f'Unknown ingredients: {sorted(unknown)}.')
+        return value
@@ -0,0 +1,19 @@
+"""
+Signal receivers for home app.
+"""
+from django.db.models.signals import post_delete, post_save
+
+from core.models import Recipe, RecipeIngredient
+from home import meal_plan
+
+for model in (Recipe, RecipeIngredient):
+    post_save.connect(
+        meal_plan.invalidate_matrix,
+        sender=model,
+        dispatch_uid=f'meal_plan_save_{model.__name__}',
+    )
+    post_delete.connect(
+        meal_plan.invalidate_matrix,
+        sender=model,
+        dispatch_uid=f'meal_plan_delete_{model.__name__}',
+    )
@@ -40,13 +40,16 @@ class PublicFavHomeRecipeTests(TestCase):
 class PrivateFavHomeRecipeTests(TestCase):
     """Test for favourite home recipes."""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.home = create_home()
+        cls.user = create_user(email='user@example.com', password='Test123')
+        cls.user.home = cls.home
+        cls.user.save()
+        cls.recipe = create_recipe(user=cls.user)
+
     def setUp(self):
         self.client = APIClient()
-        self.home = create_home()
-        self.user = create_user(email='user@example.com', password='Test123')
-        self.user.home = self.home
-        self.user.save()
-        self.recipe = create_recipe(user=self.user)
         self.client.force_authenticate(self.user)
 
     def test_fetch_fav_recipes_for_user_home(self):
@@ -138,3 +141,49 @@ class PrivateFavHomeRecipeTests(TestCase):
         url = detail_url(fav_recipe.id)
         res = self.client.delete(url)
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_fav_recipe_updates_popularity(self):
+        """Test committed creates, updates and deletes of a fav recipe keep
+        the recipe popularity aggregates in step."""
+        payload = {'recipe': self.recipe.id, 'rating': 6}
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(FAV_HOME_RECIPE_CREATE_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.fav_count, 1)
+        self.assertEqual(self.recipe.rating_sum, 6)
+        self.assertEqual(self.recipe.rating_count, 1)
+
+        url = detail_url(res.data['id'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'rating': 9})
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.fav_count, 1)
+        self.assertEqual(self.recipe.rating_sum, 9)
+        self.assertEqual(self.recipe.rating_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(url)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.fav_count, 0)
+        self.assertEqual(self.recipe.rating_sum, 0)
+        self.assertEqual(self.recipe.rating_count, 0)
+
+    def test_fav_recipe_change_recipe_moves_popularity(self):
+        """Test pointing a fav recipe at another recipe moves the
+        aggregates between both recipes."""
+        other = create_recipe(user=self.user, title='Rajma')
+        payload = {'recipe': self.recipe.id, 'rating': 4}
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(FAV_HOME_RECIPE_CREATE_URL, payload)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(detail_url(res.data['id']),
+                              {'recipe': other.id})
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.fav_count, 0)
+        self.assertEqual(self.recipe.rating_sum, 0)
+        self.assertEqual(other.fav_count, 1)
+        self.assertEqual(other.rating_sum, 4)
+        self.assertEqual(other.rating_count, 1)
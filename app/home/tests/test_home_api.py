@@ -8,6 +8,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import dietary
 from core.models import Home
 from home.serializers import HomeSerializer
 from home.helper_method import (
@@ -43,8 +44,11 @@ class PublicHomeAPITests(TestCase):
 class PrivateHomeApiTests(TestCase):
     """Tests for authenticated Home API requests."""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='sarthak@example.com', password='test12')
+
     def setUp(self):
-        self.user = create_user(email='sarthak@example.com', password='test12')
         self.client = APIClient()
         self.client.force_authenticate(self.user)
 
@@ -206,6 +210,24 @@ class PrivateHomeApiTests(TestCase):
         self.assertEqual(home.name, payload['name'])
         self.assertEqual(self.user.home, home)
 
+    def test_set_dietary_profile(self):
+        """Test diets and flags to avoid are stored as bitmasks."""
+        home = create_home()
+        self.user.home = home
+        self.user.save()
+        payload = {'diets': ['vegetarian'], 'avoid': ['nuts', 'peanuts']}
+
+        res = self.client.patch(detail_url(home.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['diets'], ['vegetarian'])
+        self.assertEqual(res.data['avoid'], ['peanuts', 'nuts'])
+        home.refresh_from_db()
+        self.assertEqual(home.diets, dietary.DIET_BITS['vegetarian'])
+        res = self.client.patch(detail_url(home.id),
+                                {'avoid': ['unclassified']}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_updating_other_user_home_when_no_home(self):
         """Test updating home for different user when logged in
         user has no home assigned is unsuccessful."""
@@ -41,12 +41,15 @@ class PublicInventoryApiTests(TestCase):
 class PrivateInventoryAPiTests(TestCase):
     """Test Inventory API requests authentciated."""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.home = create_home()
+        cls.user = create_user(email='user@example.com', password='Test123')
+        cls.user.home = cls.home
+        cls.user.save()
+
     def setUp(self):
         self.client = APIClient()
-        self.home = create_home()
-        self.user = create_user(email='user@example.com', password='Test123')
-        self.user.home = self.home
-        self.user.save()
         self.client.force_authenticate(self.user)
 
     def test_fetching_inventory_list_for_user_home(self):
@@ -0,0 +1,312 @@
+"""
+Test API requests for meal plans.
+"""
+
+import tempfile
+import threading
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import cache, dietary
+from home import meal_plan
+from recipe import cooccurrence
+from home.helper_method import (
+    create_user,
+    create_home,
+    create_recipe,
+    create_ingredient,
+    create_fav_recipe,
+    add_to_inventory,
+    add_recipe_ingredient,
+)
+
+MEAL_PLAN_URL = reverse('home:meal-plan')
+
+
+def build_matrix(recipes):
+    """Build a matrix from {recipe_id: (time, [(ing, amount, mand)])}."""
+    rows = [(rid, minutes) for rid, (minutes, _) in sorted(recipes.items())]
+    lines = [
+        (rid, ing, amount, 'g', mandatory)
+        for rid, (_, recipe_lines) in sorted(recipes.items())
+        for ing, amount, mandatory in recipe_lines
+    ]
+    return meal_plan.RecipeMatrix.from_rows(rows, lines)
+
+
+class MealPlanOptimizerTests(SimpleTestCase):
+    """Tests for the meal plan optimizer."""
+
+    def test_matrix_rows(self):
+        """Test recipe lines end up in the matching matrix rows."""
+        matrix = build_matrix({
+            1: (10, [(5, 100, True)]),
+            2: (20, []),
+            3: (30, [(5, 200, True), (6, 1, False)]),
+        })
+        self.assertEqual(len(matrix), 3)
+        self.assertEqual(matrix.nnz, 3)
+        self.assertEqual(list(matrix.indptr), [0, 1, 1, 3])
+        self.assertEqual(list(matrix.lines_by_ingredient[5]), [0, 1])
+
+    def test_plan_prefers_inventory_and_respects_time(self):
+        """Test recipes using the inventory are preferred within limits."""
+        matrix = build_matrix({
+            1: (15, [(1, 100, True), (2, 100, True)]),
+            2: (90, [(1, 100, True), (3, 100, True)]),
+            3: (20, [(4, 100, True), (5, 100, True)]),
+            4: (25, [(3, 100, True)]),
+        })
+        inventory = {1: (0, 1000.0), 3: (0, 1000.0)}
+
+        result = meal_plan.plan_meals(
+            matrix, inventory, [30, 30], budget_ms=50)
+
+        chosen = {matrix.recipe_ids[row] for row in result['rows']}
+        self.assertEqual(chosen, {1, 4})
+
+    def test_plan_consumes_stock(self):
+        """Test stock used on one day is not counted again."""
+        matrix = build_matrix({
+            1: (10, [(1, 100, True)]),
+            2: (10, [(1, 100, True)]),
+            3: (10, [(2, 100, True)]),
+        })
+        inventory = {1: (0, 100.0), 2: (0, 100.0)}
+
+        result = meal_plan.plan_meals(matrix, inventory, [None, None])
+
+        chosen = [matrix.recipe_ids[row] for row in result['rows']]
+        self.assertIn(3, chosen)
+        self.assertEqual(len(set(chosen)), 2)
+        missing = meal_plan.shopping_list(matrix, result['rows'], inventory)
+        self.assertEqual(missing, {})
+
+    def test_fallback_cheapest_first(self):
+        """Test recipes sharing nothing with the stock come cheapest
+        first, also among a few candidates."""
+        matrix = build_matrix({
+            1: (10, [(1, 100, True), (2, 100, True)]),
+            2: (40, [(3, 100, True)]),
+            3: (20, [(4, 100, True)]),
+            **{rid: (5, [(5, 1, True)] * 3) for rid in range(4, 40)},
+        })
+        self.assertEqual(
+            [matrix.recipe_ids[row] for row in matrix.fallback_order[:3]],
+            [3, 2, 1])
+
+        result = meal_plan.plan_meals(
+            matrix, {}, [None], candidates=[0, 1])
+
+        self.assertEqual(result['rows'], [1])
+        self.assertEqual(result['candidates'], 2)
+
+
+@override_settings(MEAL_PLAN={'REBUILD_ASYNC': True,
+                              'REBUILD_INTERVAL': 60})
+class MatrixCacheTests(SimpleTestCase):
+    """Test the cached matrix is rebuilt off the request path."""
+
+    def setUp(self):
+        self.old = build_matrix({1: (10, [])})
+        self.new = build_matrix({1: (10, []), 2: (10, [])})
+        patcher = mock.patch.multiple(
+            meal_plan, _matrix=self.old, _stale=False, _rebuilding=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.built = threading.Event()
+
+        def load_matrix():
+            self.built.set()
+            return self.new
+
+        patcher = mock.patch.object(meal_plan, 'load_matrix', load_matrix)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stale_matrix_served_while_rebuilt(self):
+        self.old.built_at -= 120
+        meal_plan.invalidate_matrix()
+
+        self.assertIs(meal_plan.get_matrix(), self.old)
+
+        self.assertTrue(self.built.wait(5))
+        for thread in threading.enumerate():
+            if thread.name == 'meal-plan-matrix':
+                thread.join()
+        self.assertIs(meal_plan.get_matrix(), self.new)
+
+    def test_rebuilds_rate_limited(self):
+        meal_plan.invalidate_matrix()
+
+        self.assertIs(meal_plan.get_matrix(), self.old)
+
+        self.assertFalse(self.built.is_set())
+
+
+class PublicMealPlanApiTests(TestCase):
+    """Test unauthenticated meal plan requests."""
+
+    def test_auth_required(self):
+        """Test auth is required for meal plans."""
+        res = APIClient().get(MEAL_PLAN_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(
+    COOCCURRENCE_PATH=f'{tempfile.gettempdir()}/missing-cooccurrence.bin')
+class PrivateMealPlanApiTests(TestCase):
+    """Test authenticated meal plan requests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.home = create_home()
+        cls.user = create_user(email='user@example.com', password='Test123')
+        cls.user.home = cls.home
+        cls.user.save()
+
+    def setUp(self):
+        cooccurrence.reset_index()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_meal_plan_without_home(self):
+        """Test a user without home cannot get a meal plan."""
+        user = create_user(email='other@example.com', password='Test123')
+        self.client.force_authenticate(user)
+        res = self.client.get(MEAL_PLAN_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_meal_plan_uses_inventory(self):
+        """Test the plan uses inventory and lists missing ingredients."""
+        rice = create_ingredient(self.user, name='Rice')
+        dal = create_ingredient(self.user, name='Dal')
+        paneer = create_ingredient(self.user, name='Paneer')
+        add_to_inventory(self.home, rice, amount=1, amount_unit='kg')
+        khichdi = create_recipe(self.user, title='Khichdi', time_minutes=30)
+        add_recipe_ingredient(khichdi, rice, amount=200)
+        add_recipe_ingredient(khichdi, dal, amount=100)
+        curry = create_recipe(self.user, title='Curry', time_minutes=30)
+        add_recipe_ingredient(curry, paneer, amount=250)
+        add_recipe_ingredient(curry, dal, amount=50)
+
+        res = self.client.get(MEAL_PLAN_URL, {'days': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['plan'][0]['recipe']['id'], khichdi.id)
+        self.assertEqual(res.data['shopping_list'], [{
+            'ingredient': dal.id,
+            'ingredient_name': 'Dal',
+            'amount': 100.0,
+            'amount_unit': 'g',
+            'substitutes': [],
+        }])
+
+    def test_meal_plan_time_limits(self):
+        """Test recipes over the day's time limit are not picked."""
+        create_recipe(self.user, title='Biryani', time_minutes=120)
+        quick = create_recipe(self.user, title='Poha', time_minutes=15)
+
+        res = self.client.get(MEAL_PLAN_URL, {
+            'days': 2,
+            'max_minutes': '20,20',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes = [day['recipe'] for day in res.data['plan']]
+        self.assertEqual(recipes[0]['id'], quick.id)
+        self.assertIsNone(recipes[1])
+
+    def test_meal_plan_from_favourites(self):
+        """Test source=favourites only plans favourite recipes."""
+        create_recipe(self.user, title='Biryani')
+        fav = create_recipe(self.user, title='Poha')
+        create_fav_recipe(self.home, fav)
+
+        res = self.client.get(MEAL_PLAN_URL, {
+            'days': 3,
+            'source': 'favourites',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes = [day['recipe'] for day in res.data['plan']]
+        self.assertEqual(recipes[0]['id'], fav.id)
+        self.assertEqual(recipes[1:], [None, None])
+
+    def test_meal_plan_follows_dietary_profile(self):
+        """Test recipes the home's profile rules out are not planned."""
+        self.home.diets = dietary.DIET_BITS['vegetarian']
+        self.home.save()
+        create_recipe(self.user, title='Steak',
+                      dietary_flags=dietary.FLAGS['meat'])
+        create_recipe(self.user, title='Mystery',
+                      dietary_flags=dietary.UNCLASSIFIED)
+        dal = create_recipe(self.user, title='Dal',
+                            dietary_flags=dietary.FLAGS['milk'])
+
+        res = self.client.get(MEAL_PLAN_URL, {'days': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes = [day['recipe'] for day in res.data['plan']]
+        self.assertEqual(recipes[0]['id'], dal.id)
+        self.assertIsNone(recipes[1])
+
+    def test_meal_plan_invalid_limits(self):
+        """Test mismatched per day limits return an error."""
+        res = self.client.get(MEAL_PLAN_URL, {
+            'days': 3,
+            'max_minutes': '20,30',
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(
+    COOCCURRENCE_PATH=f'{tempfile.gettempdir()}/missing-cooccurrence.bin',
+    RESPONSE_CACHE=dict(settings.RESPONSE_CACHE, ENABLED=True))
+class CachedMealPlanApiTests(TestCase):
+    """Test meal plans served from the response cache."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        cooccurrence.reset_index()
+        self.home = create_home()
+        self.user = create_user(email='user@example.com', password='Test123')
+        self.user.home = self.home
+        self.user.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_profile_change_invalidates_plan(self):
+        """Test a cached plan follows a new dietary profile."""
+        steak = create_recipe(self.user, title='Steak',
+                              dietary_flags=dietary.FLAGS['meat'])
+        meal_plan.get_matrix()
+        res = self.client.get(MEAL_PLAN_URL, {'days': 1})
+        self.assertEqual(res.data['plan'][0]['recipe']['id'], steak.id)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.home.diets = dietary.DIET_BITS['vegetarian']
+            self.home.save()
+        res = self.client.get(MEAL_PLAN_URL, {'days': 1})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertIsNone(res.data['plan'][0]['recipe'])
+
+    def test_plan_from_outdated_matrix_not_cached(self):
+        """Test plans are not cached while the matrix is being rebuilt."""
+        create_recipe(self.user, title='Dal')
+        meal_plan.get_matrix()
+
+        with mock.patch.object(meal_plan, '_rebuilding', True):
+            self.client.get(MEAL_PLAN_URL, {'days': 1})
+            res = self.client.get(MEAL_PLAN_URL, {'days': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Cache', res)
@@ -0,0 +1,223 @@
+"""
+Tests for sensor readings API requests.
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import events
+from core.models import Inventory
+from home import sensors
+from home.helper_method import (
+    create_user,
+    create_ingredient,
+    create_home,
+    add_to_inventory,
+)
+
+SENSOR_READINGS_URL = reverse('home:sensor-readings')
+
+
+class PrivateSensorApiTests(TestCase):
+    """Test sensor readings API requests authenticated."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.home = create_home()
+        cls.user = create_user(email='user@example.com', password='Test123')
+        cls.user.home = cls.home
+        cls.user.save()
+        cls.flour = create_ingredient(user=cls.user, name='Flour')
+        cls.sugar = create_ingredient(user=cls.user, name='Sugar')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch.object(sensors, '_buffer',
+                                    sensors.ReadingBuffer(window=0))
+        self.buffer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_latest_readings_written(self):
+        """Test the latest reading of each ingredient sets its amount,
+        adding ingredients not in the inventory."""
+        inventory = add_to_inventory(home=self.home, ingredient=self.flour,
+                                     amount=900)
+        payload = {'readings': [
+            {'ingredient': self.flour.id, 'amount': 850},
+            {'ingredient': self.flour.id, 'amount': 820},
+            {'ingredient': self.sugar.id, 'amount': 310.4},
+        ]}
+
+        res = self.client.post(SENSOR_READINGS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data, {'accepted': 3})
+        inventory.refresh_from_db()
+        self.assertEqual(inventory.amount, 820)
+        sugar = Inventory.objects.get(home=self.home, ingredient=self.sugar)
+        self.assertEqual(sugar.amount, 310)
+        self.assertEqual(self.buffer.counters['written'], 2)
+
+    def test_late_readings_dropped(self):
+        """Test a reading measured before the last one taken is dropped."""
+        now = timezone.now()
+        for measured_at, amount in ((now, 400),
+                                    (now - timedelta(seconds=5), 700)):
+            self.client.post(SENSOR_READINGS_URL, {'readings': [
+                {'ingredient': self.flour.id, 'amount': amount,
+                 'measured_at': measured_at.isoformat()},
+            ]}, format='json')
+
+        inventory = Inventory.objects.get(home=self.home,
+                                          ingredient=self.flour)
+        self.assertEqual(inventory.amount, 400)
+        self.assertEqual(self.buffer.counters['stale'], 1)
+
+    def test_future_readings_rejected(self):
+        """Test readings measured beyond the allowed clock skew are
+        refused, as they would shadow every later reading."""
+        measured_at = timezone.now() + timedelta(minutes=10)
+        payload = {'readings': [
+            {'ingredient': self.flour.id, 'amount': 10,
+             'measured_at': measured_at.isoformat()},
+        ]}
+
+        res = self.client.post(SENSOR_READINGS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('measured_at', res.data['readings'][0])
+        self.assertFalse(Inventory.objects.exists())
+
+    def test_unknown_ingredient_rejected(self):
+        payload = {'readings': [{'ingredient': 999999, 'amount': 10}]}
+
+        res = self.client.post(SENSOR_READINGS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('999999', str(res.data['readings']))
+        self.assertFalse(Inventory.objects.exists())
+
+    def test_too_many_readings_rejected(self):
+        payload = {'readings': [{'ingredient': self.flour.id, 'amount': 1}]
+                   * 3}
+
+        with self.settings(SENSORS={'MAX_READINGS': 2}):
+            res = self.client.post(SENSOR_READINGS_URL, payload,
+                                   format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_without_home_forbidden(self):
+        user = create_user(email='other@example.com', password='Test123')
+        self.client.force_authenticate(user)
+        payload = {'readings': [{'ingredient': self.flour.id, 'amount': 1}]}
+
+        res = self.client.post(SENSOR_READINGS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_inventory_events_published(self):
+        """Test bulk written rows are published once committed."""
+        add_to_inventory(home=self.home, ingredient=self.flour)
+        published = []
+        with mock.patch.object(events, 'publish', published.append):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(SENSOR_READINGS_URL, {'readings': [
+                    {'ingredient': self.flour.id, 'amount': 5},
+                    {'ingredient': self.sugar.id, 'amount': 6},
+                ]}, format='json')
+
+        self.assertEqual(
+            sorted((event.topic, event.data['ingredient_id'])
+                   for event in published),
+            [(f'home/{self.home.id}/inventory/created', self.sugar.id),
+             (f'home/{self.home.id}/inventory/updated', self.flour.id)])
+
+
+class ReadingBufferTests(TestCase):
+    """Test coalescing readings between writes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.home = create_home()
+        user = create_user(email='user@example.com', password='Test123')
+        cls.flour = create_ingredient(user=user, name='Flour')
+
+    def test_readings_coalesced_until_flush(self):
+        buffer = sensors.ReadingBuffer(window=60)
+        with mock.patch.object(buffer, '_run'):
+            for amount in range(100, 0, -1):
+                buffer.add(self.home.id, [(self.flour.id, amount, amount)])
+
+        self.assertFalse(Inventory.objects.exists())
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(Inventory.objects.get().amount, 100)
+        self.assertEqual(buffer.counters['readings'], 100)
+        self.assertEqual(buffer.counters['stale'], 99)
+
+    def test_failed_flush_keeps_readings(self):
+        buffer = sensors.ReadingBuffer(window=60)
+        with mock.patch.object(buffer, '_run'):
+            buffer.add(self.home.id, [(self.flour.id, 250, 1)])
+
+        with mock.patch.object(sensors, 'write_amounts',
+                               side_effect=RuntimeError('down')), \
+                self.assertLogs('home.sensors', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(Inventory.objects.get().amount, 250)
+
+    def test_failing_home_does_not_block_others(self):
+        """Test a failed flush is retried per home, dropping readings of
+        deleted ingredients."""
+        other = create_home(name='Other')
+        sugar = create_ingredient(user=create_user(email='o@example.com'),
+                                  name='Sugar')
+        buffer = sensors.ReadingBuffer(window=60)
+        with mock.patch.object(buffer, '_run'):
+            buffer.add(self.home.id, [(self.flour.id, 250, 1),
+                                      (sugar.id, 40, 1)])
+            buffer.add(other.id, [(self.flour.id, 500, 1)])
+        sugar_id = sugar.id
+        sugar.delete()
+        write_amounts = sensors.write_amounts
+
+        def fail_on_deleted(amounts):
+            if any(ingredient == sugar_id for _, ingredient in amounts):
+                raise RuntimeError('foreign key')
+            return write_amounts(amounts)
+
+        with mock.patch.object(sensors, 'write_amounts', fail_on_deleted), \
+                self.assertLogs('home.sensors', 'ERROR'):
+            self.assertEqual(buffer.flush(), 2)
+
+        self.assertEqual(
+            sorted(Inventory.objects.values_list('home_id', 'amount')),
+            [(self.home.id, 250), (other.id, 500)])
+        self.assertEqual(buffer.counters['dropped'], 1)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_retries_are_capped(self):
+        buffer = sensors.ReadingBuffer(window=60)
+        with mock.patch.object(buffer, '_run'):
+            buffer.add(self.home.id, [(self.flour.id, 250, 1)])
+
+        with mock.patch.object(sensors, 'write_amounts',
+                               side_effect=RuntimeError('down')), \
+                self.assertLogs('home.sensors', 'ERROR'), \
+                self.settings(SENSORS=dict(settings.SENSORS, MAX_RETRIES=2)):
+            for _ in range(3):
+                buffer.flush()
+
+        self.assertEqual(buffer.counters['dropped'], 1)
+        self.assertEqual(buffer.flush(), 0)
+        self.assertFalse(Inventory.objects.exists())
@@ -32,4 +32,8 @@ urlpatterns = [
      path('fav-recipe-update/<int:pk>/',
           views.FavHomeRecipeUpdateView.as_view(),
           name='fav-recipe-update'),
+     path('meal-plan/', views.MealPlanView.as_view(),
+          name='meal-plan'),
+     path('sensor-readings/', views.SensorReadingsView.as_view(),
+          name='sensor-readings'),
 ]
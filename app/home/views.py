@@ -7,7 +7,9 @@ from rest_framework import viewsets, status, generics
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from home import serializers
+from home import serializers, meal_plan, sensors
+from core.cache import CachedResponseMixin
+from core.fieldsets import SparseQuerysetMixin
 from core.models import Home, Inventory, FavHomeRecipe
 from rest_framework.exceptions import ValidationError
 from rest_framework.exceptions import PermissionDenied
@@ -15,16 +17,20 @@ from home.permissions import (
     InventoryPermissions,
     AddUserToHomePermissions,
     FavHomeRecipePermissions,
+    MealPlanPermissions,
 )
 from django.contrib.auth import get_user_model
 
 
-class HomeViewSet(viewsets.ModelViewSet):
+class HomeViewSet(CachedResponseMixin, SparseQuerysetMixin,
+                  viewsets.ModelViewSet):
     """Views to manage home API request."""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.HomeSerializer
     queryset = Home.objects.all()
+    cache_scope = 'home'
+    cache_namespaces = ['home:{home}']
 
     def get_queryset(self):
         """Return home object for authenticated user."""
@@ -74,12 +80,15 @@ class HomeViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class InventoryFetchView(generics.ListAPIView):
+class InventoryFetchView(CachedResponseMixin, SparseQuerysetMixin,
+                         generics.ListAPIView):
     """View to fetch inventory list API requests."""
     serializer_class = serializers.InventorySerializer
     queryset = Inventory.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, InventoryPermissions]
+    cache_scope = 'home'
+    cache_namespaces = ['inventory:{home}', 'ingredient']
 
     def get_queryset(self):
         """Return the list of inventory for authenticated user."""
@@ -100,12 +109,15 @@ class InventoryCreateView(generics.CreateAPIView):
         serializer.save(home=self.request.user.home)
 
 
-class InventoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+class InventoryDetailView(CachedResponseMixin, SparseQuerysetMixin,
+                          generics.RetrieveUpdateDestroyAPIView):
     """View to update and retrieve Inventory items for home."""
     serializer_class = serializers.InventorySerializer
     queryset = Inventory.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, InventoryPermissions]
+    cache_scope = 'home'
+    cache_namespaces = ['inventory:{home}', 'ingredient']
 
 
 class AddUserToHomeView(generics.CreateAPIView):
@@ -146,12 +158,15 @@ class RemoveUserFromHomeView(generics.GenericAPIView):
             status=status.HTTP_200_OK)
 
 
-class FavHomeRecipeListView(generics.ListAPIView):
+class FavHomeRecipeListView(CachedResponseMixin, SparseQuerysetMixin,
+                            generics.ListAPIView):
     """View to manage Favourite home recipe API requests."""
     serializer_class = serializers.FavHomeRecipeSerializer
     queryset = FavHomeRecipe.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    cache_scope = 'home'
+    cache_namespaces = ['favourite:{home}', 'home:{home}', 'recipe']
 
     def get_queryset(self):
         """Return the list of fav recipes for authenticated user's home."""
@@ -170,9 +185,52 @@ class FavHomeRecipeCreateView(generics.CreateAPIView):
         serializer.save(home=self.request.user.home)
 
 
-class FavHomeRecipeUpdateView(generics.RetrieveUpdateDestroyAPIView):
+class FavHomeRecipeUpdateView(CachedResponseMixin, SparseQuerysetMixin,
+                              generics.RetrieveUpdateDestroyAPIView):
     """View to update, retrieve, delete fav recipe object."""
     serializer_class = serializers.FavHomeRecipeSerializer
     queryset = FavHomeRecipe.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, FavHomeRecipePermissions]
+    cache_scope = 'home'
+    cache_namespaces = ['favourite:{home}', 'home:{home}', 'recipe']
+
+
+class MealPlanView(CachedResponseMixin, generics.GenericAPIView):
+    """View to generate a weekly meal plan for user's home."""
+    serializer_class = serializers.MealPlanRequestSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated, MealPlanPermissions]
+    cache_scope = 'home'
+    cache_namespaces = ['inventory:{home}', 'favourite:{home}', 'home:{home}',
+                        'recipe', 'recipeingredient', 'ingredient']
+
+    def get(self, request, *args, **kwargs):
+        return self.cached_response(self.plan, request, *args, **kwargs)
+
+    def plan(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        current = meal_plan.matrix_is_current()
+        plan = meal_plan.plan_for_home(
+            request.user.home, **serializer.validated_data)
+        # Plans from a matrix older than the catalog would be cached under
+        # the catalog's new generation.
+        self.cacheable = current and meal_plan.matrix_is_current()
+        return Response(plan, status=status.HTTP_200_OK)
+
+
+class SensorReadingsView(generics.GenericAPIView):
+    """View to take ingredient weights reported by kitchen sensors."""
+    serializer_class = serializers.SensorReadingsSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated, InventoryPermissions]
+
+    def post(self, request, *args, **kwargs):
+        """Buffer the readings; inventory amounts follow within a window."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        readings = serializer.validated_data['readings']
+        sensors.record(request.user.home_id, readings)
+        return Response({'accepted': len(readings)},
+                        status=status.HTTP_202_ACCEPTED)
@@ -0,0 +1,22 @@
+"""
+Async views for Recipe, served over ASGI.
+"""
+from core.async_views import AsyncReadView
+from recipe import views
+
+
+class RecipeListView(AsyncReadView):
+    """Async view for the recipe list."""
+    view_class = views.RecipeViewSet
+    actions = {'get': 'list', 'post': 'create'}
+
+
+class RecipeDetailView(AsyncReadView):
+    """Async view for recipe details."""
+    view_class = views.RecipeViewSet
+    actions = {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    }
@@ -0,0 +1,872 @@
+"""
+Ingredient co-occurrence matrix and substitute suggestions.
+
+The matrix counts, for every pair of ingredients, the number of recipes
+using both. It is kept in a single little-endian binary file that request
+workers memory-map, so lookups are array slices with no SQL:
+
+    header      magic, version, generation, size, nnz, k
+    indptr      int64[size + 1]   row r is cols/counts[indptr[r]:indptr[r+1]]
+    cols        int64[nnz]        neighbour ids, most frequent first
+    counts      int32[nnz]
+    freq        int32[size]       recipes using each ingredient
+    subs        int64[size * k]   precomputed substitutes, -1 padded
+    scores      float32[size * k]
+    name_ptr    int64[size + 1]
+    names       utf-8 bytes
+
+Rows are indexed by ingredient id; deleted ingredients keep an empty
+row and no name. `build_index` writes the file from scratch.
+
+Rows have no room to grow in place, so `apply_changes` keeps the rows,
+frequencies, substitutes and names it recomputes in a delta file next
+to the index (`<path>.delta`), laid out the same way but with the
+ingredient ids of each section, which readers look up before the mapped
+file. Only once the delta file has grown past a fraction of the index
+are the two compacted into a new index file, the one step that rewrites
+every row.
+
+Committed changes are not merged one by one: each process collects them
+and a background thread merges what came in every
+`COOCCURRENCE_FLUSH_MS` at once, so requests never wait for it. A
+process killed in between loses its last changes until the next
+`build_cooccurrence`.
+"""
+import atexit
+import fcntl
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import transaction
+
+from core.models import Ingredient, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RCOO'
+DELTA_MAGIC = b'RCOD'
+VERSION = 1
+HEADER = struct.Struct('<4sIQQQI4x')
+# magic, version, base generation, generation, size, k, then the ids of
+# rows, row entries, ids of frequencies, substitutes and names, and the
+# length of the names.
+DELTA_HEADER = struct.Struct('<4sI10Q')
+
+# Substitutes stored per ingredient.
+SUBSTITUTES = 10
+# Neighbours per row considered when scoring substitutes.
+FANOUT = 20
+# Seconds between checks for a newer file in reader processes.
+RELOAD_INTERVAL = 1.0
+# Values the delta file may hold before it is compacted into the index
+# file, or this fraction of the values of the index file if more.
+DELTA_MIN = 100000
+DELTA_RATIO = 0.1
+
+
+def index_path():
+    """Return the configured path of the co-occurrence file."""
+    return str(settings.COOCCURRENCE_PATH)
+
+
+def delta_path(path):
+    """Return the path of the delta file kept next to an index file."""
+    return path + '.delta'
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _offsets(start, sections):
+    """Return `{section: (offset, typecode, length)}` of `sections`
+    following a header of `start` bytes."""
+    layout = {}
+    offset = start
+    for name, typecode, length in sections:
+        offset = _align(offset)
+        layout[name] = (offset, typecode, length)
+        offset += length * array(typecode).itemsize
+    return layout
+
+
+def _layout(size, nnz, k, names_len):
+    """Return the layout of an index file."""
+    return _offsets(HEADER.size, [
+        ('indptr', 'q', size + 1),
+        ('cols', 'q', nnz),
+        ('counts', 'i', nnz),
+        ('freq', 'i', size),
+        ('subs', 'q', size * k),
+        ('scores', 'f', size * k),
+        ('name_ptr', 'q', size + 1),
+        ('names', 'B', names_len),
+    ])
+
+
+def _delta_layout(k, rows, nnz, freqs, scored, named, names_len):
+    """Return the layout of a delta file.
+
+    Each kind of value comes with the ingredient ids it is for.
+    """
+    return _offsets(DELTA_HEADER.size, [
+        ('row_ids', 'q', rows),
+        ('indptr', 'q', rows + 1),
+        ('cols', 'q', nnz),
+        ('counts', 'i', nnz),
+        ('freq_ids', 'q', freqs),
+        ('freq', 'i', freqs),
+        ('sub_ids', 'q', scored),
+        ('subs', 'q', scored * k),
+        ('scores', 'f', scored * k),
+        ('name_ids', 'q', named),
+        ('name_ptr', 'q', named + 1),
+        ('names', 'B', names_len),
+    ])
+
+
+def _cast(buffer, layout):
+    """Return `{section: memoryview}` over the sections of `buffer`."""
+    view = memoryview(buffer)
+    return {
+        name: view[offset:offset + length * array(typecode).itemsize]
+        .cast(typecode)
+        for name, (offset, typecode, length) in layout.items()
+    }
+
+
+def _stat_key(stat):
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _file_state(path):
+    """Return what identifies the current index and delta files.
+
+    Raises FileNotFoundError when there is no index file.
+    """
+    base = _stat_key(os.stat(path))
+    try:
+        delta = _stat_key(os.stat(delta_path(path)))
+    except FileNotFoundError:
+        delta = None
+    return base, delta
+
+
+class _Delta:
+    """Sections of a delta file, with the position of each id in them."""
+
+    def __init__(self, data):
+        (magic, version, self.base_generation, self.generation, self.size,
+         self.k, rows, nnz, freqs, scored, named,
+         names_len) = DELTA_HEADER.unpack_from(data, 0)
+        if magic != DELTA_MAGIC or version != VERSION:
+            raise ValueError('Not a co-occurrence delta file.')
+        self.__dict__.update(_cast(data, _delta_layout(
+            self.k, rows, nnz, freqs, scored, named, names_len)))
+        self.rows = dict(zip(self.row_ids, range(rows)))
+        self.freqs = dict(zip(self.freq_ids, range(freqs)))
+        self.scored = dict(zip(self.sub_ids, range(scored)))
+        self.named = dict(zip(self.name_ids, range(named)))
+
+
+def _read_delta(path, base_generation):
+    """Return `(stat key, delta)` of the delta file of `path`.
+
+    `delta` is None without a delta file for this `base_generation`.
+    """
+    try:
+        with open(delta_path(path), 'rb') as fh:
+            key = _stat_key(os.fstat(fh.fileno()))
+            delta = _Delta(fh.read())
+    except FileNotFoundError:
+        return None, None
+    if delta.base_generation != base_generation:
+        return key, None
+    return key, delta
+
+
+class CooccurrenceIndex:
+    """Read-only view over a memory-mapped co-occurrence file and the
+    values its delta file replaces."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as fh:
+            base_key = _stat_key(os.fstat(fh.fileno()))
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, generation, size, nnz, k = HEADER.unpack_from(
+            self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path} is not a co-occurrence index.')
+        self.base_generation = generation
+        self.base_size = size
+        self.nnz = nnz
+        self.k = k
+        names_len = len(self._mmap) - _layout(size, nnz, k, 0)['names'][0]
+        self.__dict__.update(_cast(
+            self._mmap, _layout(size, nnz, k, names_len)))
+
+        delta_key, self._delta = _read_delta(path, generation)
+        self.state = (base_key, delta_key)
+        self.generation = generation
+        self.size = size
+        if self._delta is not None:
+            self.generation = self._delta.generation
+            self.size = max(size, self._delta.size)
+
+    def _in_base(self, ingredient_id):
+        return 0 <= ingredient_id < self.base_size
+
+    def _row(self, ingredient_id):
+        """Return `(cols, counts, start, end)` holding a row."""
+        delta = self._delta
+        if delta is not None and ingredient_id in delta.rows:
+            pos = delta.rows[ingredient_id]
+            return (delta.cols, delta.counts, delta.indptr[pos],
+                    delta.indptr[pos + 1])
+        if not self._in_base(ingredient_id):
+            return self.cols, self.counts, 0, 0
+        return (self.cols, self.counts, self.indptr[ingredient_id],
+                self.indptr[ingredient_id + 1])
+
+    def _name(self, ingredient_id):
+        """Return `(names, start, end)` holding an encoded name."""
+        delta = self._delta
+        if delta is not None and ingredient_id in delta.named:
+            pos = delta.named[ingredient_id]
+            return delta.names, delta.name_ptr[pos], delta.name_ptr[pos + 1]
+        if not self._in_base(ingredient_id):
+            return self.names, 0, 0
+        return (self.names, self.name_ptr[ingredient_id],
+                self.name_ptr[ingredient_id + 1])
+
+    def __contains__(self, ingredient_id):
+        return self.frequency(ingredient_id) > 0
+
+    def frequency(self, ingredient_id):
+        """Number of recipes that use the ingredient."""
+        delta = self._delta
+        if delta is not None and ingredient_id in delta.freqs:
+            return delta.freq[delta.freqs[ingredient_id]]
+        if not self._in_base(ingredient_id):
+            return 0
+        return self.freq[ingredient_id]
+
+    def _has_name(self, ingredient_id):
+        _, start, end = self._name(ingredient_id)
+        return start != end
+
+    def name(self, ingredient_id):
+        """Return the ingredient name stored with the index."""
+        return self.name_bytes(ingredient_id).decode('utf-8') or None
+
+    def name_bytes(self, ingredient_id):
+        """Return the encoded name, empty when there is none."""
+        names, start, end = self._name(ingredient_id)
+        return bytes(names[start:end])
+
+    def neighbours(self, ingredient_id, limit=None):
+        """Return `{ingredient: count}` for ingredients used together."""
+        cols, counts, start, end = self._row(ingredient_id)
+        if limit is not None:
+            end = min(end, start + limit)
+        return dict(zip(cols[start:end], counts[start:end]))
+
+    def row_bytes(self, ingredient_id):
+        """Return the `(cols, counts)` bytes of a row."""
+        cols, counts, start, end = self._row(ingredient_id)
+        return cols[start:end].tobytes(), counts[start:end].tobytes()
+
+    def scored(self, ingredient_id):
+        """Return the stored `[(ingredient, score)]` of an ingredient."""
+        delta = self._delta
+        if delta is not None and ingredient_id in delta.scored:
+            subs, scores = delta.subs, delta.scores
+            start = delta.scored[ingredient_id] * self.k
+        elif self._in_base(ingredient_id):
+            subs, scores = self.subs, self.scores
+            start = ingredient_id * self.k
+        else:
+            return []
+        end = start + self.k
+        return [(sub, score) for sub, score in
+                zip(subs[start:end], scores[start:end]) if sub >= 0]
+
+    def substitutes(self, ingredient_id, limit=None):
+        """Return `[(ingredient, score)]`, best substitute first.
+
+        Ingredients deleted since the list was scored are skipped.
+        """
+        limit = self.k if limit is None else min(self.k, limit)
+        result = []
+        for sub, score in self.scored(ingredient_id):
+            if len(result) == limit:
+                break
+            if self._has_name(sub):
+                result.append((sub, score))
+        return result
+
+    def delta(self):
+        """Return the rows, frequencies, substitutes and names the delta
+        file holds, as dicts by ingredient id."""
+        delta = self._delta
+        if delta is None:
+            return {}, {}, {}, {}
+        return (
+            {i: list(self.neighbours(i).items()) for i in delta.rows},
+            {i: self.frequency(i) for i in delta.freqs},
+            {i: self.scored(i) for i in delta.scored},
+            {i: self.name(i) for i in delta.named},
+        )
+
+
+def _row_arrays(row):
+    return (array('q', [c for c, _ in row]).tobytes(),
+            array('i', [n for _, n in row]).tobytes())
+
+
+def _sorted_row(row):
+    """Return row items most frequent first, ties by ingredient id."""
+    return sorted(
+        ((col, count) for col, count in row.items() if count > 0),
+        key=lambda item: (-item[1], item[0]),
+    )
+
+
+class _TopRows:
+    """Memoized top `fanout` neighbours of each row and their norms."""
+
+    def __init__(self, row_of, fanout=FANOUT):
+        self._row_of = row_of
+        self._fanout = fanout
+        self._cache = {}
+
+    def __call__(self, ingredient):
+        entry = self._cache.get(ingredient)
+        if entry is None:
+            top = dict(self._row_of(ingredient)[:self._fanout])
+            norm = math.sqrt(sum(c * c for c in top.values()))
+            entry = self._cache[ingredient] = (top, norm)
+        return entry
+
+
+def _score_substitutes(ingredient, top_of, freq_of, k=SUBSTITUTES):
+    """Score substitutes for `ingredient`.
+
+    A good substitute appears with the same ingredients (cosine similarity
+    of the top neighbours returned by `top_of`) but rarely together with
+    the ingredient itself.
+    """
+    top, norm = top_of(ingredient)
+    if not top:
+        return []
+    candidates = set()
+    for neighbour in top:
+        candidates.update(top_of(neighbour)[0])
+    candidates.discard(ingredient)
+
+    freq = freq_of(ingredient)
+    scored = []
+    for candidate in candidates:
+        other, other_norm = top_of(candidate)
+        small, large = (top, other) if len(top) < len(other) \
+            else (other, top)
+        dot = sum(count * large.get(col, 0) for col, count in small.items())
+        if not dot:
+            continue
+        together = top.get(candidate, 0)
+        overlap = together / max(1, min(freq, freq_of(candidate)))
+        score = dot / (norm * other_norm) * (1.0 - overlap)
+        if score > 0:
+            scored.append((-score, candidate))
+    scored.sort()
+    return [(candidate, -score) for score, candidate in scored[:k]]
+
+
+def _write(path, size, generation, rows, freq, subs, names, k=SUBSTITUTES):
+    """Write a complete index file atomically.
+
+    `rows(i)` returns the raw `(cols, counts)` bytes of row `i`,
+    `subs(i)` the substitute list and `names(i)` the encoded name.
+    """
+    indptr = array('q', [0])
+    cols = array('q')
+    counts = array('i')
+    freqs = array('i')
+    sub_ids = array('q')
+    sub_scores = array('f')
+    name_ptr = array('q', [0])
+    name_blob = bytearray()
+    for i in range(size):
+        row_cols, row_counts = rows(i)
+        cols.frombytes(row_cols)
+        counts.frombytes(row_counts)
+        indptr.append(len(cols))
+        freqs.append(freq(i))
+        row_subs = subs(i)
+        for sub, score in row_subs:
+            sub_ids.append(sub)
+            sub_scores.append(score)
+        for _ in range(k - len(row_subs)):
+            sub_ids.append(-1)
+            sub_scores.append(0.0)
+        name_blob += names(i)
+        name_ptr.append(len(name_blob))
+
+    layout = _layout(size, len(cols), k, len(name_blob))
+    data = {
+        'indptr': indptr, 'cols': cols, 'counts': counts, 'freq': freqs,
+        'subs': sub_ids, 'scores': sub_scores, 'name_ptr': name_ptr,
+        'names': name_blob,
+    }
+    header = HEADER.pack(MAGIC, VERSION, generation, size, len(cols), k)
+    _replace(path, lambda fh: _write_sections(fh, header, layout, data))
+    # Changes in the delta file are part of the new file now.
+    try:
+        os.unlink(delta_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def _write_delta(path, base_generation, generation, size, rows, freq,
+                 subs, names, k=SUBSTITUTES):
+    """Write the values replacing those of the index file atomically.
+
+    `rows` maps ingredient ids to sorted rows, `freq` to frequencies,
+    `subs` to substitute lists and `names` to names or None.
+    """
+    row_ids = sorted(rows)
+    indptr = array('q', [0])
+    cols = array('q')
+    counts = array('i')
+    for i in row_ids:
+        row_cols, row_counts = _row_arrays(rows[i])
+        cols.frombytes(row_cols)
+        counts.frombytes(row_counts)
+        indptr.append(len(cols))
+    sub_ids = sorted(subs)
+    sub_cols = array('q')
+    scores = array('f')
+    for i in sub_ids:
+        scored = subs[i][:k]
+        sub_cols.extend([sub for sub, _ in scored] + [-1] * (k - len(scored)))
+        scores.extend([score for _, score in scored] +
+                      [0.0] * (k - len(scored)))
+    name_ids = sorted(names)
+    name_ptr = array('q', [0])
+    name_blob = bytearray()
+    for i in name_ids:
+        name_blob += (names[i] or '').encode('utf-8')
+        name_ptr.append(len(name_blob))
+    freq_ids = sorted(freq)
+    data = {
+        'row_ids': array('q', row_ids), 'indptr': indptr, 'cols': cols,
+        'counts': counts, 'freq_ids': array('q', freq_ids),
+        'freq': array('i', [freq[i] for i in freq_ids]),
+        'sub_ids': array('q', sub_ids), 'subs': sub_cols, 'scores': scores,
+        'name_ids': array('q', name_ids), 'name_ptr': name_ptr,
+        'names': name_blob,
+    }
+    lengths = (len(row_ids), len(cols), len(freq_ids), len(sub_ids),
+               len(name_ids), len(name_blob))
+    header = DELTA_HEADER.pack(DELTA_MAGIC, VERSION, base_generation,
+                               generation, size, k, *lengths)
+    _replace(delta_path(path), lambda fh: _write_sections(
+        fh, header, _delta_layout(k, *lengths), data))
+
+
+def _write_sections(fh, header, layout, data):
+    fh.write(header)
+    for name, (offset, _, _) in layout.items():
+        fh.write(b'\0' * (offset - fh.tell()))
+        fh.write(bytes(data[name]) if name == 'names'
+                 else data[name].tobytes())
+
+
+def _replace(path, write):
+    """Replace `path` with the file `write(fh)` writes, atomically."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write(fh)
+            # mkstemp creates files only the owner can read.
+            os.fchmod(fh.fileno(), 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _add_recipe(rows, freq, ingredients, sign):
+    """Add (sign=1) or remove (sign=-1) one recipe's ingredient set."""
+    for a in ingredients:
+        freq[a] = freq.get(a, 0) + sign
+        row = rows.setdefault(a, {})
+        for b in ingredients:
+            if b != a:
+                row[b] = row.get(b, 0) + sign
+
+
+class _Writer:
+    """Serialize writers across processes with a lock file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._lock = open(self.path + '.lock', 'w')
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._lock, fcntl.LOCK_UN)
+        self._lock.close()
+
+
+def build_index(path=None, chunk_size=10000):
+    """Build the index from every `RecipeIngredient` row.
+
+    Returns `(ingredients, nnz)` of the written file.
+    """
+    path = path or index_path()
+    rows = {}
+    freq = {}
+    current, items = None, []
+    lines = (RecipeIngredient.objects.order_by('recipe_id')
+             .values_list('recipe_id', 'ingredient_id')
+             .iterator(chunk_size=chunk_size))
+    for recipe_id, ingredient_id in lines:
+        if recipe_id != current:
+            _add_recipe(rows, freq, items, 1)
+            current, items = recipe_id, []
+        items.append(ingredient_id)
+    _add_recipe(rows, freq, items, 1)
+
+    names = dict(Ingredient.objects.values_list('id', 'name'))
+    size = max(list(rows) + list(names) + [-1]) + 1
+    sorted_rows = {i: _sorted_row(row) for i, row in rows.items()}
+
+    def row_of(i):
+        return sorted_rows.get(i, [])
+
+    top_of = _TopRows(row_of)
+
+    def row_arrays(i):
+        return _row_arrays(row_of(i))
+
+    with _Writer(path):
+        generation = 0
+        if os.path.exists(path):
+            try:
+                generation = CooccurrenceIndex(path).generation + 1
+            except ValueError:
+                pass
+        _write(
+            path, size, generation, row_arrays,
+            lambda i: freq.get(i, 0),
+            lambda i: _score_substitutes(
+                i, top_of, lambda j: freq.get(j, 0)),
+            lambda i: names.get(i, '').encode('utf-8'),
+        )
+    return size, sum(len(row) for row in sorted_rows.values())
+
+
+def apply_changes(changes, names=None, path=None):
+    """Merge recipe ingredient set changes into the index.
+
+    `changes` is an iterable of `(before, after)` ingredient id sets, one
+    per changed recipe; `names` maps ingredient ids to new names. Only
+    rows whose counts changed, and the substitute lists within two hops
+    of them, are recomputed. A name of None removes the name of a
+    deleted ingredient.
+
+    The recomputed values are added to the delta file, which is rewritten
+    whole, so a merge costs about the size of the changes made since the
+    index file was written. Once the delta file holds more than
+    `DELTA_MIN` values, or `DELTA_RATIO` of the index file if that is
+    more, both are compacted into a new index file, which costs about
+    the size of the index.
+    """
+    path = path or index_path()
+    names = names or {}
+    delta_rows = {}
+    delta_freq = {}
+    for before, after in changes:
+        if before == after:
+            continue
+        _add_recipe(delta_rows, delta_freq, before, -1)
+        _add_recipe(delta_rows, delta_freq, after, 1)
+    if not delta_rows and not names:
+        return False
+
+    with _Writer(path):
+        old = None
+        if os.path.exists(path):
+            old = CooccurrenceIndex(path)
+        old_size = old.size if old else 0
+        size = max([old_size - 1] + list(delta_rows) + list(names)) + 1
+
+        changed = {}
+        for i, delta in delta_rows.items():
+            row = old.neighbours(i) if old else {}
+            for col, count in delta.items():
+                row[col] = row.get(col, 0) + count
+            changed[i] = _sorted_row(row)
+
+        def row_of(i):
+            if i in changed:
+                return changed[i]
+            if old is None:
+                return []
+            return list(old.neighbours(i, FANOUT).items())
+
+        def freq_of(i):
+            base = old.frequency(i) if old else 0
+            return base + delta_freq.get(i, 0)
+
+        # Substitutes of an ingredient depend on the rows of its
+        # candidates, which are the neighbours of its neighbours.
+        top_of = _TopRows(row_of)
+        rescore = set(changed)
+        for i in changed:
+            for neighbour in top_of(i)[0]:
+                rescore.update(top_of(neighbour)[0])
+        # Scores are stored as float32, in the index file and here alike.
+        scored = {}
+        for i in rescore:
+            subs = _score_substitutes(i, top_of, freq_of)
+            scores = array('f', [score for _, score in subs]).tolist()
+            scored[i] = [(sub, score) for (sub, _), score in zip(subs, scores)]
+
+        generation = old.generation + 1 if old else 0
+        if old is not None:
+            rows, freq, subs, delta_names = old.delta()
+            rows.update(changed)
+            freq.update((i, freq_of(i)) for i in delta_freq)
+            subs.update(scored)
+            delta_names.update(names)
+            values = (sum(len(row) for row in rows.values()) + len(freq)
+                      + len(subs) * SUBSTITUTES + len(delta_names))
+            if values <= max(DELTA_MIN,
+                             DELTA_RATIO * (old.nnz + old.base_size)):
+                _write_delta(path, old.base_generation, generation, size,
+                             rows, freq, subs, delta_names)
+                return True
+
+        def row_arrays(i):
+            if i in changed:
+                return _row_arrays(changed[i])
+            return old.row_bytes(i) if old else (b'', b'')
+
+        def subs_of(i):
+            if i in scored:
+                return scored[i]
+            return old.substitutes(i) if old else []
+
+        def name_of(i):
+            if i in names:
+                return (names[i] or '').encode('utf-8')
+            return old.name_bytes(i) if old else b''
+
+        _write(path, size, generation, row_arrays, freq_of, subs_of, name_of)
+    return True
+
+
+_index = None
+_index_checked = 0.0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Return the mapped index of this process, or None if not built.
+
+    The file is re-checked at most every `RELOAD_INTERVAL` seconds and
+    remapped when a writer replaced it.
+    """
+    global _index, _index_checked
+    now = time.monotonic()
+    if _index is not None and now - _index_checked < RELOAD_INTERVAL:
+        return _index
+    with _index_lock:
+        _index_checked = now
+        path = index_path()
+        try:
+            state = _file_state(path)
+        except FileNotFoundError:
+            _index = None
+            return None
+        if _index is None or _index.path != path or _index.state != state:
+            _index = CooccurrenceIndex(path)
+        return _index
+
+
+def reset_index():
+    """Forget the mapped index so the next lookup reopens the file."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def _config():
+    return settings.COOCCURRENCE_FLUSH_MS / 1000
+
+
+class ChangeBuffer:
+    """Committed changes waiting to be merged into the index file.
+
+    Holds the ingredient sets of each changed recipe from before its
+    first change to after its last one, and the latest name of each
+    changed ingredient.
+    """
+
+    def __init__(self, window=None):
+        self.window = _config() if window is None else window
+        self._recipes = {}
+        self._names = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def add(self, changes, names):
+        """Take `{recipe_id: (before, after)}` and `{ingredient_id: name}`
+        changes, merged at once when there is no window."""
+        with self._lock:
+            self._merge(changes, names)
+            if self.window and self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name='cooccurrence', daemon=True)
+                self._worker.start()
+        if not self.window:
+            self.flush()
+
+    def _merge(self, changes, names):
+        for recipe_id, (before, after) in changes.items():
+            if recipe_id in self._recipes:
+                before = self._recipes[recipe_id][0]
+            self._recipes[recipe_id] = (before, after)
+        self._names.update(names)
+
+    def flush(self):
+        """Merge the waiting changes into the index file."""
+        with self._lock:
+            recipes, self._recipes = self._recipes, {}
+            names, self._names = self._names, {}
+        if not recipes and not names:
+            return False
+        try:
+            return apply_changes(recipes.values(), names)
+        except Exception:
+            # Changes that came in meanwhile follow these ones.
+            with self._lock:
+                waiting = self._recipes, self._names
+                self._recipes, self._names = recipes, names
+                self._merge(*waiting)
+            raise
+
+    def _run(self):
+        while True:
+            time.sleep(self.window)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Updating the co-occurrence index failed')
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Return the change buffer of this process."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ChangeBuffer()
+        return _buffer
+
+
+@atexit.register
+def _flush_at_exit():
+    if _buffer is None:
+        return
+    try:
+        _buffer.flush()
+    except Exception:
+        logger.exception('Updating the co-occurrence index at exit failed')
+
+
+# Recipes touched by the current transaction in this thread.
+_pending = threading.local()
+
+
+def _ingredient_sets(recipe_ids):
+    sets = {recipe_id: set() for recipe_id in recipe_ids}
+    rows = (RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+            .values_list('recipe_id', 'ingredient_id'))
+    for recipe_id, ingredient_id in rows:
+        sets[recipe_id].add(ingredient_id)
+    return sets
+
+
+def _state():
+    if not hasattr(_pending, 'recipes'):
+        _pending.recipes = {}
+        _pending.names = {}
+    return _pending
+
+
+def track_recipe(recipe_id):
+    """Snapshot a recipe's ingredients before it changes.
+
+    Call before the write; the difference to its ingredients after the
+    commit is merged into the index by `flush`.
+    """
+    state = _state()
+    if recipe_id is None or recipe_id in state.recipes:
+        return
+    state.recipes[recipe_id] = _ingredient_sets([recipe_id])[recipe_id]
+
+
+def track_name(ingredient_id, name):
+    """Record a new, renamed or (with None) deleted ingredient."""
+    _state().names[ingredient_id] = name
+
+
+def schedule_flush():
+    """Flush tracked changes once the current transaction commits.
+
+    Call after the write. Outside a transaction this flushes at once.
+    """
+    transaction.on_commit(flush)
+
+
+def clear_pending():
+    """Forget the changes tracked by this thread without applying them."""
+    state = _state()
+    state.recipes = {}
+    state.names = {}
+
+
+def flush():
+    """Hand the changes tracked by this thread to the change buffer."""
+    state = _state()
+    pending, state.recipes = state.recipes, {}
+    names, state.names = state.names, {}
+    if not pending and not names:
+        return
+    after = _ingredient_sets(list(pending))
+    get_buffer().add(
+        {recipe_id: (before, after[recipe_id])
+         for recipe_id, before in pending.items()},
+        names,
+    )
@@ -0,0 +1,297 @@
+"""
+Near-duplicate recipe detection with MinHash and LSH.
+
+Every recipe has two MinHash signatures, kept in `RecipeSignature`: one
+over its normalized title tokens and one over those tokens together with
+its ingredient ids. The fraction of positions two signatures agree on
+estimates the Jaccard similarity of the underlying sets.
+
+Signatures are cut into bands and each band is hashed into a key stored
+in `RecipeBand`. Two recipes sharing a key agree on a whole band, which
+is likely only when they are similar, so candidates come from one indexed
+`key IN (...)` lookup rather than a scan of the catalog; only those
+candidates have their signatures compared.
+
+Titles are banded on their own because recipes are created before their
+ingredients are added: `RecipeViewSet.perform_create` can only compare
+titles, while `find_duplicates` compares whole recipes. Changing the
+signature parameters below requires `build_duplicates` to be run again.
+"""
+import functools
+import hashlib
+import random
+import re
+import struct
+from array import array
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from core.models import Recipe, RecipeBand, RecipeIngredient, RecipeSignature
+from core.bulk import copy_rows, insert_rows
+from core.commits import CommitBuffer
+
+# Hash functions per signature.
+PERMUTATIONS = 40
+# Bands and rows per band. A pair with similarity s shares at least one
+# band with probability 1 - (1 - s ** rows) ** bands: about 0.93 at 0.7
+# and 0.99 at 0.8 for recipes, 0.95 at 0.75 for titles.
+BANDS, ROWS = 10, 4
+TITLE_BANDS, TITLE_ROWS = 6, 3
+# Candidates compared per lookup, those sharing most bands first.
+MAX_CANDIDATES = 200
+# Recipes indexed per transaction by `build_index`.
+BATCH_SIZE = 2000
+# Tokens whose hash values are kept; ingredient ids repeat across recipes.
+TOKEN_CACHE = 50000
+
+STOPWORDS = frozenset([
+    'a', 'an', 'and', 'best', 'easy', 'for', 'in', 'my', 'of', 'on',
+    'or', 'recipe', 'the', 'to', 'with',
+])
+
+_RECIPE, _TITLE = 0, 1
+_PRIME = (1 << 61) - 1
+_MASK = 0xFFFFFFFF
+# Fixed seed: stored signatures stay comparable across processes.
+_rng = random.Random(0x6D696E68)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME))
+                 for _ in range(PERMUTATIONS)]
+_KEY = struct.Struct('<BB')
+
+
+def title_tokens(title):
+    """Return the normalized word set of a title."""
+    tokens = set()
+    for word in re.findall(r'[a-z0-9]+', title.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.add(word)
+    return tokens
+
+
+@functools.lru_cache(maxsize=TOKEN_CACHE)
+def _token_hashes(token):
+    """Return the value of every hash function for one token."""
+    digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+    value = int.from_bytes(digest, 'little')
+    return array('I', [((a * value + b) % _PRIME) & _MASK
+                       for a, b in _PERMUTATIONS])
+
+
+def minhash(features):
+    """Return the signature of a set of strings, or None if it is empty."""
+    rows = [_token_hashes(feature) for feature in features]
+    if not rows:
+        return None
+    return array('I', map(min, zip(*rows)))
+
+
+def signatures(title, ingredient_ids):
+    """Return the `(title, recipe)` signatures of a recipe."""
+    words = {f't:{word}' for word in title_tokens(title)}
+    ingredients = {f'i:{ingredient_id}' for ingredient_id in ingredient_ids}
+    return minhash(words), minhash(words | ingredients)
+
+
+def band_keys(signature, bands, rows, kind):
+    """Return the LSH bucket key of each band of a signature."""
+    keys = []
+    for band in range(bands):
+        values = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(_KEY.pack(kind, band) + values.tobytes(),
+                                 digest_size=8).digest()
+        # Non-negative, so keys fit a signed bigint column.
+        keys.append(int.from_bytes(digest, 'little') >> 1)
+    return keys
+
+
+def recipe_keys(signature):
+    """Return the bucket keys of a recipe signature."""
+    return band_keys(signature, BANDS, ROWS, _RECIPE)
+
+
+def title_keys(signature):
+    """Return the bucket keys of a title signature."""
+    return band_keys(signature, TITLE_BANDS, TITLE_ROWS, _TITLE)
+
+
+def similarity(a, b):
+    """Estimate the Jaccard similarity of the sets behind two signatures."""
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def _unpack(data):
+    signature = array('I')
+    signature.frombytes(bytes(data))
+    return signature
+
+
+def _ingredient_ids(recipe_ids):
+    ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+    rows = (RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+            .values_list('recipe_id', 'ingredient_id'))
+    for recipe_id, ingredient_id in rows:
+        ingredients[recipe_id].append(ingredient_id)
+    return ingredients
+
+
+def _write(signature_rows, band_rows):
+    signature_table = RecipeSignature._meta.db_table
+    band_table = RecipeBand._meta.db_table
+    signature_columns = ['recipe_id', 'title_minhash', 'minhash']
+    band_columns = ['recipe_id', 'key']
+    if connection.vendor == 'postgresql':
+        copy_rows(connection, signature_table, signature_columns, [
+            (recipe_id, '\\x' + title.hex(), '\\x' + recipe.hex())
+            for recipe_id, title, recipe in signature_rows
+        ])
+        copy_rows(connection, band_table, band_columns, band_rows)
+    else:
+        insert_rows(connection, signature_table, signature_columns,
+                    signature_rows)
+        insert_rows(connection, band_table, band_columns, band_rows)
+
+
+def index_recipes(recipe_ids, replace=True):
+    """Store the signatures and band keys of the given recipes.
+
+    With `replace`, recipes indexed earlier are compared with their stored
+    signatures: unchanged ones (an edit that kept the title and the
+    ingredients) are left alone and changed ones have their rows replaced.
+    Ids of deleted recipes are ignored, their rows went with them.
+    Returns the number of recipes whose rows were written.
+    """
+    recipe_ids = list(recipe_ids)
+    # One query reads titles, lines and stored signatures together.
+    rows = Recipe.objects.filter(id__in=recipe_ids)
+    if replace:
+        rows = rows.values_list('id', 'title', 'recipeingredient__ingredient',
+                                'signature__title_minhash',
+                                'signature__minhash')
+    else:
+        rows = rows.values_list('id', 'title', 'recipeingredient__ingredient')
+    recipes = {}
+    for recipe_id, title, ingredient_id, *stored in rows:
+        if recipe_id not in recipes:
+            if stored and stored[1] is not None:
+                stored = (bytes(stored[0]), bytes(stored[1]))
+            else:
+                stored = None
+            recipes[recipe_id] = (title, [], stored)
+        if ingredient_id is not None:
+            recipes[recipe_id][1].append(ingredient_id)
+    signature_rows = []
+    band_rows = []
+    stale = []
+    for recipe_id, (title, ingredient_ids, stored) in recipes.items():
+        title_signature, signature = signatures(title, ingredient_ids)
+        title_bytes = (b'' if title_signature is None
+                       else title_signature.tobytes())
+        if signature is not None and \
+                stored == (title_bytes, signature.tobytes()):
+            continue
+        if stored is not None:
+            stale.append(recipe_id)
+        if signature is None:
+            continue
+        keys = recipe_keys(signature)
+        if title_signature is not None:
+            keys += title_keys(title_signature)
+        signature_rows.append((recipe_id, title_bytes, signature.tobytes()))
+        band_rows.extend((recipe_id, key) for key in keys)
+    if not stale and not signature_rows:
+        return 0
+    with transaction.atomic():
+        if stale:
+            RecipeBand.objects.filter(recipe_id__in=stale).delete()
+            RecipeSignature.objects.filter(recipe_id__in=stale).delete()
+        _write(signature_rows, band_rows)
+    return len(signature_rows)
+
+
+def build_index(missing_only=False, batch_size=BATCH_SIZE):
+    """Index every recipe, or with `missing_only` those not indexed yet.
+
+    Returns the number of recipes indexed.
+    """
+    recipes = Recipe.objects.order_by('id')
+    if missing_only:
+        recipes = recipes.filter(signature__isnull=True)
+    else:
+        with transaction.atomic():
+            RecipeBand.objects.all().delete()
+            RecipeSignature.objects.all().delete()
+    indexed = 0
+    last = 0
+    while True:
+        ids = list(recipes.filter(id__gt=last)
+                   .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return indexed
+        indexed += index_recipes(ids, replace=False)
+        last = ids[-1]
+
+
+def _rank(keys, signature, field, exclude, threshold, limit):
+    """Return `[(id, title, score)]` of candidates reaching `threshold`."""
+    candidates = RecipeBand.objects.filter(key__in=keys)
+    if exclude is not None:
+        candidates = candidates.exclude(recipe_id=exclude)
+    candidates = (candidates.values('recipe_id')
+                  .annotate(hits=Count('recipe_id'))
+                  .order_by('-hits', 'recipe_id')[:MAX_CANDIDATES])
+    ids = [row['recipe_id'] for row in candidates]
+    if not ids:
+        return []
+    if threshold is None:
+        threshold = settings.DUPLICATES['THRESHOLD']
+    rows = (RecipeSignature.objects.filter(recipe_id__in=ids)
+            .values_list('recipe_id', 'recipe__title', field))
+    matches = []
+    for recipe_id, title, data in rows:
+        score = similarity(signature, _unpack(data))
+        if score >= threshold:
+            matches.append((recipe_id, title, score))
+    matches.sort(key=lambda match: (-match[2], match[0]))
+    return matches[:limit]
+
+
+def find_duplicates(recipe, threshold=None, limit=10):
+    """Return `[(id, title, score)]` of recipes similar to `recipe`.
+
+    Compares titles and ingredients, most similar first. The signature of
+    `recipe` is computed from its current rows, so it need not be indexed.
+    """
+    _, signature = signatures(recipe.title,
+                              _ingredient_ids([recipe.id])[recipe.id])
+    if signature is None:
+        return []
+    return _rank(recipe_keys(signature), signature, 'minhash', recipe.id,
+                 threshold, limit)
+
+
+def find_title_duplicates(title, threshold=None, limit=10, exclude=None):
+    """Return `[(id, title, score)]` of recipes with a similar title."""
+    signature, _ = signatures(title, ())
+    if signature is None:
+        return []
+    return _rank(title_keys(signature), signature, 'title_minhash',
+                 exclude, threshold, limit)
+
+
+# Recipes changed by the current transaction.
+_changed = CommitBuffer(index_recipes)
+
+
+def track(recipe_id):
+    """Reindex a recipe once the current transaction commits.
+
+    Outside a transaction this reindexes at once.
+    """
+    _changed.add(recipe_id)
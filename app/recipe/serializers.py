@@ -6,12 +6,21 @@ from core.models import (
     Recipe,
     Tag,
     Ingredient,
+    IngredientNutrition,
     RecipeIngredient,
 )
+from core import dietary, nutrition
+from core.fieldsets import SparseFieldsMixin
+from core.importing import FORMATS
+from core.serializers import FlagsField
+from core.timing import TimedSerializerMixin
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                    serializers.ModelSerializer):
     """Serializer for Tags."""
 
     class Meta:
@@ -20,24 +29,70 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Serializer for Ingredients."""
+    contains = FlagsField(dietary.FLAGS, source='dietary_flags',
+                          required=False)
 
     class Meta:
         model = Ingredient
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'contains']
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class IngredientNutritionSerializer(TimedSerializerMixin,
+                                    serializers.ModelSerializer):
+    """Serializer for the nutrition of an ingredient."""
+
+    class Meta:
+        model = IngredientNutrition
+        fields = ['amount', 'unit', 'kcal', 'protein', 'fat', 'carbs']
+
+    def validate_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError('Amount must be positive.')
+        return value
+
+
+class RecipeSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                       serializers.ModelSerializer):
     """Serializer for recipe."""
 
     created_by = serializers.ReadOnlyField(source='user.name')
+    avg_rating = serializers.FloatField(read_only=True, allow_null=True)
+    nutrition = serializers.SerializerMethodField()
+    contains = FlagsField(dietary.FLAGS, source='dietary_flags',
+                          read_only=True)
+    diets = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'time_minutes', 'link', 'created_by']
-        read_only_fields = ['id', 'created_by']
+        fields = ['id', 'title', 'time_minutes', 'link', 'created_by',
+                  'fav_count', 'avg_rating', 'nutrition', 'contains',
+                  'diets']
+        read_only_fields = ['id', 'created_by', 'fav_count', 'avg_rating']
+        sparse_sources = {
+            'avg_rating': ['rating_sum', 'rating_count'],
+            'nutrition': [*nutrition.NUTRIENTS, 'nutrition_missing'],
+            'diets': ['dietary_flags'],
+        }
+
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_nutrition(self, recipe):
+        """Totals of the lines with known nutrition, None if none are."""
+        data = {
+            nutrient: (None if getattr(recipe, nutrient) is None
+                       else round(getattr(recipe, nutrient), 1))
+            for nutrient in nutrition.NUTRIENTS
+        }
+        data['missing_lines'] = recipe.nutrition_missing
+        return data
+
+    @extend_schema_field(serializers.ListField(child=serializers.CharField()))
+    def get_diets(self, recipe):
+        """Diets every line fits; none while a line is unclassified."""
+        return dietary.suitable_diets(recipe.dietary_flags)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -47,7 +102,8 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ['description']
 
 
-class RecipeIngredientSerializer(serializers.ModelSerializer):
+class RecipeIngredientSerializer(SparseFieldsMixin, TimedSerializerMixin,
+                                 serializers.ModelSerializer):
     """Serializers for recipe ingredients."""
 
     recipe_name = serializers.ReadOnlyField(source='recipe.title')
@@ -58,3 +114,9 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'recipe', 'recipe_name', 'ingredient',
                   'ingredient_name', 'amount', 'mandatory', 'amount_unit']
         read_only_fields = ['id', 'recipe_name', 'ingredient_name']
+
+
+class RecipeImportSerializer(serializers.Serializer):
+    """Serializer for uploading a recipe catalog."""
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=FORMATS, required=False)
@@ -0,0 +1,121 @@
+"""
+Signal receivers for recipe app.
+"""
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core import dietary, events, nutrition
+from core.models import (
+    Ingredient,
+    IngredientNutrition,
+    Recipe,
+    RecipeIngredient,
+)
+from recipe import cooccurrence, duplicates
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def track_recipe_ingredient_save(sender, instance, **kwargs):
+    """Snapshot the recipes a line belongs to before it is saved."""
+    cooccurrence.track_recipe(instance.recipe_id)
+    instance._previous_recipe_id = None
+    if instance.pk:
+        old_recipe_id = (RecipeIngredient.objects.filter(pk=instance.pk)
+                         .values_list('recipe_id', flat=True).first())
+        if old_recipe_id != instance.recipe_id:
+            cooccurrence.track_recipe(old_recipe_id)
+            instance._previous_recipe_id = old_recipe_id
+
+
+@receiver(pre_delete, sender=RecipeIngredient)
+def track_recipe_ingredient_delete(sender, instance, **kwargs):
+    """Snapshot the recipe of a line before it is deleted."""
+    cooccurrence.track_recipe(instance.recipe_id)
+
+
+@receiver(pre_delete, sender=Recipe)
+def track_recipe_delete(sender, instance, **kwargs):
+    """Snapshot a recipe before its lines are removed with it."""
+    cooccurrence.track_recipe(instance.id)
+
+
+@receiver(pre_save, sender=Ingredient)
+def snapshot_ingredient_flags(sender, instance, **kwargs):
+    """Note whether the dietary flags of an ingredient are changing."""
+    instance._dietary_flags_changed = False
+    if instance.pk:
+        old_flags = (Ingredient.objects.filter(pk=instance.pk)
+                     .values_list('dietary_flags', flat=True).first())
+        instance._dietary_flags_changed = old_flags != instance.dietary_flags
+
+
+@receiver(post_save, sender=Ingredient)
+def recompute_ingredient_flags(sender, instance, **kwargs):
+    """Recompute the flags of recipes using an ingredient that changed."""
+    if not getattr(instance, '_dietary_flags_changed', False):
+        return
+    ingredient_id = instance.id
+    transaction.on_commit(
+        lambda: dietary.rebuild_dietary_flags(ingredient_id=ingredient_id))
+
+
+@receiver(post_save, sender=Ingredient)
+def track_ingredient_name(sender, instance, **kwargs):
+    """Keep ingredient names in the index current."""
+    cooccurrence.track_name(instance.id, instance.name)
+    cooccurrence.schedule_flush()
+
+
+@receiver(post_delete, sender=Ingredient)
+def track_ingredient_delete(sender, instance, **kwargs):
+    """Drop deleted ingredients from the index."""
+    cooccurrence.track_name(instance.id, None)
+    cooccurrence.schedule_flush()
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(post_delete, sender=Recipe)
+def flush_cooccurrence(sender, **kwargs):
+    """Merge tracked changes into the index once they are committed."""
+    cooccurrence.schedule_flush()
+
+
+def reindex_recipe_duplicates(batch):
+    """Event subscriber refreshing the duplicate signatures of saved
+    recipes."""
+    duplicates.index_recipes({event.pk for event in batch})
+
+
+events.subscribe('duplicates', ['recipe/created', 'recipe/updated'],
+                 reindex_recipe_duplicates, database=True)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def track_line_change(sender, instance, **kwargs):
+    """Refresh the duplicate signatures, nutrition and dietary flags of a
+    line's recipes.
+
+    A line moved to another recipe changes the one it left too.
+    """
+    previous = getattr(instance, '_previous_recipe_id', None)
+    for recipe_id in {instance.recipe_id, previous} - {None}:
+        duplicates.track(recipe_id)
+        nutrition.track(recipe_id)
+        dietary.track(recipe_id)
+
+
+@receiver(post_save, sender=IngredientNutrition)
+@receiver(post_delete, sender=IngredientNutrition)
+def recompute_ingredient_nutrition(sender, instance, **kwargs):
+    """Recompute the nutrition of recipes using a changed ingredient."""
+    ingredient_id = instance.ingredient_id
+    transaction.on_commit(
+        lambda: nutrition.rebuild_nutrition(ingredient_id=ingredient_id))
@@ -0,0 +1,220 @@
+"""
+Tests for the ingredient co-occurrence index.
+"""
+import os
+import shutil
+import stat
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe
+from recipe import cooccurrence
+from recipe.helper_method import (
+    create_user,
+    create_recipe,
+    create_ingredient,
+    create_recipe_ingredient,
+)
+
+
+def substitutes_url(ingredient_id):
+    """Return the substitutes URL for an ingredient."""
+    return reverse('recipe:ingredient-substitutes', args=[ingredient_id])
+
+
+class CooccurrenceTests(TestCase):
+    """Tests for building and updating the index."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cooc.bin')
+        self.override = override_settings(COOCCURRENCE_PATH=self.path)
+        self.override.enable()
+        cooccurrence.reset_index()
+        cooccurrence.clear_pending()
+        self.user = create_user(email='user@example.com', password='Test123')
+        self.ing = {
+            name: create_ingredient(self.user, name=name)
+            for name in ['Flour', 'Sugar', 'Butter', 'Margarine', 'Eggs']
+        }
+
+    def tearDown(self):
+        self.override.disable()
+        cooccurrence.reset_index()
+        shutil.rmtree(self.tmpdir)
+
+    def make_recipe(self, *names):
+        recipe = create_recipe(self.user, title='+'.join(names))
+        for name in names:
+            create_recipe_ingredient(recipe, self.ing[name])
+        return recipe
+
+    def snapshot(self):
+        index = cooccurrence.CooccurrenceIndex(self.path)
+        return {
+            ing.name: (index.frequency(ing.id), index.neighbours(ing.id),
+                       index.substitutes(ing.id))
+            for ing in self.ing.values()
+        }
+
+    def test_build_index_counts_pairs(self):
+        """Test pairs are counted once per recipe using both."""
+        self.make_recipe('Flour', 'Sugar', 'Butter')
+        self.make_recipe('Flour', 'Sugar', 'Margarine')
+        self.make_recipe('Flour', 'Butter', 'Eggs')
+
+        cooccurrence.build_index(self.path)
+
+        index = cooccurrence.CooccurrenceIndex(self.path)
+        flour, butter = self.ing['Flour'].id, self.ing['Butter'].id
+        self.assertEqual(index.frequency(flour), 3)
+        self.assertEqual(index.neighbours(flour)[butter], 2)
+        self.assertNotIn(self.ing['Margarine'].id, index.neighbours(butter))
+        self.assertEqual(index.name(butter), 'Butter')
+
+    def test_substitutes_share_context(self):
+        """Test ingredients used in the same context are substitutes."""
+        self.make_recipe('Flour', 'Sugar', 'Butter')
+        self.make_recipe('Flour', 'Sugar', 'Margarine')
+
+        cooccurrence.build_index(self.path)
+
+        index = cooccurrence.CooccurrenceIndex(self.path)
+        subs = index.substitutes(self.ing['Butter'].id)
+        self.assertEqual(subs[0][0], self.ing['Margarine'].id)
+        self.assertAlmostEqual(subs[0][1], 1.0, places=5)
+
+    def test_incremental_changes_match_full_build(self):
+        """Test committed recipe changes are merged into the index."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_recipe('Flour', 'Sugar', 'Butter')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_recipe('Flour', 'Sugar', 'Margarine')
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.make_recipe('Flour', 'Eggs')
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.get(id=recipe.id).delete()
+        incremental = self.snapshot()
+
+        cooccurrence.build_index(self.path)
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_deleted_ingredient_dropped(self):
+        """Test a deleted ingredient loses its name, row and place among
+        substitutes."""
+        self.make_recipe('Flour', 'Sugar', 'Butter')
+        self.make_recipe('Flour', 'Sugar', 'Margarine')
+        cooccurrence.build_index(self.path)
+        cooccurrence.clear_pending()
+        margarine = self.ing['Margarine'].id
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.get(id=margarine).delete()
+
+        index = cooccurrence.CooccurrenceIndex(self.path)
+        self.assertIsNone(index.name(margarine))
+        self.assertEqual(index.frequency(margarine), 0)
+        self.assertNotIn(margarine, [
+            sub for sub, _ in index.substitutes(self.ing['Butter'].id)])
+
+    def test_index_file_readable_by_others(self):
+        cooccurrence.build_index(self.path)
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o644)
+
+    def test_changes_merged_per_window(self):
+        """Test changes of several commits are merged in one rewrite, from
+        before the first to after the last."""
+        cooccurrence.build_index(self.path)
+        buffer = cooccurrence.ChangeBuffer(window=60)
+        flour, sugar = self.ing['Flour'].id, self.ing['Sugar'].id
+        # Keep the worker from starting; flush is called explicitly.
+        buffer._worker = True
+
+        buffer.add({1: (set(), {flour})}, {})
+        buffer.add({1: ({flour}, {flour, sugar})}, {})
+
+        index = cooccurrence.CooccurrenceIndex(self.path)
+        self.assertEqual(index.frequency(flour), 0)
+        self.assertTrue(buffer.flush())
+        index = cooccurrence.CooccurrenceIndex(self.path)
+        self.assertEqual(index.generation, 1)
+        self.assertEqual(index.neighbours(flour), {sugar: 1})
+        self.assertFalse(buffer.flush())
+
+    def test_changes_kept_in_delta_file(self):
+        """Test merged changes leave the index file as it is and are
+        seen by readers through the delta file."""
+        self.make_recipe('Flour', 'Sugar', 'Butter')
+        cooccurrence.build_index(self.path)
+        cooccurrence.clear_pending()
+        before = os.stat(self.path)
+        self.assertEqual(cooccurrence.get_index().frequency(
+            self.ing['Flour'].id), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.make_recipe('Flour', 'Eggs')
+        cooccurrence.reset_index()
+
+        after = os.stat(self.path)
+        self.assertEqual((before.st_ino, before.st_mtime_ns),
+                         (after.st_ino, after.st_mtime_ns))
+        self.assertTrue(os.path.exists(cooccurrence.delta_path(self.path)))
+        index = cooccurrence.get_index()
+        self.assertEqual(index.frequency(self.ing['Flour'].id), 2)
+        self.assertEqual(index.neighbours(self.ing['Eggs'].id),
+                         {self.ing['Flour'].id: 1})
+
+    def test_large_delta_compacted(self):
+        """Test a delta file past its limit is merged into a new index
+        file."""
+        self.make_recipe('Flour', 'Sugar', 'Butter')
+        cooccurrence.build_index(self.path)
+        cooccurrence.clear_pending()
+
+        with mock.patch.multiple(cooccurrence, DELTA_MIN=0, DELTA_RATIO=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.make_recipe('Flour', 'Sugar', 'Margarine')
+        incremental = self.snapshot()
+
+        self.assertFalse(os.path.exists(cooccurrence.delta_path(self.path)))
+        index = cooccurrence.CooccurrenceIndex(self.path)
+        self.assertEqual(index.base_generation, 1)
+        cooccurrence.build_index(self.path)
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_substitutes_api(self):
+        """Test substitutes endpoint reads from the index."""
+        self.make_recipe('Flour', 'Sugar', 'Butter')
+        self.make_recipe('Flour', 'Sugar', 'Margarine')
+        cooccurrence.build_index(self.path)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(substitutes_url(self.ing['Butter'].id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]['id'], self.ing['Margarine'].id)
+        self.assertEqual(res.data[0]['name'], 'Margarine')
+
+        res = client.get(substitutes_url(99999))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = client.get(substitutes_url(self.ing['Butter'].id),
+                         {'limit': 0})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_substitutes_api_without_index(self):
+        """Test substitutes endpoint is empty before the index is built."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get(substitutes_url(self.ing['Butter'].id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
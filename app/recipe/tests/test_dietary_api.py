@@ -0,0 +1,104 @@
+"""
+Tests for dietary filtering of recipes.
+"""
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import dietary
+from core.models import Recipe
+from home.helper_method import create_home
+from recipe.helper_method import (
+    create_user,
+    create_recipe,
+    create_ingredient,
+    create_recipe_ingredient,
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def ingredient_url(ingredient_id):
+    """Return the detail URL for an ingredient."""
+    return reverse('recipe:ingredient-detail', args=[ingredient_id])
+
+
+class DietaryApiTests(TestCase):
+    """Test dietary filters, profiles and ingredient flags."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='user@example.com', password='Test123')
+        flags = dietary.FLAGS
+        create_recipe(cls.user, title='Salad', dietary_flags=0)
+        create_recipe(cls.user, title='Pesto pasta',
+                      dietary_flags=flags['nuts'] | flags['milk'])
+        create_recipe(cls.user, title='Prawns',
+                      dietary_flags=flags['crustaceans'])
+        create_recipe(cls.user, title='Steak', dietary_flags=flags['meat'])
+        create_recipe(cls.user, title='Mystery',
+                      dietary_flags=dietary.UNCLASSIFIED)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def titles(self, **params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_filters(self):
+        """Test diets and avoided flags combine; unclassified never pass."""
+        self.assertEqual(len(self.titles()), 5)
+        self.assertEqual(self.titles(diet='vegetarian'),
+                         ['Pesto pasta', 'Salad'])
+        self.assertEqual(self.titles(diet='pescatarian', avoid='nuts'),
+                         ['Prawns', 'Salad'])
+        self.assertEqual(self.titles(diet='vegan,gluten_free'), ['Salad'])
+
+    def test_unknown_values(self):
+        res = self.client.get(RECIPES_URL, {'diet': 'paleo'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('diet', res.data)
+        res = self.client.get(RECIPES_URL, {'avoid': 'nuts,kryptonite'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_home_profile(self):
+        """Test home_profile applies the profile stored on the home."""
+        res = self.client.get(RECIPES_URL, {'home_profile': 'true'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        home = create_home(diets=dietary.DIET_BITS['vegetarian'],
+                           avoid=dietary.FLAGS['milk'])
+        self.user.home = home
+        self.user.save()
+
+        self.assertEqual(self.titles(home_profile='true'), ['Salad'])
+
+    def test_recipe_flags(self):
+        res = self.client.get(RECIPES_URL, {'diet': 'vegetarian'})
+
+        self.assertEqual(res.data[0]['contains'], ['milk', 'nuts'])
+        self.assertEqual(res.data[0]['diets'], [
+            'vegetarian', 'pescatarian', 'gluten_free', 'alcohol_free'])
+
+    def test_set_ingredient_flags(self):
+        """Test flags set on an ingredient reach its recipes."""
+        ingredient = create_ingredient(self.user, name='Gelatin')
+        recipe = create_recipe(self.user, title='Jelly')
+        create_recipe_ingredient(recipe, ingredient)
+        res = self.client.get(ingredient_url(ingredient.id))
+        self.assertEqual(res.data['contains'], ['unclassified'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.patch(ingredient_url(ingredient.id),
+                                    {'contains': ['meat']}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['contains'], ['meat'])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.dietary_flags, dietary.FLAGS['meat'])
+        self.assertNotIn('Jelly', self.titles(diet='vegetarian'))
+        self.assertEqual(Recipe.objects.filter(title='Jelly').count(), 1)
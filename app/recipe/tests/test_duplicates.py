@@ -0,0 +1,187 @@
+"""
+Tests for near-duplicate recipe detection.
+"""
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import RecipeBand, RecipeIngredient, RecipeSignature
+from recipe import duplicates
+from recipe.helper_method import (
+    create_user,
+    create_recipe,
+    create_ingredient,
+    create_recipe_ingredient,
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def duplicates_url(recipe_id):
+    """Return the duplicates URL for a recipe."""
+    return reverse('recipe:recipe-duplicates', args=[recipe_id])
+
+
+class SignatureTests(SimpleTestCase):
+    """Tests for signatures and their similarity."""
+
+    def test_title_tokens(self):
+        self.assertEqual(
+            duplicates.title_tokens('The Best Chocolate-Chip Cookies!'),
+            {'chocolate', 'chip', 'cookie'})
+
+    def test_similarity_estimates_jaccard(self):
+        """Test signature agreement tracks the Jaccard similarity."""
+        base = {f'w{i}' for i in range(20)}
+        same = duplicates.minhash(base)
+        close = duplicates.minhash(base - {'w0', 'w1'} | {'x0', 'x1'})
+        other = duplicates.minhash({f'y{i}' for i in range(20)})
+
+        self.assertEqual(duplicates.similarity(same, same), 1.0)
+        self.assertGreater(duplicates.similarity(same, close), 0.6)
+        self.assertLess(duplicates.similarity(same, other), 0.1)
+        self.assertIsNone(duplicates.minhash(set()))
+
+    def test_band_keys_differ_by_band(self):
+        signature = duplicates.minhash({'a'})
+
+        keys = duplicates.recipe_keys(signature)
+
+        self.assertEqual(len(set(keys)), duplicates.BANDS)
+        self.assertTrue(all(0 <= key < 2 ** 63 for key in keys))
+        self.assertFalse(set(keys) & set(duplicates.title_keys(signature)))
+
+
+class DuplicateIndexTests(TestCase):
+    """Tests for indexing recipes and finding duplicates."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='user@example.com', password='Test123')
+        cls.ing = [create_ingredient(cls.user, name=f'Ingredient {i}')
+                   for i in range(12)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_recipe(self, title, ingredients):
+        recipe = create_recipe(self.user, title=title)
+        for ingredient in ingredients:
+            create_recipe_ingredient(recipe, self.ing[ingredient])
+        return recipe
+
+    def test_find_duplicates(self):
+        """Test recipes sharing title and ingredients are found."""
+        original = self.make_recipe('Chocolate chip cookies', range(8))
+        copy = self.make_recipe('Best chocolate-chip cookies', range(8))
+        self.make_recipe('Chocolate chip cookies', range(4, 12))
+        duplicates.build_index()
+
+        matches = duplicates.find_duplicates(original)
+
+        self.assertEqual([(match[0], match[1]) for match in matches],
+                         [(copy.id, copy.title)])
+        self.assertEqual(matches[0][2], 1.0)
+        self.assertEqual(RecipeSignature.objects.count(), 3)
+        self.assertEqual(RecipeBand.objects.count(), 3 * (
+            duplicates.BANDS + duplicates.TITLE_BANDS))
+
+    def test_index_follows_changes(self):
+        """Test committed recipe and line changes are reindexed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            original = self.make_recipe('Lentil soup', range(6))
+        with self.captureOnCommitCallbacks(execute=True):
+            other = self.make_recipe('Tomato salad', range(6, 12))
+        self.assertEqual(duplicates.find_duplicates(original), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.title = 'Lentil soup'
+            other.save()
+            RecipeIngredient.objects.filter(recipe=other).delete()
+            for i in range(6):
+                create_recipe_ingredient(other, self.ing[i])
+
+        (match,) = duplicates.find_duplicates(original)
+        self.assertEqual(match[0], other.id)
+        signature = RecipeSignature.objects.get(recipe=other)
+        self.assertEqual(bytes(signature.minhash), bytes(
+            RecipeSignature.objects.get(recipe=original).minhash))
+
+    def test_unchanged_recipes_are_not_rewritten(self):
+        """Test reindexing only writes recipes whose signature changed."""
+        recipe = self.make_recipe('Lentil soup', range(6))
+        other = self.make_recipe('Tomato salad', range(6, 12))
+        duplicates.build_index()
+        recipe.time_minutes = 45
+        recipe.save()
+        other.title = 'Tomato and onion salad'
+        other.save()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(duplicates.index_recipes([recipe.id]), 0)
+        self.assertEqual(
+            duplicates.index_recipes([recipe.id, other.id]), 1)
+        (match,) = duplicates.find_title_duplicates('Tomato onion salad')
+        self.assertEqual(match[0], other.id)
+
+        recipe_id = recipe.id
+        recipe.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(duplicates.index_recipes([recipe_id]), 0)
+
+    def test_build_missing_only(self):
+        self.make_recipe('Lentil soup', range(6))
+        duplicates.build_index()
+        self.make_recipe('Tomato salad', range(6, 12))
+
+        self.assertEqual(duplicates.build_index(missing_only=True), 1)
+        self.assertEqual(RecipeSignature.objects.count(), 2)
+
+    def test_duplicates_api(self):
+        """Test the duplicates endpoint lists similar recipes."""
+        original = self.make_recipe('Lentil soup', range(6))
+        copy = self.make_recipe('Lentils soup', range(6))
+        duplicates.build_index()
+
+        res = self.client.get(duplicates_url(original.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': copy.id, 'title': 'Lentils soup', 'score': 1.0}])
+        res = self.client.get(duplicates_url(original.id),
+                              {'threshold': 'high'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(
+        DUPLICATES=dict(settings.DUPLICATES, CHECK_ON_CREATE=True))
+    def test_create_refuses_duplicate_title(self):
+        """Test creating a recipe with a near-duplicate title fails."""
+        existing = self.make_recipe('Lentil soup', range(6))
+        duplicates.build_index()
+        payload = {'title': 'The lentil soups', 'time_minutes': 30}
+
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['duplicates'], [
+            {'id': existing.id, 'title': 'Lentil soup', 'score': 1.0}])
+
+        res = self.client.post(f'{RECIPES_URL}?allow_duplicate=true',
+                               payload)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        res = self.client.post(RECIPES_URL, {'title': 'Tomato salad',
+                                             'time_minutes': 5})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_check_off_by_default(self):
+        """Test duplicate titles are accepted unless the check is on."""
+        self.make_recipe('Lentil soup', range(6))
+        duplicates.build_index()
+
+        res = self.client.post(RECIPES_URL, {'title': 'Lentil soup',
+                                             'time_minutes': 30})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
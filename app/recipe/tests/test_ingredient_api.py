@@ -35,9 +35,12 @@ class PublicIngredientApiTests(TestCase):
 class PrivateIngredientApiTests(TestCase):
     """Tests for authenticated API requests."""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='sarthak@example.com')
+
     def setUp(self):
         self.client = APIClient()
-        self.user = create_user(email='sarthak@example.com')
         self.client.force_authenticate(self.user)
 
     def test_get_ingredients_successful(self):
@@ -0,0 +1,90 @@
+"""
+Tests for the nutrition APIs.
+"""
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IngredientNutrition
+from recipe.helper_method import (
+    create_user,
+    create_recipe,
+    create_ingredient,
+)
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def nutrition_url(ingredient_id):
+    """Return the nutrition URL for an ingredient."""
+    return reverse('recipe:ingredient-nutrition', args=[ingredient_id])
+
+
+class NutritionApiTests(TestCase):
+    """Test nutrition filters and data entry."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='user@example.com', password='Test123')
+        cls.salad = create_recipe(cls.user, title='Salad', kcal=250,
+                                  protein=5)
+        cls.steak = create_recipe(cls.user, title='Steak', kcal=700,
+                                  protein=60)
+        cls.unknown = create_recipe(cls.user, title='Mystery')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def titles(self, **params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_filters(self):
+        """Test recipes filter on totals; unknown totals never match."""
+        self.assertEqual(self.titles(max_kcal=300), ['Salad'])
+        self.assertEqual(self.titles(min_protein=20), ['Steak'])
+        self.assertEqual(self.titles(max_kcal=800, min_protein=1),
+                         ['Steak', 'Salad'])
+        self.assertEqual(len(self.titles()), 3)
+
+        res = self.client.get(RECIPES_URL, {'max_kcal': 'lots'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipe_nutrition(self):
+        res = self.client.get(RECIPES_URL, {'max_kcal': 300})
+
+        self.assertEqual(res.data[0]['nutrition'], {
+            'kcal': 250, 'protein': 5, 'fat': None, 'carbs': None,
+            'missing_lines': 0})
+
+    def test_set_ingredient_nutrition(self):
+        """Test the owner reads and sets nutrition."""
+        ingredient = create_ingredient(self.user, name='Milk')
+        url = nutrition_url(ingredient.id)
+        self.assertEqual(self.client.get(url).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        payload = {'amount': 100, 'unit': 'ml', 'kcal': 64, 'protein': 3.4,
+                   'fat': 3.6, 'carbs': 4.8}
+
+        res = self.client.put(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).data['kcal'], 64)
+        stored = IngredientNutrition.objects.get(ingredient=ingredient)
+        self.assertEqual((stored.amount, stored.unit), (100, 'ml'))
+
+        payload['amount'] = 0
+        res = self.client.put(url, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_cannot_set_nutrition(self):
+        other = create_user(email='other@example.com', password='Test123')
+        ingredient = create_ingredient(other, name='Milk')
+
+        res = self.client.put(nutrition_url(ingredient.id), {'kcal': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(IngredientNutrition.objects.exists())
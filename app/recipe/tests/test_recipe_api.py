@@ -40,9 +40,12 @@ class PublicRecipeApiTests(TestCase):
 class PrivateRecipeApiTests(TestCase):
     """Tests authenticated API requests."""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='user@example.com', password='Test123')
+
     def setUp(self):
         self.client = APIClient()
-        self.user = create_user(email='user@example.com', password='Test123')
         self.client.force_authenticate(self.user)
 
     def test_retrieve_recipes(self):
@@ -168,3 +171,20 @@ class PrivateRecipeApiTests(TestCase):
         res = self.client.delete(url)
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
         self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_retrieve_recipes_ordered_by_popularity(self):
+        """Test ordering=popularity returns most favourited first, then
+        highest average rating."""
+        r1 = create_recipe(user=self.user, fav_count=1, rating_sum=5,
+                           rating_count=1)
+        r2 = create_recipe(user=self.user, fav_count=3, rating_sum=2,
+                           rating_count=1)
+        r3 = create_recipe(user=self.user, fav_count=1, rating_sum=9,
+                           rating_count=3)
+        r4 = create_recipe(user=self.user, fav_count=1)
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'popularity'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data], [r2.id, r1.id, r3.id, r4.id])
@@ -0,0 +1,91 @@
+"""
+Test recipe catalog import API requests.
+"""
+import json
+import os
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, RecipeSignature
+from recipe import cooccurrence
+from recipe.helper_method import create_user
+
+IMPORT_URL = reverse('recipe:recipe-import')
+CATALOG = '\n'.join(json.dumps(recipe) for recipe in [
+    {'title': 'Soup', 'time_minutes': 5,
+     'ingredients': [{'name': 'water', 'amount': 1, 'amount_unit': 'l'}]},
+    {'title': ''},
+]).encode()
+
+
+def upload(name='catalog.ndjson', content=CATALOG):
+    return SimpleUploadedFile(name, content, 'application/x-ndjson')
+
+
+class RecipeImportApiTests(TestCase):
+    """Test importing recipe catalogs through the API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user(email='admin@example.com', password='pass123',
+                                is_staff=True)
+        cls.user = create_user(email='user@example.com', password='pass123')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_import(self):
+        """Test a catalog upload reports what was imported."""
+        res = self.client.post(IMPORT_URL, {'file': upload()},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((res.data['recipes'], res.data['lines'],
+                          res.data['errors']), (1, 1, 1))
+        self.assertIn('rows_per_second', res.data)
+        self.assertEqual(Recipe.objects.get().user, self.admin)
+
+    def test_import_updates_indexes(self):
+        """Test imported recipes are indexed like those of import_recipes,
+        for duplicates and substitutes."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cooc.bin')
+            with self.settings(COOCCURRENCE_PATH=path):
+                self.client.post(IMPORT_URL, {'file': upload()},
+                                 format='multipart')
+                water = Ingredient.objects.get(name='water')
+                self.assertEqual(
+                    cooccurrence.get_index().name(water.id), 'water')
+                cooccurrence.reset_index()
+
+        self.assertTrue(RecipeSignature.objects.filter(
+            recipe__title='Soup').exists())
+
+    def test_reupload_resumes(self):
+        """Test uploading the same file again imports nothing twice."""
+        self.client.post(IMPORT_URL, {'file': upload()}, format='multipart')
+        res = self.client.post(IMPORT_URL, {'file': upload()},
+                               format='multipart')
+
+        self.assertEqual(res.data['skipped_chunks'], 1)
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_unknown_format(self):
+        res = self.client.post(IMPORT_URL, {'file': upload('catalog.txt')},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_required(self):
+        self.client.force_authenticate(self.user)
+
+        res = self.client.post(IMPORT_URL, {'file': upload()},
+                               format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -38,13 +38,16 @@ class PublicRecipeIngredientRequests(TestCase):
 class PrivateRecipeIngredientRequests(TestCase):
     """Tests for authenticated user's requests."""
 
-    def setUp(self):
-        self.user = create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
             email='test@example.com',
             password='Testpass123')
+        cls.recipe = create_recipe(user=cls.user)
+        cls.ingredient = create_ingredient(user=cls.user)
+
+    def setUp(self):
         self.client = APIClient()
-        self.recipe = create_recipe(user=self.user)
-        self.ingredient = create_ingredient(user=self.user)
         self.client.force_authenticate(self.user)
 
     def test_fetch_all_recipe_ingredients(self):
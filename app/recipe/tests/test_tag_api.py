@@ -41,9 +41,12 @@ class PublicTagApiTests(TestCase):
 class PrivateTagApiTests(TestCase):
     """Tests for authenticated TAG API Requests."""
 
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email='akshat@example.com')
+
     def setUp(self):
         self.client = APIClient()
-        self.user = create_user(email='akshat@example.com')
         self.client.force_authenticate(self.user)
 
     def test_retrieve_tags(self):
@@ -20,4 +20,5 @@ app_name = 'recipe'
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('import/', views.RecipeImportView.as_view(), name='recipe-import'),
 ]
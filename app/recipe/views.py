@@ -1,16 +1,32 @@
 """
 Views for Recipe.
 """
-from recipe import serializers
-from rest_framework import viewsets
+import os
+import tempfile
+
+from django.conf import settings
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from recipe import serializers, cooccurrence, duplicates
+from rest_framework import generics, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.fields import BooleanField
+from rest_framework.response import Response
 from core.models import (
+    POPULARITY_ORDER,
     Recipe,
     Tag,
     Ingredient,
+    IngredientNutrition,
     RecipeIngredient,
 )
+from core import dietary, importing
+from core.cache import CachedResponseMixin
+from core.fieldsets import SparseQuerysetMixin
 from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from recipe.permissions import (
     TagPermissions,
     IngredientPermissions,
@@ -19,17 +35,99 @@ from recipe.permissions import (
 )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class DuplicateRecipe(APIException):
+    """Raised when a new recipe looks like existing ones."""
+    status_code = status.HTTP_409_CONFLICT
+
+    def __init__(self, matches):
+        # Set directly: APIException would turn ids and scores to strings.
+        self.detail = {
+            'detail': 'A recipe with a similar title exists.',
+            'duplicates': _duplicate_data(matches),
+        }
+
+
+class RecipeViewSet(CachedResponseMixin, SparseQuerysetMixin,
+                    viewsets.ModelViewSet):
     """View for manage recipe APIs."""
 
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, RecipePermission]
+    cache_namespaces = ['recipe']
+
+    # Query parameter -> lookup on the nutrition summary columns, which
+    # recipe_kcal_idx and recipe_protein_idx cover.
+    nutrition_filters = {
+        'max_kcal': 'kcal__lte',
+        'min_protein': 'protein__gte',
+    }
 
     def get_queryset(self):
         """Retrieves recipes for authenticated user."""
-        return self.queryset.all().order_by('-id')
+        queryset = self.queryset.all()
+        if self.action == 'list':
+            queryset = queryset.filter(**self._nutrition_lookups())
+            queryset = dietary.exclude_flags(queryset, self._excluded_flags())
+        ordering = self.request.query_params.get('ordering')
+        if ordering == 'popularity':
+            # Matches recipe_popularity_idx so no sort step is needed.
+            return queryset.order_by(*POPULARITY_ORDER)
+        return queryset.order_by('-id')
+
+    def _nutrition_lookups(self):
+        lookups = {}
+        for param, lookup in self.nutrition_filters.items():
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                lookups[lookup] = float(value)
+            except ValueError:
+                raise ValidationError({param: ['A number is required.']})
+        return lookups
+
+    def _uses_home_profile(self):
+        return (self.request.query_params.get('home_profile')
+                in BooleanField.TRUE_VALUES)
+
+    def _flags_param(self, param, bits):
+        value = self.request.query_params.get(param, '')
+        names = [name for name in value.split(',') if name]
+        unknown = [name for name in names if name not in bits]
+        if unknown:
+            raise ValidationError({param: [
+                f'Unknown: {", ".join(unknown)}. '
+                f'Choose from {", ".join(bits)}.']})
+        return dietary.mask(names, bits)
+
+    def _excluded_flags(self):
+        """Return the flags ruled out by `?diet=` and `?avoid=`, both
+        comma separated, and by the home's profile with
+        `?home_profile=true`."""
+        flags = dietary.excluded(
+            self._flags_param('diet', dietary.DIET_BITS),
+            self._flags_param('avoid', dietary.CONTENT_FLAGS))
+        if self._uses_home_profile():
+            home = self.request.user.home
+            if home is None:
+                raise ValidationError(
+                    {'home_profile': ['You do not have a home.']})
+            flags |= dietary.home_excluded(home)
+        return flags
+
+    def get_cache_scope(self):
+        # Lists filtered by a home's profile differ per home.
+        if self._uses_home_profile():
+            return f'home:{self.request.user.home_id}'
+        return super().get_cache_scope()
+
+    def get_cache_namespaces(self):
+        namespaces = super().get_cache_namespaces()
+        if self._uses_home_profile():
+            namespaces.append(f'home:{self.request.user.home_id}')
+        return namespaces
 
     def get_serializer_class(self):
         """Return the serializer class for the request."""
@@ -39,17 +137,53 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return self.serializer_class
 
     def perform_create(self, serializer):
-        """Create a new recipe."""
+        """Create a new recipe unless its title duplicates another's.
+
+        Pass `allow_duplicate=true` to create it anyway.
+        """
+        allow = self.request.query_params.get('allow_duplicate')
+        if settings.DUPLICATES['CHECK_ON_CREATE'] and \
+                allow not in BooleanField.TRUE_VALUES:
+            matches = duplicates.find_title_duplicates(
+                serializer.validated_data['title'], limit=5)
+            if matches:
+                raise DuplicateRecipe(matches)
         serializer.save(user=self.request.user)
 
+    @extend_schema(responses={200: OpenApiTypes.OBJECT})
+    @action(detail=True, methods=['get'])
+    def duplicates(self, request, pk=None):
+        """List near-duplicates by title and ingredients, closest first."""
+        recipe = self.get_object()
+        try:
+            threshold = float(request.query_params.get(
+                'threshold', settings.DUPLICATES['THRESHOLD']))
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            raise ValidationError('Provide numeric threshold and limit.')
+        if not 0 < threshold <= 1 or limit < 1:
+            raise ValidationError(
+                'Threshold must be in (0, 1] and limit positive.')
+        matches = duplicates.find_duplicates(recipe, threshold, limit)
+        return Response(_duplicate_data(matches), status=status.HTTP_200_OK)
+
+
+def _duplicate_data(matches):
+    return [
+        {'id': recipe_id, 'title': title, 'score': round(score, 4)}
+        for recipe_id, title, score in matches
+    ]
 
-class TagViewSet(viewsets.ModelViewSet):
+
+class TagViewSet(CachedResponseMixin, SparseQuerysetMixin,
+                 viewsets.ModelViewSet):
     """View for manage Tags API."""
 
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, TagPermissions]
+    cache_namespaces = ['tag']
 
     def get_queryset(self):
         """Retrieves tags for authenticated API requests."""
@@ -60,11 +194,13 @@ class TagViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(CachedResponseMixin, SparseQuerysetMixin,
+                        viewsets.ModelViewSet):
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, IngredientPermissions]
+    cache_namespaces = ['ingredient']
 
     def get_queryset(self):
         """Retrieves ingredients for authenticated API requests."""
@@ -74,14 +210,100 @@ class IngredientViewSet(viewsets.ModelViewSet):
         """Create a new ingredient."""
         serializer.save(user=self.request.user)
 
+    @extend_schema(request=serializers.IngredientNutritionSerializer,
+                   responses=serializers.IngredientNutritionSerializer)
+    @action(detail=True, methods=['get', 'put'])
+    def nutrition(self, request, pk=None):
+        """Read or set the nutrition of an ingredient.
+
+        Recipes using it are recomputed when the change commits.
+        """
+        ingredient = self.get_object()
+        current = IngredientNutrition.objects.filter(
+            ingredient=ingredient).first()
+        if request.method == 'GET':
+            if current is None:
+                return Response(
+                    {'detail': 'Not found.'},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            serializer = serializers.IngredientNutritionSerializer(current)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        serializer = serializers.IngredientNutritionSerializer(
+            current, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(ingredient=ingredient)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def substitutes(self, request, pk=None):
+        """Suggest substitutes from the co-occurrence index.
 
-class RecipeIngredientViewSet(viewsets.ModelViewSet):
+        Served entirely from the memory-mapped index, without SQL.
+        """
+        try:
+            ingredient_id = int(pk)
+            limit = int(request.query_params.get('limit', 5))
+        except ValueError:
+            raise ValidationError('Provide whole numbers.')
+        if limit < 1:
+            raise ValidationError('Limit must be positive.')
+        index = cooccurrence.get_index()
+        if index is None:
+            return Response([], status=status.HTTP_200_OK)
+        if index.name(ingredient_id) is None:
+            return Response(
+                {'detail': 'Not found.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        data = [
+            {
+                'id': sub,
+                'name': index.name(sub),
+                'score': round(score, 4),
+            }
+            for sub, score in index.substitutes(ingredient_id, limit)
+        ]
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class RecipeIngredientViewSet(CachedResponseMixin, SparseQuerysetMixin,
+                              viewsets.ModelViewSet):
     """Views to manage recipe ingredient API requests."""
     serializer_class = serializers.RecipeIngredientSerializer
     queryset = RecipeIngredient.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, RecipeIngredientPermission]
+    cache_namespaces = ['recipeingredient', 'recipe', 'ingredient']
 
     def get_queryset(self):
         """Retrieve ingredients required for recipe."""
         return self.queryset.all().order_by('-id')
+
+
+class RecipeImportView(generics.GenericAPIView):
+    """View for admins to bulk import a recipe catalog file."""
+    serializer_class = serializers.RecipeImportSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    @extend_schema(responses={201: OpenApiTypes.OBJECT})
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        fmt = serializer.validated_data.get('format')
+        suffix = os.path.splitext(upload.name)[1]
+        # Imports read the file twice: once to identify it, once to load.
+        with tempfile.NamedTemporaryFile(suffix=suffix) as file:
+            for chunk in upload.chunks():
+                file.write(chunk)
+            file.flush()
+            try:
+                result = importing.import_file(
+                    file.name, request.user, fmt=fmt)
+            except ValueError as error:
+                raise ValidationError({'format': [str(error)]})
+        importing.index_imported()
+        return Response(result.as_dict(), status=status.HTTP_201_CREATED)
@@ -6,6 +6,7 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
@@ -100,16 +101,39 @@ class PublicUserApiTests(TestCase):
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_retrieve_profile_with_token(self):
+        """Test the me endpoint accepts token authentication."""
+        user = create_user(email='token@example.com', password='testpass123')
+        token = Token.objects.create(user=user)
+
+        res = self.client.get(
+            ME_URL, HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], user.email)
+
+    def test_retrieve_profile_session_rejected(self):
+        """Test the me endpoint only authenticates tokens."""
+        create_user(email='session@example.com', password='testpass123')
+        self.client.login(email='session@example.com', password='testpass123')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
 
 class PrivateUserApiTests(TestCase):
     """Tests API requests that require authentication."""
 
-    def setUp(self):
-        self.user = create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(
             email='test@example.com',
             password='testpass123',
             name='Test Name',
         )
+
+    def setUp(self):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 